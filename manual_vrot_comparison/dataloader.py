@@ -6,6 +6,14 @@ import pytz
 import os
 import math
 import copy
+
+#The run store reader is shared with ttrappy (runTTRAP.py --compact writes the stores). It can only be imported when the top
+#folder of the repository is on PYTHONPATH (e.g. env PYTHONPATH=.. python3 runCalib.py ...). Otherwise the _prelim.csv
+#files are read like they always were.
+try:
+    from ttrappy import runstore
+except ImportError:
+    runstore = None
     
 class Truth:
 
@@ -602,8 +610,34 @@ def getManualData(manualFile):
 def getAutoData(stormFolder, tiltList, radii):
 
     print('Loading Auto values')
+    
+    #Use the run store if runTTRAP.py --compact has made one for this run
+    store = None
+    if runstore:
+        store = runstore.openRunStore(stormFolder)
+    elif os.path.exists(os.path.join(stormFolder, 'run_store.ttrap')):
+        print('Not using the run store in', stormFolder, 'without the top folder on PYTHONPATH. Reading the _prelim.csv files')
+        
+    if store is not None:
+        autoObjects = {}
+        for TC in store.getTCs():
+            autoObjects[TC] = {}
+            for case in store.getCases(TC):
+                autoObjects[TC][case] = []
+                storeCase = store.getCase(TC, case)
+                if storeCase is None:
+                    print('No _prelim.csv for', TC, case, 'in the run store and continuing!')
+                    continue
+                #Numbers come straight from the store's columns instead of being turned back into strings
+                for row in storeCase.getRows(runstore.getTextColumns(storeCase.header)):
+                    autoObjects[TC][case].append(Auto(storeCase.header, row, tiltList, radii))
+                    
+        print('Done!')
+        
+        return autoObjects
+        
     #First, we'll start by going the storms folder and listing TCs
-    tcNames = os.listdir(stormFolder)
+    tcNames = [TC for TC in os.listdir(stormFolder) if os.path.isdir(os.path.join(stormFolder, TC))]
     
     autoObjects = {}
     
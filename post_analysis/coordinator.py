@@ -413,55 +413,56 @@ def calculateBin(dt, binSpacing):
     
     return binNumber, bin
     
-def shiftAndBins(dataObjects, tdShift, tiltList, cfg):
-
-    dataObjectsCopy = copy.deepcopy(dataObjects)
-    newDataObjects = []
-    
-    for auto in dataObjectsCopy:
-        
-        #Adjust the track time/bin
-        if int(auto.trackTimeDelta) > -99900:
-            print('Adjusting Track', auto.trackTimeDelta, auto.trackBin, auto.trackBinNumber, 'timebinsize', cfg.timeBinSize)
-            auto.trackTimeDelta = auto.trackTimeDelta - tdShift
-            newTrackBins = calculateBin(auto.trackTimeDelta, cfg.timeBinSize)
-            auto.trackBinNumber = newTrackBins[0]
-            auto.trackBin = newTrackBins[1]
-            print('Now Track', auto.trackTimeDelta, auto.trackBin, auto.trackBinNumber)
-        else:
-            print('No track to adjust')
-        
+def shiftAuto(auto, tdShift, tiltList, cfg):
+    """ A copy of auto with its track, echo-top, and tilt time deltas shifted by tdShift and the bins recalculated.
+        Only the Auto and the shifted Tilts are copied. Everything else (ranges, VCPs, Vrots, ...) is shared with auto.
+    """
+    
+    shifted = copy.copy(auto)
+    
+    #Adjust the track time/bin
+    if int(auto.trackTimeDelta) > -99900:
+        shifted.trackTimeDelta = auto.trackTimeDelta - tdShift
+        shifted.trackBinNumber, shifted.trackBin = calculateBin(shifted.trackTimeDelta, cfg.timeBinSize)
         
-        #Adjust the echo-tops
-        if int(auto.etTimeDelta) > -99900:
-            print('Adjusting ET', auto.etTimeDelta, auto.etBin, auto.etBinNumber, 'timebinsize', cfg.timeBinSize)
-            auto.etTimeDelta  = auto.etTimeDelta - tdShift
-            newETBins = calculateBin(auto.etTimeDelta, cfg.timeBinSize)
-            auto.etBinNumber = newETBins[0]
-            auto.etBin = newETBins[1]
-            print('Now ET', auto.etTimeDelta, auto.etBin, auto.etBinNumber)
-        else:
-            print('No ET to adjust')
+    #Adjust the echo-tops
+    if int(auto.etTimeDelta) > -99900:
+        shifted.etTimeDelta = auto.etTimeDelta - tdShift
+        shifted.etBinNumber, shifted.etBin = calculateBin(shifted.etTimeDelta, cfg.timeBinSize)
         
-        #Adjust all tilts
-        for tilt in tiltList:
-            if int(auto.azShear[tilt].timeDelta) > -99900:
-                print('Adjusting tilt', tilt, auto.azShear[tilt].timeDelta, auto.azShear[tilt].minuteBin, auto.azShear[tilt].binNumber, 'timebinsize', cfg.timeBinSize)
-                auto.azShear[tilt].timeDelta = auto.azShear[tilt].timeDelta - tdShift
-                newTiltBins = calculateBin(auto.azShear[tilt].timeDelta, cfg.timeBinSize)
-                auto.azShear[tilt].binNumber = newTiltBins[0]
-                auto.azShear[tilt].minuteBin = newTiltBins[1]
-                print('Now tilt', tilt, auto.azShear[tilt].timeDelta, auto.azShear[tilt].minuteBin, auto.azShear[tilt].binNumber)
-            else:
-                print('Tilt', tilt, 'is unavailable to be adjusted')
-                
-        newDataObjects.append(auto)
+    #Adjust all tilts
+    shifted.azShear = dict(auto.azShear)
+    for tilt in tiltList:
+        if int(auto.azShear[tilt].timeDelta) > -99900:
+            shiftedTilt = copy.copy(auto.azShear[tilt])
+            shiftedTilt.timeDelta = auto.azShear[tilt].timeDelta - tdShift
+            shiftedTilt.binNumber, shiftedTilt.minuteBin = calculateBin(shiftedTilt.timeDelta, cfg.timeBinSize)
+            shifted.azShear[tilt] = shiftedTilt
+            
+    return shifted
+    
+def shiftAndBins(dataObjects, tdShift, tiltList, cfg, shiftedCases=None):
+    """ The autos of a case with their time deltas shifted by tdShift (see shiftAuto). dataObjects isn't changed.
         
+        shiftedCases is a dictionary the caller keeps for as long as the shifted autos should be shared. With it, every group
+        holding the same case (e.g. ALL TOR, TDS, and NO TDS) gets the same shifted autos for a shift instead of its own copy.
+        It maps (id of the case's list of autos, time shift, tilts, bin size) -> (the list, the shifted autos).
+    """
+    
+    key = (id(dataObjects), tdShift, tuple(tiltList), cfg.timeBinSize)
+    if shiftedCases is not None and key in shiftedCases and shiftedCases[key][0] is dataObjects:
+        return shiftedCases[key][1]
         
-            
+    newDataObjects = [shiftAuto(auto, tdShift, tiltList, cfg) for auto in dataObjects]
+    print('Shifted', len(newDataObjects), 'autos by', tdShift, 'seconds')
+    
+    #Keep dataObjects with the shifted autos so its id isn't reused while it's in the cache
+    if shiftedCases is not None:
+        shiftedCases[key] = (dataObjects, newDataObjects)
+    
     return newDataObjects
     
-def timeShiftObjects(dataObjects, tiltList, shiftAmount, cfg):
+def timeShiftObjects(dataObjects, tiltList, shiftAmount, cfg, shiftedCases=None):
 
     """ For each case, find the volume with the maximum abs azshear and shift all timedeltas by that amount.
         With the new timedetlas calculate the new time bins. 
@@ -487,7 +488,7 @@ def timeShiftObjects(dataObjects, tiltList, shiftAmount, cfg):
             else:
                 tdShift = int(shiftAmount)
             
-            shiftedObjects[TC][case] = shiftAndBins(dataObjects[TC][case], tdShift, tiltList, cfg)
+            shiftedObjects[TC][case] = shiftAndBins(dataObjects[TC][case], tdShift, tiltList, cfg, shiftedCases)
             
             
     return shiftedObjects
@@ -515,9 +516,10 @@ def getMaxRotTDByBin(autoObjects, tiltList, minbin, maxbin):
     
     return theTimedelta
     
-def timeShiftByBin(dataObjects, tiltList, shiftAmount, minbin, maxbin, cfg):
+def timeShiftByBin(dataObjects, tiltList, shiftAmount, minbin, maxbin, cfg, shiftedCases=None):
     """ 
-        Performs a time shift, but only on objects who's lowest tilt is between and including minbinb and maxbin 
+        Performs a time shift, but only on objects who's lowest tilt is between and including minbinb and maxbin.
+        shiftedCases is passed to shiftAndBins.
    """
    
     print('Starting time shift by bin')
@@ -538,7 +540,7 @@ def timeShiftByBin(dataObjects, tiltList, shiftAmount, minbin, maxbin, cfg):
             
             #Now shift the objects. If shift is none, then just set the auto objects to an empty list for that case
             if tdShift is not None:
-                shiftedObjects[TC][case] = shiftAndBins(dataObjects[TC][case], tdShift, tiltList, cfg)
+                shiftedObjects[TC][case] = shiftAndBins(dataObjects[TC][case], tdShift, tiltList, cfg, shiftedCases)
             else:
                 print('Shift was', tdShift, '. Setting to empty list')
                 shiftedObjects[TC][case] = []
@@ -575,6 +577,11 @@ def getSortedData(autoObjects, tiltList, cfg):
     print('Sorting by TDS for NON TOR')
     tdsNonTorObjects, noTDSNonTorObjects, nNonTorTDS, nNonTorNoTDS, nonTorTdsCountByEF, nonTorTotalCountByEF = sorting.sortTDS(nonTorObjects, tiltList[0], minCount=25, startBin=0, potentialClusters=3)
     
+    #The TDS groups are the sets of TOR cases they hold. They're binned out of the TOR objects so nothing is copied
+    tdsCases = sorting.getCaseKeys(tdsObjects)
+    noTDSCases = sorting.getCaseKeys(noTDSObjects)
+    unshiftedTorObjects = torObjects
+    
     #If desired, timeshift the objects before doing the final sorting of the data.
     #This happens after the TDS sorting since that sorting uses the zero-bin
     
@@ -584,18 +591,12 @@ def getSortedData(autoObjects, tiltList, cfg):
         nonTorObjects = timeShiftObjects(nonTorObjects, tiltList, cfg.nontorShiftAmount, cfg)
         print('NON TOR time shifting complete!')
         
-    #If we want to time shift the TOR cases, we need to apply it to TOR, TOR TDS, and TOR NO TDS
+    #If we want to time shift the TOR cases, we need to apply it to TOR, TOR TDS, and TOR NO TDS.
+    #Shifting all TOR shifts every TDS case too since they're the same cases.
     if cfg.shiftTor:
         print('TOR time shifting...')
         torObjects = timeShiftObjects(torObjects, tiltList, cfg.torShiftAmount, cfg)
-        print('TDS time shifting...')
-        tdsObjects = timeShiftObjects(tdsObjects, tiltList, cfg.torShiftAmount, cfg)
-        print('NO TDS time shifting...')
-        notdsObjects = timeShiftObjects(noTDSObjects, tiltList, cfg.torShiftAmount, cfg)
-        print('TDS3 time shifting...')
-        tdsObjects3 = timeShiftObjects(tdsObjects3, tiltList, cfg.torShiftAmount, cfg)
-        print('NO TDS3 time shifting...')
-        noTDSObjects3 = timeShiftObjects(noTDSObjects3, tiltList, cfg.torShiftAmount, cfg)
+        print('TOR time shifting complete!')
         
     #Print the number of TOR and NON TOR cases with a TDS
     print(nTDS3, 'TOR cases were found to have a TDS.', nNoTDS3, 'cases did not. TDS by EF', tdsCountByEF3, 'total by EF', totalCountByEF3)
@@ -604,57 +605,41 @@ def getSortedData(autoObjects, tiltList, cfg):
     with open('case_numbers.csv', 'w') as fi:
         #Sort each group into individual time bins
         fi.write('group,casecount,negativecount,negativecases\n')
-        print('Binning NON TOR--------------------------------')
-        noTorBinned, ntCaseCount, noTorNegAzShearCount, ntNegAzShearCases = sorting.getObjectsByBin(nonTorObjects, tiltList, cfg)
-        print('NON TOR BINNED', noTorBinned)
-        fi.write(','.join(map(str, ['NON TOR', ntCaseCount, noTorNegAzShearCount, ntNegAzShearCases]))+'\n')
-        print('Binning ALL TOR--------------------------------')
-        torBinned, torCaseCount, torNegAzShearCount, torNegAzShearCases = sorting.getObjectsByBin(torObjects, tiltList, cfg, isTOR=True)
-        print('TOR BINNED', torBinned)
-        fi.write(','.join(map(str, ['ALL TOR', torCaseCount, torNegAzShearCount, torNegAzShearCases]))+'\n')
-        print('Binning TOR TDS--------------------------------')
-        tdsBinned, tdsCaseCount, tdsNegAzShearCount, tdsNegAzShearCases = sorting.getObjectsByBin(tdsObjects, tiltList, cfg, isTDS=True, isTOR=True)
-        print('TDS BINNED', tdsBinned)
-        fi.write(','.join(map(str, ['TOR TDS', tdsCaseCount, tdsNegAzShearCount, tdsNegAzShearCases]))+'\n')
-        print('Binning TOR NO TDS-----------------------------')
-        noTdsBinned, noTdsCaseCount, noTdsNegAzShearCount, noTDSNegAzShearCases = sorting.getObjectsByBin(noTDSObjects, tiltList, cfg, isTOR=True)
-        print('NO TDS BINNED', noTdsBinned)
-        fi.write(','.join(map(str, ['TOR NO TDS', noTdsCaseCount, noTdsNegAzShearCount, noTDSNegAzShearCases]))+'\n')
-        
-        #Sort each group into individual time bins, but only if there is 3 potential clusters
-        print('Binning NON TOR Max 3--------------------------------')
-        noTorBinnedOne, ntCaseCountOne, noTorNegAzShearCountOne, noTorNegAzShearCasesThree = sorting.getObjectsByBin(nonTorObjects, tiltList, cfg, maxPotentialClusters=3)
-        print('NON TOR BINNED 3', noTorBinnedOne)
-        fi.write(','.join(map(str, ['NON TOR 3', ntCaseCountOne, noTorNegAzShearCountOne, noTorNegAzShearCasesThree]))+'\n')
-        print('Binning ALL TOR Max 3--------------------------------')
-        torBinnedOne, torCaseCountOne, torNegAzShearCountOne, torNegAzShearCasesThree = sorting.getObjectsByBin(torObjects, tiltList, cfg, isTOR=True, maxPotentialClusters=3)
-        print('TOR BINNED 3', torBinnedOne)
-        fi.write(','.join(map(str, ['ALL TOR 3', torCaseCountOne, torNegAzShearCountOne, torNegAzShearCasesThree]))+'\n')
-        print('Binning TOR TDS Max 3--------------------------------')
-        tdsBinnedOne, tdsCaseCountOne, tdsNegAzShearCountOne, tdsNegAzShearCasesThree = sorting.getObjectsByBin(tdsObjects, tiltList, cfg, isTDS=True, isTOR=True, maxPotentialClusters=3)
-        print('TDS TOR BINNED 3', tdsBinnedOne)
-        fi.write(','.join(map(str, ['TOR TDS 3', tdsCaseCountOne, tdsNegAzShearCountOne, tdsNegAzShearCasesThree]))+'\n')
-        print('Binning TOR NO TDS Max 3-----------------------------')
-        noTdsBinnedOne, noTdsCaseCountOne, noTdsNegAzShearCountOne, noTDSNegAzShearCasesThree = sorting.getObjectsByBin(noTDSObjects, tiltList, cfg, isTOR=True, maxPotentialClusters=3)
-        print('NO TDS TOR BINNED 3', noTdsBinnedOne)
-        fi.write(','.join(map(str, ['TOR NO TDS 3', noTdsCaseCountOne, noTdsNegAzShearCountOne, noTDSNegAzShearCasesThree]))+'\n')
+        #Sort each group into individual time bins, and again with only 3 potential clusters. The TDS groups are binned straight out of
+        #the TOR cases. NO TDS has always been binned without the TOR time shift (its shifted copy was never used) so it stays that way here
+        print('Binning all groups--------------------------------')
+        groups = {'nontor':{'autoObjects':nonTorObjects},
+                  'alltor':{'autoObjects':torObjects, 'isTOR':True},
+                  'tds':{'autoObjects':torObjects, 'isTDS':True, 'isTOR':True, 'cases':tdsCases},
+                  'notds':{'autoObjects':unshiftedTorObjects, 'isTOR':True, 'cases':noTDSCases},
+                  'nontor3':{'autoObjects':nonTorObjects, 'maxPotentialClusters':3},
+                  'alltor3':{'autoObjects':torObjects, 'isTOR':True, 'maxPotentialClusters':3},
+                  'tds3':{'autoObjects':torObjects, 'isTDS':True, 'isTOR':True, 'maxPotentialClusters':3, 'cases':tdsCases},
+                  'notds3':{'autoObjects':unshiftedTorObjects, 'isTOR':True, 'maxPotentialClusters':3, 'cases':noTDSCases}}
+        groupNames = {'nontor':'NON TOR', 'alltor':'ALL TOR', 'tds':'TOR TDS', 'notds':'TOR NO TDS', 'nontor3':'NON TOR 3', 'alltor3':'ALL TOR 3', 'tds3':'TOR TDS 3', 'notds3':'TOR NO TDS 3'}
+        
+        groupResults = sorting.getObjectsByBinGroups(groups, tiltList, cfg)
+        for group in list(groups.keys()):
+            binned, caseCount, negAzShearCount, negAzShearCases = groupResults[group]
+            print(groupNames[group], 'BINNED', binned)
+            fi.write(','.join(map(str, [groupNames[group], caseCount, negAzShearCount, negAzShearCases]))+'\n')
         
         
         #Calculate the CSI TDS. Only works if all TDS cases are known. Comment out for final analysis
         #getTDSCSI(nonTorObjects, torObjects, tiltList[0], -4, 4, 1, 30, ['615666', '615668', '615669', '615671', '615673', '615681', '615685', '615695',\
          #                                                                '615699', '615701', '615707', '615710', '615714', '615715', '615716', '615717', '615718'])
                                                                          
-        totalCaseCount = ntCaseCount + torCaseCount
-        totalNegAzShearCount = noTorNegAzShearCount + torNegAzShearCount
+        totalCaseCount = groupResults['nontor'][1] + groupResults['alltor'][1]
+        totalNegAzShearCount = groupResults['nontor'][2] + groupResults['alltor'][2]
         fi.write(','.join(map(str, ['TOTAL', totalCaseCount, totalNegAzShearCount])))
         
     
     print('The grand total of cases is', totalCaseCount)
     print('The grand total cases for negative azshear at at least 1 tilt is', totalNegAzShearCount)
     
-    binnedDataDict = {'nontor':noTorBinned, 'alltor':torBinned, 'tds':tdsBinned, 'notds':noTdsBinned, 'nontor3':noTorBinnedOne, 'alltor3':torBinnedOne, 'tds3':tdsBinnedOne, 'notds3':noTdsBinnedOne}
-    caseCountDict = {'nontor':ntCaseCount, 'alltor':torCaseCount, 'tds':tdsCaseCount, 'notds':noTdsCaseCount, 'nontor3':ntCaseCountOne, 'alltor3':torCaseCountOne, 'tds3':tdsCaseCountOne, 'notds3':noTdsCaseCountOne}
-    negCountDict = {'nontor':noTorNegAzShearCount, 'alltor':torNegAzShearCount, 'tds':tdsNegAzShearCount, 'notds':noTdsNegAzShearCount, 'nontor3':noTorNegAzShearCountOne, 'alltor3':torNegAzShearCountOne, 'tds3':tdsNegAzShearCountOne, 'notds3':noTdsNegAzShearCountOne}
+    binnedDataDict = {group:groupResults[group][0] for group in list(groups.keys())}
+    caseCountDict = {group:groupResults[group][1] for group in list(groups.keys())}
+    negCountDict = {group:groupResults[group][2] for group in list(groups.keys())}
     
     print('Case count dict', caseCountDict)
     return binnedDataDict, caseCountDict, negCountDict, tdsCountByEFDict
@@ -6,6 +6,123 @@ import pytz
 import os
 import math
 import copy
+from collections.abc import MutableMapping
+from multiprocessing import Pool
+import numpy as np
+
+#The run store reader is shared with ttrappy (runTTRAP.py --compact writes the stores). It can only be imported when the top
+#folder of the repository is on PYTHONPATH (e.g. env PYTHONPATH=.. python3 runAnalysis.py ...). Otherwise the _prelim.csv
+#files are read like they always were.
+try:
+    from ttrappy import runstore
+except ImportError:
+    runstore = None
+
+
+class HeaderMap:
+
+    """ Column positions for a _prelim.csv header. Worked out once per header and shared by every row (and file) with
+        that header so Auto and Tilt don't have to search the ~300 column header for each value.
+        
+        index() gives the first column with a label like list.index (and raises ValueError the same way).
+    """
+    
+    def __init__(self, headerList):
+    
+        self.headerList = list(headerList)
+        
+        self.columns = {}
+        for i, head in enumerate(self.headerList):
+            if head not in self.columns:
+                self.columns[head] = i
+                
+        #(key, column) pairs in header order for the values Auto collects by looking through the whole header
+        self.vcpDurationColumns = []
+        self.vcpNumberColumns = []
+        self.trackGroundRangeColumns = []
+        self.etGroundRangeColumns = []
+        for head in self.headerList:
+            if 'VCP' in head:
+                if 'duration' in head:
+                    self.vcpDurationColumns.append((head[head.index('('):len(head)], self.columns[head]))
+                else:
+                    self.vcpNumberColumns.append((head[head.index('('):len(head)], self.columns[head]))
+                    
+            if 'GroundRange' in head and '(Track)' in head:
+                self.trackGroundRangeColumns.append((head[head.index(' ')+1], self.columns[head]))
+            if 'GroundRange' in head and '(ET)' in head:
+                self.etGroundRangeColumns.append((head[head.index(' ')+1], self.columns[head]))
+        
+        #The track and ET potential clusters aren't labeled. The first one is the track and the next one is the ET
+        self.etPotentialClusterIndex = None
+        if 'potentialClusters(unitless)' in self.columns:
+            try:
+                self.etPotentialClusterIndex = self.headerList.index('potentialClusters(unitless)', self.columns['potentialClusters(unitless)']+1)
+            except ValueError:
+                pass
+        
+        self.tiltColumns = {}
+        
+        #Columns Auto and Tilt keep as the text from the _prelim.csv rather than converting them with float() or int()
+        self.textColumns = runstore.getTextColumns(self.headerList) if runstore else set()
+        
+        return
+        
+    def index(self, label):
+        
+        try:
+            return self.columns[label]
+        except KeyError:
+            raise ValueError(repr(label)+' is not in the header')
+            
+    def getETPotentialClusterIndex(self):
+    
+        if self.etPotentialClusterIndex is None:
+            raise ValueError('The header does not have a second potentialClusters(unitless) for the ET')
+        return self.etPotentialClusterIndex
+        
+    def getTiltColumns(self, modTilt):
+        """ Ground range, radar bearing, and beam height columns (one per radar) for a tilt like '(00.5deg)' """
+        
+        if modTilt not in self.tiltColumns:
+            groundRanges = []
+            bearings = []
+            beamHeights = []
+            for head in self.headerList:
+                if 'GroundRange' in head and modTilt in head:
+                    groundRanges.append(self.columns[head])
+                if 'Radar Bearing' in head and modTilt in head:
+                    bearings.append(self.columns[head])
+                if 'BeamHeight' in head and modTilt in head:
+                    beamHeights.append(self.columns[head])
+            self.tiltColumns[modTilt] = (groundRanges, bearings, beamHeights)
+            
+        return self.tiltColumns[modTilt]
+        
+        
+#tuple(header) -> HeaderMap
+headerMaps = {}
+
+def getHeaderMap(headerList):
+    """ The HeaderMap for a header list (made the first time the header is seen). HeaderMaps are passed through. """
+    
+    if isinstance(headerList, HeaderMap):
+        return headerList
+        
+    key = tuple(headerList)
+    if key not in headerMaps:
+        headerMaps[key] = HeaderMap(key)
+        
+    return headerMaps[key]
+    
+    
+def getModTilt(tilt):
+    """ The label suffix used for a tilt in the _prelim.csv header (e.g. '0.5' -> '(00.5deg)') """
+    
+    if float(tilt) < 1:
+        return '(0'+tilt+'deg)'
+    return '('+tilt+'deg)'
+    
     
 class Truth:
 
@@ -78,53 +195,50 @@ class Tilt:
     def __init__(self, headerList, dataList, tilt, radii):
     
         self.tilt = tilt
+        header = getHeaderMap(headerList)
         
-        modTilt = tilt
-        if float(tilt) < 1:
-            modTilt = '(0'+modTilt+'deg)'
-        else:
-            modTilt = '('+modTilt+'deg)'
+        modTilt = getModTilt(tilt)
             
-        self.dateTime = dataList[headerList.index('DateTime'+modTilt)]
-        self.minuteBin = dataList[headerList.index('Bin(minutes)'+modTilt)]
-        self.binNumber = dataList[headerList.index('BinNumber'+modTilt)]
-        self.timeDelta = float(dataList[headerList.index('Timedelta(Seconds)'+modTilt)])
-        self.latitude = float(dataList[headerList.index('Latitude(Degrees)'+modTilt)])
-        self.longitude = float(dataList[headerList.index('Longitude(Degrees)'+modTilt)])
-        self.latRadius = float(dataList[headerList.index('LatRadius(km)'+modTilt)])
-        self.lonRadius = float(dataList[headerList.index('LonRadius(km)'+modTilt)])
-        self.orientation = float(dataList[headerList.index('Orientation(degrees)'+modTilt)])
-        self.size = float(dataList[headerList.index('Size(km2)'+modTilt)])
+        self.dateTime = dataList[header.index('DateTime'+modTilt)]
+        self.minuteBin = dataList[header.index('Bin(minutes)'+modTilt)]
+        self.binNumber = dataList[header.index('BinNumber'+modTilt)]
+        self.timeDelta = float(dataList[header.index('Timedelta(Seconds)'+modTilt)])
+        self.latitude = float(dataList[header.index('Latitude(Degrees)'+modTilt)])
+        self.longitude = float(dataList[header.index('Longitude(Degrees)'+modTilt)])
+        self.latRadius = float(dataList[header.index('LatRadius(km)'+modTilt)])
+        self.lonRadius = float(dataList[header.index('LonRadius(km)'+modTilt)])
+        self.orientation = float(dataList[header.index('Orientation(degrees)'+modTilt)])
+        self.size = float(dataList[header.index('Size(km2)'+modTilt)])
         if modTilt == '(00.5deg)':
             try:
-                self.numReports = int(float(dataList[headerList.index('NumReports'+modTilt)]))
+                self.numReports = int(float(dataList[header.index('NumReports'+modTilt)]))
             except ValueError:
                 self.numReports = None
             try:
-                self.distCell = float(dataList[headerList.index('DistToCell(kilometers)'+modTilt)])
+                self.distCell = float(dataList[header.index('DistToCell(kilometers)'+modTilt)])
             except ValueError:
                 self.distToCell = None
                 
-        self.maxShear = float(dataList[headerList.index('maxShear(s^-1)'+modTilt)])
-        self.minShear = float(dataList[headerList.index('minShear(s^-1)'+modTilt)])
-        self.bottom10Shear = float(dataList[headerList.index('10thShear(s^-1)'+modTilt)])
-        self.top90Shear = float(dataList[headerList.index('90thShear(s^-1)'+modTilt)])
-        self.minZdrTDS = float(dataList[headerList.index('minZdrTDS(dB)'+modTilt)])
-        self.minRhoHV = float(dataList[headerList.index('minRhoHV'+modTilt)])
-        self.areaVrot = float(dataList[headerList.index('AreaVrot(kts)'+modTilt)])
-        self.maxRefTDS = float(dataList[headerList.index('maxRefTDS(dBZ)'+modTilt)])
-        self.maxSpectrumWidth = float(dataList[headerList.index('maxSpectrumWidth(m/s)'+modTilt)]) * 1.94384 #Convert to knots
-        self.uShear = float(dataList[headerList.index('uShear(m/s)'+modTilt)])
-        self.vShear = float(dataList[headerList.index('vShear(m/s)'+modTilt)])
-        self.clusterU = float(dataList[headerList.index('clusterU(m/s)'+modTilt)])
-        self.clusterV = float(dataList[headerList.index('clusterV(m/s)'+modTilt)])
-        self.TDScount = int(float(dataList[headerList.index('TDScount'+modTilt)]))
-        self.TDSmin = float(dataList[headerList.index('TDSmin'+modTilt)])
-        self.forwardLat = float(dataList[headerList.index('forwardLat(deg)'+modTilt)])
-        self.forwardLon = float(dataList[headerList.index('forwardLon(deg)'+modTilt)])
-        self.backwardLat = float(dataList[headerList.index('backLat(deg)'+modTilt)])
-        self.backwardLon = float(dataList[headerList.index('backLon(deg)'+modTilt)])
-        self.potentialClusters = int(float(dataList[headerList.index('potentialClusters(unitless)'+modTilt)]))
+        self.maxShear = float(dataList[header.index('maxShear(s^-1)'+modTilt)])
+        self.minShear = float(dataList[header.index('minShear(s^-1)'+modTilt)])
+        self.bottom10Shear = float(dataList[header.index('10thShear(s^-1)'+modTilt)])
+        self.top90Shear = float(dataList[header.index('90thShear(s^-1)'+modTilt)])
+        self.minZdrTDS = float(dataList[header.index('minZdrTDS(dB)'+modTilt)])
+        self.minRhoHV = float(dataList[header.index('minRhoHV'+modTilt)])
+        self.areaVrot = float(dataList[header.index('AreaVrot(kts)'+modTilt)])
+        self.maxRefTDS = float(dataList[header.index('maxRefTDS(dBZ)'+modTilt)])
+        self.maxSpectrumWidth = float(dataList[header.index('maxSpectrumWidth(m/s)'+modTilt)]) * 1.94384 #Convert to knots
+        self.uShear = float(dataList[header.index('uShear(m/s)'+modTilt)])
+        self.vShear = float(dataList[header.index('vShear(m/s)'+modTilt)])
+        self.clusterU = float(dataList[header.index('clusterU(m/s)'+modTilt)])
+        self.clusterV = float(dataList[header.index('clusterV(m/s)'+modTilt)])
+        self.TDScount = int(float(dataList[header.index('TDScount'+modTilt)]))
+        self.TDSmin = float(dataList[header.index('TDSmin'+modTilt)])
+        self.forwardLat = float(dataList[header.index('forwardLat(deg)'+modTilt)])
+        self.forwardLon = float(dataList[header.index('forwardLon(deg)'+modTilt)])
+        self.backwardLat = float(dataList[header.index('backLat(deg)'+modTilt)])
+        self.backwardLon = float(dataList[header.index('backLon(deg)'+modTilt)])
+        self.potentialClusters = int(float(dataList[header.index('potentialClusters(unitless)'+modTilt)]))
         
         self.groundRanges = {}
         self.bearings = {}
@@ -137,13 +251,13 @@ class Tilt:
         else:
             self.isMax = False
         
-        for head in headerList:
-            if 'GroundRange' in head and modTilt in head:
-                self.groundRanges[str(len(self.groundRanges))] = float(dataList[headerList.index(head)])
-            if 'Radar Bearing' in head and modTilt in head:
-                self.bearings[str(len(self.bearings))] = float(dataList[headerList.index(head)])
-            if 'BeamHeight' in head and modTilt in head:
-                self.beamHeights[str(len(self.beamHeights))] = float(dataList[headerList.index(head)])
+        groundRangeColumns, bearingColumns, beamHeightColumns = header.getTiltColumns(modTilt)
+        for i in groundRangeColumns:
+            self.groundRanges[str(len(self.groundRanges))] = float(dataList[i])
+        for i in bearingColumns:
+            self.bearings[str(len(self.bearings))] = float(dataList[i])
+        for i in beamHeightColumns:
+            self.beamHeights[str(len(self.beamHeights))] = float(dataList[i])
         
         self.tiltBin = None
         self.rangeBin = None
@@ -210,77 +324,74 @@ class Auto:
     def __init__(self, headerList, dataList, tiltList, radii):
     
         """ This class holds the valuse from the ttrappy analysis """
+        
+        header = getHeaderMap(headerList)
          
-        self.TC = dataList[headerList.index('TC')] 
-        self.case = dataList[headerList.index('case')]
-        self.efRating = dataList[headerList.index('F-EF-rating')]
-        self.warningClass = dataList[headerList.index('class')]
-        self.istor = bool(int(dataList[headerList.index('tor')]))
+        self.TC = dataList[header.index('TC')] 
+        self.case = dataList[header.index('case')]
+        self.efRating = dataList[header.index('F-EF-rating')]
+        self.warningClass = dataList[header.index('class')]
+        self.istor = bool(int(dataList[header.index('tor')]))
         
         self.vcpNumbers = {}
         self.vcpDurations = {}
         self.trackGroundRanges = {}
         self.etGroundRanges = {}
         
-        #For the VCP information we'll need to check for all the VCP info.
-        for head in headerList:
-        
-            if 'VCP' in head:
-                if 'duration' in head:
-                    self.vcpDurations[head[head.index('('):len(head)]] = dataList[headerList.index(head)]
-                else:
-                    self.vcpNumbers[head[head.index('('):len(head)]] = dataList[headerList.index(head)]
-                    
-            if 'GroundRange' in head and '(Track)' in head:
-                self.trackGroundRanges[head[head.index(' ')+1]] = float(dataList[headerList.index(head)])
-            if 'GroundRange' in head and '(ET)' in head:
-                self.etGroundRanges[head[head.index(' ')+1]] = float(dataList[headerList.index(head)])
+        #For the VCP information we'll need to check for all the VCP info. The columns are found once per header by HeaderMap.
+        for key, i in header.vcpDurationColumns:
+            self.vcpDurations[key] = dataList[i]
+        for key, i in header.vcpNumberColumns:
+            self.vcpNumbers[key] = dataList[i]
+        for key, i in header.trackGroundRangeColumns:
+            self.trackGroundRanges[key] = float(dataList[i])
+        for key, i in header.etGroundRangeColumns:
+            self.etGroundRanges[key] = float(dataList[i])
                 
                            
         #Now we get the information from the individual AzShear clusters.
         self.azShear = {}
         for tilt in tiltList:
-            self.azShear[tilt] = Tilt(headerList, dataList, tilt, radii)
+            self.azShear[tilt] = Tilt(header, dataList, tilt, radii)
             
-        self.trackDT = dataList[headerList.index('DateTime(Track)')]
-        self.trackBin = dataList[headerList.index('Bin(minutes)(Track)')]
-        self.trackBinNumber = dataList[headerList.index('BinNumber(Track)')]
-        self.trackTimeDelta = float(dataList[headerList.index('Timedelta(Seconds)(Track)')])
-        self.trackLatitude = float(dataList[headerList.index('Latitude(Degrees)(Track)')])
-        self.trackLongitude = float(dataList[headerList.index('Longitude(Degrees)(Track)')])
-        self.trackLatRadius = float(dataList[headerList.index('LatRadius(km)(Track)')])
-        self.trackLonRadius = float(dataList[headerList.index('LonRadius(km)(Track)')])
-        self.trackOrientation = float(dataList[headerList.index('Orientation(degrees)(Track)')])
-        self.size = float(dataList[headerList.index('Size(km2)(Track)')])
-        self.trackAvgVIL = float(dataList[headerList.index('avgVIL(kg/m^2)')])
-        self.trackMaxVIL = float(dataList[headerList.index('maxVIL(kg/m^2)')])
-        self.trackMaxREF = float(dataList[headerList.index('maxREF(dBZ)')])
-        self.trackU6kmMeanWind = float(dataList[headerList.index('u6kmMeanWind(m/s)')])
-        self.trackV6kmMeanWind = float(dataList[headerList.index('v6kmMeanWind(m/s)')])
-        self.trackUShear = float(dataList[headerList.index('uShear(m/s)')])
-        self.trackVShear = float(dataList[headerList.index('vShear(m/s)')])
-        trackPotentialClusterIndex = headerList.index('potentialClusters(unitless)')
-        self.trackPotentialClusters = int(float(dataList[trackPotentialClusterIndex]))
+        self.trackDT = dataList[header.index('DateTime(Track)')]
+        self.trackBin = dataList[header.index('Bin(minutes)(Track)')]
+        self.trackBinNumber = dataList[header.index('BinNumber(Track)')]
+        self.trackTimeDelta = float(dataList[header.index('Timedelta(Seconds)(Track)')])
+        self.trackLatitude = float(dataList[header.index('Latitude(Degrees)(Track)')])
+        self.trackLongitude = float(dataList[header.index('Longitude(Degrees)(Track)')])
+        self.trackLatRadius = float(dataList[header.index('LatRadius(km)(Track)')])
+        self.trackLonRadius = float(dataList[header.index('LonRadius(km)(Track)')])
+        self.trackOrientation = float(dataList[header.index('Orientation(degrees)(Track)')])
+        self.size = float(dataList[header.index('Size(km2)(Track)')])
+        self.trackAvgVIL = float(dataList[header.index('avgVIL(kg/m^2)')])
+        self.trackMaxVIL = float(dataList[header.index('maxVIL(kg/m^2)')])
+        self.trackMaxREF = float(dataList[header.index('maxREF(dBZ)')])
+        self.trackU6kmMeanWind = float(dataList[header.index('u6kmMeanWind(m/s)')])
+        self.trackV6kmMeanWind = float(dataList[header.index('v6kmMeanWind(m/s)')])
+        self.trackUShear = float(dataList[header.index('uShear(m/s)')])
+        self.trackVShear = float(dataList[header.index('vShear(m/s)')])
+        self.trackPotentialClusters = int(float(dataList[header.index('potentialClusters(unitless)')]))
         
         #There's a mistake with the potential clusters in that the track and ET potential clusters
         #aren't labeled. Therefore, we use the first one as the track and find the next one as the 
         #echo-top one
         
-        self.etDT = dataList[headerList.index('DateTime(ET)')]
-        self.etBin = dataList[headerList.index('Bin(minutes)(ET)')]
-        self.etBinNumber = dataList[headerList.index('BinNumber(ET)')]
-        self.etTimeDelta = float(dataList[headerList.index('Timedelta(Seconds)(ET)')])
-        self.etLatitude = float(dataList[headerList.index('Latitude(Degrees)(ET)')])
-        self.etLongitude = float(dataList[headerList.index('Longitude(Degrees)(ET)')])
-        self.etLatRadius = float(dataList[headerList.index('LatRadius(km)(ET)')])
-        self.etLonRadius = float(dataList[headerList.index('LonRadius(km)(ET)')])
-        self.etOrientation = float(dataList[headerList.index('Orientation(degrees)(ET)')])
-        self.etSize = float(dataList[headerList.index('Size(km2)(ET)')])
-        self.maxETkm = float(dataList[headerList.index('maxET(km)')])
-        self.top90ETkm = float(dataList[headerList.index('90thET(km)')])
-        self.maxETft = float(dataList[headerList.index('maxET(ft)')])
-        self.top90ETft = float(dataList[headerList.index('90thET(ft)')])
-        self.etPotentialClusters = int(float(dataList[headerList.index('potentialClusters(unitless)', trackPotentialClusterIndex+1, len(headerList))]))
+        self.etDT = dataList[header.index('DateTime(ET)')]
+        self.etBin = dataList[header.index('Bin(minutes)(ET)')]
+        self.etBinNumber = dataList[header.index('BinNumber(ET)')]
+        self.etTimeDelta = float(dataList[header.index('Timedelta(Seconds)(ET)')])
+        self.etLatitude = float(dataList[header.index('Latitude(Degrees)(ET)')])
+        self.etLongitude = float(dataList[header.index('Longitude(Degrees)(ET)')])
+        self.etLatRadius = float(dataList[header.index('LatRadius(km)(ET)')])
+        self.etLonRadius = float(dataList[header.index('LonRadius(km)(ET)')])
+        self.etOrientation = float(dataList[header.index('Orientation(degrees)(ET)')])
+        self.etSize = float(dataList[header.index('Size(km2)(ET)')])
+        self.maxETkm = float(dataList[header.index('maxET(km)')])
+        self.top90ETkm = float(dataList[header.index('90thET(km)')])
+        self.maxETft = float(dataList[header.index('maxET(ft)')])
+        self.top90ETft = float(dataList[header.index('90thET(ft)')])
+        self.etPotentialClusters = int(float(dataList[header.getETPotentialClusterIndex()]))
         
         
         return
@@ -611,47 +722,223 @@ def getManualData(manualFile):
     
     return truthObjects
 
-def getAutoData(stormFolder, tiltList, radii):
+class CaseAutos(MutableMapping):
 
-    print('Loading Auto values')
-    #First, we'll start by going the storms folder and listing TCs
-    tcNames = os.listdir(stormFolder)
+    """ {case: [Auto, ...]} for one TC of an AutoTable. A case's Autos are only built (by AutoTable.getAutos) the first
+        time the case is looked up. Setting a case replaces its Autos like a dict.
+    """
     
-    autoObjects = {}
+    def __init__(self, table, TC):
     
-    #Then we'll go through each TC and list all of the cases
-    for TC in tcNames:
-        autoObjects[TC] = {}
+        self.table = table
+        self.TC = TC
+        self.replaced = {}
         
-        currentCasesPath = os.path.join(stormFolder, TC, 'cases')
-        caseNames = os.listdir(currentCasesPath)
+        return
         
-        casesAutoObjects = {}
-         
-        #Now go through each case and get the _prelim.csv file
-        for case in caseNames:
+    def __getitem__(self, case):
+        if case in self.replaced:
+            return self.replaced[case]
+        if case not in self.table.cases[self.TC]:
+            raise KeyError(case)
+        return self.table.getAutos(self.TC, case)
+        
+    def __setitem__(self, case, autos):
+        if case not in self.table.cases[self.TC]:
+            raise KeyError(str(case)+' is not a case of '+str(self.TC))
+        self.replaced[case] = autos
+        
+    def __delitem__(self, case):
+        raise TypeError('Cases cannot be removed from an AutoTable')
+        
+    def __iter__(self):
+        return iter(self.table.cases[self.TC])
+        
+    def __len__(self):
+        return len(self.table.cases[self.TC])
+        
+        
+def readPrelimCSV(prelimCSV):
+    """ Reads a _prelim.csv into its header and a 2D array of the row strings. Run in the loadAutoTable pool.
+        Returns (header, rows, None) or (None, None, error) if the file isn't there.
+    """
+    
+    header = []
+    rows = []
+    try:
+        with open(prelimCSV, 'r') as fi:
+            for n, line in enumerate(fi):
+                if n == 0:
+                    header = line.lstrip('#').rstrip('\n').split(',')
+                else:
+                    rows.append(line.rstrip('\n').split(','))
+                    
+    except FileNotFoundError as err:
+        return None, None, err
+        
+    for n, row in enumerate(rows):
+        if len(row) != len(header):
+            raise ValueError(prelimCSV+' line '+str(n+2)+' has '+str(len(row))+' columns but the header has '+str(len(header)))
+            
+    if rows:
+        rows = np.array(rows, dtype=str)
+    else:
+        rows = np.empty((0, len(header)), dtype=str)
+        
+    return header, rows, None
+    
+    
+class AutoTable:
 
-            prelimCSV = os.path.join(currentCasesPath, case, 'results', case+'_prelim.csv')
-            casesAutoObjects[case] = []
-            header = ''
-            isHeader = True
-            try:
-                with open(prelimCSV, 'r') as fi:
-                    n = 0
-                    for line in fi:
-                        if not isHeader:
-                            casesAutoObjects[case].append(Auto(header, line.rstrip('\n').split(','), tiltList, radii))
-                            print('Added Auto', TC, case, n)
-                        else:
-                            header = line.lstrip('#').rstrip('\n').split(',')
-                            isHeader = False
-                        n += 1    
-                        
-            except FileNotFoundError as err:
-                print(err, 'and continuing!')
-                
-        autoObjects[TC] = casesAutoObjects
+    """ The _prelim.csv rows of every case in a run, kept as one array of strings per case (or a runstore.StoreCase
+        when the run has a run store) with the column positions resolved once per header (HeaderMap).
+        
+        getColumn() gives a typed column (float where every value is a number, otherwise str) for a TC, case, and
+        (optionally) tilt. getAutos() builds the Auto objects for a case the first time they're asked for.
+    """
+    
+    def __init__(self, tiltList, radii):
+    
+        self.tiltList = tiltList
+        self.radii = radii
+        
+        self.cases = {} #TC -> {case -> (HeaderMap, rows or StoreCase)} in the order they were listed
+        self.autos = {}
+        self.typedColumns = {}
+        
+        return
+        
+    def addCase(self, TC, case, header, rows):
+    
+        self.cases.setdefault(TC, {})[case] = (getHeaderMap(header), rows)
+        return
+        
+    def getTCs(self):
+        return list(self.cases.keys())
+        
+    def getCases(self, TC):
+        return list(self.cases[TC].keys())
+        
+    def getNumRows(self, TC=None, case=None):
+        """ Number of rows in a case, a TC, or the whole table """
+        
+        if case is not None:
+            return len(self.cases[TC][case][1])
+        if TC is not None:
+            return sum(len(rows) for header, rows in self.cases[TC].values())
+        return sum(self.getNumRows(TC) for TC in self.cases)
+        
+    def getColumn(self, TC, case, label, tilt=None):
+        """ Typed NumPy array of a column for a case. For tilt data give the label without the tilt (e.g. 'maxShear(s^-1)') and the tilt """
         
+        if tilt is not None:
+            label = label+getModTilt(tilt)
+            
+        key = (TC, case, label)
+        if key not in self.typedColumns:
+            header, rows = self.cases[TC][case]
+            if runstore and isinstance(rows, runstore.StoreCase):
+                column = rows.getColumn(header.index(label))
+            else:
+                column = rows[:, header.index(label)]
+                try:
+                    column = column.astype(float)
+                except ValueError:
+                    pass
+            self.typedColumns[key] = column
+            
+        return self.typedColumns[key]
+        
+    def getAutos(self, TC, case):
+        """ The Auto objects for the rows of a case, built on the first call """
+        
+        key = (TC, case)
+        if key not in self.autos:
+            header, rows = self.cases[TC][case]
+            if runstore and isinstance(rows, runstore.StoreCase):
+                #Numbers come straight from the store's columns instead of being turned back into strings
+                rows = rows.getRows(header.textColumns)
+            else:
+                rows = rows.tolist()
+            self.autos[key] = [Auto(header, row, self.tiltList, self.radii) for row in rows]
+            
+        return self.autos[key]
+        
+    def getAutoObjects(self):
+        """ Every Auto as {TC: CaseAutos} like getAutoData. Nothing is built until a case is looked up. """
+        
+        return {TC: CaseAutos(self, TC) for TC in self.cases}
+        
+        
+def loadAutoTable(stormFolder, tiltList, radii, processes=None):
+    """ Reads every storms/<TC>/cases/<case>/results/<case>_prelim.csv into an AutoTable. If the run has an up to date
+        run store (runTTRAP.py --compact) it's opened instead. Otherwise the files are read across a pool of processes
+        (os.cpu_count() by default; 1 reads them here).
+    """
+    
+    table = AutoTable(tiltList, radii)
+    
+    store = None
+    if runstore:
+        store = runstore.openRunStore(stormFolder)
+    elif os.path.exists(os.path.join(stormFolder, 'run_store.ttrap')):
+        print('Not using the run store in', stormFolder, 'without the top folder on PYTHONPATH. Reading the _prelim.csv files')
+        
+    if store is not None:
+        for TC in store.getTCs():
+            table.cases[TC] = {}
+            for case in store.getCases(TC):
+                storeCase = store.getCase(TC, case)
+                if storeCase is None:
+                    print('No _prelim.csv for', TC, case, 'in the run store and continuing!')
+                    table.addCase(TC, case, [], np.empty((0, 0), dtype=str))
+                else:
+                    table.addCase(TC, case, storeCase.header, storeCase)
+                    
+        return table
+    
+    #First, we'll start by going the storms folder and listing TCs and their cases. Files there (e.g. a run store) are skipped
+    prelimFiles = []
+    for TC in os.listdir(stormFolder):
+        if not os.path.isdir(os.path.join(stormFolder, TC)):
+            continue
+        table.cases[TC] = {}
+        currentCasesPath = os.path.join(stormFolder, TC, 'cases')
+        for case in os.listdir(currentCasesPath):
+            prelimFiles.append((TC, case, os.path.join(currentCasesPath, case, 'results', case+'_prelim.csv')))
+    
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(prelimFiles)))
+    
+    fileNames = [prelimCSV for TC, case, prelimCSV in prelimFiles]
+    if processes > 1:
+        with Pool(processes) as pool:
+            results = pool.map(readPrelimCSV, fileNames, chunksize=max(1, len(fileNames)//(processes*4)))
+    else:
+        results = [readPrelimCSV(prelimCSV) for prelimCSV in fileNames]
+        
+    for (TC, case, prelimCSV), (header, rows, err) in zip(prelimFiles, results):
+        if err is not None:
+            print(err, 'and continuing!')
+            header = []
+            rows = np.empty((0, 0), dtype=str)
+        table.addCase(TC, case, header, rows)
+        
+    return table
+    
+    
+def getAutoData(stormFolder, tiltList, radii, processes=None):
+    """ {TC: {case: [Auto, ...]}} for a run. The cases are CaseAutos so each case's Auto and Tilt objects are only built
+        when a case is first used.
+    """
+
+    print('Loading Auto values')
+    
+    table = loadAutoTable(stormFolder, tiltList, radii, processes)
+    autoObjects = table.getAutoObjects()
+    
+    print('Loaded', table.getNumRows(), 'rows from', sum(len(table.cases[TC]) for TC in table.cases), 'cases')
     print('Done!')
     
     return autoObjects
@@ -4076,10 +4076,12 @@ def getManualLikeStats(torObjects, nonTorObjects, tiltList, cfg, realWarningStat
     tdsObjects, noTDSObjects, nTDS, nNoTDS, tdsCountByEF, totalCountByEF = sorting.sortTDS(torObjects, tiltList[0], minCount=25, startBin=0, potentialClusters=potentialClusters)
     
     print('Starting time shifting in the manual stats')
-    shiftedNonTor = coord.timeShiftByBin(nonTorObjects, tiltList, 'max', -2, 0, cfg)
-    shiftedTor = coord.timeShiftByBin(torObjects, tiltList, 'max', 0, 0, cfg)
-    shiftedTDS = coord.timeShiftByBin(tdsObjects, tiltList, 'max', 0, 0, cfg)
-    shiftedNoTDS = coord.timeShiftByBin(noTDSObjects, tiltList, 'max', 0, 0, cfg)
+    #The TDS groups hold the same case lists as TOR so they share its shifted autos
+    shiftedCases = {}
+    shiftedNonTor = coord.timeShiftByBin(nonTorObjects, tiltList, 'max', -2, 0, cfg, shiftedCases)
+    shiftedTor = coord.timeShiftByBin(torObjects, tiltList, 'max', 0, 0, cfg, shiftedCases)
+    shiftedTDS = coord.timeShiftByBin(tdsObjects, tiltList, 'max', 0, 0, cfg, shiftedCases)
+    shiftedNoTDS = coord.timeShiftByBin(noTDSObjects, tiltList, 'max', 0, 0, cfg, shiftedCases)
     
     print('Now sorting for manual stats')
     #Sort each of these object sets
@@ -3,7 +3,6 @@
 
 #Justin Spotts 7/3/2022
 import math
-import copy
 
 def toVrot(azShear, radius):
 
@@ -54,6 +53,8 @@ def sortTDS(autoObjects, tilt, startBin=0, minCount=5, potentialClusters=math.in
         
         minCount is the minimum number of TDS pixles required for a TDS to be counted.
         
+        The groups hold the same case lists as autoObjects (nothing is copied). Use getCaseKeys() to get a group as a set of cases.
+        
     """
     
     tdsObjects = {}
@@ -93,7 +94,7 @@ def sortTDS(autoObjects, tilt, startBin=0, minCount=5, potentialClusters=math.in
                 else:
                     binMeetsOtherCriteria = False
                 if int(tiltObject.binNumber) >= startBin and int(tiltObject.TDScount) >= minCount and binMeetsOtherCriteria:
-                    tdsObjects[TC][case] = copy.deepcopy(autoObjects[TC][case])
+                    tdsObjects[TC][case] = autoObjects[TC][case]
                     #print(TC, case, 'deemed TDS at bin and count', tiltObject.binNumber, tiltObject.TDScount)
                     foundTDS = True
                     nTDS += 1
@@ -110,7 +111,7 @@ def sortTDS(autoObjects, tilt, startBin=0, minCount=5, potentialClusters=math.in
                     
             if not foundTDS and meetsOtherCriteria:
                 #print('No TDS was found for', TC, case)
-                noTdsObjects[TC][case] = copy.deepcopy(autoObjects[TC][case])
+                noTdsObjects[TC][case] = autoObjects[TC][case]
                 nNoTDS += 1
                 try:
                     totalCountByEF[currentEF] += 1
@@ -126,6 +127,12 @@ def sortTDS(autoObjects, tilt, startBin=0, minCount=5, potentialClusters=math.in
     return tdsObjects, noTdsObjects, nTDS, nNoTDS, tdsCountByEF, totalCountByEF
     
     
+def getCaseKeys(autoObjects):
+    """ The (TC, case) of every case in a group so the group can be picked out of a larger set (e.g. getObjectsByBin cases=) """
+    
+    return {(TC, case) for TC in autoObjects for case in autoObjects[TC]}
+    
+    
 def determineTDS(autoObjects, tilt, startBin=0, minCount=5):
     """
         sortTDS except using only autoObjects from one case rather than the full set of autoObjects.
@@ -147,7 +154,7 @@ def determineTDS(autoObjects, tilt, startBin=0, minCount=5):
     return foundTDS        
     
     
-def getObjectsByBin(autoObjects, tiltList, cfg, isTDS=False, isTOR=False, maxPotentialClusters=math.inf):
+def getObjectsByBin(autoObjects, tiltList, cfg, isTDS=False, isTOR=False, maxPotentialClusters=math.inf, cases=None):
 
     """ Sorts individual tilts, echo-top clusters, and track clusters by time bin.
         Returns the a dictionary for:
@@ -155,6 +162,8 @@ def getObjectsByBin(autoObjects, tiltList, cfg, isTDS=False, isTOR=False, maxPot
         Echo-tops or track clusters by time bin, then desired data.
         
         There are also versions for the time-bins between and by EF rating. 
+        
+        cases is a set of (TC, case) (see getCaseKeys) to only use part of autoObjects (e.g. the TDS cases out of all of the TOR cases).
     """
     
     tiltData = {}
@@ -259,6 +268,9 @@ def getObjectsByBin(autoObjects, tiltList, cfg, isTDS=False, isTOR=False, maxPot
         
         for case in list(autoObjects[TC].keys()):
             
+            if cases is not None and (TC, case) not in cases:
+                continue
+                
             isNegAzShear = False
             
             print('\nStarting to sort TC', TC, 'case', case, totalCases, '\n')
@@ -1821,6 +1833,22 @@ def getObjectsByBin(autoObjects, tiltList, cfg, isTDS=False, isTOR=False, maxPot
     
     
     
+def getObjectsByBinGroups(groups, tiltList, cfg):
+
+    """ getObjectsByBin for several groups of cases.
+        groups is a dictionary of name -> dictionary of getObjectsByBin keyword arguments ('autoObjects' plus any of 'isTDS', 'isTOR',
+        'maxPotentialClusters', and 'cases'). Returns name -> what getObjectsByBin returns for that group.
+    """
+    
+    returnData = {}
+    for name in list(groups.keys()):
+        print('Group', name)
+        group = dict(groups[name])
+        returnData[name] = getObjectsByBin(group.pop('autoObjects'), tiltList, cfg, **group)
+        
+    return returnData
+    
+    
 #Defining a dictionary to serve as an alias for what's above minums VCP and others not used. 
 generalAliases = {'Echo Tops': 'ET',\
             'Cyclonic Case Echo Tops': 'POSET',\
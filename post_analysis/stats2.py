@@ -421,6 +421,92 @@ def calculateTSSRange(expectedLower, expectedHigher, mainThreshold, adjustRanges
     return {'TSS':TSS, 'threshold':mainThreshold, 'correct':correct, 'wrong':wrong, 'far':far, 'pod':pod, 'CSI':CSI, 'a':a, 'b':b, 'c':c, 'd':d}
     
     
+def countBelow(values, thresholds):
+    """ Number of values < each threshold, for every threshold at once """
+    
+    return np.searchsorted(np.sort(np.asarray(values, dtype=float)), np.asarray(thresholds, dtype=float), side='left')
+    
+def countBelowRange(valueRanges, thresholds, adjustRanges, rangeAdjustValues):
+    """ countBelow for (value, range) tuples where each value is compared to the threshold adjusted by adjustThresholds for its range.
+        Values with the same adjustments are counted together and the adjustments are added to all thresholds at once, in the same
+        order as adjustThresholds adds them.
+    """
+    
+    thresholds = np.asarray(thresholds, dtype=float)
+    if not len(valueRanges):
+        return np.zeros(len(thresholds), dtype=np.int64)
+        
+    values = np.array([value for value,clusterRange in valueRanges], dtype=float)
+    clusterRanges = np.array([clusterRange for value,clusterRange in valueRanges], dtype=float)
+    
+    #Which of the adjustments apply to each value
+    applied = np.array([clusterRanges >= adjustRange for adjustRange in adjustRanges]).T
+    patterns, patternIndex = np.unique(applied, axis=0, return_inverse=True)
+    patternIndex = patternIndex.reshape(-1)
+    
+    below = np.zeros(len(thresholds), dtype=np.int64)
+    for p, pattern in enumerate(patterns):
+        adjustedThresholds = thresholds
+        for i in range(len(adjustRanges)):
+            if pattern[i]:
+                adjustedThresholds = adjustedThresholds + rangeAdjustValues[i]
+                
+        below += countBelow(values[patternIndex == p], adjustedThresholds)
+        
+    return below
+    
+def calculateTSSSweep(expectedLower, expectedHigher, thresholds, adjustRanges=None, rangeAdjustValues=None):
+
+    """ calculateTSS (or calculateTSSRange with adjustRanges and rangeAdjustValues) for every threshold at once.
+    
+        The values are sorted once and the a, b, c, d counts for all of the thresholds come from binary searches of them, so
+        the stats are the same as calling calculateTSS for each threshold. Returns a list with the dictionary (or None) for each threshold.
+    """
+    
+    if adjustRanges and rangeAdjustValues:
+        if len(adjustRanges) != len(rangeAdjustValues):
+            raise ValueError("Warning! The length of of adjustRanges ("+str(len(adjustRanges))+") must be equal to the length of rangeAdjustValues ("+str(len(rangeAdjustValues))+")")
+            
+        d = countBelowRange(expectedLower, thresholds, adjustRanges, rangeAdjustValues)
+        c = countBelowRange(expectedHigher, thresholds, adjustRanges, rangeAdjustValues)
+    else:
+        for value in expectedLower:
+            if isinstance(value, tuple):
+                raise TypeError("Warning! "+str(value)+" must be an int or float for expectedLower")
+        for value in expectedHigher:
+            if isinstance(value, tuple):
+                raise TypeError("Warning! "+str(value)+" must be an int or float for expectedHigher")
+                
+        d = countBelow(expectedLower, thresholds)
+        c = countBelow(expectedHigher, thresholds)
+        
+    b = len(expectedLower) - d
+    a = len(expectedHigher) - c
+    
+    #Thresholds with a zero in any of the denominators get None like calculateTSS
+    valid = ((a+b) != 0) & ((a+c) != 0) & ((a+b+c) != 0) & (((a+c)*(b+d)) != 0)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        far = (b/(a+b)).tolist()
+        pod = (a/(a+c)).tolist()
+        CSI = (a/(a+b+c)).tolist()
+        TSS = (((a*d) - (b*c))/((a+c)*(b+d))).tolist()
+        
+    a, b, c, d = a.tolist(), b.tolist(), c.tolist(), d.tolist()
+    
+    tssStatDicts = []
+    for n, threshold in enumerate(thresholds):
+        if not valid[n]:
+            tssStatDicts.append(None)
+            continue
+            
+        tssStatDicts.append({'TSS':TSS[n], 'threshold':threshold, 'correct':a[n]+d[n], 'wrong':b[n]+c[n], 'far':far[n], 'pod':pod[n], 'CSI':CSI[n], 'a':a[n], 'b':b[n], 'c':c[n], 'd':d[n]})
+        
+    if not valid.all():
+        print('Zero Division for', int(np.count_nonzero(~valid)), 'of', len(valid), 'thresholds')
+        
+    return tssStatDicts
+    
 def calculateVrotTSS(expectedLower, expectedHigher, initialThreshold=5, maxThreshold=60, thresholdIncrement=1, adjustRanges=None, rangeAdjustValues=None, writeMode=None, writeFile='tss.csv', group1Name='Group1', group2Name='Group2'):
 
     """ Calculates the TSS for Vrot. 
@@ -446,19 +532,14 @@ def calculateVrotTSS(expectedLower, expectedHigher, initialThreshold=5, maxThres
         Returns 
     """
     
-    tssStats = []
-    for threshold in range(initialThreshold, maxThreshold+thresholdIncrement, thresholdIncrement):
+    thresholds = list(range(initialThreshold, maxThreshold+thresholdIncrement, thresholdIncrement))
     
-        if adjustRanges and rangeAdjustValues:
-            print('Calculating TSS with range correction. Group1', group1Name, 'group2', group2Name)
-            tssStatDict = calculateTSSRange(expectedLower, expectedHigher, threshold, adjustRanges, rangeAdjustValues)
-        else:
-            print('Calculating TSS without range correction. Group1', group1Name, 'group2', group2Name)
-            tssStatDict = calculateTSS(expectedLower, expectedHigher, threshold)
-
-        tssStats.append((threshold, tssStatDict))
+    if adjustRanges and rangeAdjustValues:
+        print('Calculating TSS with range correction for', len(thresholds), 'thresholds. Group1', group1Name, 'group2', group2Name)
+    else:
+        print('Calculating TSS without range correction for', len(thresholds), 'thresholds. Group1', group1Name, 'group2', group2Name)
         
-        print('Threshold', threshold, 'stats', tssStatDict)
+    tssStats = list(zip(thresholds, calculateTSSSweep(expectedLower, expectedHigher, thresholds, adjustRanges, rangeAdjustValues)))
     
     if writeMode is not None:
         if writeMode.lower() == 'w' or writeMode.lower() == 'a':
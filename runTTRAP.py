@@ -2,6 +2,7 @@
 
 from ttrapcfg import config
 from ttrappy.master import Master
+from ttrappy import runstore
 import argparse as agp        
 import sys
         
@@ -21,9 +22,13 @@ def main():
     parser.add_argument("-nc", "--nocomb", action="store_true", help="(Currently Disabled) Disable combining data from all cases at the end. Useful if processing data in parallel")
     parser.add_argument('-ln', '--logname', help='The prefix for the error and log files. For example, a value of first_run would create the files first_run_log.txt and first_run_error.txt. Default is ttrap_log.txt and ttrap_error.txt')
     parser.add_argument('-sf', '--skipfigures', help='Skip the process of making figures', action='store_true')
+    parser.add_argument('-np', '--nopdf', help='Only save PNGs of the figures (no PDFs). Turning PDFs back on later only redraws the frames missing one', action='store_true')
+    parser.add_argument('-rf', '--redrawfigures', help='Redraw every figure even if the one already saved is up to date', action='store_true')
+    parser.add_argument('-j', '--jobs', type=int, help='Number of cases to process at once in archive mode. Downloading, WDSSII, and analysis/figures are pipelined across cases. Default is 1 (one case at a time)')
+    parser.add_argument('--compact', metavar='RUN', help='Merge the _prelim.csv of every case in RUN (the folder with the TC folders) into one run store file that post_analysis and manual_vrot_comparison read instead of the CSVs, then exit')
     args = parser.parse_args()
     
-    if not args.archive_mode and not args.gui:
+    if not args.archive_mode and not args.gui and not args.compact:
         print('Warning!!! Must specify -A , -g, or --help')
         exit(10)
     
@@ -43,6 +48,10 @@ def main():
         cfg = config.Config(configFile, 'ttrap_log.txt', 'ttrap_error.txt', 'ttrap')
     
         
+    if args.compact:
+        runstore.compactRun(cfg, args.compact)
+        return
+        
     if args.ID:
         cfg.log("Overriding case ID "+args.ID)
         cfg.setOverrideID = args.ID
@@ -67,6 +76,15 @@ def main():
         
     if args.skipfigures:
         cfg.makeFigures = False
+        
+    if args.nopdf:
+        cfg.makePDFs = False
+        
+    if args.redrawfigures:
+        cfg.incrementalFigures = False
+        
+    if args.jobs:
+        cfg.setJobs(args.jobs)
     
     mstr = Master(cfg)
     
@@ -4,8 +4,10 @@ import xml.etree.ElementTree as ET
 from datetime import timedelta as TD
 from string import Template
 import sys
+import os
 import pytz
 import time
+from ttrapcfg import logwriter
 
 class Config():
     caseFile = None
@@ -46,10 +48,14 @@ class Config():
     radarStart = None
     radarEnd = None
     ETThresholds = None
-    log = None
     refMethod = None
     velMethod = None
     numVelRadars = None
+    maxProcesses = None
+    jobs = 1 #Number of cases to run at once in archive mode
+    downloadWorkers = 4 #Scans to download at once for each radar
+    caseWorkers = 4 #Cases to pick radars for at once ahead of the one being processed
+    l2Archive = None #URL or directory to download L2 data from instead of AWS
     overrideID = None
     mergerTimeout = None
     utc = pytz.UTC
@@ -62,11 +68,16 @@ class Config():
     shed = None
     shedAlt = None
     makeFigures = None
+    incrementalFigures = True #Skip figures already saved from the same inputs (see ttrappy/figuremanifest.py)
+    makePDFs = True
     useRap = None
     rapCurrent = None
     rapHistorical = None
     rapOffset = None
     rapTemplate = None
+    rapCatalogFile = None
+    rapCatalogTTL = 24 #Hours to keep the RAP archive listings
+    rapStoreDir = None
     tiltList = None
     
     minShearScore = None
@@ -145,6 +156,11 @@ class Config():
     figurePrefix = ''
     combine = True
     createCache = None
+    useAnalysisCache = True
+    analysisCacheDir = None
+    productMirror = 'hardlink' #How copyProducts puts a radar's products in dataDir (see ttrappy/mirror.py)
+    useL2Store = False
+    l2StoreDir = None
     
     maxBearingDev = None
     useSails = None
@@ -168,6 +184,10 @@ class Config():
     logFile = None
     errorFile = None
     logName = None
+    logLevel = 'debug'
+    caseLog = None #Log for the case being processed. Everything logged is also written here when set.
+    
+    levels = {'debug':10, 'info':20, 'error':40}
     def __init__(self, configFile, logFileName, errorFileName, logName):
        
         #Clear the logfile
@@ -187,26 +207,48 @@ class Config():
         return
     
     def log(self, message):
+        self.write(self.logFile, message, 'info')
+        return
+        
+    def debug(self, message):
+        """ Log verbose details (e.g. every interest score). Dropped unless LogLevel is debug. """
+        self.write(self.logFile, message, 'debug')
+        return
         
-        # fi = open(self.logFile, 'a')
-        # fi.write(str(time.asctime())+': '+str(message)+'\n')
-        # fi.close()
+    def error(self, message):
+        self.write(self.errorFile, message, 'error')
+        return
         
-        print(str(time.asctime())+': '+str(message))
-        with open (self.logFile, 'a') as f:
-            print(str(time.asctime())+': '+str(message), file=f)
+    def write(self, fileName, message, level):
+        """ Print the message and hand it to the buffered log writer. Lines below logLevel are dropped. """
+        
+        if self.levels[level] < self.levels[self.logLevel]:
+            return
+            
+        line = str(time.asctime())+': '+str(message)
+        print(line)
+        logwriter.writer.write(fileName, line+'\n')
+        if self.caseLog:
+            logwriter.writer.write(self.caseLog, line+'\n')
         
         return
         
-    def error(self, message):
-        # fi = open(self.errorFile, 'a')
-        # fi.write(str(time.asctime())+': '+str(message)+'\n')
-        # fi.close()
+    def setCaseLog(self, fileName):
+        """ Also write the log and errors to fileName (None to stop) """
+        logwriter.writer.flush()
+        self.caseLog = fileName
+        return
         
-        print(str(time.asctime())+': '+str(message))
-        with open(self.errorFile, 'a') as f:
-            print(str(time.asctime())+': '+str(message), file=f)
+    def appendCSV(self, fileName, line):
+        """ Append a line to one of the shared csv files (e.g. events or skipped cases). The line is written with a single
+            write on an O_APPEND descriptor so lines from cases running at the same time never interleave. """
         
+        fd = os.open(fileName, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
+            
         return
         
     def updateConfig(self, configFile):
@@ -299,11 +341,58 @@ class Config():
         self.ETThresholds = currentElement.find('EchoTop').text
         self.numRadars = int(currentElement.find('NumRadars').text)
         self.numVelRadars = int(currentElement.find('NumVelRadars').text)
+        if currentElement.find('LogLevel') is not None:
+            logLevel = (currentElement.find('LogLevel').text or '').strip().lower()
+            if logLevel in self.levels:
+                self.logLevel = logLevel
+            else:
+                self.logLevel = 'debug'
+                self.error("Unknown LogLevel "+repr(logLevel)+" (should be one of "+', '.join(self.levels)+"). Using debug")
+        if currentElement.find('LogMaxMB') is not None:
+            logwriter.writer.maxBytes = int(float(currentElement.find('LogMaxMB').text)*1024*1024)
+        if currentElement.find('LogBackups') is not None:
+            logwriter.writer.backupCount = int(currentElement.find('LogBackups').text)
+        if currentElement.find('MaxProcesses') is not None:
+            self.maxProcesses = int(currentElement.find('MaxProcesses').text)
+        if currentElement.find('AnalysisCache') is not None:
+            self.useAnalysisCache = bool(int(currentElement.find('AnalysisCache').text))
+        if currentElement.find('DownloadWorkers') is not None:
+            self.downloadWorkers = int(currentElement.find('DownloadWorkers').text)
+        if currentElement.find('CaseWorkers') is not None:
+            self.caseWorkers = int(currentElement.find('CaseWorkers').text)
+        if currentElement.find('L2Archive') is not None and currentElement.find('L2Archive').text:
+            self.l2Archive = currentElement.find('L2Archive').text.strip()
+        if currentElement.find('ProductMirror') is not None:
+            self.productMirror = currentElement.find('ProductMirror').text.strip()
+        if currentElement.find('L2Store') is not None:
+            self.useL2Store = bool(int(currentElement.find('L2Store').text))
+        if currentElement.find('L2StoreDir') is not None:
+            self.l2StoreDir = currentElement.find('L2StoreDir').text
+        else:
+            self.l2StoreDir = os.path.join(self.baseDir, 'l2_store')
+        if currentElement.find('IncrementalFigures') is not None:
+            self.incrementalFigures = bool(int(currentElement.find('IncrementalFigures').text))
+        if currentElement.find('MakePDFs') is not None:
+            self.makePDFs = bool(int(currentElement.find('MakePDFs').text))
+        if currentElement.find('AnalysisCacheDir') is not None:
+            self.analysisCacheDir = currentElement.find('AnalysisCacheDir').text
+        else:
+            self.analysisCacheDir = os.path.join(self.baseDir, 'analysis_cache')
         self.useRap = bool(int(currentElement.find('UseRap').text))
         self.rapCurrent = currentElement.find('RAPCurrentLink').text
         self.rapHistorical = currentElement.find('RAPHistoricalLink').text
         self.rapOffset = float(currentElement.find('RAPOffset').text)
         self.rapTemplate = Template(currentElement.find('RAPTemplate').text)
+        if currentElement.find('RAPCatalogTTL') is not None:
+            self.rapCatalogTTL = float(currentElement.find('RAPCatalogTTL').text)
+        if currentElement.find('RAPCatalogFile') is not None:
+            self.rapCatalogFile = currentElement.find('RAPCatalogFile').text
+        else:
+            self.rapCatalogFile = os.path.join(self.baseDir, 'rap_catalog.json')
+        if currentElement.find('RAPStoreDir') is not None:
+            self.rapStoreDir = currentElement.find('RAPStoreDir').text
+        else:
+            self.rapStoreDir = os.path.join(self.baseDir, 'rap_store')
         self.maxBearingDev = float(currentElement.find('MaxBearingDeviation').text)
 
         self.createCache = bool(int(currentElement.find('CreateCache').text))
@@ -428,4 +517,8 @@ class Config():
         
     def setTTRAP(self, value):
         self.ttrapOnly = value
-        return
\ No newline at end of file
+        return
+        
+    def setJobs(self, value):
+        self.jobs = max(1, int(value))
+        return
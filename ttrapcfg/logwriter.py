@@ -0,0 +1,141 @@
+#Buffered writer for the TTRAP log files. Used by Config.log and Config.error
+
+import os
+import queue
+import threading
+import atexit
+import fcntl
+from multiprocessing import util
+
+
+class LogWriter():
+
+    """ Collects log lines in a queue and writes them from a single background thread in batches. Each batch is written
+        to a file with one write on an O_APPEND descriptor (under an flock) so lines from other processes writing to the
+        same file don't interleave. Files are rotated once they grow past maxBytes.
+
+        The writer is per process. After a fork the child starts with an empty queue and its own thread, and the parent
+        flushes before forking so nothing is written twice.
+
+        maxBytes = rotate a file once it's larger than this. 0 never rotates.
+        backupCount = number of rotated files to keep (file.1, file.2, ...)
+        flushInterval = longest a line waits in the queue in seconds
+        batchSize = most lines written per file per batch
+    """
+
+    def __init__(self, maxBytes=0, backupCount=3, flushInterval=0.5, batchSize=1000):
+
+        self.maxBytes = maxBytes
+        self.backupCount = backupCount
+        self.flushInterval = flushInterval
+        self.batchSize = batchSize
+        self.reset()
+
+        return
+
+    def reset(self):
+        """ Start over with an empty queue and no thread. Called on creation and in a child after a fork. """
+
+        self.q = queue.Queue()
+        self.thread = None
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+        return
+
+    def start(self):
+
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='logwriter', daemon=True)
+                self.thread.start()
+                #multiprocessing children leave through os._exit which skips atexit, but they do run these
+                util.Finalize(None, self.flush, exitpriority=0)
+
+        return
+
+    def write(self, fileName, line):
+        """ Queue a line to be written to fileName """
+
+        if self.thread is None or self.pid != os.getpid():
+            if self.pid != os.getpid():
+                self.reset()
+            self.start()
+
+        self.q.put((fileName, line))
+
+        return
+
+    def flush(self):
+        """ Block until everything queued so far has been written """
+
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            self.q.join()
+
+        return
+
+    def run(self):
+
+        while True:
+            try:
+                item = self.q.get(timeout=self.flushInterval)
+            except queue.Empty:
+                continue
+
+            #Grab everything else that's waiting so it goes out in the same writes
+            batch = [item]
+            while len(batch) < self.batchSize:
+                try:
+                    batch.append(self.q.get_nowait())
+                except queue.Empty:
+                    break
+
+            lines = {}
+            for fileName, line in batch:
+                lines.setdefault(fileName, []).append(line)
+
+            for fileName in lines:
+                try:
+                    self.writeLines(fileName, ''.join(lines[fileName]))
+                except OSError as E:
+                    print("Unable to write to log "+str(fileName)+": "+str(E))
+
+            for a in range(len(batch)):
+                self.q.task_done()
+
+    def writeLines(self, fileName, text):
+
+        fd = os.open(fileName, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if self.maxBytes and os.fstat(fd).st_size + len(text) > self.maxBytes and os.fstat(fd).st_size > 0:
+                self.rotate(fileName)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+                fd = os.open(fileName, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, text.encode())
+        finally:
+            os.close(fd)
+
+        return
+
+    def rotate(self, fileName):
+        """ file -> file.1 -> file.2 ... dropping anything past backupCount """
+
+        for a in range(self.backupCount - 1, 0, -1):
+            if os.path.exists(fileName+'.'+str(a)):
+                os.replace(fileName+'.'+str(a), fileName+'.'+str(a+1))
+        if self.backupCount > 0:
+            os.replace(fileName, fileName+'.1')
+        else:
+            os.truncate(fileName, 0)
+
+        return
+
+
+#The writer shared by every Config in this process
+writer = LogWriter()
+
+os.register_at_fork(before=writer.flush, after_in_child=writer.reset)
+atexit.register(writer.flush)
@@ -10,6 +10,7 @@ import sys
 import multiprocessing as mp
 import traceback
 import types
+import selectors
 from datetime import datetime as dt
 from datetime import timedelta as td
 
@@ -1296,4 +1297,212 @@ class SubprocessHandler():
         return self.q
         
     def getWaitQ(self):
-        return self.waitQ
\ No newline at end of file
+        return self.waitQ
+        
+class Job():
+
+    """ A single node in the JobScheduler graph. A process job calls func to start a WDSS-II program (func must return the
+        (subprocess, logfile) pair like the functions above). A call job runs func inside of this process (e.g. copying directories).
+    """
+    
+    def __init__(self, name, func, args, kwargs, deps, isProcess, stream):
+    
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.deps = deps
+        self.isProcess = isProcess
+        self.stream = stream
+        self.proc = None
+        self.logFile = None
+        self.pidfd = None
+        self.returncode = None
+        
+        return
+        
+        
+class JobScheduler():
+
+    """ Runs WDSS-II jobs as a dependency graph. Each job is started as soon as the jobs it depends on have finished instead of
+        waiting on every job in the stage (e.g. every radar) to finish first. Finished subprocesses are reaped when the kernel 
+        reports them (pidfd on Linux, waitid otherwise) rather than by polling on a sleep (waitid falls back to polling if an unrelated child exits).
+        
+        cfg = configuration object
+        maxProcesses = the maximum number of WDSS-II programs to run at once. Defaults to the number of cores.
+    """
+    
+    def __init__(self, cfg, maxProcesses=None):
+    
+        self.cfg = cfg
+        if maxProcesses:
+            self.maxProcesses = maxProcesses
+        else:
+            self.maxProcesses = os.cpu_count() or 1
+        self.jobs = {} #All of the jobs by name in the order they were added
+        self.activeJobs = {} #Running process jobs by pid
+        self.finished = set()
+        
+        return
+        
+    def addJob(self, name, func, args, kwargs, deps, isProcess, stream):
+    
+        if name in self.jobs:
+            raise ValueError("Job "+str(name)+" was already added to the scheduler")
+            
+        deps = [d for d in deps if d is not None]
+        for dep in deps:
+            if dep not in self.jobs:
+                raise KeyError("Job "+str(name)+" depends on "+str(dep)+" which has not been added")
+        
+        if isinstance(args, str):
+            args = (args,)
+        
+        self.jobs[name] = Job(name, func, args, kwargs if kwargs else {}, deps, isProcess, stream)
+        
+        return name
+        
+    def addProcess(self, func, args, kwargs, name, deps=(), stream=False):
+        """ Add a WDSS-II program. The arguments mirror the tuples that were put in the SubprocessHandler queue.
+            deps = names of the jobs that must finish before this one starts
+            stream = the program exchanges data with other running programs (e.g. w2merger listening to w2simulator) so it
+                     is started as soon as it's ready regardless of maxProcesses
+        """
+        return self.addJob(name, func, args, kwargs, deps, True, stream)
+        
+    def addCall(self, func, args, kwargs, name, deps=()):
+        """ Add a python step that runs in this process once its dependencies are finished """
+        return self.addJob(name, func, args, kwargs, deps, False, False)
+        
+    def getNames(self):
+        """ Returns the names of every job added so far. Useful to make a job wait on everything before it. """
+        return list(self.jobs.keys())
+        
+    def isReady(self, job):
+        return all(dep in self.finished for dep in job.deps)
+        
+    def launch(self, job):
+    
+        if job.isProcess:
+            job.proc, job.logFile = job.func(*job.args, **job.kwargs)
+            if hasattr(os, 'pidfd_open'):
+                try:
+                    job.pidfd = os.pidfd_open(job.proc.pid)
+                except OSError:
+                    job.pidfd = None
+            self.activeJobs[job.proc.pid] = job
+            self.cfg.log("Started job "+str(job.name)+" (pid "+str(job.proc.pid)+")")
+        else:
+            self.cfg.log("Running job "+str(job.name))
+            job.func(*job.args, **job.kwargs)
+            self.finished.add(job.name)
+        
+        return
+        
+    def release(self, job):
+        """ Close out a process job that has exited """
+        
+        job.returncode = job.proc.wait()
+        try:
+            job.logFile.flush()
+            job.logFile.close()
+        except ValueError:
+            self.cfg.error("Tried to flush a closed file")
+        if job.pidfd is not None:
+            os.close(job.pidfd)
+            job.pidfd = None
+            
+        del self.activeJobs[job.proc.pid]
+        self.finished.add(job.name)
+        
+        if job.returncode != 0:
+            self.cfg.error("Job "+str(job.name)+" exited with code "+str(job.returncode))
+        else:
+            self.cfg.log("Finished job "+str(job.name))
+            
+        return
+        
+    def waitForChild(self):
+        """ Block until at least one running job exits and release it """
+        
+        running = list(self.activeJobs.values())
+        
+        if all(job.pidfd is not None for job in running):
+            #A pidfd becomes readable when its process exits
+            with selectors.DefaultSelector() as sel:
+                for job in running:
+                    sel.register(job.pidfd, selectors.EVENT_READ, job)
+                events = sel.select()
+            for key, _ in events:
+                self.release(key.data)
+            return
+            
+        #Wait for any child to exit without reaping it so Popen can still collect its status
+        try:
+            os.waitid(os.P_ALL, 0, os.WEXITED | os.WNOWAIT)
+        except ChildProcessError:
+            pass
+            
+        done = [job for job in running if job.proc.poll() is not None]
+        while not done:
+            #Something other than one of our jobs exited (e.g. a multiprocessing child). It stays unreaped, so waitid would
+            #keep reporting it. Poll our own jobs until one of them exits instead of blocking on any single one.
+            time.sleep(0.25)
+            done = [job for job in running if job.proc.poll() is not None]
+            
+        for job in done:
+            self.release(job)
+            
+        return
+        
+    def run(self):
+        """ Run every job, respecting dependencies and maxProcesses. Returns the names of the jobs that exited with an error. """
+        
+        pending = list(self.jobs.values())
+        startTime = dt.now()
+        self.cfg.log("Running "+str(len(pending))+" jobs on up to "+str(self.maxProcesses)+" processes")
+        
+        try:
+            while pending or self.activeJobs:
+            
+                #Start everything that is ready. Call jobs may finish immediately and free up others, so keep going until nothing changes.
+                launched = True
+                while launched:
+                    launched = False
+                    for job in list(pending):
+                        if not self.isReady(job):
+                            continue
+                        if job.isProcess and not job.stream and len(self.activeJobs) >= self.maxProcesses:
+                            continue
+                        pending.remove(job)
+                        self.launch(job)
+                        launched = True
+                    
+                if not self.activeJobs:
+                    if pending:
+                        raise err.StopProcessingException("Jobs "+str([job.name for job in pending])+" can never start")
+                    break
+                    
+                self.waitForChild()
+                
+        except BaseException:
+            self.cfg.error("Stopping scheduler. Terminating "+str(len(self.activeJobs))+" running jobs")
+            self.terminateAll()
+            raise
+            
+        failed = [job.name for job in self.jobs.values() if job.isProcess and job.returncode != 0]
+        
+        self.cfg.log("Scheduler finished "+str(len(self.finished))+" jobs in "+str((dt.now() - startTime).seconds)+" seconds")
+        
+        return failed
+        
+    def terminateAll(self):
+        """ Terminates all running jobs """
+        
+        for job in list(self.activeJobs.values()):
+            if job.proc.poll() is None:
+                self.cfg.log("Terminating job "+str(job.name))
+                job.proc.terminate()
+            self.release(job)
+            
+        return
@@ -1,16 +1,15 @@
 #This module contains function and class definitions for analysis of WDSII data 
 
-from datetime import datetime
 from datetime import timedelta
 from netCDF4 import Dataset
 import os
 import math
 from ttrappy import distance
 from ttrappy import ttrappy as ttr
-from ttrappy import visualize
 from ttrappy import clusters as clu
 from ttrappy import stormbuilder as sb
 from ttrappy import error as err
+from ttrappy import timeindex
 import sys
 import pickle
 
@@ -36,6 +35,10 @@ class Time():
         return self.__maxShearClusters[tilt]
     def getMinShearClusters(self, tilt):
         return self.__minShearClusters[tilt]
+    def getMaxShearClusterSets(self):
+        return self.__maxShearClusters
+    def getMinShearClusterSets(self):
+        return self.__minShearClusters
     def getTrackClusters(self):
         return self.__trackClusters
     def getETClusters(self):
@@ -43,111 +46,35 @@ class Time():
     def getDT(self):
         return self.__DT
 
-#This function determines which file in a string of files is closest in time to the given time string
+#This function determines which file in a string of files is closest in time to the given time string (the closest at or after it if there is one)
 def getClosestTime(baseTime, files, UNIVDT='2'):
 
+    index = timeindex.TimeIndex([timeindex.findDTString(fi, UNIVDT) for fi in files])
 
-    #Split the base time into its individual elements
-    string1 = baseTime
-    year1 = int(string1[0:4])
-    month1 = int(string1[4:6])
-    day1 = int(string1[6:8])
-    hour1 = int(string1[9:11])
-    minute1 = int(string1[11:13])
-    second1 = int(string1[13:15])
-    dt1 = datetime(year1, month1, day1, hour1, minute1, second1)
-
-    closestIndex = 999999999
-    closestDelta = 999999999
-    count2 = 0
-
-    #Loop through the files
-    for fi in files:
-        string2 = ''
-        count = 0
-        #Find the index of the beginning of DT string and define the DT string 
-        for char in fi:
-            if(char == UNIVDT):
-                string2 = fi[count:count+15]
-                break
-            count = count + 1
-        
-        year2 = int(string2[0:4])
-        month2 = int(string2[4:6])
-        day2 = int(string2[6:8])
-        hour2 = int(string2[9:11])
-        minute2 = int(string2[11:13])
-        second2 = int(string2[13:15])
-        dt2 = datetime(year2, month2, day2, hour2, minute2, second2)
-
-        delta = dt2 - dt1
-        if(delta.seconds < closestDelta):
-            closestDelta = delta.seconds
-            closestIndex = count2
-        #print(count2, closestIndex, delta.seconds, closestDelta, string1, string2, fi)
-        count2 = count2 + 1
+    closestIndex = index.atOrAfter(baseTime)
+    if closestIndex is None:
+        closestIndex = index.nearest(baseTime)
+    if closestIndex is None:
+        closestIndex = 999999999
 
     return closestIndex
 
 
-def readTableLines(tableFile):
-    lines = []
-
-    fi3 = open(tableFile, 'r')
-    first = True
-    header = []
-    for line in fi3:
-        if (not first):
-            lines.append(line.rstrip('\n').split(','))
-        else:
-            first = False
-            #Make sure there is no # in the beginning
-            if '#' in line:
-                line.replace('#', '')
-            header = line.lstrip('#').rstrip('\n').split(',')
-            
-    fi3.close()
-    return header, lines
+def reorderTimes(times):
+    """ The Time objects sorted by their DT. Times with the same DT keep their order. """
 
+    index = timeindex.TimeIndex([currentTime.getDT() for currentTime in times])
 
-def reorderTimes(times):
-	
-	orderedTimes = []
-	ordered = 0
-	orderedIndicies = []
-
-	while ordered < len(times):
-		
-		lowestDT = datetime(9999, 1, 1, 0, 0, 0) #Pick a ridiculus time in the future
-		lowestIndex = -1
-		count = 0
-		for currentTime in times:
-			string1 = currentTime.getDT()
-			year = int(string1[0:4])
-			month = int(string1[4:6])
-			day = int(string1[6:8])
-			hour = int(string1[9:11])
-			minute = int(string1[11:13])
-			second = int(string1[13:15])
-			dt = datetime(year, month, day, hour, minute, second)
-		
-			if (dt < lowestDT and (count not in orderedIndicies)):
-				lowestDT = dt
-				lowestIndex = count
-			count = count + 1
-		
-		orderedTimes.append(times[lowestIndex])
-		orderedIndicies.append(lowestIndex)
-		ordered = ordered + 1
-	
-	return orderedTimes
+    return [times[i] for i in index.getSortedIndices()]
 	
 
 class Analysis():
 
-    def __init__(self, cfg, case):
+    def __init__(self, cfg, case, cache=None):
+        self.cache = cache #AnalysisCache the cluster tables and times are loaded from/saved to. None reads everything from the files
         self.UNIVDT = str(case.dateTime.year)[0] #This is the number that indicates the start of the DT string. Change to first digit of the year in question. For example, '2' for 2xxx or '1' for 1xxx
         self.TIMES = [] #A list of lists of time objects that can be accessed from anywhere in the program. Each index is from a different altitude
+        self.timeIndexes = {} #id of a list of cluster sets -> (the list, its TimeIndex). See getTimeIndex()
         # self.statFile = case.saveDir+'_'+case.ID+'.csv'
         # self.activeFile = case.saveDir+'_'+case.ID+'_active.csv'
         
@@ -384,15 +311,15 @@ class Analysis():
             #Now find the corresponding HailTruth table, if it exists
             
             try:
-                clusterHeader, clusterLines = readTableLines(currentClusterFile)
+                clusterTable = self.readClusterTable(currentClusterFile)
             except FileNotFoundError:
                 cfg.error("loadETClusters(): file not found for "+currentClusterFile)
                 return False, False
 
             appendClusters = []
             
-            for cLine in clusterLines:
-                appendCluster = clu.EchoTopCluster(cfg, case, cLine, clusterHeader, fiS)
+            for row in range(len(clusterTable)):
+                appendCluster = clu.EchoTopCluster(cfg, case, clusterTable, row, fiS)
                 appendCluster.setReportTD(case.dateTime) #Set the time delta of the cluster based of the time of interest from the case
 
                 appendClusters.append(appendCluster)
@@ -426,12 +353,12 @@ class Analysis():
                 count0 += 1
                 
           
-            clusterHeader, clusterLines = readTableLines(currentClusterFile)
+            clusterTable = self.readClusterTable(currentClusterFile)
 
             appendClusters = []
             
-            for cLine in clusterLines:
-                appendCluster = clu.TrackCluster(cfg, case, cLine, clusterHeader, fiS)
+            for row in range(len(clusterTable)):
+                appendCluster = clu.TrackCluster(cfg, case, clusterTable, row, fiS)
                 appendCluster.setReportTD(case.dateTime) #Set the time delta of the cluster based of the time of interest from the case
 
                 appendClusters.append(appendCluster)
@@ -450,6 +377,9 @@ class Analysis():
         clusterDTs = []
         clusters = []
         
+        #Index the HailTruth tables by time once for all of the cluster files
+        truthIndex = timeindex.TimeIndex([timeindex.findDTString(htFi, self.UNIVDT) for htFi in truthFiles])
+        
         #First, load the max and min
         for fiS in clusterFiles:
             currentClusterFile = os.path.join(clusterTableDir, fiS)
@@ -467,35 +397,26 @@ class Analysis():
             #Now find the corresponding HailTruth table, if it exists
             
             closestHTFile = ''
-            for htFi in truthFiles:
-                count0 = 0
-                htDT = ''
-                for char in htFi:
-                    if(char == self.UNIVDT):
-                        htDT = htFi[count0:count0+15]
-                        break
-                    count0 += 1
-                if (visualize.getStringDT(cfg, clusterDT, htDT)[0] == 0):
-                    closestHTFile = os.path.join(truthTableDir, htFi)
-                    break
+            htIndex = truthIndex.exact(clusterDT) if clusterDT else None
+            if htIndex is not None:
+                closestHTFile = os.path.join(truthTableDir, truthFiles[htIndex])
             
-            clusterHeader, clusterLines = readTableLines(currentClusterFile)
+            clusterTable = self.readClusterTable(currentClusterFile)
             
             #If we actuallly found the closest file
             if closestHTFile:
-                truthHeader, truthLines = readTableLines(closestHTFile)
+                truthTable = self.readClusterTable(closestHTFile)
                 # cfg.error("Closest hailtruth file "+fiS+" "+closestHTFile)
+                nRows = min(len(clusterTable), len(truthTable))
             else:
-                #Or else set them to none
-                truthHeader = None
-                truthLines = [None] * len(clusterLines)
-                
-            iterable = zip(clusterLines, truthLines)
+                #Or else set it to none
+                truthTable = None
+                nRows = len(clusterTable)
             
             appendClusters = []
             
-            for cLine,htLine in iterable:
-                appendCluster = clu.ShearCluster(cfg, case, clusterDT, cLine, clusterHeader, tilt, fiS, hailTruthList=htLine, hailTruthHeaderList=truthHeader)
+            for row in range(nRows):
+                appendCluster = clu.ShearCluster(cfg, case, clusterDT, clusterTable, row, tilt, fiS, truthTable=truthTable, truthRow=row)
                 appendCluster.setReportTD(case.dateTime) #Set the time delta of the cluster based of the time of interest from the case
              
                 appendClusters.append(appendCluster)
@@ -529,7 +450,7 @@ class Analysis():
                 count0 += 1
 
             try:
-                clusterHeader, clusterLines = readTableLines(currentClusterFile)
+                clusterTable = self.readClusterTable(currentClusterFile)
             except FileNotFoundError:
                 cfg.error("loadShearClusters(): No file found for "+currentClusterFile+". Returning None")
                 return False, False
@@ -537,8 +458,8 @@ class Analysis():
 
             appendClusters = []
             
-            for cLine in clusterLines:
-                appendCluster = clu.ShearCluster(cfg, case, clusterDT, cLine, clusterHeader, tilt, fiS)
+            for row in range(len(clusterTable)):
+                appendCluster = clu.ShearCluster(cfg, case, clusterDT, clusterTable, row, tilt, fiS)
                 appendCluster.setReportTD(case.dateTime) #Set the time delta of the cluster based of the time of interest from the case
              
                 appendClusters.append(appendCluster)
@@ -555,40 +476,27 @@ class Analysis():
     
         cfg.log("Loading time "+str(DT))
         #Find the set of VIL clusters temporally.
-        timeDifference = 99999999
         closestTrackClusters = None
         #cfg.error("Checking track clusters in time "+str(trackClusters))
         
         if trackClusters:
-            for i,trackCluster in enumerate(trackClusters):
-            
-                if trackCluster:
-                    currentDifference = visualize.getStringDT(cfg, DT, trackCluster[0].getDT().strftime('%Y%m%d-%H%M%S'))[0]
-                    # cfg.error("Track "+str(DT)+" "+str(trackCluster[0].getDT().strftime('%Y%m%d-%H%M%S'))+" "+str(currentDifference))
-                    if currentDifference < timeDifference and (currentDifference <= cfg.maxAppendTimeR*60):
-                    
-                        timeDifference = currentDifference
-                        closestTrackClusters = trackCluster
+            closestIndex = self.getTimeIndex(trackClusters).nearest(DT, tolerance=cfg.maxAppendTimeR*60)
+            if closestIndex is not None:
+                closestTrackClusters = trackClusters[closestIndex]
         else:
             cfg.error("No Track Clusters Found")
             
-        #Find the ET clusters at or after the VIL cluster
+        #Find the ET clusters closest to the VIL cluster
 
-        timeDifference = 999999999
         closestETClusters = None
         #cfg.error("Checking ET Clusters in time "+str(ETClusters))
         
         if ETClusters and trackClusters:
-            for i,etCluster in enumerate(ETClusters):
-            
-                if etCluster and closestTrackClusters:
-                    currentDifference, greater, equal = visualize.getStringDT(cfg, closestTrackClusters[0].getDT().strftime('%Y%m%d-%H%M%S'), etCluster[0].getDT().strftime('%Y%m%d-%H%M%S'))
-                    # cfg.error("ET "+str(DT)+" "+str(etCluster[0].getDT().strftime('%Y%m%d-%H%M%S'))+" "+str(currentDifference)+" "+str(greater)+" "+str(equal))
-
-                    if currentDifference < timeDifference and (currentDifference <= cfg.maxAppendTimeR*60): #Removed (equal or greater) from this check to avoid missed ETs that were close to, but before the VIL time
-                        
-                        timeDifference = currentDifference
-                        closestETClusters = etCluster
+            #Either side of the VIL time to avoid missed ETs that were close to, but before the VIL time
+            if closestTrackClusters:
+                closestIndex = self.getTimeIndex(ETClusters).nearest(closestTrackClusters[0].getDT(), tolerance=cfg.maxAppendTimeR*60)
+                if closestIndex is not None:
+                    closestETClusters = ETClusters[closestIndex]
         else:
             cfg.error("No ET Clusters Available")
                 
@@ -645,63 +553,49 @@ class Analysis():
             #Begin looping through each each tilt...
             for tilt in cfg.tiltList:
                 
-                closestCluster = None
-                closestTimeDifference = 999999
                 #cfg.log("Cluster check! "+str(tilt)+" "+str(clusters[tilt]))
-                #First, determine what the closest time difference is
+                #Take the closest clusters at or after DT
                 if clusters[tilt]:
-                    #Then loop through DT
-                   
-                    for cluster in clusters[tilt]:
-                    
-                        if cluster:
-                            #Check if the clusters are the closest
-                            currentDifference, greater, equal = visualize.getStringDT(cfg, DT, cluster[0].getDT().strftime('%Y%m%d-%H%M%S'))
-                            
-                            if currentDifference < closestTimeDifference and (greater or equal) and (currentDifference <= (cfg.maxAppendTimeV*60)):
-                                
-                                closestTimeDifference = currentDifference
-                            
-                            
-                    #Repeat, but now add clusters that are less than or equal (in other words, equal) to the closeset time difference
+                    closestIndex = self.getTimeIndex(clusters[tilt]).atOrAfter(DT, tolerance=cfg.maxAppendTimeV*60, last=True)
                     
-                    for cluster in clusters[tilt]:
-                        
-                        if cluster:
-                            currentDifference, greater, equal = visualize.getStringDT(cfg, DT, cluster[0].getDT().strftime('%Y%m%d-%H%M%S'))
-                            
-                            if currentDifference <= closestTimeDifference and (greater or equal) and (currentDifference <= (cfg.maxAppendTimeV*60)):
-                                #cfg.log("Added "+str(len(cluster))+" clusters for "+str(tilt)+" "+str(DT)+" "+cluster[0].getDT().strftime('%Y%m%d-%H%M%S')+" "+str(currentDifference)+" "+str(closestTimeDifference))
-                                targetClusterSet[tilt] = cluster
-                                #cfg.log("Append!")
+                    if closestIndex is not None:
+                        #cfg.log("Added "+str(len(clusters[tilt][closestIndex]))+" clusters for "+str(tilt)+" "+str(DT))
+                        targetClusterSet[tilt] = clusters[tilt][closestIndex]
             
                 
             #cfg.log("End DT by Tilt")
                 
         else:
         
-            if clusters:
+            closestIndex = self.getTimeIndex(clusters).nearest(DT)
             
-                closestCluster = None
-                
-                for cluster in clusters:
-                
-                    if cluster:
-                        #Check if the clusters are the closest
-                        currentDifference, greater, equal = visualize.getStringDT(cfg, DT, cluster[0].getDT().strftime('%Y%m%d-%H%M%S'))
-                        
-                        if currentDifference < timeDifference:
-                            
-                            timeDifference = currentDifference
-                            closestClusters = cluster
-                    
-                targetClustserSet = closestCluster
+            if closestIndex is not None:
+                targetClusterSet = clusters[closestIndex]
             else:
                 cfg.error("getClustersByDT(): No non-tilt clusters found ")
             
             #cfg.log("Not by tilt")
         return targetClusterSet
         
+    def readClusterTable(self, tableFile):
+        """ ClusterTable for tableFile, out of the analysis cache when there is one """
+        
+        if self.cache:
+            return self.cache.getClusterTable(tableFile)
+            
+        return clu.ClusterTable(tableFile)
+        
+    def getTimeIndex(self, clusters):
+        """ TimeIndex of a list of cluster sets (lists of clusters from the same table) by the DT of each set. Empty sets are left out.
+            Built once per list and reused for every DT looked up in it.
+        """
+        
+        key = id(clusters)
+        if key not in self.timeIndexes or self.timeIndexes[key][0] is not clusters:
+            self.timeIndexes[key] = (clusters, timeindex.TimeIndex([cluster[0].getDT() if cluster else None for cluster in clusters]))
+        
+        return self.timeIndexes[key][1]
+        
     def runPreliminaryAnalysis(self, cfg, case):
 
         cfg.log("Starting analysis for case: "+case.ID)
@@ -777,7 +671,12 @@ class Analysis():
                 
             #cfg.log(str(maxShearDTs[lowestTilt]))
             #Create time ojbects
-            if maxShearDTs[lowestTilt]:
+            cachedTimes = self.cache.getTimes(maxShearClusters, minShearClusters, trackClusters, etClusters) if self.cache else None
+            
+            if cachedTimes is not None:
+                times = cachedTimes
+                
+            elif maxShearDTs[lowestTilt]:
             
                 for i,DT in enumerate(maxShearDTs[lowestTilt]):
                 
@@ -838,6 +737,11 @@ class Analysis():
             # for time in times:
                 # cfg.error(str(time.getDT()))
                 
+            if self.cache:
+                if cachedTimes is None:
+                    self.cache.setTimes(times, maxShearClusters, minShearClusters, trackClusters, etClusters)
+                self.cache.save()
+                
             orderedTimes = reorderTimes(times)
             
             cfg.log("Created times "+str(orderedTimes))
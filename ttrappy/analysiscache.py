@@ -0,0 +1,272 @@
+#On-disk cache of the parsed inputs to the analysis (cluster tables, VCPs, and which cluster sets make up each Time)
+#Re-running the analysis on the same data (e.g. ttrapOnly with new StormBuilder weights) loads the cache instead of parsing everything again.
+#Each case's cache is an npz named by a hash of its input files (name, size, mtime) and the settings the parsing depends on,
+#so any change to the inputs gives a new name and the old cache is never used. The caches are kept in a directory per case
+#and saving one deletes the others there, so only the newest is kept.
+
+import os
+import hashlib
+import tempfile
+import numpy as np
+from ttrappy import clusters as clu
+from ttrappy import analysis
+
+VERSION = 1 #Change when what's stored changes so old caches aren't read
+
+
+def getInputDirectories(cfg, case):
+    """ Every directory the analysis (and Case.getVCPs) reads for a case """
+
+    directories = [case.productDirs['clustertable'],
+                   os.path.join(case.productDirs['hailtruth'], 'maxshear'),
+                   os.path.join(case.productDirs['hailtruth'], 'minshear'),
+                   os.path.join(case.productDirs['ETClusterTable'], case.productVars['ETClusterTable'])]
+
+    for tilt in cfg.tiltList:
+        directories.append(os.path.join(case.productDirs['maxShearClusterTable'], tilt, case.productVars['maxShearClusterTable']))
+        directories.append(os.path.join(case.productDirs['minShearClusterTable'], tilt, case.productVars['minShearClusterTable']))
+
+    for site in case.sites:
+        directories.append(os.path.join(case.dataDir, site.name, 'AliasedVelocity', cfg.tiltList[0]))
+
+    return directories
+
+
+class AnalysisCache():
+
+    """ Parsed analysis inputs for one case, loaded from and saved to cfg.analysisCacheDir.
+
+        getClusterTable() hands back a ClusterTable from the cache (or reads the file and adds it), loadVCPs()/setVCPs()
+        do the same for Case.radarVCPs, and getTimes()/setTimes() for the layout of the Time objects. Everything is
+        stored as plain arrays (no pickles) and written by save() if anything was added.
+    """
+
+    def __init__(self, cfg, case):
+
+        self.cfg = cfg
+        self.case = case
+
+        self.key = self.makeKey()
+        self.caseDir = os.path.join(cfg.analysisCacheDir, hashlib.sha1((str(case.storm)+'/'+str(case.ID)).encode()).hexdigest()[0:16])
+        self.fileName = os.path.join(self.caseDir, self.key+'.npz')
+
+        self.tables = {} #Table file -> (header, columns)
+        self.vcps = None
+        self.times = None
+        self.changed = False
+
+        self.hit = self.load()
+
+        return
+
+    def makeKey(self):
+        """ Hash of the input files and the settings that change what's parsed """
+
+        h = hashlib.sha1()
+        h.update(str((VERSION, self.cfg.tiltList, self.cfg.maxAppendTimeV, self.cfg.maxAppendTimeR)).encode())
+
+        for directory in getInputDirectories(self.cfg, self.case):
+            h.update(('\n'+directory+'\n').encode())
+            try:
+                entries = sorted((entry.name, entry.stat().st_size, entry.stat().st_mtime_ns) for entry in os.scandir(directory))
+            except FileNotFoundError:
+                h.update(b'missing')
+                continue
+
+            for entry in entries:
+                h.update((str(entry)+'\n').encode())
+
+        return h.hexdigest()
+
+    def load(self):
+        """ Load the cache file if there is one. Returns whether it was found """
+
+        if not os.path.exists(self.fileName):
+            self.cfg.log("No analysis cache for "+str(self.case.ID)+" ("+self.key+")")
+            return False
+
+        try:
+            with np.load(self.fileName, allow_pickle=False) as data:
+
+                for i, tableFile in enumerate(data['tableFiles'].tolist()):
+                    header = data['header'+str(i)].tolist()
+                    columns = data['columns'+str(i)].tolist() if int(data['tableRows'][i]) else [[] for label in header]
+                    self.tables[tableFile] = (header, columns)
+
+                if 'vcpSites' in data:
+                    self.vcps = []
+                    for i in range(int(data['vcpSites'])):
+                        #Durations that were ints (the 0 for the last VCP) stay ints so they're written out the same
+                        durations = [int(duration) if isInt else duration for duration, isInt in zip(data['vcpDurations'+str(i)].tolist(), data['vcpIsInt'+str(i)].tolist())]
+                        self.vcps.append(dict(zip(data['vcpNames'+str(i)].tolist(), durations)))
+
+                if 'timeDTs' in data:
+                    self.times = {name: data[name] for name in ('timeDTs', 'timeMax', 'timeMin', 'timeTrack', 'timeET', 'timeHasMax', 'timeHasMin')}
+
+        except (OSError, KeyError, ValueError) as E:
+            self.cfg.error("Unable to read analysis cache "+self.fileName+": "+str(E))
+            self.tables = {}
+            self.vcps = None
+            self.times = None
+            return False
+
+        self.cfg.log("Loaded analysis cache "+self.fileName+" with "+str(len(self.tables))+" tables")
+
+        return True
+
+    def save(self):
+        """ Write the cache if anything was added since it was loaded """
+
+        if not self.changed:
+            return
+
+        arrays = {}
+        tableFiles = list(self.tables.keys())
+        arrays['tableFiles'] = np.array(tableFiles, dtype=str)
+        arrays['tableRows'] = np.array([len(self.tables[tableFile][1][0]) if self.tables[tableFile][1] else 0 for tableFile in tableFiles], dtype=np.int64)
+
+        for i, tableFile in enumerate(tableFiles):
+            header, columns = self.tables[tableFile]
+            arrays['header'+str(i)] = np.array(header, dtype=str)
+            arrays['columns'+str(i)] = np.array(columns, dtype=str)
+
+        if self.vcps is not None:
+            arrays['vcpSites'] = np.array(len(self.vcps))
+            for i, vcps in enumerate(self.vcps):
+                arrays['vcpNames'+str(i)] = np.array(list(vcps.keys()), dtype=str)
+                arrays['vcpDurations'+str(i)] = np.array(list(vcps.values()), dtype=float)
+                arrays['vcpIsInt'+str(i)] = np.array([isinstance(duration, int) for duration in vcps.values()], dtype=bool)
+
+        if self.times is not None:
+            arrays.update(self.times)
+
+        #Write to a temporary file and move it into place so a case reading the cache never sees half of one
+        os.makedirs(self.caseDir, exist_ok=True)
+        fd, tempName = tempfile.mkstemp(dir=self.caseDir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fi:
+                np.savez_compressed(fi, **arrays)
+            os.replace(tempName, self.fileName)
+        except OSError as E:
+            self.cfg.error("Unable to write analysis cache "+self.fileName+": "+str(E))
+            if os.path.exists(tempName):
+                os.remove(tempName)
+            return
+
+        self.changed = False
+        self.cfg.log("Saved analysis cache "+self.fileName)
+
+        self.removeStale()
+
+        return
+
+    def removeStale(self):
+        """ Delete the case's caches for inputs that have since changed. They would never be read again """
+
+        for entry in os.scandir(self.caseDir):
+            if entry.name.endswith('.npz') and entry.path != self.fileName:
+                try:
+                    os.remove(entry.path)
+                    self.cfg.log("Removed stale analysis cache "+entry.path)
+                except OSError as E:
+                    self.cfg.error("Unable to remove analysis cache "+entry.path+": "+str(E))
+
+        return
+
+    def getClusterTable(self, tableFile):
+        """ ClusterTable for tableFile from the cache, or read from the file and added to the cache """
+
+        if tableFile in self.tables:
+            header, columns = self.tables[tableFile]
+            return clu.ClusterTable(tableFile, header=header, columns=columns)
+
+        clusterTable = clu.ClusterTable(tableFile)
+        self.tables[tableFile] = (clusterTable.header, clusterTable.getColumns())
+        self.changed = True
+
+        return clusterTable
+
+    def loadVCPs(self, case):
+        """ Fill case.radarVCPs from the cache. Returns False if they aren't cached """
+
+        if self.vcps is None:
+            return False
+
+        for vcps in self.vcps:
+            case.radarVCPs.append(dict(vcps))
+
+        return True
+
+    def setVCPs(self, case):
+        """ Cache the case.radarVCPs found by Case.getVCPs """
+
+        self.vcps = [dict(vcps) for vcps in case.radarVCPs]
+        self.changed = True
+
+        return
+
+    def getTimes(self, maxShearClusters, minShearClusters, trackClusters, ETClusters):
+        """ Rebuild the Time objects from the cached layout and the loaded cluster sets. None if the layout isn't cached """
+
+        if self.times is None:
+            return None
+
+        def pickSet(clusterSets, index):
+            if index < 0 or not clusterSets:
+                return None
+            return clusterSets[index]
+
+        times = []
+        for n, DT in enumerate(self.times['timeDTs'].tolist()):
+
+            maxSets = []
+            if self.times['timeHasMax'][n]:
+                maxSets = {tilt: pickSet(maxShearClusters[tilt], int(self.times['timeMax'][n][t])) or [] for t, tilt in enumerate(self.cfg.tiltList)}
+
+            minSets = []
+            if self.times['timeHasMin'][n]:
+                minSets = {tilt: pickSet(minShearClusters[tilt], int(self.times['timeMin'][n][t])) or [] for t, tilt in enumerate(self.cfg.tiltList)}
+
+            times.append(analysis.Time(DT, maxSets, minSets, pickSet(trackClusters, int(self.times['timeTrack'][n])), pickSet(ETClusters, int(self.times['timeET'][n]))))
+
+        self.cfg.log("Loaded "+str(len(times))+" times from the analysis cache")
+
+        return times
+
+    def setTimes(self, times, maxShearClusters, minShearClusters, trackClusters, ETClusters):
+        """ Cache which cluster set from each list went into each Time (-1 for none) """
+
+        def findSet(clusterSets, clusterSet):
+            if not clusterSets or not clusterSet:
+                return -1
+            for i, candidate in enumerate(clusterSets):
+                if candidate is clusterSet:
+                    return i
+            return -1
+
+        nTilts = len(self.cfg.tiltList)
+        timeMax = np.full((len(times), nTilts), -1, dtype=np.int64)
+        timeMin = np.full((len(times), nTilts), -1, dtype=np.int64)
+        hasMax = np.zeros(len(times), dtype=bool)
+        hasMin = np.zeros(len(times), dtype=bool)
+
+        for n, time in enumerate(times):
+            if isinstance(time.getMaxShearClusterSets(), dict):
+                hasMax[n] = True
+                for t, tilt in enumerate(self.cfg.tiltList):
+                    timeMax[n][t] = findSet(maxShearClusters[tilt], time.getMaxShearClusterSets().get(tilt))
+            if isinstance(time.getMinShearClusterSets(), dict):
+                hasMin[n] = True
+                for t, tilt in enumerate(self.cfg.tiltList):
+                    timeMin[n][t] = findSet(minShearClusters[tilt], time.getMinShearClusterSets().get(tilt))
+
+        self.times = {'timeDTs': np.array([time.getDT() for time in times], dtype=str),
+                      'timeMax': timeMax,
+                      'timeMin': timeMin,
+                      'timeTrack': np.array([findSet(trackClusters, time.getTrackClusters()) for time in times], dtype=np.int64),
+                      'timeET': np.array([findSet(ETClusters, time.getETClusters()) for time in times], dtype=np.int64),
+                      'timeHasMax': hasMax,
+                      'timeHasMin': hasMin}
+        self.changed = True
+
+        return
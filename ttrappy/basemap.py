@@ -0,0 +1,178 @@
+#Cities and counties drawn under every figure
+#The Natural Earth places and the county shapes are read once per process and the part of them inside a figure is kept
+#by domain (for the last MAXLAYERS domains), so every frame of every product for a case reuses the same layers instead of reading the shapefiles again.
+
+import functools
+import numpy as np
+import cartopy.io.shapereader as shpreader
+import cartopy.feature as cfeature
+from metpy.plots import USCOUNTIES
+
+#Define a dictionary of states and their appreviations for use in the city names
+STATES = {'Alabama':'AL',
+          'Alaska':'AK',
+          'Arizona':'AZ',
+          'Arkansas':'AR',
+          'American Samoa':'AS',
+          'California':'CA',
+          'Colorado':'CO',
+          'Connecticut':'CT',
+          'Deleware':'DE',
+          'District of Columbia':'DC',
+          'Florida':'FL',
+          'Georgia':'GA',
+          'Guam':'GU',
+          'Hawaii':'HI',
+          'Idaho':'ID',
+          'Illinois':'IL',
+          'Indiana':'IN',
+          'Iowa':'IA',
+          'Kansas':'KS',
+          'Kentucky':'KY',
+          'Louisiana':'LA',
+          'Maine':'ME',
+          'Maryland':'MD',
+          'Massachusetts':'MA',
+          'Michigan':'MI',
+          'Minnesota':'MN',
+          'Mississippi':'MS',
+          'Missouri':'MO',
+          'Montana':'MT',
+          'Nebraska':'NE',
+          'Nevada':'NV',
+          'New Hampshire':'NH',
+          'New Jersey':'NJ',
+          'New Mexico':'NM',
+          'New York':'NY',
+          'North Carolina':'NC',
+          'North Dakota':'ND',
+          'Northern Mariana Islands':'CM',
+          'Ohio':'OH',
+          'Oklahoma':'OK',
+          'Oregon':'OR',
+          'Pennsylvania':'PA',
+          'Puerto Rico':'PR',
+          'Rhode Island':'RI',
+          'South Carolina':'SC',
+          'South Dakota':'SD',
+          'Tennessee':'TN',
+          'Texas':'TX',
+          'Trust Territories':'TT',
+          'Utah':'UT',
+          'Vermont':'VT',
+          'Virginia':'VA',
+          'Virgin Islands':'VI',
+          'Washington':'WA',
+          'West Virginia':'WV',
+          'Wisconsin':'WI',
+          'Wyoming':'WY'}
+
+COUNTYPAD = 0.5 #Degrees around a figure to keep counties for so the ones on the edge are still drawn
+MAXLAYERS = 16 #Domains to keep city and county layers for. The oldest ones are dropped so long batches don't keep growing
+
+
+def getDomain(xticks, yticks):
+    """ (minLon, maxLon, minLat, maxLat) of a figure's axis ticks """
+    return (min(xticks), max(xticks), min(yticks), max(yticks))
+
+
+class CityIndex():
+
+    """ Every Natural Earth populated place sorted by longitude so the ones in a box are found with a binary search """
+
+    def __init__(self):
+
+        fname = shpreader.natural_earth(resolution='10m', category='cultural', name='populated_places')
+        reader = shpreader.Reader(fname)
+
+        xlist = []
+        ylist = []
+        self.attributes = []
+        for city in reader.records():
+            xlist.append(city.geometry.x)
+            ylist.append(city.geometry.y)
+            self.attributes.append((city.attributes['NAME_EN'], city.attributes['ADM1NAME']))
+
+        self.order = np.argsort(np.array(xlist, dtype=float), kind='stable')
+        self.lons = np.array(xlist, dtype=float)[self.order]
+        self.lats = np.array(ylist, dtype=float)[self.order]
+
+        return
+
+    def query(self, minLon, maxLon, minLat, maxLat):
+        """ Lons, lats, and names (with the state) of the cities in the box (edges included) in the shapefile's order """
+
+        start = np.searchsorted(self.lons, minLon, side='left')
+        end = np.searchsorted(self.lons, maxLon, side='right')
+        positions = start + np.flatnonzero((self.lats[start:end] >= minLat) & (self.lats[start:end] <= maxLat))
+        positions = positions[np.argsort(self.order[positions], kind='stable')]
+
+        xlist = []
+        ylist = []
+        nameList = []
+        for position in positions.tolist():
+            xlist.append(float(self.lons[position]))
+            ylist.append(float(self.lats[position]))
+            name, state = self.attributes[int(self.order[position])]
+            nameList.append(name+','+str(STATES[state]))
+
+        return xlist, ylist, nameList
+
+
+class CountyIndex():
+
+    """ The 20m US county shapes with their bounding boxes so the ones overlapping a box are found without a shapefile read """
+
+    def __init__(self):
+
+        feature = USCOUNTIES.with_scale('20m')
+        self.crs = feature.crs
+        self.geometries = list(feature.geometries())
+        self.bounds = np.array([geometry.bounds for geometry in self.geometries], dtype=float).reshape(-1, 4)
+
+        return
+
+    def query(self, minLon, maxLon, minLat, maxLat):
+        """ Feature with the counties whose bounding box overlaps the box """
+
+        overlaps = (self.bounds[:, 0] <= maxLon) & (self.bounds[:, 2] >= minLon) & (self.bounds[:, 1] <= maxLat) & (self.bounds[:, 3] >= minLat)
+
+        return cfeature.ShapelyFeature([self.geometries[i] for i in np.flatnonzero(overlaps).tolist()], self.crs)
+
+
+#Loaded the first time they're needed in a process, then kept
+cityIndex = None
+countyIndex = None
+
+def getCityLayer(xticks, yticks):
+    """ Lons, lats, and names of the cities inside the figure """
+
+    return getDomainCities(getDomain(xticks, yticks))
+
+@functools.lru_cache(maxsize=MAXLAYERS)
+def getDomainCities(domain):
+    """ getCityLayer for a domain from getDomain """
+
+    global cityIndex
+
+    if cityIndex is None:
+        cityIndex = CityIndex()
+
+    return cityIndex.query(*domain)
+
+def getCountyLayer(xticks, yticks):
+    """ Feature with the counties for the figure. Use in place of USCOUNTIES.with_scale('20m') """
+
+    return getDomainCounties(getDomain(xticks, yticks))
+
+@functools.lru_cache(maxsize=MAXLAYERS)
+def getDomainCounties(domain):
+    """ getCountyLayer for a domain from getDomain """
+
+    global countyIndex
+
+    if countyIndex is None:
+        countyIndex = CountyIndex()
+    minLon, maxLon, minLat, maxLat = domain
+
+    return countyIndex.query(minLon-COUNTYPAD, maxLon+COUNTYPAD, minLat-COUNTYPAD, maxLat+COUNTYPAD)
@@ -3,31 +3,157 @@
 
 from datetime import datetime as dt
 from datetime import timedelta as td
+from concurrent.futures import ThreadPoolExecutor
 from ttrappy import ttraprad as rad
+from ttrappy import error as err
+from ttrappy import volumeindex
 import pytz
 import os
+import json
 import pickle
-import netCDF4 as nc
+import tempfile
+import threading
+
+CASEFIELDS = 13 #id,storm,year,month,day,time,start_lat,start_lon,stop_lat,stop_lon,istor,F-EF-Rating,class
 	
 def loadCases(cfg):
+	""" Read every row of the case file into a Case. Rows that can't be read are returned as InvalidCaseRow errors instead.
+	    The radars aren't picked here (see CaseResolver) so this only takes as long as reading the file """
 
 	cfg.log("Creating Cases")
 
 	fi = open(cfg.caseFile, 'r')
 	cases = []
+	invalidRows = []
 	
 	header = True
-	for line in fi:		
+	for lineNumber, line in enumerate(fi, start=1):
 	
 		if not header and not line.startswith('#'):
-			cases.append(Case(cfg, line))
+			if not line.strip():
+				continue
+			try:
+				cases.append(Case(cfg, line, lineNumber))
+			except err.InvalidCaseRow as E:
+				cfg.error("Skipping case file row. "+E.message)
+				invalidRows.append(E)
 	
 		else:
 			header = False
 
 	fi.close()
 
-	return cases
+	cfg.log("Read "+str(len(cases))+" cases and "+str(len(invalidRows))+" invalid rows from "+str(cfg.caseFile))
+
+	return cases, invalidRows
+
+
+class CaseManifest():
+
+    """ The radars picked for each case, kept in <case file name>_cases.json in the base directory so a batch that's started
+        again doesn't ask the L2 archive again. A case's entry is only used if the row and the settings radar picking
+        depends on are the same.
+    """
+
+    def __init__(self, cfg):
+
+        self.fileName = os.path.join(cfg.baseDir, os.path.splitext(os.path.basename(cfg.caseFile))[0]+'_cases.json')
+        self.lock = threading.Lock()
+        self.cases = {}
+
+        if os.path.exists(self.fileName):
+            try:
+                with open(self.fileName, 'r') as fi:
+                    self.cases = json.load(fi)
+            except (OSError, ValueError) as E:
+                cfg.error("Unable to read case manifest "+self.fileName+": "+str(E))
+
+        return
+
+    def getKey(self, cfg, case):
+        """ What the radars picked for a case depend on """
+        return '|'.join(str(x) for x in (case.ID, case.storm, case.dateTime.isoformat(), case.startLat, case.startLon, cfg.numRadars,
+                                         cfg.radarStart, cfg.radarEnd, cfg.radarinfo, cfg.l2Archive))
+
+    def get(self, cfg, case):
+        """ Sites, distances, and names saved for the case. None if there aren't any (or a site is no longer in radarinfo) """
+
+        with self.lock:
+            entry = self.cases.get(self.getKey(cfg, case))
+        if entry is None:
+            return None
+
+        registry = rad.getRegistry(cfg)
+        try:
+            sites = [registry.getRadarByName(name) for name in entry['names']]
+        except KeyError:
+            return None
+        sites[0].setIsClosest(True)
+
+        return sites, entry['distances'], entry['names']
+
+    def add(self, cfg, case):
+        """ Save the radars picked for a case """
+
+        with self.lock:
+            self.cases[self.getKey(cfg, case)] = {'names':case.siteNames, 'distances':case.distances}
+
+            #Written for every case so a batch that's stopped keeps what it had
+            os.makedirs(os.path.dirname(os.path.abspath(self.fileName)), exist_ok=True)
+            fd, tempName = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.fileName)), suffix='.tmp')
+            with os.fdopen(fd, 'w') as fi:
+                json.dump(self.cases, fi, indent=1, sort_keys=True)
+            os.replace(tempName, self.fileName)
+
+        return
+
+
+class CaseResolver():
+
+    """ Picks the radars for the cases (Case.resolveSites) with cfg.caseWorkers threads in case file order, so the next cases
+        are ready by the time they're needed instead of all of them being done before the first one starts. Only the
+        cfg.caseWorkers cases after the last one asked for are picked ahead.
+    """
+
+    def __init__(self, cfg, cases):
+
+        self.cfg = cfg
+        self.cases = cases
+        self.manifest = CaseManifest(cfg)
+        self.lookahead = max(1, cfg.caseWorkers)
+        self.executor = ThreadPoolExecutor(max_workers=self.lookahead)
+        self.futures = []
+        self.lock = threading.Lock()
+        self.submit(self.lookahead)
+
+        return
+
+    def resolve(self, case):
+        case.resolveSites(self.cfg, self.manifest)
+        return case
+
+    def submit(self, stop):
+        """ Start picking radars for every case before stop that hasn't been started """
+
+        with self.lock:
+            while len(self.futures) < min(stop, len(self.cases)):
+                self.futures.append(self.executor.submit(self.resolve, self.cases[len(self.futures)]))
+
+        return
+
+    def get(self, index):
+        """ The case at index with its radars picked, waiting for it if needed. Raises what picking them raised """
+
+        self.submit(index+1+self.lookahead)
+
+        return self.futures[index].result()
+
+    def close(self):
+        """ Stop picking radars for the cases that haven't started """
+
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+        return
 
 
 class Case():
@@ -37,9 +163,9 @@ class Case():
 
 
     
-    def __init__(self, cfg, fileLine): 
-
+    def __init__(self, cfg, fileLine, lineNumber=None): 
 
+        """ Read a row of the case file. Raises InvalidCaseRow if it can't be. The radars are picked by resolveSites """
 
         self.ID = None #ID for the case 
         self.storm = None
@@ -122,11 +248,22 @@ class Case():
     
         splitLine = fileLine.rstrip('\n').split(',')
 
+        if len(splitLine) < CASEFIELDS:
+            raise err.InvalidCaseRow(lineNumber, None, 'Expected '+str(CASEFIELDS)+' columns but found '+str(len(splitLine)),
+                                     storm=splitLine[1] if len(splitLine) > 1 else None, ID=splitLine[0])
+
+        def readField(index, label, kind):
+            try:
+                return kind(splitLine[index])
+            except ValueError:
+                raise err.InvalidCaseRow(lineNumber, label, repr(splitLine[index])+' is not a valid '+kind.__name__, storm=splitLine[1], ID=splitLine[0])
+
         self.ID = splitLine[0]
         self.storm = splitLine[1]
-        self.year = int(splitLine[2])
-        self.month = int(splitLine[3])
-        self.day = int(splitLine[4])
+        self.year = readField(2, 'year', int)
+        self.month = readField(3, 'month', int)
+        self.day = readField(4, 'day', int)
+        readField(5, 'time', int)
         if len(splitLine[5]) < 3:
             self.hour = 0
             self.minute = int(splitLine[5])
@@ -137,37 +274,26 @@ class Case():
             self.hour = int(splitLine[5][0:2])
             self.minute = int(splitLine[5][2:4])
         else:
-            cfg.log.error(f"Something went wrong with the minute on {self.ID}")
+            raise err.InvalidCaseRow(lineNumber, 'time', repr(splitLine[5])+' is not HHMM', storm=self.storm, ID=self.ID)
 
-        self.dateTime = cfg.utc.localize(dt(self.year, self.month, self.day, hour=self.hour, minute=self.minute))
+        try:
+            self.dateTime = cfg.utc.localize(dt(self.year, self.month, self.day, hour=self.hour, minute=self.minute))
+        except ValueError as E:
+            raise err.InvalidCaseRow(lineNumber, 'time', str(E), storm=self.storm, ID=self.ID)
         self.startTime = self.dateTime - cfg.radarStart
         self.endTime = self.dateTime + cfg.radarEnd
-        self.startLat = float(splitLine[6])
-        self.startLon = float(splitLine[7])
-        self.stopLat = float(splitLine[8])
-        self.stopLon = float(splitLine[9])
-        self.isTor = bool(int(splitLine[10]))
-        self.eFRating = int(splitLine[11])
-        self.warningClass = int(splitLine[12])
-
-        #Use warning start for Non-Tor and Tor midpoint for Tor
-        start = self.dateTime - cfg.radarStart
-        end = self.dateTime + cfg.radarEnd
-        
-        #Commented this out because methodology now uses the start point for TORS
-        # if self.isTor:
-            # midLat = (self.startLat+self.stopLat)/2
-            # midLon = (self.startLon+self.stopLon)/2
-            # self.sites, self.distances, self.siteNames = rad.findNearestRadars(cfg, midLat, midLon, cfg.numRadars, start, end)
-
-            # self.topLat = round(midLat+float(cfg.latOffset), 2)
-            # self.botLat = round(midLat-float(cfg.latOffset), 2)
-            # self.topLon = round(midLon-float(cfg.lonOffset), 2)
-            # self.botLon = round(midLon+float(cfg.lonOffset), 2)
-
-        # if not self.isTor:
-        self.sites, self.distances, self.siteNames = rad.findNearestRadars(cfg, self.startLat, self.startLon, cfg.numRadars, start, end)
-        
+        self.startLat = readField(6, 'start_lat', float)
+        self.startLon = readField(7, 'start_lon', float)
+        self.stopLat = readField(8, 'stop_lat', float)
+        self.stopLon = readField(9, 'stop_lon', float)
+        self.isTor = bool(readField(10, 'istor', int))
+        self.eFRating = readField(11, 'F-EF-Rating', int)
+        self.warningClass = readField(12, 'class', int)
+
+        for label, value, limit in (('start_lat', self.startLat, 90), ('start_lon', self.startLon, 180), ('stop_lat', self.stopLat, 90), ('stop_lon', self.stopLon, 180)):
+            if abs(value) > limit:
+                raise err.InvalidCaseRow(lineNumber, label, str(value)+' is out of range', storm=self.storm, ID=self.ID)
+
         self.topLat = round(self.startLat+float(cfg.latOffset), 2)
         self.botLat = round(self.startLat-float(cfg.latOffset), 2)
         self.topLon = round(self.startLon-float(cfg.lonOffset), 2)
@@ -190,6 +316,26 @@ class Case():
             
         self.TIMESBYALT = []
         
+        self.sitesNum = 0
+        
+        return
+    
+    def resolveSites(self, cfg, manifest=None):
+        """ Pick the radars for the case (the nearest cfg.numRadars with data), or take the ones an earlier run picked from the manifest """
+        
+        saved = manifest.get(cfg, self) if manifest is not None else None
+        if saved is not None:
+            self.sites, self.distances, self.siteNames = saved
+        else:
+            #Commented this out because methodology now uses the start point for TORS
+            # if self.isTor:
+                # midLat = (self.startLat+self.stopLat)/2
+                # midLon = (self.startLon+self.stopLon)/2
+                # self.sites, self.distances, self.siteNames = rad.findNearestRadars(cfg, midLat, midLon, cfg.numRadars, self.startTime, self.endTime)
+            self.sites, self.distances, self.siteNames = rad.findNearestRadars(cfg, self.startLat, self.startLon, cfg.numRadars, self.startTime, self.endTime)
+            if manifest is not None:
+                manifest.add(cfg, self)
+                
         self.sitesNum = len(self.sites)
             
         cfg.log("Created case "+str(self.ID)+" "+str(vars(self))+"\n\n")
@@ -264,52 +410,48 @@ class Case():
         return
     
     def getVCPs(self, cfg):
-        """ After ingesting the L2 data into netcdf format. Gather the VCPs and their durations from each radar using the AliasedVelocity files """
+        """ After ingesting the L2 data into netcdf format. Gather the VCPs and their durations from each radar using the AliasedVelocity files.
+            The headers are read once into the case's volume index (see volumeindex.py) for every radar at the same time """
+        
+        targetDirs = [os.path.join(self.dataDir, site.name, 'AliasedVelocity', cfg.tiltList[0]) for site in self.sites]
         
+        index = volumeindex.VolumeIndex(cfg, self)
+        index.update(targetDirs)
+        index.save()
         
         #Do this for each radar
-        for site in self.sites:
+        for targetDir in targetDirs:
         
-            #First, we want to sort the files by time so that the duration between them can be properly calculated
-            targetDir = os.path.join(self.dataDir, site.name, 'AliasedVelocity', cfg.tiltList[0])
-            file_list = filter(lambda x: os.path.isfile(os.path.join(targetDir, x)), os.listdir(targetDir))
+            #The files are in order of the times in their names so that the duration between them can be properly calculated
+            volumes = [(fileName, str(int(header['vcp']))) for fileName, header in index.getVolumes(targetDir) if header['vcp'] is not None]
             
-            sortedFiles = sorted(file_list, key = lambda x: os.path.getmtime(os.path.join(targetDir, x)))
-            
-            cfg.log("Checking files "+str(sortedFiles)+" in case "+str(self.ID)+" for VCPs")
+            cfg.log("Checking files "+str([fileName for fileName, _ in volumes])+" in case "+str(self.ID)+" for VCPs")
             
             vcps = {}
-            for a in range(len(sortedFiles)-1):
+            for a in range(len(volumes)-1):
             
-                currentDataset = nc.Dataset(os.path.join(targetDir, sortedFiles[a]))
-                currentVCP = str(int(float(currentDataset.getncattr('vcp-value'))))
-                
-                nextDataset = nc.Dataset(os.path.join(targetDir, sortedFiles[a+1]))
-                nextVCP = str(int(float(nextDataset.getncattr('vcp-value'))))
-                
-                #Close the datasets because we no longer need them
-                currentDataset.close()
-                nextDataset.close()
+                currentVCP = volumes[a][1]
+                nextVCP = volumes[a+1][1]
                 
                 #Get the time difference between the two files
-                file1DT = dt.strptime(sortedFiles[a], '%Y%m%d-%H%M%S.netcdf')
-                file2DT = dt.strptime(sortedFiles[a+1], '%Y%m%d-%H%M%S.netcdf')
+                file1DT = volumeindex.getVolumeTime(volumes[a][0])
+                file2DT = volumeindex.getVolumeTime(volumes[a+1][0])
                 
                 #Now the duration between them
                 duration = abs((file2DT - file1DT).total_seconds())
                 
                 cfg.log("VCP "+str(currentVCP)+" duration chunk "+str(duration))
                 
-                if currentVCP in list(vcps.keys()):
+                if currentVCP in vcps:
                     vcps[currentVCP] += duration
                 else:
                     vcps[currentVCP] = duration 
                 
-                if a == len(sortedFiles) - 2:
+                if a == len(volumes) - 2:
                     
                     if currentVCP != nextVCP:
                         
-                        if nextVCP in list(vcps.keys()):
+                        if nextVCP in vcps:
                             vcps[nextVCP] += 0
                         else:
                             vcps[nextVCP] = 0
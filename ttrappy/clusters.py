@@ -3,9 +3,109 @@
 
 from datetime import datetime
 import math
+from itertools import zip_longest
+import numpy as np
 from ttrappy import distance
 from ttrappy import error as err
 
+class ClusterTable():
+
+    """ One w2segmotionll (or hailtruth) table read into columns. The header is resolved once and each column is converted
+        once, the first time a cluster asks for it, so the clusters built from the table just index into these columns.
+
+        tableFile (str): Path to the csv table. The first line is the header (with or without a leading #)
+        header/columns (list): Already parsed header and columns (from getColumns(), e.g. out of the analysis cache). The file isn't read when given.
+    """
+
+    def __init__(self, tableFile, header=None, columns=None):
+
+        self.tableFile = tableFile
+
+        if header is not None and columns is not None:
+            self.header = header
+            self.__numRows = len(columns[0]) if columns else 0
+            self.__columns = columns
+        else:
+            with open(tableFile, 'r') as fi:
+                header = fi.readline().lstrip('#').rstrip('\n').split(',')
+                lines = [line.rstrip('\n').split(',') for line in fi]
+
+            self.header = header
+            self.__numRows = len(lines)
+
+            #Short rows get '' so converting them fails like indexing the row used to
+            self.__columns = [list(column) for column in zip_longest(*lines, fillvalue='')] if lines else [[] for label in header]
+
+        #Same as header.index(label) but only done once
+        self.__columnIndex = {}
+        for i, label in enumerate(header):
+            self.__columnIndex.setdefault(label, i)
+
+        self.__strings = {}
+        self.__floats = {}
+        self.__geometry = {}
+
+        return
+
+    def __len__(self):
+        return self.__numRows
+
+    def getColumns(self):
+        """ Every raw column (lists of strings) in header order """
+        return self.__columns
+
+    def getColumn(self, label):
+        """ Raw column for label. Raises ValueError if the label isn't in the header """
+
+        try:
+            return self.__columns[self.__columnIndex[label]]
+        except KeyError:
+            raise ValueError(str(label)+" is not in the header of "+str(self.tableFile))
+
+    def getStrings(self, label):
+        """ Column as a list of strings """
+
+        if label not in self.__strings:
+            self.__strings[label] = self.getColumn(label)
+
+        return self.__strings[label]
+
+    def getArray(self, label):
+        """ Column as a float array """
+
+        if label not in self.__floats:
+            self.__floats[label] = np.array(self.getColumn(label), dtype=float)
+
+        return self.__floats[label]
+
+    def getFloats(self, label):
+        """ Column as a list of Python floats """
+
+        key = ('list', label)
+        if key not in self.__floats:
+            self.__floats[key] = self.getArray(label).tolist()
+
+        return self.__floats[key]
+
+    def getRadarGeometry(self, case, latLabel, lonLabel, tilt=None):
+        """ Ground range (m), slant range (m), bearing (deg), and beam height (feet, only with a tilt) from every radar in the case
+            to every row of the table. Each is a list with a list of the radars for every row. Done in one call for the whole table.
+        """
+
+        key = (latLabel, lonLabel, tilt)
+        if key not in self.__geometry:
+            sites = case.sites
+            groundRanges, slantRanges, bearings, beamHeights = distance.calculateRadarGeometry([float(site.lat) for site in sites], [float(site.lon) for site in sites],
+                                                                    [float(site.hgt) for site in sites], self.getArray(latLabel), self.getArray(lonLabel), tilt=tilt)
+
+            if beamHeights is not None:
+                beamHeights = (beamHeights*3.28).tolist() #Convert to feet
+
+            self.__geometry[key] = (groundRanges.tolist(), slantRanges.tolist(), bearings.tolist(), beamHeights)
+
+        return self.__geometry[key]
+
+
 class StormGroup():
     
 
@@ -241,7 +341,35 @@ class ShearGroup():
         
 class TrackCluster():
 
-    def __init__(self, cfg, case, clusterList, clusterHeaderList, fileName):
+    #Column names in the w2segmotionll and hailtruth tables. Shared by every cluster instead of stored on each one.
+    __ageLabel = 'Age(s)'
+    __latRadiusLabel = 'LatRadius(km)'
+    __latitudeLabel = 'Latitude(Degrees)'
+    __lonRadiusLabel = 'LonRadius(km)'
+    __longitudeLabel = 'Longitude(Degrees)'
+    __eastMotionLabel = 'MotionEast(MetersPerSecond)'
+    __southMotionLabel = 'MotionSouth(MetersPerSecond)'
+    __oldTrackLabel = 'OldTrack'
+    __orientationLabel = 'Orientation(degrees)'
+    __IDLabel = 'RowName'
+    __sizeLabel = 'Size(km2)'
+    __speedLabel = 'Speed(MetersPerSecond)'
+    __startTimeLabel = 'StartTime'
+    __maxREFLabel = 'maxREF(dBZ)'
+    __maxVILLabel = 'maxVIL(kg/m^2)'
+    __avgVILLabel = 'avgVIL(kg/m^2)'
+    __u10kmWindLabel = 'u10kmWind(m/s)'
+    __v10kmWindLabel = 'v10kmWind(m/s)'
+    __u6kmMeanWindLabel = 'u6kmMeanWind(m/s)'
+    __v6kmMeanWindLabel = 'v6kmMeanWind(m/s)'
+    __10kmRelativeWindDirectionLabel = '10kmRelativeWindDirection(deg)'
+    __u10kmRelativeWindLabel = 'u10kmRelativeWind(m/s)'
+    __v10kmRelativeWindLabel = 'v10kmRelativeWind(m/s)'
+    __uShearLabel = 'uShear(m/s)'
+    __vShearLabel = 'vShear(m/s)'
+    __potentialClustersLabel = 'potentialClusters(unitless)'
+
+    def __init__(self, cfg, case, table, row, fileName):
 
         #Here, we will go through the expected data we get from the cluster file and assign them to attributes
         #The format is index of the desired data from the clusterHeader and get that data from the clusterLine
@@ -254,58 +382,30 @@ class TrackCluster():
         self.__reportTDSeconds = None
         self.__type = 'track'
         
-        #We'll start by defining the labels for each variable
-        
-        self.__ageLabel = 'Age(s)'
-        self.__latRadiusLabel = 'LatRadius(km)'
-        self.__latitudeLabel = 'Latitude(Degrees)'
-        self.__lonRadiusLabel = 'LonRadius(km)'
-        self.__longitudeLabel = 'Longitude(Degrees)'
-        self.__eastMotionLabel = 'MotionEast(MetersPerSecond)'
-        self.__southMotionLabel = 'MotionSouth(MetersPerSecond)'
-        self.__oldTrackLabel = 'OldTrack'
-        self.__orientationLabel = 'Orientation(degrees)'
-        self.__IDLabel = 'RowName'
-        self.__sizeLabel = 'Size(km2)'
-        self.__speedLabel = 'Speed(MetersPerSecond)'
-        self.__startTimeLabel = 'StartTime'
-        self.__maxREFLabel = 'maxREF(dBZ)'
-        self.__maxVILLabel = 'maxVIL(kg/m^2)'
-        self.__avgVILLabel = 'avgVIL(kg/m^2)'
-        self.__u10kmWindLabel = 'u10kmWind(m/s)'
-        self.__v10kmWindLabel = 'v10kmWind(m/s)'
-        self.__u6kmMeanWindLabel = 'u6kmMeanWind(m/s)'
-        self.__v6kmMeanWindLabel = 'v6kmMeanWind(m/s)'
-        self.__10kmRelativeWindDirectionLabel = '10kmRelativeWindDirection(deg)'
-        self.__u10kmRelativeWindLabel = 'u10kmRelativeWind(m/s)'
-        self.__v10kmRelativeWindLabel = 'v10kmRelativeWind(m/s)'
-        self.__uShearLabel = 'uShear(m/s)'
-        self.__vShearLabel = 'vShear(m/s)'
-        self.__potentialClustersLabel = 'potentialClusters(unitless)'
         
         
         #Next, we'll get the actual values
         self.__DT = cfg.utc.localize(datetime.strptime(fileName[-19:-4], '%Y%m%d-%H%M%S'))
-        self.__age = float(clusterList[clusterHeaderList.index(self.__ageLabel)])
-        self.__latRadius = float(clusterList[clusterHeaderList.index(self.__latRadiusLabel)])
-        self.__latitude = float(clusterList[clusterHeaderList.index(self.__latitudeLabel)])
-        self.__lonRadius = float(clusterList[clusterHeaderList.index(self.__lonRadiusLabel)])
-        self.__longitude = float(clusterList[clusterHeaderList.index(self.__longitudeLabel)])
-        self.__eastMotion = float(clusterList[clusterHeaderList.index(self.__eastMotionLabel)])
-        self.__southMotion = float(clusterList[clusterHeaderList.index(self.__southMotionLabel)])
-        self.__oldTrack = clusterList[clusterHeaderList.index(self.__oldTrackLabel)]
-        self.__orientnation = float(clusterList[clusterHeaderList.index(self.__orientationLabel)])
-        self.__ID = clusterList[clusterHeaderList.index(self.__IDLabel)]
-        self.__size = float(clusterList[clusterHeaderList.index(self.__sizeLabel)])
-        self.__speed = float(clusterList[clusterHeaderList.index(self.__speedLabel)])
-        self.__startTime = clusterList[clusterHeaderList.index(self.__startTimeLabel)]
-        self.__orientation = clusterList[clusterHeaderList.index(self.__orientationLabel)]
-        self.__u10kmWind = float(clusterList[clusterHeaderList.index(self.__u10kmWindLabel)])
-        self.__v10kmWind = float(clusterList[clusterHeaderList.index(self.__v10kmWindLabel)])
-        self.__u6kmMeanWind = float(clusterList[clusterHeaderList.index(self.__u6kmMeanWindLabel)])
-        self.__v6kmMeanWind = float(clusterList[clusterHeaderList.index(self.__v6kmMeanWindLabel)])
-        self.__uShear = float(clusterList[clusterHeaderList.index(self.__uShearLabel)])
-        self.__vShear = float(clusterList[clusterHeaderList.index(self.__vShearLabel)])
+        self.__age = table.getFloats(self.__ageLabel)[row]
+        self.__latRadius = table.getFloats(self.__latRadiusLabel)[row]
+        self.__latitude = table.getFloats(self.__latitudeLabel)[row]
+        self.__lonRadius = table.getFloats(self.__lonRadiusLabel)[row]
+        self.__longitude = table.getFloats(self.__longitudeLabel)[row]
+        self.__eastMotion = table.getFloats(self.__eastMotionLabel)[row]
+        self.__southMotion = table.getFloats(self.__southMotionLabel)[row]
+        self.__oldTrack = table.getStrings(self.__oldTrackLabel)[row]
+        self.__orientnation = table.getFloats(self.__orientationLabel)[row]
+        self.__ID = table.getStrings(self.__IDLabel)[row]
+        self.__size = table.getFloats(self.__sizeLabel)[row]
+        self.__speed = table.getFloats(self.__speedLabel)[row]
+        self.__startTime = table.getStrings(self.__startTimeLabel)[row]
+        self.__orientation = table.getStrings(self.__orientationLabel)[row]
+        self.__u10kmWind = table.getFloats(self.__u10kmWindLabel)[row]
+        self.__v10kmWind = table.getFloats(self.__v10kmWindLabel)[row]
+        self.__u6kmMeanWind = table.getFloats(self.__u6kmMeanWindLabel)[row]
+        self.__v6kmMeanWind = table.getFloats(self.__v6kmMeanWindLabel)[row]
+        self.__uShear = table.getFloats(self.__uShearLabel)[row]
+        self.__vShear = table.getFloats(self.__vShearLabel)[row]
         
         self.__potentialClusters = None
         
@@ -321,13 +421,14 @@ class TrackCluster():
         if self.__shearDirection < 0:
             self.__shearDirection += 360
         
-        self.__groundRanges = [distance.calculateDistance(float(case.sites[a].lat), float(case.sites[a].lon), float(self.__latitude), float(self.__longitude))*1000 for a in range(len(case.sites))] #Convert to meters
-        self.__slantRanges = [distance.calculateSlantRange(float(case.sites[a].hgt), distance.R, self.__groundRanges[a]) for a in range(len(case.sites))]
+        groundRanges, slantRanges, bearings, beamHeights = table.getRadarGeometry(case, self.__latitudeLabel, self.__longitudeLabel)
+        self.__groundRanges = groundRanges[row] #meters
+        self.__slantRanges = slantRanges[row]
         
       
-        self.__maxVIL = clusterList[clusterHeaderList.index(self.__maxVILLabel)]
-        self.__avgVIL = clusterList[clusterHeaderList.index(self.__avgVILLabel)]
-        self.__maxREF = clusterList[clusterHeaderList.index(self.__maxREFLabel)]
+        self.__maxVIL = table.getStrings(self.__maxVILLabel)[row]
+        self.__avgVIL = table.getStrings(self.__avgVILLabel)[row]
+        self.__maxREF = table.getStrings(self.__maxREFLabel)[row]
         
         
 
@@ -447,7 +548,53 @@ class TrackCluster():
         
 class ShearCluster():
 
-    def __init__(self, cfg, case, DT, clusterList, clusterHeaderList, tilt, fileName, hailTruthList=None, hailTruthHeaderList=None):
+    #Column names in the w2segmotionll and hailtruth tables. Shared by every cluster instead of stored on each one.
+    __ageLabel = 'Age(s)'
+    __cellNameLabel = 'CellName'
+    __distToCellLabel = 'DistToCell(kilometers)'
+    __epochLabel = 'Epoch(seconds)'
+    __latRadiusLabel = 'LatRadius(km)'
+    __latitudeLabel = 'Latitude(Degrees)'
+    __lonRadiusLabel = 'LonRadius(km)'
+    __longitudeLabel = 'Longitude(Degrees)'
+    __eastMotionLabel = 'MotionEast(MetersPerSecond)'
+    __southMotionLabel = 'MotionSouth(MetersPerSecond)'
+    __numReportsLabel = 'NumReports'
+    __oldTrackLabel = 'OldTrack'
+    __orientationLabel = 'Orientation(degrees)'
+    __IDLabel = 'RowName'
+    __sizeLabel = 'Size(km2)'
+    __speedLabel = 'Speed(MetersPerSecond)'
+    __startTimeLabel = 'StartTime'
+    __timeToCellLabel = 'TimeToCell(seconds)'
+    __TDSCountLabel = 'TDScount'
+    __TDSminLabel = 'TDSmin'
+    __maxReflectivityLabel = 'maxRefTDS(dBZ)'
+    __maxShearLabel = 'maxShear(s^-1)'
+    __minRhoHVLabel = 'minRhoHV'
+    __minShearLabel = 'minShear(s^-1)'
+    __minZdrLabel = 'minZdrTDS(dB)'
+    __bottom10ShearLabel = '10thShear(s^-1)'
+    __top90ShearLabel = '90thShear(s^-1)'
+    __uShearLabel = 'uShear(m/s)'
+    __vShearLabel = 'vShear(m/s)'
+    __areaVrotLabel = 'AreaVrot(kts)'
+    __motionDirectionLabel = 'motionDirection(deg)'
+    __vLonLabel = 'lonMotion(deg/s)'
+    __vLatLabel = 'latMotion(deg/s)'
+    __absShearLabel = 'absShear(s^-1)'
+    __maxSpectrumWidthLabel = 'maxSpectrumWidth(m/s)'
+    __u6kmMeanWindLabel = 'u6kmMeanWind(m/s)'
+    __v6kmMeanWindLabel = 'v6kmMeanWind(m/s)'
+    __clusterULabel = 'clusterU(m/s)'
+    __clusterVLabel = 'clusterV(m/s)'
+    __forwardProjectedLatLabel = 'forwardLat(deg)'
+    __forwardProjectedLonLabel = 'forwardLon(deg)'
+    __backProjectedLatLabel = 'backLat(deg)'
+    __backProjectedLonLabel = 'backLon(deg)'
+    __potentialClustersLabel = 'potentialClusters(unitless)'
+
+    def __init__(self, cfg, case, DT, table, row, tilt, fileName, truthTable=None, truthRow=None):
 
         #Here, we will go through the expected data we get from the cluster file and assign them to attributes
         #The format is index of the desired data from the clusterHeader and get that data from the clusterLine
@@ -461,83 +608,37 @@ class ShearCluster():
         self.__beamHeights = []
         self.__type = 'shear'
         
-        #We'll start by defining the labels for each variable
-        
-        self.__ageLabel = 'Age(s)'
-        self.__cellNameLabel = 'CellName'
-        self.__distToCellLabel = 'DistToCell(kilometers)'
-        self.__epochLabel = 'Epoch(seconds)'
-        self.__latRadiusLabel = 'LatRadius(km)'
-        self.__latitudeLabel = 'Latitude(Degrees)'
-        self.__lonRadiusLabel = 'LonRadius(km)'
-        self.__longitudeLabel = 'Longitude(Degrees)'
-        self.__eastMotionLabel = 'MotionEast(MetersPerSecond)'
-        self.__southMotionLabel = 'MotionSouth(MetersPerSecond)'
-        self.__numReportsLabel = 'NumReports'
-        self.__oldTrackLabel = 'OldTrack'
-        self.__orientationLabel = 'Orientation(degrees)'
-        self.__IDLabel = 'RowName'
-        self.__sizeLabel = 'Size(km2)'
-        self.__speedLabel = 'Speed(MetersPerSecond)'
-        self.__startTimeLabel = 'StartTime'
-        self.__timeToCellLabel = 'TimeToCell(seconds)'
-        self.__TDSCountLabel = 'TDScount'
-        self.__TDSminLabel = 'TDSmin'
-        self.__maxReflectivityLabel = 'maxRefTDS(dBZ)'
-        self.__maxShearLabel = 'maxShear(s^-1)'
-        self.__minRhoHVLabel = 'minRhoHV'
-        self.__minShearLabel = 'minShear(s^-1)'
-        self.__minZdrLabel = 'minZdrTDS(dB)'
-        self.__bottom10ShearLabel = '10thShear(s^-1)'
-        self.__top90ShearLabel = '90thShear(s^-1)'
-        self.__uShearLabel = 'uShear(m/s)'
-        self.__vShearLabel = 'vShear(m/s)'
-        self.__areaVrotLabel = 'AreaVrot(kts)'
-        self.__motionDirectionLabel = 'motionDirection(deg)'
-        self.__vLonLabel = 'lonMotion(deg/s)'
-        self.__vLatLabel = 'latMotion(deg/s)'
-        self.__absShearLabel = 'absShear(s^-1)'
-        self.__maxSpectrumWidthLabel = 'maxSpectrumWidth(m/s)'
-        self.__u6kmMeanWindLabel = 'u6kmMeanWind(m/s)'
-        self.__v6kmMeanWindLabel = 'v6kmMeanWind(m/s)'
-        self.__clusterULabel = 'clusterU(m/s)'
-        self.__clusterVLabel = 'clusterV(m/s)'
-        self.__forwardProjectedLatLabel = 'forwardLat(deg)'
-        self.__forwardProjectedLonLabel = 'forwardLon(deg)'
-        self.__backProjectedLatLabel = 'backLat(deg)'
-        self.__backProjectedLonLabel  = 'backLon(deg)'
-        self.__potentialClustersLabel = 'potentialClusters(unitless)'
         
         #Next, we'll get the actual values
         self.__DT = cfg.utc.localize(datetime.strptime(DT, '%Y%m%d-%H%M%S'))
-        self.__age = float(clusterList[clusterHeaderList.index(self.__ageLabel)])
-        self.__latRadius = float(clusterList[clusterHeaderList.index(self.__latRadiusLabel)])
-        self.__latitude = float(clusterList[clusterHeaderList.index(self.__latitudeLabel)])
-        self.__lonRadius = float(clusterList[clusterHeaderList.index(self.__lonRadiusLabel)])
-        self.__longitude = float(clusterList[clusterHeaderList.index(self.__longitudeLabel)])
-        self.__eastMotion = float(clusterList[clusterHeaderList.index(self.__eastMotionLabel)])
-        self.__southMotion = float(clusterList[clusterHeaderList.index(self.__southMotionLabel)])
-        self.__oldTrack = clusterList[clusterHeaderList.index(self.__oldTrackLabel)]
-        self.__orientnation = float(clusterList[clusterHeaderList.index(self.__orientationLabel)])
-        self.__ID = clusterList[clusterHeaderList.index(self.__IDLabel)]
-        self.__size = float(clusterList[clusterHeaderList.index(self.__sizeLabel)])
-        self.__speed = float(clusterList[clusterHeaderList.index(self.__speedLabel)])
-        self.__startTime = clusterList[clusterHeaderList.index(self.__startTimeLabel)]
-        self.__TDSCount = float(clusterList[clusterHeaderList.index(self.__TDSCountLabel)])
-        self.__TDSmin = float(clusterList[clusterHeaderList.index(self.__TDSminLabel)])
-        self.__maxReflectivity = float(clusterList[clusterHeaderList.index(self.__maxReflectivityLabel)])
-        self.__maxShear = float(clusterList[clusterHeaderList.index(self.__maxShearLabel)])
-        self.__minRhoHV = float(clusterList[clusterHeaderList.index(self.__minRhoHVLabel)])
-        self.__minShear = float(clusterList[clusterHeaderList.index(self.__minShearLabel)])
-        self.__minZdr = float(clusterList[clusterHeaderList.index(self.__minZdrLabel)])
-        self.__bottom10Shear = float(clusterList[clusterHeaderList.index(self.__bottom10ShearLabel)])
-        self.__top90Shear = float(clusterList[clusterHeaderList.index(self.__top90ShearLabel)])
-        self.__uShear = float(clusterList[clusterHeaderList.index(self.__uShearLabel)])
-        self.__vShear = float(clusterList[clusterHeaderList.index(self.__vShearLabel)])
-        self.__maxSpectrumWidth = float(clusterList[clusterHeaderList.index(self.__maxSpectrumWidthLabel)])
-        self.__orientation = float(clusterList[clusterHeaderList.index(self.__orientationLabel)])
-        self.__u6kmMeanWind = float(clusterList[clusterHeaderList.index(self.__u6kmMeanWindLabel)])
-        self.__v6kmMeanWind = float(clusterList[clusterHeaderList.index(self.__v6kmMeanWindLabel)])
+        self.__age = table.getFloats(self.__ageLabel)[row]
+        self.__latRadius = table.getFloats(self.__latRadiusLabel)[row]
+        self.__latitude = table.getFloats(self.__latitudeLabel)[row]
+        self.__lonRadius = table.getFloats(self.__lonRadiusLabel)[row]
+        self.__longitude = table.getFloats(self.__longitudeLabel)[row]
+        self.__eastMotion = table.getFloats(self.__eastMotionLabel)[row]
+        self.__southMotion = table.getFloats(self.__southMotionLabel)[row]
+        self.__oldTrack = table.getStrings(self.__oldTrackLabel)[row]
+        self.__orientnation = table.getFloats(self.__orientationLabel)[row]
+        self.__ID = table.getStrings(self.__IDLabel)[row]
+        self.__size = table.getFloats(self.__sizeLabel)[row]
+        self.__speed = table.getFloats(self.__speedLabel)[row]
+        self.__startTime = table.getStrings(self.__startTimeLabel)[row]
+        self.__TDSCount = table.getFloats(self.__TDSCountLabel)[row]
+        self.__TDSmin = table.getFloats(self.__TDSminLabel)[row]
+        self.__maxReflectivity = table.getFloats(self.__maxReflectivityLabel)[row]
+        self.__maxShear = table.getFloats(self.__maxShearLabel)[row]
+        self.__minRhoHV = table.getFloats(self.__minRhoHVLabel)[row]
+        self.__minShear = table.getFloats(self.__minShearLabel)[row]
+        self.__minZdr = table.getFloats(self.__minZdrLabel)[row]
+        self.__bottom10Shear = table.getFloats(self.__bottom10ShearLabel)[row]
+        self.__top90Shear = table.getFloats(self.__top90ShearLabel)[row]
+        self.__uShear = table.getFloats(self.__uShearLabel)[row]
+        self.__vShear = table.getFloats(self.__vShearLabel)[row]
+        self.__maxSpectrumWidth = table.getFloats(self.__maxSpectrumWidthLabel)[row]
+        self.__orientation = table.getFloats(self.__orientationLabel)[row]
+        self.__u6kmMeanWind = table.getFloats(self.__u6kmMeanWindLabel)[row]
+        self.__v6kmMeanWind = table.getFloats(self.__v6kmMeanWindLabel)[row]
         
         self.__potentialClusters = None
         self.__forwardProjectedLat = -99900
@@ -559,28 +660,21 @@ class ShearCluster():
         if self.__shearDirection < 0:
             self.__shearDirection += 360
         
-        self.__groundRanges = [distance.calculateDistance(float(case.sites[a].lat), float(case.sites[a].lon), float(self.__latitude), float(self.__longitude))*1000 for a in range(len(case.sites))] #Convert to meters
-        self.__slantRanges = [distance.calculateSlantRange(float(case.sites[a].hgt), distance.R, self.__groundRanges[a]) for a in range(len(case.sites))]
-        
-        for a in range(len(case.sites)):
-            self.__beamHeights.append(distance.calculateBeamHeightIter(self.__groundRanges[a], float(tilt), distance.R*(4/3))*3.28) #Convert to feet
-        
-        self.__radarBearings = []
-        for a in range(len(case.sites)):
-            bearing = distance.calculateBearingAT(float(case.sites[a].lat), float(case.sites[a].lon), float(self.__latitude), float(self.__longitude))
-            if bearing < 0:
-                bearing += 360
-            self.__radarBearings.append(bearing)
+        groundRanges, slantRanges, bearings, beamHeights = table.getRadarGeometry(case, self.__latitudeLabel, self.__longitudeLabel, tilt=float(tilt))
+        self.__groundRanges = groundRanges[row] #meters
+        self.__slantRanges = slantRanges[row]
+        self.__beamHeights.extend(beamHeights[row]) #feet
+        self.__radarBearings = bearings[row]
             
         #Next, we'll assign everything that is in the hailtruth tables
-        if hailTruthList:
-            self.__cellName = hailTruthList[hailTruthHeaderList.index(self.__cellNameLabel)]
-            self.__distToCell = hailTruthList[hailTruthHeaderList.index(self.__distToCellLabel)]
+        if truthTable is not None:
+            self.__cellName = truthTable.getStrings(self.__cellNameLabel)[truthRow]
+            self.__distToCell = truthTable.getStrings(self.__distToCellLabel)[truthRow]
             if len(self.__distToCell.split(' ')) > 1: #Fix for weird instance where 2 distances are appended to the same attribute by hailtruth
                 self.__distToCell = self.__distToCell.split(' ')[0]
-            self.__epoch = hailTruthList[hailTruthHeaderList.index(self.__epochLabel)]
-            self.__numReports = hailTruthList[hailTruthHeaderList.index(self.__numReportsLabel)]
-            self.__timeToCell = hailTruthList[hailTruthHeaderList.index(self.__timeToCellLabel)]
+            self.__epoch = truthTable.getStrings(self.__epochLabel)[truthRow]
+            self.__numReports = truthTable.getStrings(self.__numReportsLabel)[truthRow]
+            self.__timeToCell = truthTable.getStrings(self.__timeToCellLabel)[truthRow]
             
             if self.__cellName != self.__ID:
                 cfg.error("Warning! CellName and ID mismatch "+str(self.__cellName)+' '+str(self.__ID))
@@ -778,7 +872,7 @@ class ShearCluster():
             
 
         #Step 1, calculate the total distance change expected for each component.
-        self.__cfg.log("Projecting cluster "+str(self.__ID)+" using timestep "+str(timeStep)+" seconds.")
+        self.__cfg.debug("Projecting cluster "+str(self.__ID)+" using timestep "+str(timeStep)+" seconds.")
         du1 = self.__clusterU * timeStep
         dv1 = self.__clusterV * timeStep
         du2 = self.__clusterU * -timeStep
@@ -806,7 +900,7 @@ class ShearCluster():
         #Project backwards
         self.__backProjectedLat, self.__backProjectedLon = distance.calculateDestination(self.__latitude, self.__longitude, bearing2, d2)
             
-        self.__cfg.log("New Projections forward lat: "+str(self.__forwardProjectedLat)+" lon: "+str(self.__forwardProjectedLon)+\
+        self.__cfg.debug("New Projections forward lat: "+str(self.__forwardProjectedLat)+" lon: "+str(self.__forwardProjectedLon)+\
                     "\nbackward lat: "+str(self.__backProjectedLat)+" backward lon: "+str(self.__backProjectedLon)+\
                     "\nfrom modified d1 bearing1 modified d2 bearing2: "+str(d1)+" "+str(bearing1)+" "+str(d2)+" "+str(bearing2)+\
                     "\nfrom du1 dv1 du2 dv2: "+str(du1)+" "+str(dv1)+" "+str(du2)+" "+str(dv2))
@@ -814,7 +908,7 @@ class ShearCluster():
         
     def getClusterProjection(self, timeStep):
         """ This method is similar to project cluster, except it returns a projection of this cluster using the provided time step """
-        self.__cfg.log("Getting cluster projection of "+str(self.__ID)+" using timestep "+str(timeStep)+" seconds.")
+        self.__cfg.debug("Getting cluster projection of "+str(self.__ID)+" using timestep "+str(timeStep)+" seconds.")
         
         du = self.__clusterU * timeStep
         dv = self.__clusterV * timeStep
@@ -827,7 +921,7 @@ class ShearCluster():
             
         projLat, projLon = distance.calculateDestination(self.__latitude, self.__longitude, bearing, d)
         
-        self.__cfg.log("New Projections  lat: "+str(projLat)+" forward lon: "+str(projLon)+\
+        self.__cfg.debug("New Projections  lat: "+str(projLat)+" forward lon: "+str(projLon)+\
                     "\nfrom modified d bearing : "+str(d)+" "+str(bearing)+\
                     "\nfrom du dv: "+str(du)+" "+str(dv))
                     
@@ -857,7 +951,27 @@ class ShearCluster():
         
 class EchoTopCluster():
 
-    def __init__(self, cfg, case, clusterList, clusterHeaderList, fileName):
+    #Column names in the w2segmotionll and hailtruth tables. Shared by every cluster instead of stored on each one.
+    __ageLabel = 'Age(s)'
+    __latRadiusLabel = 'LatRadius(km)'
+    __latitudeLabel = 'Latitude(Degrees)'
+    __lonRadiusLabel = 'LonRadius(km)'
+    __longitudeLabel = 'Longitude(Degrees)'
+    __eastMotionLabel = 'MotionEast(MetersPerSecond)'
+    __southMotionLabel = 'MotionSouth(MetersPerSecond)'
+    __numReportsLabel = 'NumReports'
+    __oldTrackLabel = 'OldTrack'
+    __orientationLabel = 'Orientation(degrees)'
+    __IDLabel = 'RowName'
+    __sizeLabel = 'Size(km2)'
+    __speedLabel = 'Speed(MetersPerSecond)'
+    __startTimeLabel = 'StartTime'
+    __timeToCellLabel = 'TimeToCell(seconds)'
+    __maxETLabel = 'maxET(km)'
+    __top90ETLabel = '90thET(km)'
+    __potentialClustersLabel = 'potentialClusters(unitless)'
+
+    def __init__(self, cfg, case, table, row, fileName):
 
         #Here, we will go through the expected data we get from the cluster file and assign them to attributes
         #The format is index of the desired data from the clusterHeader and get that data from the clusterLine
@@ -870,53 +984,34 @@ class EchoTopCluster():
         self.__type = 'echotop'
        
         
-        #We'll start by defining the labels for each variable
-        
-        self.__ageLabel = 'Age(s)'
-        self.__latRadiusLabel = 'LatRadius(km)'
-        self.__latitudeLabel = 'Latitude(Degrees)'
-        self.__lonRadiusLabel = 'LonRadius(km)'
-        self.__longitudeLabel = 'Longitude(Degrees)'
-        self.__eastMotionLabel = 'MotionEast(MetersPerSecond)'
-        self.__southMotionLabel = 'MotionSouth(MetersPerSecond)'
-        self.__numReportsLabel = 'NumReports'
-        self.__oldTrackLabel = 'OldTrack'
-        self.__orientationLabel = 'Orientation(degrees)'
-        self.__IDLabel = 'RowName'
-        self.__sizeLabel = 'Size(km2)'
-        self.__speedLabel = 'Speed(MetersPerSecond)'
-        self.__startTimeLabel = 'StartTime'
-        self.__timeToCellLabel = 'TimeToCell(seconds)'
-        self.__maxETLabel = 'maxET(km)'
-        self.__top90ETLabel = '90thET(km)'
-        self.__potentialClustersLabel = 'potentialClusters(unitless)'
 
         
         
         #Next, we'll get the actual values
         self.__DT = cfg.utc.localize(datetime.strptime(fileName[-19:-4], '%Y%m%d-%H%M%S'))
-        self.__age = float(clusterList[clusterHeaderList.index(self.__ageLabel)])
-        self.__latRadius = float(clusterList[clusterHeaderList.index(self.__latRadiusLabel)])
-        self.__latitude = float(clusterList[clusterHeaderList.index(self.__latitudeLabel)])
-        self.__lonRadius = float(clusterList[clusterHeaderList.index(self.__lonRadiusLabel)])
-        self.__longitude = float(clusterList[clusterHeaderList.index(self.__longitudeLabel)])
-        self.__eastMotion = float(clusterList[clusterHeaderList.index(self.__eastMotionLabel)])
-        self.__southMotion = float(clusterList[clusterHeaderList.index(self.__southMotionLabel)])
-        self.__oldTrack = clusterList[clusterHeaderList.index(self.__oldTrackLabel)]
-        self.__orientation = float(clusterList[clusterHeaderList.index(self.__orientationLabel)])
-        self.__ID = clusterList[clusterHeaderList.index(self.__IDLabel)]
-        self.__size = float(clusterList[clusterHeaderList.index(self.__sizeLabel)])
-        self.__speed = float(clusterList[clusterHeaderList.index(self.__speedLabel)])
-        self.__startTime = clusterList[clusterHeaderList.index(self.__startTimeLabel)]
-        self.__orientatation = clusterList[clusterHeaderList.index(self.__orientationLabel)]
-        
-        self.__groundRanges = [distance.calculateDistance(float(case.sites[a].lat), float(case.sites[a].lon), float(self.__latitude), float(self.__longitude))*1000 for a in range(len(case.sites))] #Convert to meters
-        self.__slantRanges = [distance.calculateSlantRange(float(case.sites[a].hgt), distance.R, self.__groundRanges[a]) for a in range(len(case.sites))]
+        self.__age = table.getFloats(self.__ageLabel)[row]
+        self.__latRadius = table.getFloats(self.__latRadiusLabel)[row]
+        self.__latitude = table.getFloats(self.__latitudeLabel)[row]
+        self.__lonRadius = table.getFloats(self.__lonRadiusLabel)[row]
+        self.__longitude = table.getFloats(self.__longitudeLabel)[row]
+        self.__eastMotion = table.getFloats(self.__eastMotionLabel)[row]
+        self.__southMotion = table.getFloats(self.__southMotionLabel)[row]
+        self.__oldTrack = table.getStrings(self.__oldTrackLabel)[row]
+        self.__orientation = table.getFloats(self.__orientationLabel)[row]
+        self.__ID = table.getStrings(self.__IDLabel)[row]
+        self.__size = table.getFloats(self.__sizeLabel)[row]
+        self.__speed = table.getFloats(self.__speedLabel)[row]
+        self.__startTime = table.getStrings(self.__startTimeLabel)[row]
+        self.__orientatation = table.getStrings(self.__orientationLabel)[row]
+        
+        groundRanges, slantRanges, bearings, beamHeights = table.getRadarGeometry(case, self.__latitudeLabel, self.__longitudeLabel)
+        self.__groundRanges = groundRanges[row] #meters
+        self.__slantRanges = slantRanges[row]
         
         self.__potentialClusters = None
         
         #For the variables at multiple altitudes or tilts, we want to create lists of their values and column names        
-        self.__maxET = clusterList[clusterHeaderList.index(self.__maxETLabel)]
+        self.__maxET = table.getStrings(self.__maxETLabel)[row]
         
         #If the maxET is missing, set the converted ET to missing
         if self.__maxET == -99900:
@@ -924,7 +1019,7 @@ class EchoTopCluster():
         else:
             self.__maxETFeet = float(self.__maxET) * 3280.84 #Convert km to Feet
         
-        self.__top90ET = float(clusterList[clusterHeaderList.index(self.__top90ETLabel)])
+        self.__top90ET = table.getFloats(self.__top90ETLabel)[row]
         
         
         #Same thing with the top 90 ET
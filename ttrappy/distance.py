@@ -1,117 +1,212 @@
 #This module contains the distance claculation function
+#The calculate*Array functions take NumPy arrays (or anything that broadcasts) so that N clusters x M radars can be done in
+#one call. The scalar functions are kept for the existing callers and use the same formulas with the math module.
 
 import math
+import numpy as np
 
 R = 6371 #Radius of the Earth in km
 
+
+class MathOps():
+    """ The handful of functions the formulas need, taken from math for scalars or numpy for arrays """
+
+    def __init__(self, module):
+        self.radians = module.radians
+        self.degrees = module.degrees
+        self.sin = module.sin
+        self.cos = module.cos
+        self.sqrt = module.sqrt
+        if module is np:
+            self.atan2 = np.arctan2
+            self.asin = np.arcsin
+        else:
+            self.atan2 = math.atan2
+            self.asin = math.asin
+
+        return
+
+scalarOps = MathOps(math)
+arrayOps = MathOps(np)
+
+
 #Calculates the Distance Between 2 points along a great circle
 #Based on information from https://www.movable-type.co.uk/scripts/latlong.html
 
-def calculateDistance(lat1, lon1, lat2, lon2):
-        lat1r = math.radians(lat1)
-        lon1r = math.radians(lon1)
-        lat2r = math.radians(lat2)
-        lon2r = math.radians(lon2)
+def distanceFormula(m, lat1, lon1, lat2, lon2):
+        lat1r = m.radians(lat1)
+        lon1r = m.radians(lon1)
+        lat2r = m.radians(lat2)
+        lon2r = m.radians(lon2)
 
-        a = (math.sin((lat2r-lat1r)/2)**2)+(math.cos(lat1r)*math.cos(lat2r)*(math.sin((lon2r-lon1r)/2)**2))
-        c = 2 * (math.atan2(math.sqrt(a), math.sqrt(1-a)))
+        a = (m.sin((lat2r-lat1r)/2)**2)+(m.cos(lat1r)*m.cos(lat2r)*(m.sin((lon2r-lon1r)/2)**2))
+        c = 2 * (m.atan2(m.sqrt(a), m.sqrt(1-a)))
         d = R * c
 
         return d
 
+def calculateDistance(lat1, lon1, lat2, lon2):
+    return distanceFormula(scalarOps, lat1, lon1, lat2, lon2)
+
+def calculateDistanceArray(lat1, lon1, lat2, lon2):
+    """ Great circle distance (km) between broadcastable arrays of points """
+    return distanceFormula(arrayOps, np.asarray(lat1, dtype=float), np.asarray(lon1, dtype=float), np.asarray(lat2, dtype=float), np.asarray(lon2, dtype=float))
+
 #Calculate bearing from one location to another. Based on iformation from the same place as above. Returns the atan2 value in degrees for better beaing differences
-def calculateBearingAT(lat1, lon1, lat2, lon2):
-	lat1r = math.radians(lat1)
-	lon1r = math.radians(lon1)
-	lat2r = math.radians(lat2)
-	lon2r = math.radians(lon2)
+def bearingFormula(m, lat1, lon1, lat2, lon2):
+	lat1r = m.radians(lat1)
+	lon1r = m.radians(lon1)
+	lat2r = m.radians(lat2)
+	lon2r = m.radians(lon2)
 
 	dLon = lon2r-lon1r
 
-	theta = math.atan2(math.sin(dLon)*math.cos(lat2r), (math.cos(lat1r)*math.sin(lat2r))-(math.sin(lat1r)*math.cos(lat2r)*math.cos(dLon)))
-	
-	return math.degrees(theta)
+	theta = m.atan2(m.sin(dLon)*m.cos(lat2r), (m.cos(lat1r)*m.sin(lat2r))-(m.sin(lat1r)*m.cos(lat2r)*m.cos(dLon)))
+
+	return m.degrees(theta)
+
+def calculateBearingAT(lat1, lon1, lat2, lon2):
+    return bearingFormula(scalarOps, lat1, lon1, lat2, lon2)
+
+def calculateBearingATArray(lat1, lon1, lat2, lon2):
+    """ Bearing (-180 to 180 deg) from the first points to the second for broadcastable arrays """
+    return bearingFormula(arrayOps, np.asarray(lat1, dtype=float), np.asarray(lon1, dtype=float), np.asarray(lat2, dtype=float), np.asarray(lon2, dtype=float))
+
+def beamHeightFormula(m, sRange, elevation, earthRadius, antHeight):
+    earthRadius = (earthRadius*1000)
+
+    return m.sqrt((sRange**2)+((earthRadius + antHeight)**2)+(2*sRange*(earthRadius)*m.sin(elevation*(math.pi/180)))) - earthRadius
 
 def calculateBeamHeight(sRange, elevation, earthRadius, antHeight=0):
     """ Calculates the beam height above the radar at a given slant range (m), elevation (deg), and earthRadius (km).
         Follows equation (3.12) in Reinhart (2010) except H0 is neglected by default to give height above radar level instead of above sea level.
         Does not apply 4/3 refraction correction to earthRadius by default. Specify when calling calculateBeamHeight()
     """
-    
-    earthRadius = (earthRadius*1000)
-    
-    
-    return math.sqrt((sRange**2)+((earthRadius + antHeight)**2)+(2*sRange*(earthRadius)*math.sin(elevation*(math.pi/180)))) - earthRadius
-    
-    
-def calculateSlantRange(antHeight, earthRadius, groundRange):
-        """ Calculates the slant range from the ground range. earthRadius is assumed to be (km). antHeight and groundRange assumed to be (m) """
+    return beamHeightFormula(scalarOps, sRange, elevation, earthRadius, antHeight)
+
+def calculateBeamHeightArray(sRange, elevation, earthRadius, antHeight=0):
+    """ calculateBeamHeight for arrays of slant ranges (m) and/or elevations (deg) """
+    return beamHeightFormula(arrayOps, np.asarray(sRange, dtype=float), np.asarray(elevation, dtype=float), earthRadius, np.asarray(antHeight, dtype=float))
+
+def slantRangeFormula(m, antHeight, earthRadius, groundRange):
         #Convert radius to m and calculate antenna height from the center of the earth
         earthRadius = earthRadius * 1000
         antHeightEarth = (earthRadius) + antHeight
-        return math.sqrt(((antHeightEarth**2) + (earthRadius**2))- (2*antHeightEarth*earthRadius*math.cos(groundRange/earthRadius)))
-        
+        return m.sqrt(((antHeightEarth**2) + (earthRadius**2))- (2*antHeightEarth*earthRadius*m.cos(groundRange/earthRadius)))
+
+def calculateSlantRange(antHeight, earthRadius, groundRange):
+        """ Calculates the slant range from the ground range. earthRadius is assumed to be (km). antHeight and groundRange assumed to be (m) """
+        return slantRangeFormula(scalarOps, antHeight, earthRadius, groundRange)
+
+def calculateSlantRangeArray(antHeight, earthRadius, groundRange):
+        """ calculateSlantRange for arrays of antenna heights (m) and ground ranges (m) """
+        return slantRangeFormula(arrayOps, np.asarray(antHeight, dtype=float), earthRadius, np.asarray(groundRange, dtype=float))
+
+
+def calculateBeamHeightIterArray(groundRange, elevation, radius, tolerance=0.1, maxIter=100):
 
-def calculateBeamHeightIter(groundRange, elevation, radius, tolerance=0.1, maxIter=100):
-    
     """ Attempts to calculate beam height iteratively using the equations 3 and 4 in Zhang et al. (2005; May be from Doviack and Zrnic 1993).
 
         Ground range is the range from radar projected to the earth's surface in meters, elevation is the vertical tilt of the radar from the horizon in degrees, and radius is the earth's radius in km (you probably want to provide 4/3 Rearth; This is not calculated).
-        
+        groundRange and elevation can be arrays (they are broadcast together) and an array of heights is returned.
+
         Tolerence is the error in meters for when iteration stops. maxIter is the maximum permissble iterations. After this many iterations, the value at this point is returned.
-        
-        The first guess for the iteration is what is calculated using calculateBeamHeight and calculateBeamHeight above. This method assumes that the antenna height is 0 (gives height above radar level). 
-        
+        Each element stops iterating once it meets the tolerance, so the result matches doing every point on its own.
+
+        The first guess for the iteration is what is calculated using calculateBeamHeight and calculateBeamHeight above. This method assumes that the antenna height is 0 (gives height above radar level).
+
         """
-    
+
+    groundRange, elevation = np.broadcast_arrays(np.asarray(groundRange, dtype=float), np.asarray(elevation, dtype=float))
+    shape = groundRange.shape
+    groundRange = groundRange.ravel()
+    elevation = elevation.ravel()
+
     #Get the first guess
-    h = calculateBeamHeight(calculateSlantRange(0, R, groundRange), elevation, radius)
-    previousH = h
-    print('First guess height', h*3.28084)
-    
+    h = np.array(calculateBeamHeightArray(calculateSlantRangeArray(0, R, groundRange), elevation, radius), dtype=float)
+
     radiusM = radius * 1000
-    delta = 99999999
+    elevationR = np.radians(elevation)
+    const1 = ((np.sin(groundRange/radiusM)**2)/(np.cos(elevationR))**2)
+    const2 = ((np.sin(groundRange/radiusM))/(np.cos(elevationR)))
+    sinElevation = np.sin(elevationR)
+
+    #Indices of the points that haven't met the tolerance yet
+    active = np.arange(h.size)
     n = 0
-    const1 = ((math.sin(groundRange/radiusM)**2)/(math.cos(math.radians(elevation)))**2)
-    const2 = ((math.sin(groundRange/radiusM))/(math.cos(math.radians(elevation))))
-    while n <  maxIter:
-        
-        
-        term1 = (radiusM + h)**2
-        term2 = (radiusM + h)
-        #print('const1', const1, 'const2', const2, 'term1', term1, 'term2', term2)
-        h = math.sqrt((const1*term1) + (radiusM**2) + (2*const2*term2*radiusM*math.sin(math.radians(elevation)))) - radiusM
-        delta = abs(previousH - h)
-        print(n, 'Calculated new beam height', h, 'meters delta', delta, 'meters')
-        if delta <= tolerance:
-            print('Tolerance', tolerance, 'met. Stopping!')
-            break
-        previousH = h
+    while n < maxIter and active.size:
+
+        term1 = (radiusM + h[active])**2
+        term2 = (radiusM + h[active])
+        newH = np.sqrt((const1[active]*term1) + (radiusM**2) + (2*const2[active]*term2*radiusM*sinElevation[active])) - radiusM
+        delta = np.abs(h[active] - newH)
+        h[active] = newH
+
+        active = active[delta > tolerance]
         n += 1
-        
+
+    h = h.reshape(shape)
+
     return h
-    
-    
+
+def calculateBeamHeightIter(groundRange, elevation, radius, tolerance=0.1, maxIter=100):
+    """ Scalar version of calculateBeamHeightIterArray """
+    return float(calculateBeamHeightIterArray(groundRange, elevation, radius, tolerance, maxIter))
+
+
+def destinationFormula(m, lat, lon, bearing, dist):
+
+    angDist = dist/R
+
+    bearingRad = m.radians(bearing)
+
+    latRad = m.radians(lat)
+    lonRad = m.radians(lon)
+
+    lat2Rad = m.asin((m.sin(latRad)*m.cos(angDist)) + (m.cos(latRad)*m.sin(angDist)*m.cos(bearingRad)))
+    lon2Rad = lonRad + m.atan2(m.sin(bearingRad)*m.sin(angDist)*m.cos(latRad), m.cos(angDist) - (m.sin(latRad)*m.sin(lat2Rad)))
+
+    lat2Deg = m.degrees(lat2Rad)
+    lon2Deg = m.degrees(lon2Rad)
+
+    return lat2Deg, lon2Deg
+
 def calculateDestination(lat, lon, bearing, dist):
 
     """ Calculates a "destination point" from the origin given the origin's latitude and longitude (in decimal degrees) and
         the bearing (in degrees) and distance (in km) from the origin to the distnation.
-        
-        Formula is "Destination point given distance and bearing from start point" from https://www.movable-type.co.uk/scripts/latlong.html 
+
+        Formula is "Destination point given distance and bearing from start point" from https://www.movable-type.co.uk/scripts/latlong.html
     """
-    
-    #Cal
-    angDist = dist/R
-    
-    bearingRad = math.radians(bearing)
-    
-    latRad = math.radians(lat)
-    lonRad = math.radians(lon)
-    
-    lat2Rad = math.asin((math.sin(latRad)*math.cos(angDist)) + (math.cos(latRad)*math.sin(angDist)*math.cos(bearingRad)))
-    lon2Rad = lonRad + math.atan2(math.sin(bearingRad)*math.sin(angDist)*math.cos(latRad), math.cos(angDist) - (math.sin(latRad)*math.sin(lat2Rad)))
-    
-    lat2Deg = math.degrees(lat2Rad)
-    lon2Deg = math.degrees(lon2Rad)
-    
-    return lat2Deg, lon2Deg
\ No newline at end of file
+    return destinationFormula(scalarOps, lat, lon, bearing, dist)
+
+def calculateDestinationArray(lat, lon, bearing, dist):
+    """ calculateDestination for arrays of origins, bearings (deg), and distances (km). Returns arrays of lats and lons. """
+    return destinationFormula(arrayOps, np.asarray(lat, dtype=float), np.asarray(lon, dtype=float), np.asarray(bearing, dtype=float), np.asarray(dist, dtype=float))
+
+
+def calculateRadarGeometry(siteLats, siteLons, siteHgts, lats, lons, tilt=None):
+
+    """ Geometry between N points (e.g. clusters) and M radars in one call. lats/lons are the points and siteLats/siteLons/siteHgts
+        the radars (height in m). Returns arrays shaped (N, M) (or (M,) for a single point) of
+        ground range (m), slant range (m), bearing from the radar to the point (0-360 deg), and beam height (m above radar level
+        using 4/3 earth radius) when tilt (deg) is given, otherwise None.
+    """
+
+    lats = np.asarray(lats, dtype=float)[..., np.newaxis]
+    lons = np.asarray(lons, dtype=float)[..., np.newaxis]
+    siteLats = np.asarray(siteLats, dtype=float)
+    siteLons = np.asarray(siteLons, dtype=float)
+    siteHgts = np.asarray(siteHgts, dtype=float)
+
+    groundRanges = calculateDistanceArray(siteLats, siteLons, lats, lons)*1000 #Convert to meters
+    slantRanges = calculateSlantRangeArray(siteHgts, R, groundRanges)
+
+    bearings = calculateBearingATArray(siteLats, siteLons, lats, lons)
+    bearings = np.where(bearings < 0, bearings+360, bearings)
+
+    beamHeights = None
+    if tilt is not None:
+        beamHeights = calculateBeamHeightIterArray(groundRanges, tilt, R*(4/3))
+
+    return groundRanges, slantRanges, bearings, beamHeights
@@ -3,27 +3,283 @@
 
 import sys
 import os
+import shutil
+import threading
+import fcntl
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime as dt
 from datetime import timedelta as td
 from multiprocessing import Pool
 import requests
 from bs4 import BeautifulSoup as bs
 from ttrappy import error as err
+from ttrappy import l2store
+from ttrappy import rapcatalog
 
 import nexradaws
 
+AWSL2URL = 'https://noaa-nexrad-level2.s3.amazonaws.com' #The NEXRAD L2 bucket on AWS
+PARTIALSUFFIX = '_partial' #Scans being downloaded go in radDir+PARTIALSUFFIX so WDSSII never reads half of one
+CHUNKSIZE = 1024*1024
+DOWNLOADTRIES = 3 #Times to try a scan. Each try carries on from what the last one got
+
+
+def isWantedScan(fileName):
+    """ Whether an L2 file is a volume scan TTRAP uses (not an MDM file) """
+    return 'MDM' not in fileName and (fileName.endswith('V06') or fileName.endswith('.gz'))
+
+
+def getDayPrefixes(radarName, start, end):
+    """ Archive prefixes (YYYY/MM/DD/SITE/) of every day from start to end """
+
+    prefixes = []
+    day = start.date()
+    while day <= end.date():
+        prefixes.append(day.strftime('%Y/%m/%d/')+radarName+'/')
+        day += td(days=1)
+
+    return prefixes
+
+
+class L2Scan():
+
+    """ A scan in an archive listed by HTTPArchive or LocalArchive. It has the attributes of nexradaws' AwsNexradFile that TTRAP uses """
+
+    def __init__(self, key, utc):
+
+        self.key = key
+        self.filename = key.split('/')[-1]
+        self.radar_id = self.filename[0:4]
+        self.scan_time = utc.localize(dt.strptime(self.filename[4:19], '%Y%m%d_%H%M%S'))
+
+        return
+
+
+class HTTPArchive():
+
+    """ L2 archive served over HTTP with the layout of the NEXRAD bucket on AWS (YYYY/MM/DD/SITE/file).
+        Scans are listed with the S3 list API and downloaded with one session (connection pool) per thread.
+    """
+
+    def __init__(self, baseURL, utc):
+
+        self.baseURL = baseURL.rstrip('/')
+        self.utc = utc
+        self.local = threading.local()
+
+        return
+
+    def getSession(self):
+        """ This thread's session. Made the first time it's needed, then reused for every request """
+
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+
+        return self.local.session
+
+    def listScans(self, radarName, start, end):
+        """ Every scan for the radar from start to end """
+
+        scans = []
+        for prefix in getDayPrefixes(radarName, start, end):
+            token = None
+            while True:
+                params = {'list-type':'2', 'prefix':prefix}
+                if token:
+                    params['continuation-token'] = token
+                r = self.getSession().get(self.baseURL+'/', params=params, timeout=60)
+                r.raise_for_status()
+
+                soup = bs(r.content, 'html.parser')
+                for key in soup.find_all('key'):
+                    try:
+                        scan = L2Scan(key.string, self.utc)
+                    except ValueError:
+                        continue #Not a time-stamped scan
+                    if start <= scan.scan_time <= end:
+                        scans.append(scan)
+
+                token = soup.find('nextcontinuationtoken')
+                if token is None:
+                    break
+                token = token.string
+
+        return scans
+
+    def fetch(self, scan, partPath):
+        """ Download a scan to partPath, carrying on from what's already in it """
+
+        offset = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+        headers = {'Range':'bytes='+str(offset)+'-'} if offset else {}
+
+        with self.getSession().get(self.baseURL+'/'+scan.key, headers=headers, stream=True, timeout=60) as r:
+
+            #Nothing past the offset. It's done if the partial file is the whole scan, otherwise start over
+            if r.status_code == 416:
+                if r.headers.get('Content-Range', '').endswith('/'+str(offset)):
+                    return
+                os.remove(partPath)
+                raise IOError('Partial download of '+scan.filename+' is larger than the scan')
+
+            r.raise_for_status()
+
+            #A server that ignores the range sends all of it
+            mode = 'ab' if offset and r.status_code == 206 else 'wb'
+            with open(partPath, mode) as fi:
+                for chunk in r.iter_content(CHUNKSIZE):
+                    fi.write(chunk)
+
+        return
+
+
+class AWSArchive(HTTPArchive):
+
+    """ The NEXRAD bucket on AWS. Scans are listed with nexradaws (which raises TypeError for a radar it doesn't have)
+        and downloaded over HTTPS like any HTTPArchive
+    """
+
+    def __init__(self, utc):
+
+        super().__init__(AWSL2URL, utc)
+        self.conn = nexradaws.NexradAwsInterface()
+
+        return
+
+    def listScans(self, radarName, start, end):
+        """ Every scan for the radar from start to end """
+        return self.conn.get_avail_scans_in_range(start, end, radarName)
+
+
+class LocalArchive():
+
+    """ L2 archive in a directory with the layout of the NEXRAD bucket on AWS (YYYY/MM/DD/SITE/file), e.g. a copy of part of it """
+
+    def __init__(self, directory, utc):
+
+        self.directory = directory
+        self.utc = utc
+
+        return
+
+    def listScans(self, radarName, start, end):
+        """ Every scan for the radar from start to end """
+
+        scans = []
+        for prefix in getDayPrefixes(radarName, start, end):
+            dayDir = os.path.join(self.directory, prefix)
+            if not os.path.isdir(dayDir):
+                continue
+            for fileName in sorted(os.listdir(dayDir)):
+                try:
+                    scan = L2Scan(prefix+fileName, self.utc)
+                except ValueError:
+                    continue
+                if start <= scan.scan_time <= end:
+                    scans.append(scan)
+
+        return scans
+
+    def fetch(self, scan, partPath):
+        """ Copy a scan to partPath, carrying on from what's already in it """
+
+        offset = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+        with open(os.path.join(self.directory, scan.key), 'rb') as src:
+            src.seek(offset)
+            with open(partPath, 'ab' if offset else 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNKSIZE)
+
+        return
+
+
+def getArchive(cfg):
+    """ The archive to download L2 data from. cfg.l2Archive is a URL or a directory (AWS if it isn't set) """
+
+    if not cfg.l2Archive:
+        return AWSArchive(cfg.utc)
+
+    if cfg.l2Archive.startswith('http://') or cfg.l2Archive.startswith('https://'):
+        return HTTPArchive(cfg.l2Archive, cfg.utc)
+
+    return LocalArchive(cfg.l2Archive, cfg.utc)
+
+
+def removeLock(partPath):
+    """ Remove the lock file for a scan once it's in place. It's removed while it's still held, which is fine since
+        anyone waiting on it (or making a new one) finds the scan there and stops.
+    """
+
+    try:
+        os.remove(partPath+'.lock')
+    except FileNotFoundError:
+        pass
+
+    return
+
+
+def downloadScans(cfg, archive, scans, radDir, radarName):
+    """ Download scans to radDir with up to cfg.downloadWorkers at once. Each one is written to radDir+PARTIALSUFFIX and moved
+        into radDir when it's finished, so a download that's cut off is carried on from where it stopped next time.
+        Returns the names of the files downloaded.
+    """
+
+    partialDir = radDir.rstrip('/')+PARTIALSUFFIX
+    os.makedirs(radDir, exist_ok=True)
+    os.makedirs(partialDir, exist_ok=True)
+
+    lock = threading.Lock()
+    progress = {'count':0, 'bytes':0}
+
+    def fetchScan(scan):
+        partPath = os.path.join(partialDir, scan.filename)
+        
+        #Cases running at the same time can want the same scan in the L2 store. Only one downloads it
+        with open(partPath+'.lock', 'w') as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+            if os.path.exists(os.path.join(radDir, scan.filename)):
+                removeLock(partPath)
+                return scan.filename
+                
+            for attempt in range(DOWNLOADTRIES):
+                try:
+                    archive.fetch(scan, partPath)
+                    size = os.path.getsize(partPath)
+                    os.replace(partPath, os.path.join(radDir, scan.filename))
+                    break
+                except (OSError, requests.RequestException) as E:
+                    cfg.error("Try "+str(attempt+1)+" of "+str(DOWNLOADTRIES)+" to download "+scan.filename+" failed: "+str(E))
+            else:
+                return None
+                
+            removeLock(partPath)
+
+        with lock:
+            progress['count'] += 1
+            progress['bytes'] += size
+            cfg.log("Downloaded "+scan.filename+" ("+str(progress['count'])+" of "+str(len(scans))+" for "+radarName+", "+str(round(progress['bytes']/1048576, 1))+" MB)")
+
+        return scan.filename
+
+    with ThreadPoolExecutor(max_workers=max(1, cfg.downloadWorkers)) as executor:
+        downloaded = [fileName for fileName in executor.map(fetchScan, scans) if fileName]
+
+    return downloaded
+
+
 #Downloads the files
 def getRadarFiles(cfg, start, end, radar, radDir):
     
     """ Retrieve and download the files in the given range """
     
-    conn = nexradaws.NexradAwsInterface()
+    archive = getArchive(cfg)
     
     fileObjects = [] 
    
     cfg.log("Retrieving radar data for "+radar.name+" between "+str(start)+" and "+str(end))
     try:
-        fileObjects = conn.get_avail_scans_in_range(start, end, radar.name)
+        if radar.availableScans is not None:
+            fileObjects = radar.availableScans #Listed when the radar was picked
+        else:
+            fileObjects = archive.listScans(radar.name, start, end)
     except TypeError as E:
         cfg.error('Warning! TypeError '+str(E)+' while downloading data for '+str(radar.name)+'. Take a look at this. Returning!')
         if radar.getIsClosest():
@@ -32,14 +288,16 @@ def getRadarFiles(cfg, start, end, radar, radDir):
         
     radar.activate()
     
+    #List the directory once instead of for every scan
+    existing = set(os.listdir(radDir))
+    toDownload = []
+    
     earliestScan = cfg.utc.localize(dt(year=9999, month=12, day=30, hour=0, minute=0, second=0))
     latestScan = cfg.utc.localize(dt(year=1900, month=1, day=1, hour=0, minute=0, second=0))
     for fi in fileObjects:
-        if fi.filename not in os.listdir(radDir) and 'MDM' not in fi.filename and (fi.filename.endswith('V06') or fi.filename.endswith('.gz')):
+        if fi.filename not in existing and isWantedScan(fi.filename):
             radar.setLatestScan(fi)
-            files = conn.download(fi, radDir)
-            if files.success and not radar.hasData:
-                radar.setHasData(True)
+            toDownload.append(fi)
                 
         else:
             cfg.log('File '+fi.filename+' alread exists or it is an MDM file')
@@ -52,96 +310,36 @@ def getRadarFiles(cfg, start, end, radar, radDir):
             radar.setLatestScan(fi)
             latestScan = fi.scan_time
             
-    return radar
-
-def getURL(url, saveFolder, year, month, day):
-    
-    cfg.log("Trying historical on url")
-    URL2 = os.path.join(cfg.rapHistorical, year+month, year+month+day)
-    fullURL2 = os.path.join(URL2, fileNames[a])
-    
-    cfg.log("Attempting download of "+fullURL2)
-    r2 = requests.get(fullURL2, stream=True)
-
-    try:
-        if '404 Not Found' in r2.content.decode('ASCII'):
-            cfg.error("**No luck")
-        
-        else:
-            savePath = os.path.join(case.rapDir, saveFolder, fileNames[a])
-            cfg.log('downloaded something. Saving '+savePath)
-            with open(savePath, 'wb') as f:
-                f.write(r2.content)
+    store = l2store.getStore(cfg)
+    if toDownload and store is None:
+        cfg.log("Downloading "+str(len(toDownload))+" scans for "+radar.name)
+        if downloadScans(cfg, archive, toDownload, radDir, radar.name) and not radar.hasData:
+            radar.setHasData(True)
+            
+    elif toDownload:
+        #Download the scans the L2 store doesn't have into it (by day) and link every scan from it into the case
+        missing = {}
+        for fi in toDownload:
+            if not store.hasScan(radar.name, fi.filename):
+                missing.setdefault(store.getScanDir(radar.name, fi.filename), []).append(fi)
                 
-    except (TypeError, UnicodeDecodeError) as e:
-        cfg.error('Exception '+str(e))
-        savePath = os.path.join(case.rapDir, saveFolder, fileNames[a])
-        cfg.log('downloaded something. Saving '+savePath)
-        with open(savePath, 'wb') as f:
-            f.write(r2.content)    
+        cfg.log("Downloading "+str(sum(len(scans) for scans in missing.values()))+" scans for "+radar.name+". The L2 store has the other "+str(len(toDownload)-sum(len(scans) for scans in missing.values())))
+        for scanDir, scans in missing.items():
+            store.addScans(radar.name, downloadScans(cfg, archive, scans, scanDir, radar.name))
             
-    return
-    
-    
+        if store.linkScans(radar.name, [fi.filename for fi in toDownload], radDir) and not radar.hasData:
+            radar.setHasData(True)
+            
+    return radar
+
 def getRapFiles(cfg, case, start, end):
-    """ Downloads rap files from the NCEI archive for the given case """
+    """ Downloads rap files from the NCEI archive for the given case. The archive listings and the files are shared by every case
+        through the RAP catalog (see rapcatalog.py) """
     
     #Determine the period we will attempt to pull data from
     startDT = start - td(seconds=cfg.rapOffset*60)
     endDT = end + td(seconds=cfg.rapOffset*60)
     
-    #Determine if we need to use current or historical link
-    startHist = False
-    endHist = False
-    #Step 1: Download the content for the current link
-    currentR = requests.get(cfg.rapCurrent, stream=True)
-    #Step 2: Open the file in BeautifulSoup
-    soup = bs(currentR.content, 'html.parser')
-    linkTags = soup.find_all('a')
-    #Step 3: Loop through the list of link targs and attempt to create dt objects
-    
-    monthStart = startDT.month
-    if monthStart < 10:
-        monthStart = '0'+str(monthStart)
-    monthEnd = endDT.month
-    if monthEnd < 10:
-        monthEnd = '0'+str(monthEnd)
-      
-    startDT2 = str(startDT.year)+str(monthStart)
-    endDT2 = str(endDT.year)+str(monthEnd)
-    
-    elements = [x.string.rstrip('/') for x in linkTags]
-    if startDT2 not in elements:
-        startHist = True
-    else:
-        #If not already flagged as needing to be historical
-        nextLayerStart = requests.get(os.path.join(cfg.rapCurrent, startDT2), stream=True)
-        soupStart1 = bs(nextLayerStart.content, 'html.parser')
-        start1Tags = soupStart1.find_all('a')
-        elements2 = [x.string.rstrip('/') for x in start1Tags]
-        day = startDT.day
-        if day < 10:
-            day = '0'+str(day)
-        startDT3 = startDT2+str(day)
-        if startDT3 not in elements2:
-            startHist = True
-            
-    if endDT2 not in elements:
-        endHist = True
-    else:
-        #If not already flagged as needing to be historical
-        nextLayerStart = requests.get(os.path.join(cfg.rapCurrent, endDT2), stream=True)
-        soupEnd1 = bs(nextLayerStart.content, 'html.parser')
-        end1Tags = soupStart1.find_all('a')
-        elements2 = [x.string.rstrip('/') for x in start1Tags]
-        day = startDT.day
-        if day < 10:
-            day = '0'+str(day)
-        endDT3 = endDT2+str(day)
-        if endDT3 not in elements2:
-            endHist = True
-            
-   
     #Make list of filenames we think we will need
     fileNames = []
     fileDTs = []
@@ -163,93 +361,21 @@ def getRapFiles(cfg, case, start, end):
         fileDTs.append(currentDT)
         currentDT += td(seconds=3600)
 
-    #Round up the end datetime if needed
-    endDT = endDT.replace(second=0, microsecond=0, minute=0, hour=endDT.hour)+td(hours=endDT.minute//30)
+    catalog = rapcatalog.RapCatalog(cfg)
     
-    #Build links for start and end times
-    startURL = ''
-    endURL = ''
-    
-    startMonth = startDT.month
-    if startMonth < 10:
-        startMonth = '0'+str(startMonth)
-
-    startDay = startDT.day
-    if startDay < 10:
-        startDay = '0'+str(startDay)
-   
-    endMonth = endDT.month
-    if endMonth < 10:
-        endMonth = '0'+str(endMonth)
-        
-    endDay = endDT.day
-    if endDay < 10:
-        endDay = '0'+str(endDay)
-            
-    if startHist:
-        startURL = os.path.join(cfg.rapHistorical, str(startDT.year)+str(startMonth), str(startDT.year)+str(startMonth)+str(startDay))
-    else:
-        startURL = os.path.join(cfg.rapCurrent, str(startDT.year)+str(startMonth), str(startDT.year)+str(startMonth)+str(startDay))
-
-    
-    if endHist:
-        endURL = os.path.join(cfg.rapHistorical, str(endDT.year)+str(endMonth), str(endDT.year)+str(endMonth)+str(endDay))
-    else:
-        endURL = os.path.join(cfg.rapCurrent, str(endDT.year)+str(endMonth), str(endDT.year)+str(endMonth)+str(endDay))
-        
     #Download them
     for a in range(len(fileNames)):
     
-         
         saveFolder = fileNames[a][9:21]
-        saveFolderPath = os.path.join(case.rapDir, saveFolder)
         savePath = os.path.join(case.rapDir, saveFolder, fileNames[a])
-        if os.path.exists(saveFolderPath):
-            if fileNames[a] in os.listdir(saveFolderPath):
-                cfg.log(savePath+' exists. Skipping.')
-                continue
-                
-        if fileDTs[a].year == startDT.year and fileDTs[a].month == startDT.month and fileDTs[a].day == startDT.day:
-            fullURL = os.path.join(startURL, fileNames[a])
-        else:
-            fullURL = os.path.join(endURL, fileNames[a])
+        if os.path.exists(savePath):
+            cfg.log(savePath+' exists. Skipping.')
+            continue
             
-        cfg.log("Attempting download of "+fullURL)
-        r = requests.get(fullURL, stream=True)
-        
-       
+        catalog.getFile(fileNames[a], fileDTs[a], savePath)
         
-        #Make the save folder
-        try:
-            os.mkdir(os.path.join(case.rapDir, saveFolder))
-        except FileExistsError:
-            pass
-            
-        try:
-            if '404 Not Found' in r.content.decode('ASCII'):
-                cfg.error(str(fileNames[a]+' was found to be a not binary file.'))
-                
-                #If it was the startURL using the current link, try the historical link
-                if (startURL in fullURL) and (not startHist):
-                    getURL(startURL, saveFolder, str(startDT.year), str(startMonth), str(startDay))
-                    
-                            
-                #Same thing if it was the endURL with current link
-                if (endURL in fullURL) and (not endHist):
-                    getURL(endURL, saveFolder, str(endDT.year), str(endMonth), str(endDay))
-                        
-            else:
-               
-                cfg.log('downloaded something. Saving '+savePath)
-                
-                with open(savePath, 'wb') as f:
-                    f.write(r.content)
-                    
-        except (TypeError, UnicodeDecodeError) as e:
-            cfg.error('Exception '+str(e))
-            cfg.log('downloaded something. Saving '+savePath)
-            with open(savePath, 'wb') as f:
-                f.write(r.content)
+    catalog.save()
+    
     return
     
 def downloadData(cfg, case):
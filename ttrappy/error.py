@@ -30,4 +30,29 @@ class NoModelDataFound(Exception):
         self.message = message
         super().__init__(self.message)
         
-        return        
\ No newline at end of file
+        return
+        
+class CaseSkipped(Exception):
+    """ Raised by a stage of the archive pipeline when a case can't continue. code is the errorcode column for the
+        skipped cases csv (None if the case shouldn't be recorded there) """
+
+    def __init__(self, code, message):
+        self.code = code
+        self.message = message
+        super().__init__(self.message)
+        
+        return
+        
+class InvalidCaseRow(Exception):
+    """ Raised by loadCases for a row of the case file that can't be read. line is the line number in the file, field the
+        column that's wrong (None if it's the whole row), and storm/ID are whatever the row had for them """
+
+    def __init__(self, line, field, message, storm=None, ID=None):
+        self.line = line
+        self.field = field
+        self.storm = storm
+        self.ID = ID
+        self.message = 'Line '+str(line)+(' ('+field+')' if field else '')+': '+message
+        super().__init__(self.message)
+        
+        return
@@ -0,0 +1,137 @@
+#Record of the figures made for a case and what they were made from
+#Each figure is saved with a signature of its inputs: its data file, the prelim.csv rows and shed files near its time
+#(see OverlayIndex.getFrameSignature), and the settings and plotting code. Re-running a case (e.g. after changing the
+#association weights) skips the frames whose signature hasn't changed and only redraws the ones that did.
+
+import os
+import json
+import hashlib
+import tempfile
+
+VERSION = 1 #Change when the figures change in a way the signature doesn't see so every figure is redrawn
+SOURCES = ('visualize.py', 'overlays.py', 'basemap.py', 'colormaps.py') #Plotting code. Changing any of it redraws every figure
+
+
+def getSourceHash():
+    """ Hash of the plotting code """
+
+    h = hashlib.sha1()
+    for source in SOURCES:
+        try:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), source), 'rb') as fi:
+                h.update(fi.read())
+        except FileNotFoundError:
+            h.update(b'missing')
+
+    return h.hexdigest()
+
+
+def getFileStat(fileName):
+    """ Name, size, and mtime of a file as a string for a signature """
+
+    try:
+        stat = os.stat(fileName)
+    except FileNotFoundError:
+        return fileName+' missing'
+
+    return fileName+' '+str(stat.st_size)+' '+str(stat.st_mtime_ns)
+
+
+class FigureManifest():
+
+    """ The signature of every figure saved for a case, kept in <ID>_figures.json in the case's save directory.
+
+        createPlots loads it and hands it to the plot processes with the OverlayIndex. A frame checks isCurrent() before
+        drawing anything, and the figures a plot saves are sent back and added with update() and written by save().
+        Only the parent writes the file, so the plots running at the same time never overwrite each other.
+    """
+
+    def __init__(self, cfg, case):
+
+        self.cfg = cfg
+        self.fileName = os.path.join(case.saveDir, str(case.ID)+'_figures.json')
+        self.incremental = cfg.incrementalFigures
+        self.makePDFs = cfg.makePDFs
+        self.window = 60*max(cfg.maxAppendTimeV, cfg.maxAppendTimeR)
+
+        self.settings = hashlib.sha1(str((VERSION, getSourceHash(), cfg.storm, cfg.figurePrefix, cfg.bottom, cfg.hvSpacing, cfg.activeColor,
+                                          cfg.maxAppendTimeV, cfg.maxAppendTimeR, cfg.tiltList, cfg.shearAltList, cfg.shed,
+                                          case.ID, case.startLat, case.startLon, case.stopLat, case.stopLon,
+                                          [(site.name, site.lat, site.lon) for site in case.sites],
+                                          sorted(case.productVars.items()), sorted(case.hasDir.items()))).encode()).hexdigest()
+
+        self.figures = {} #Figure -> {'signature':, 'pdf':}
+        self.changed = False
+        self.load()
+
+        return
+
+    def load(self):
+        """ Read the manifest if there is one """
+
+        if not self.incremental or not os.path.exists(self.fileName):
+            return
+
+        try:
+            with open(self.fileName, 'r') as fi:
+                self.figures = json.load(fi)['figures']
+        except (OSError, ValueError, KeyError) as E:
+            self.cfg.error("Unable to read figure manifest "+self.fileName+": "+str(E))
+            self.figures = {}
+
+        return
+
+    def save(self):
+        """ Write the manifest if any figures were added """
+
+        if not self.changed:
+            return
+
+        #Write to a temporary file and move it into place so a crash never leaves half of one
+        fd, tempName = tempfile.mkstemp(dir=os.path.dirname(self.fileName), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fi:
+                json.dump({'version':VERSION, 'figures':self.figures}, fi, indent=1, sort_keys=True)
+            os.replace(tempName, self.fileName)
+        except OSError:
+            if os.path.exists(tempName):
+                os.remove(tempName)
+            raise
+
+        self.changed = False
+
+        return
+
+    def getSignature(self, overlayIndex, tString, inputFiles):
+        """ Signature of a frame at tString drawn from inputFiles with the overlays in overlayIndex """
+
+        h = hashlib.sha1(self.settings.encode())
+        for inputFile in inputFiles:
+            h.update((getFileStat(inputFile)+'\n').encode())
+        h.update(overlayIndex.getFrameSignature(tString, self.window).encode())
+
+        return h.hexdigest()
+
+    def isCurrent(self, savePath, pdfPath, signature):
+        """ Whether the figure at savePath was saved with this signature (and its PDF if PDFs are being made) and is still there """
+
+        if not self.incremental:
+            return False
+
+        entry = self.figures.get(os.path.basename(savePath))
+        if entry is None or entry['signature'] != signature or not os.path.exists(savePath):
+            return False
+
+        if self.makePDFs and pdfPath and (not entry['pdf'] or not os.path.exists(pdfPath)):
+            return False
+
+        return True
+
+    def update(self, figures):
+        """ Add the figures (savePath -> entry) saved by a plot """
+
+        for savePath, entry in figures.items():
+            self.figures[os.path.basename(savePath)] = entry
+            self.changed = True
+
+        return
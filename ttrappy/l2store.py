@@ -0,0 +1,208 @@
+#Level-II scans and their ldm2netcdf output shared by every case on the machine
+#Cases in the same storm mostly use the same radars over overlapping times. Each scan is downloaded into the store once and
+#hardlinked (or symlinked across filesystems) into a case's radDir, and what ldm2netcdf made from it is kept so another case
+#with the same scan links the converted files into its dataDir instead of converting it again.
+#
+#Layout (the directories are the index, so cases running at the same time only ever add to it with renames):
+#    l2/SITE/YYYYMMDD/<scan>                          The L2 file
+#    ingest/<variant>/SITE/<scan>/<Product>/<tilt>/.. What ldm2netcdf made from the scan (variant is sails or nosails)
+
+import os
+import shutil
+import tempfile
+from datetime import datetime as dt
+from ttrappy import timeindex
+
+
+def isScanFile(fileName, siteName):
+    """ Whether a file in a radDir is an L2 scan from the site (not an MDM file) """
+    return fileName.startswith(siteName) and 'MDM' not in fileName and (fileName.endswith('V06') or fileName.endswith('.gz'))
+
+
+def getScanEpoch(fileName):
+    """ Epoch seconds of the start of a scan from its name (SITEYYYYMMDD_HHMMSS...) """
+    return timeindex.toEpoch(dt.strptime(fileName[4:19], '%Y%m%d_%H%M%S'))
+
+
+def linkFile(source, destination):
+    """ Hardlink source to destination, or symlink it if they're on different filesystems. Does nothing if destination exists """
+
+    if os.path.lexists(destination):
+        return
+
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        pass
+    except OSError:
+        os.symlink(os.path.abspath(source), destination)
+
+    return
+
+
+def linkTree(source, destination):
+    """ Link every file under source into the same place under destination. Returns the number of files """
+
+    count = 0
+    for root, dirs, files in os.walk(source):
+        relativeDir = os.path.relpath(root, source)
+        os.makedirs(os.path.join(destination, relativeDir), exist_ok=True)
+        for fi in files:
+            linkFile(os.path.join(root, fi), os.path.join(destination, relativeDir, fi))
+            count += 1
+
+    return count
+
+
+def getIngestVariant(cfg):
+    """ Name for the ldm2netcdf settings the output depends on """
+    return 'sails' if cfg.useSails else 'nosails'
+
+
+class L2Store():
+
+    """ The L2 store in directory. The scans in each radar/day directory are listed once and added to as they are downloaded. """
+
+    def __init__(self, directory):
+
+        self.directory = directory
+        self.days = {} #Day directory -> set of the scans in it
+
+        return
+
+    def getScanDir(self, siteName, fileName):
+        """ Directory a scan is kept in """
+        return os.path.join(self.directory, 'l2', siteName, fileName[4:12])
+
+    def getDay(self, scanDir):
+        """ Names in a day directory (listed the first time) """
+
+        if scanDir not in self.days:
+            self.days[scanDir] = set(os.listdir(scanDir)) if os.path.isdir(scanDir) else set()
+
+        return self.days[scanDir]
+
+    def hasScan(self, siteName, fileName):
+        """ Whether the scan is in the store """
+        return fileName in self.getDay(self.getScanDir(siteName, fileName))
+
+    def addScans(self, siteName, fileNames):
+        """ Note scans downloaded into the store """
+
+        for fileName in fileNames:
+            self.getDay(self.getScanDir(siteName, fileName)).add(fileName)
+
+        return
+
+    def linkScans(self, siteName, fileNames, radDir):
+        """ Link the scans in the store into radDir. Returns the names of the ones linked """
+
+        linked = []
+        for fileName in fileNames:
+            if not self.hasScan(siteName, fileName):
+                continue
+            linkFile(os.path.join(self.getScanDir(siteName, fileName), fileName), os.path.join(radDir, fileName))
+            linked.append(fileName)
+
+        return linked
+
+    def getIngestDir(self, variant, siteName, fileName):
+        """ Directory with what ldm2netcdf made from a scan """
+        return os.path.join(self.directory, 'ingest', variant, siteName, fileName)
+
+    def prepareIngest(self, cfg, case, siteName):
+        """ Link the converted files of the site's scans that are already in the store into the case's dataDir and put the rest
+            in a directory of their own for ldm2netcdf. Returns the directory to convert (None if there's nothing to convert),
+            the directory for ldm2netcdf to write to, and the scans being converted.
+        """
+
+        variant = getIngestVariant(cfg)
+        outputDir = os.path.join(case.dataDir, siteName)
+
+        scans = sorted(fileName for fileName in os.listdir(case.radDir) if isScanFile(fileName, siteName))
+        toIngest = []
+        linked = 0
+        for fileName in scans:
+            ingestDir = self.getIngestDir(variant, siteName, fileName)
+            if not os.path.isdir(ingestDir):
+                toIngest.append(fileName)
+                continue
+            linked += linkTree(ingestDir, outputDir)
+
+        cfg.log("Linked "+str(linked)+" converted files for "+str(len(scans)-len(toIngest))+" of "+str(len(scans))+" "+siteName+" scans from the L2 store")
+
+        if not toIngest:
+            return None, None, toIngest
+
+        #ldm2netcdf reads only the scans it has to convert and writes beside the case's dataDir so everything it makes can be
+        #told apart from the files linked from the store and the products made from them later
+        ingestDir = os.path.join(case.tmpDir, 'ingest_'+siteName)
+        if os.path.exists(ingestDir):
+            shutil.rmtree(ingestDir)
+        os.makedirs(os.path.join(ingestDir, 'input'))
+        os.makedirs(os.path.join(ingestDir, 'output'))
+        for fileName in toIngest:
+            linkFile(os.path.join(case.radDir, fileName), os.path.join(ingestDir, 'input', fileName))
+
+        return os.path.join(ingestDir, 'input'), os.path.join(ingestDir, 'output'), toIngest
+
+    def saveIngest(self, cfg, case, siteName, ingestOutputDir, toIngest, save=True):
+        """ Move what ldm2netcdf made from the scans in toIngest into the store (if save) and link it into the case's dataDir.
+            Each converted file goes with the latest scan that started at or before its time.
+        """
+
+        variant = getIngestVariant(cfg)
+        outputDir = os.path.join(case.dataDir, siteName)
+        scanIndex = timeindex.TimeIndex([getScanEpoch(fileName) for fileName in toIngest])
+
+        outputs = {fileName:[] for fileName in toIngest}
+        for root, dirs, files in os.walk(ingestOutputDir):
+            relativeDir = os.path.relpath(root, ingestOutputDir)
+            if relativeDir == '.':
+                continue
+            for fi in files:
+                try:
+                    i = scanIndex.atOrBefore(fi[0:15], last=True)
+                except ValueError:
+                    continue #Not a time-stamped product. Left for the case alone
+                if i is None:
+                    i = scanIndex.getSortedIndices()[0]
+                outputs[toIngest[i]].append(os.path.normpath(os.path.join(relativeDir, fi)))
+
+        saved = 0
+        for fileName in toIngest:
+            if not outputs[fileName] or not save:
+                continue
+
+            #Build it next to where it goes and rename it into place so a scan is either all there or not at all
+            ingestDir = self.getIngestDir(variant, siteName, fileName)
+            os.makedirs(os.path.dirname(ingestDir), exist_ok=True)
+            tempDir = tempfile.mkdtemp(dir=os.path.dirname(ingestDir), prefix='.'+fileName)
+            for relativePath in outputs[fileName]:
+                os.makedirs(os.path.join(tempDir, os.path.dirname(relativePath)), exist_ok=True)
+                shutil.move(os.path.join(ingestOutputDir, relativePath), os.path.join(tempDir, relativePath))
+
+            try:
+                os.rename(tempDir, ingestDir)
+                saved += 1
+            except OSError:
+                #Another case saved it first. Use theirs
+                shutil.rmtree(tempDir)
+
+            linkTree(ingestDir, outputDir)
+
+        #Anything left (not saved) goes to the case as it is
+        linkTree(ingestOutputDir, outputDir)
+
+        cfg.log("Saved the converted files of "+str(saved)+" of "+str(len(toIngest))+" "+siteName+" scans to the L2 store")
+
+        return
+
+
+def getStore(cfg):
+    """ The L2 store, or None if it isn't used """
+
+    if not cfg.useL2Store:
+        return None
+
+    return L2Store(cfg.l2StoreDir)
@@ -14,6 +14,7 @@ from datetime import timedelta as td
 import multiprocessing as mp
 import psutil
 import queue
+import threading
 
 import numpy as np
 import sys
@@ -22,20 +23,74 @@ import time
 import pytz
 import tkinter as tk
 import gc
+import traceback
 from tkinter import ttk
 from PIL import ImageTk, Image
 
 #Required WDSII programs
 #ldm2netcdf, w2makeindex.py, w2qcnndp, w2echotop, w2simulator, w2merger, dealiasVel,w2circ, w2localmax, w2smooth, w2segmotionll, w2table2csv
 
+def stageWorker(cfg, stage, inQ, outQ, resultQ, holding):
+    """ Runs one stage of the parallel archive pipeline until it receives None. Cases that finish the stage are handed to
+        outQ (or reported as done to resultQ for the last stage). Skips and exceptions are reported to resultQ. holding is
+        shared with the parent and has the index of the case being worked on (-1 if none) so the parent knows which case
+        was lost if the process dies. It's shared memory rather than a message so it's there even if the process is killed. """
+        
+    mstr = Master(cfg, manager=False)
+    
+    while True:
+        item = inQ.get()
+        if item is None:
+            break
+            
+        index, cCase, hasVarFile = item
+        holding.value = index
+        
+        try:
+            if stage == 'download':
+                hasVarFile = mstr.prepareCase(cCase)
+                mstr.downloadCase(cCase)
+                outQ.put((index, cCase, hasVarFile))
+                holding.value = -1
+                continue
+                
+            #prepareCase already moved the case to its storm's directories. The figure titles use cfg.storm.
+            cfg.storm = cCase.storm
+            cfg.setCaseLog(mstr.caseLogName(cCase))
+            if stage == 'wdssii':
+                cCase = mstr.wdssiiCase(ttr.Processor(cfg, cCase), cCase, hasVarFile)
+                outQ.put((index, cCase, hasVarFile))
+            else:
+                mstr.analyzeCase(ttr.Processor(cfg, cCase), cCase)
+                resultQ.put(('done', index, None))
+        except err.CaseSkipped as skip:
+            resultQ.put(('skipped', index, (skip.code, skip.message)))
+        except Exception as E:
+            cfg.error("Exception in "+stage+" for case "+str(cCase.ID)+"\n"+traceback.format_exc())
+            resultQ.put(('exception', index, str(E)))
+        holding.value = -1
+            
+        #Only the cases in flight should be held in memory
+        del cCase
+        gc.collect()
+        
+    visualize.closePlotPool()
+    
+    return
+    
+
 class Master():
 
     
-    def __init__(self, cfg):
+    def __init__(self, cfg, manager=True):
         
         self.cfg = cfg
-        self.m = mp.Manager()
-        self.q = self.m.Queue()
+        if manager:
+            self.m = mp.Manager()
+            self.q = self.m.Queue()
+        else:
+            self.m = None
+            self.q = None
         return
         
     def createDirectories(self, case):
@@ -82,6 +137,263 @@ class Master():
         
         return
         
+    def writeSkipped(self, case, code, message):
+        """ Record a skipped case. Cases without an error code (e.g. WDSSII not finishing) only go to the error log. Code 8 is for
+            an unexpected exception in the case or the process working on it dying (the parallel path only) """
+        
+        if code is not None:
+            self.cfg.appendCSV(self.cfg.logName+'_skippedcases.csv', str(case.storm)+','+str(case.ID)+','+str(case.isTor)+','+str(code)+','+str(message)+'\n')
+            
+        return
+        
+    def writeInvalidRow(self, invalidRow):
+        """ Record a row of the case file that couldn't be read (error code 7) """
+        
+        self.cfg.appendCSV(self.cfg.logName+'_skippedcases.csv', str(invalidRow.storm)+','+str(invalidRow.ID)+',,7,'+invalidRow.message.replace(',', ';')+'\n')
+        
+        return
+        
+    def resolveCase(self, resolver, index):
+        """ The case at index with its radars picked, waiting for the resolver if it hasn't got to it yet """
+        
+        try:
+            return resolver.get(index)
+        except err.RadarNotFoundError as excep:
+            self.cfg.error("No radars were found for case "+str(resolver.cases[index].ID)+". Continuing to next case")
+            raise err.CaseSkipped(1, str(excep))
+        
+    def caseLogName(self, cCase):
+        return os.path.join(cCase.baseDir, self.cfg.logName+'_case_log.txt')
+        
+    def prepareCase(self, cCase):
+        """ Create the directories and report for a case. Returns whether the case has a var file from a previous run """
+        
+        self.cfg.setCaseLog(None)
+        self.cfg.log("-------------- Starting case "+cCase.ID+" ------------")
+        self.cfg.error("-------------- Starting case "+cCase.ID+" ------------")
+        if cCase.storm != self.cfg.storm:
+            self.cfg.storm = cCase.storm
+            cCase.updateDirs(self.cfg)
+            self.cfg.log("Changed cfg storm to "+self.cfg.storm)
+            
+        #Create directoies for the case	
+        self.createDirectories(cCase)
+        self.cfg.setCaseLog(self.caseLogName(cCase))
+        
+        #Create the "hail report" to associate with hour target cell
+        cCase.createReport()
+        
+        try:
+            hasVarFile = cCase.checkVars(self.cfg, cCase.baseDir, 'vars.pkl')
+        except EOFError as E:
+            self.cfg.log(str(E)+"\nAssuming no var file!")
+            hasVarFile = False
+            
+        return hasVarFile
+        
+    def downloadCase(self, cCase):
+        """ Download the radar and RAP data for a case and update its sites with the scans found """
+        
+        try:
+            downloadAsync, downloadPool = download.downloadData(self.cfg, cCase)
+            results = downloadAsync.get()
+        except err.RadarNotFoundError as excep:
+            self.cfg.error("The closest radar was not found in "+cCase.ID+". Continuing to next case")
+            raise err.CaseSkipped(1, str(excep))
+            
+        #Update the case object with recent scans for each site
+        for result in results:
+            cCase.updateSite(result)
+        
+        downloadPool.close()
+
+        #Check to see if L2 data actually exists
+        L2Files = os.listdir(cCase.radDir)
+        if not L2Files:
+            self.cfg.error("No L2 files downloaded")
+            raise err.CaseSkipped(6, 'No Level 2 Radar Data Downloaded')
+            
+        return
+        
+    def wdssiiCase(self, processor, cCase, hasVarFile):
+        """ Process the radar data for a case with WDSSII (unless only running TTRAP on a case that was already processed) """
+        
+        processor.updateCase(cCase)
+        
+        if not self.cfg.ttrapOnly or not hasVarFile:
+            if not hasVarFile and self.cfg.ttrapOnly:
+                self.cfg.error("Var File not found for case "+cCase.ID+". Running WDSSII")
+            
+            #Remove old log files before creating new ones
+            if os.path.exists(cCase.logDir) and not self.cfg.ttrapOnly:
+                shutil.rmtree(cCase.logDir)
+                os.mkdir(cCase.logDir)
+                
+            cCase, finished = processor.wdssii()
+            
+            #Check to see if processing actually finished. Don't finish the case if it didn't
+            if not finished:
+                self.cfg.error("WDSSII did not finish!!! in case "+str(cCase.ID))
+                raise err.CaseSkipped(None, 'WDSSII did not finish')
+                
+        return cCase
+        
+    def analyzeCase(self, processor, cCase):
+        """ Run the TTRAP algorithm on the WDSSII data and make the figures for a case """
+        
+        try:
+            frames = processor.ttrap()
+        except err.NoReferenceClusterFoundException as excep1:
+            self.cfg.log("Starting next case after no reference cluster found")
+            raise err.CaseSkipped(2, str(excep1))
+        except err.NoModelDataFound as excep2:
+            self.cfg.log("Starting next case after no model data was found for a key cluster")
+            raise err.CaseSkipped(3, str(excep2))
+            
+        cCase.setStormGroups(frames)
+        
+        if self.cfg.makeFigures:
+            visualize.createPlots(self.cfg, cCase)
+        else:
+            self.cfg.log("Skipping figure creation")
+            
+        return
+        
+    def processCasesParallel(self, cases, resolver):
+        """ Pipeline the cases through separate download, WDSSII, and analysis stages so up to cfg.jobs cases are worked on at once.
+            The queues between the stages only hold one case each, so downloading stays at most a couple cases ahead of the
+            analysis and only the cases in flight are held in memory. Skipped cases are written here by the parent alone.
+            Cases are handed to the download stage as the resolver picks their radars.
+            Returns the cases (as loaded) that finished.
+        """
+        
+        jobs = self.cfg.jobs
+        self.cfg.log("Processing "+str(len(cases))+" cases with "+str(jobs)+" jobs")
+        
+        #Split the cores between the cases running WDSSII at the same time unless told otherwise
+        if not self.cfg.maxProcesses:
+            self.cfg.maxProcesses = max(1, (os.cpu_count() or 1)//jobs)
+            
+        processedCases = []
+        remaining = set(range(len(cases)))
+        
+        #The stages only stop early if one of their processes died. Start them again for the cases that didn't finish
+        while remaining:
+            self.runStages(cases, remaining, resolver, processedCases)
+            
+        return processedCases
+        
+    def runStages(self, cases, remaining, resolver, processedCases):
+        """ Start the stage processes and run the cases at the indices in remaining through them, removing each index as its
+            case finishes or is skipped and adding the finished cases to processedCases. If a stage process dies, the case it
+            was working on is skipped and the stages are stopped (the queues it was using can't be trusted after that), leaving
+            the indices of the cases that were still in them in remaining.
+        """
+        
+        jobs = self.cfg.jobs
+        
+        downloadQ = mp.Queue(maxsize=1)
+        wdssiiQ = mp.Queue(maxsize=1)
+        analysisQ = mp.Queue(maxsize=1)
+        resultQ = mp.Queue()
+        
+        #The last argument is the index of the case the process is working on
+        stages = {'download':(self.cfg, 'download', downloadQ, wdssiiQ, resultQ, mp.Value('i', -1, lock=False))}
+        for a in range(jobs):
+            stages['wdssii'+str(a)] = (self.cfg, 'wdssii', wdssiiQ, analysisQ, resultQ, mp.Value('i', -1, lock=False))
+            stages['analysis'+str(a)] = (self.cfg, 'analysis', analysisQ, None, resultQ, mp.Value('i', -1, lock=False))
+        workers = [mp.Process(target=stageWorker, args=args, name=name) for name, args in stages.items()]
+        
+        stopFeeding = threading.Event()
+        
+        def feedCases():
+            for index in sorted(remaining):
+                try:
+                    item = (index, self.resolveCase(resolver, index), None)
+                except err.CaseSkipped as skip:
+                    resultQ.put(('skipped', index, (skip.code, skip.message)))
+                    continue
+                except Exception as E:
+                    self.cfg.error("Exception picking radars for case "+str(cases[index].ID)+"\n"+traceback.format_exc())
+                    resultQ.put(('exception', index, str(E)))
+                    continue
+                    
+                #Don't wait forever on a download stage that's been stopped
+                while not stopFeeding.is_set():
+                    try:
+                        downloadQ.put(item, timeout=1)
+                        break
+                    except queue.Full:
+                        pass
+                if stopFeeding.is_set():
+                    return
+                
+        for worker in workers:
+            worker.start()
+        feeder = threading.Thread(target=feedCases, name='feeder', daemon=True)
+        feeder.start()
+            
+        try:
+            while remaining:
+                try:
+                    status, index, result = resultQ.get(timeout=10)
+                except queue.Empty:
+                    #Nothing has finished for a while. Make sure the stages are all still there to finish something
+                    dead = [worker for worker in workers if not worker.is_alive()]
+                    for worker in dead:
+                        lost = stages[worker.name][-1].value
+                        self.cfg.error("Process "+worker.name+" died with exit code "+str(worker.exitcode)+". Restarting the stages")
+                        if lost in remaining:
+                            remaining.discard(lost)
+                            self.writeSkipped(cases[lost], 8, 'Process '+worker.name+' died')
+                    if dead:
+                        break
+                    continue
+                    
+                remaining.discard(index)
+                case = cases[index]
+                
+                if status == 'done':
+                    self.cfg.log("Finished case "+str(case.ID)+" ("+str(len(cases)-len(remaining))+"/"+str(len(cases))+")")
+                    processedCases.append(case)
+                elif status == 'skipped':
+                    self.writeSkipped(case, *result)
+                else:
+                    #The traceback is already in the error log. Skip the case like any other rather than stopping the rest
+                    self.writeSkipped(case, 8, result.replace(',', ';').replace('\n', ' '))
+                    
+        except BaseException:
+            stopFeeding.set()
+            self.stopStages(workers)
+            raise
+            
+        stopFeeding.set()
+        if remaining:
+            self.stopStages(workers)
+            return
+            
+        #Shut down the stages in order
+        feeder.join()
+        downloadQ.put(None)
+        for a in range(jobs):
+            wdssiiQ.put(None)
+        for a in range(jobs):
+            analysisQ.put(None)
+        for worker in workers:
+            worker.join()
+            
+        return
+        
+    def stopStages(self, workers):
+        
+        for worker in workers:
+            if worker.is_alive():
+                self.cfg.log("Stopping process "+str(worker.name))
+                worker.terminate()
+                worker.join()
+                
+        return
+        
     def processArchivedCases(self, gui=None):
 
         try:
@@ -105,112 +417,44 @@ class Master():
             
             if gui:
                 pass
-            cases = caseMod.loadCases(self.cfg)
+            cases, invalidRows = caseMod.loadCases(self.cfg)
+            for invalidRow in invalidRows:
+                self.writeInvalidRow(invalidRow)
             
-            #c for currentCase
-            for cCase in cases:
-
-                
-                self.ttrap = ttr.Processor(self.cfg, cCase, self.q, self.m)
-                self.cfg.log("-------------- Starting case "+cCase.ID+" ------------")
-                self.cfg.error("-------------- Starting case "+cCase.ID+" ------------")
-                if cCase.storm != self.cfg.storm:
-                    self.cfg.storm = cCase.storm
-                    cCase.updateDirs(self.cfg)
-                    self.cfg.log("Changed cfg storm to "+self.cfg.storm)
-                    
-                #Create directoies for the case	
-                self.createDirectories(cCase)
-                
-                #Create the "hail report" to associate with hour target cell
-                cCase.createReport()
-                
-                try:
-                    hasVarFile = cCase.checkVars(self.cfg, cCase.baseDir, 'vars.pkl')
-                except EOFError as E:
-                    self.cfg.log(str(E)+"\nAssuming no var file!")
-                    hasVarFile = False
+            #Radars are picked for the cases in the background ahead of the one being processed
+            resolver = caseMod.CaseResolver(self.cfg, cases)
             
-                try:
-                    downloadAsync, downloadPool = download.downloadData(self.cfg, cCase)
-                    downloadAsync.wait(20)
-                    results = downloadAsync.get()
-                except err.RadarNotFoundError as excep:
-                    cfg.error("The closest radar was not found in "+cCase.ID+". Continuing to next case")
-                    
-                    with open(self.cfg.logName+'_skippedcases.csv', 'a') as fi2:
-                        fi2.write(str(cCase.storm)+','+str(cCase.ID)+','+str(cCase.isTor)+',1,'+str(excep)+'\n')
-                        
-
-                    continue
+            try:
+                if self.cfg.jobs > 1:
+                    processedCases = self.processCasesParallel(cases, resolver)
+                else:
+                    #c for currentCase
+                    for index, cCase in enumerate(cases):
                     
-                #Update the case object with recent scans for each site
-                for result in results:
-                    cCase.updateSite(result)
-                
-                downloadPool.close()
-
-                #Check to see if L2 data actually exists
-                L2Files = os.listdir(cCase.radDir)
-                if not L2Files:
-                    self.cfg.error("No L2 files downloaded")
-                    with open(self.cfg.logName+'_skippedcases.csv', 'a') as fi:
-                        fi.write(str(cCase.storm)+','+str(cCase.ID)+','+str(cCase.isTor)+',6,No Level 2 Radar Data Downloaded\n')
-                        continue
+                        try:
+                            cCase = self.resolveCase(resolver, index)
+                            hasVarFile = self.prepareCase(cCase)
+                            self.downloadCase(cCase)
+                            
+                            self.ttrap = ttr.Processor(self.cfg, cCase, self.q, self.m)
+                            cCase = self.wdssiiCase(self.ttrap, cCase, hasVarFile)
+                            self.analyzeCase(self.ttrap, cCase)
+                        except err.CaseSkipped as skip:
+                            self.writeSkipped(cCase, skip.code, skip.message)
+                            continue
                         
-                self.ttrap.updateCase(cCase)
-                
-                #Process radar data with WDSII
-                if not self.cfg.ttrapOnly or not hasVarFile:
-                    if not hasVarFile and self.cfg.ttrapOnly:
-                        self.cfg.error("Var File not found for case "+cCase.ID+". Running WDSSII")
-                    
-                    #Remove old log files before creating new ones
-                    if os.path.exists(cCase.logDir) and not self.cfg.ttrapOnly:
-                        shutil.rmtree(cCase.logDir)
-                        os.mkdir(cCase.logDir)
+                        processedCases.append(cCase)
                         
-                    cCase, finished = self.ttrap.wdssii()
-                    
-                    #Check to see if processing actually finished. Don't finish the loop if it didn't
-                    if not finished:
-                        self.cfg.error("WDSSII did not finish!!! in case "+str(cCase.ID))
-                        continue
-                    
-                try:
-                    #Run the TTRAP algorithm on the WDSII data
-                    frames = self.ttrap.ttrap()
-                except err.NoReferenceClusterFoundException as excep1:
-                    self.cfg.log("Starting next case after no reference cluster found")
-                    
-                    with open(self.cfg.logName+'_skippedcases.csv', 'a') as fi:
-                        fi.write(str(cCase.storm)+','+str(cCase.ID)+','+str(cCase.isTor)+',2,'+str(excep1)+'\n')
+                        #Delete the ttrap object to free up memory 
+                        del self.ttrap
+                        gc.collect() #Actually frees up unferenced memory spaces
                         
-
-                    continue
-                except err.NoModelDataFound as excep2:
-                    self.cfg.log("Starting next case after no model data was found for a key cluster")
-                    
-                    with open(self.cfg.logName+'_skippedcases.csv', 'a') as fi2:
-                        fi2.write(str(cCase.storm)+','+str(cCase.ID)+','+str(cCase.isTor)+',3,'+str(excep2)+'\n')
-                    
-                    continue
-                    
-                    
-                cCase.setStormGroups(frames)
-                
-                if self.cfg.makeFigures:
-                    visualize.createPlots(self.cfg, cCase)
-                else:
-                    self.cfg.log("Skipping figure creation")
-                
-                processedCases.append(cCase)
-                
-                #Delete the ttrap object to free up memory 
-                del self.ttrap
-                gc.collect() #Actually frees up unferenced memory spaces
-                
+            finally:
+                #Also on an exception so the resolver doesn't keep picking radars for cases that will never run
+                resolver.close()
                 
+            visualize.closePlotPool()
+            self.cfg.setCaseLog(None)
             self.cfg.log("Finished cases")
                 
                 
@@ -218,30 +462,6 @@ class Master():
 
             self.cfg.log("Excpetion occured. Terminating subprocesses.\n"+str(E))
             
-            self.q.put(err.StopProcessingException("Exception in Archive"))
-
-            #Clean out the remaining queue items to avoid broken pipe at shutdown after confirmation the listener has stopped
-            emptyStart = dt.now()
-            startEmptying = False
-            while not startEmptying or not self.q.empty():
-                #Give the listener 2 seconds to close. Assumed the listener is no longer running then
-                if not self.q.empty():
-                    qResult = self.q.get_nowait()
-                    if qResult == 'listenerstopped':
-                        startEmptying = True
-                    if startEmptying:
-                        self.cfg.log("Removed "+str(qResult))
-                        time.sleep(0.1)
-                        emptyStart = dt.now()
-                    else:
-                        self.cfg.log("Waiting for listenerstopped from listener")
-                        self.q.put(qResult)
-                     
-                if (dt.now() - emptyStart).seconds > 2:
-                    self.cfg.log("Empty Timeout")
-                    break
-                time.sleep(0.1)
-            self.q.put('listenerstopped') #Replace the listener status since the listener should be stopped            
             raise
          
         except err.StopProcessingException:
@@ -0,0 +1,146 @@
+#Product mirroring: putting the files of a product tree in a second place without writing them again
+#copyProducts gives the velocity radars' AliasedVelocity, SpectrumWidth, and Reflectivity to dataDir and reformatTilt moves the
+#tilt grids back into it. The files are linked (cfg.productMirror: hardlink, reflink, or symlink) and only copied when a link
+#can't be made (e.g. across filesystems), so the largest products of a case aren't written twice.
+#A linked file is the same data in both places, so every linked source is recorded with its size and mtime and verify()
+#checks after WDSSII that no tool changed one in place. Tools that write a new file over a mirrored one replace it instead.
+
+import os
+import fcntl
+import shutil
+
+MODES = ('hardlink', 'reflink', 'symlink', 'copy')
+FICLONE = 0x40049409 #Linux ioctl to make a file share another's blocks (copy-on-write filesystems like btrfs and XFS)
+
+
+def reflinkFile(source, destination):
+    """ Make destination a copy-on-write clone of source. OSError if the filesystem can't """
+
+    with open(source, 'rb') as src:
+        with open(destination, 'wb') as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+    return
+
+
+def placeFile(source, destination, mode):
+    """ Put source at destination with mode (see MODES), replacing what's there the way cp -f would.
+        Falls back to a copy if the link can't be made. Returns how it was placed.
+    """
+
+    #Made beside the destination and renamed over it so a file already there (which may be linked to another) is never written into
+    tempName = os.path.join(os.path.dirname(destination), '.'+os.path.basename(destination)+'.mirror')
+    if os.path.lexists(tempName):
+        os.remove(tempName)
+
+    placed = mode
+    try:
+        if mode == 'hardlink':
+            os.link(source, tempName)
+        elif mode == 'reflink':
+            reflinkFile(source, tempName)
+        elif mode == 'symlink':
+            os.symlink(os.path.abspath(source), tempName)
+        else:
+            placed = 'copy'
+    except OSError:
+        if os.path.lexists(tempName):
+            os.remove(tempName)
+        placed = 'copy'
+
+    if placed == 'copy':
+        shutil.copy2(source, tempName)
+
+    os.replace(tempName, destination)
+
+    return placed
+
+
+def moveTree(source, destination):
+    """ Move every file under source into the same place under destination (replacing files that are there) and remove source.
+        Like cp -f -R -T followed by rm -r, but files are renamed instead of copied.
+    """
+
+    #An empty or missing destination takes the whole directory at once
+    try:
+        os.rename(source, destination)
+        return
+    except OSError:
+        pass
+
+    for root, dirs, files in os.walk(source):
+        relativeDir = os.path.relpath(root, source)
+        os.makedirs(os.path.join(destination, relativeDir), exist_ok=True)
+        for fi in files:
+            os.replace(os.path.join(root, fi), os.path.join(destination, relativeDir, fi))
+
+    shutil.rmtree(source)
+
+    return
+
+
+class ProductMirror():
+
+    """ Mirrors product trees for one run of WDSSII on a case and keeps what was linked for verify() """
+
+    def __init__(self, cfg):
+
+        self.cfg = cfg
+        self.mode = cfg.productMirror
+        if self.mode not in MODES:
+            cfg.error("Unknown ProductMirror "+str(self.mode)+". Copying products instead")
+            self.mode = 'copy'
+
+        self.linked = {} #Source -> (inode, size, mtime, how it was placed) when it was linked
+
+        return
+
+    def mirrorTree(self, source, destination):
+        """ Mirror every file under source into the same place under destination, merging with what's there like cp -r -f.
+            Returns the number of files placed each way.
+        """
+
+        counts = {}
+        for root, dirs, files in os.walk(source):
+            relativeDir = os.path.relpath(root, source)
+            os.makedirs(os.path.join(destination, relativeDir), exist_ok=True)
+            for fi in files:
+                fileName = os.path.join(root, fi)
+                placed = placeFile(fileName, os.path.join(destination, relativeDir, fi), self.mode)
+                counts[placed] = counts.get(placed, 0) + 1
+
+                #Copies and reflinks are separate files. Writing into one doesn't change the other
+                if placed in ('hardlink', 'symlink'):
+                    stat = os.stat(fileName)
+                    self.linked[fileName] = (stat.st_ino, stat.st_size, stat.st_mtime_ns, placed)
+
+        return counts
+
+    def verify(self):
+        """ Check that none of the linked sources were changed in place since they were mirrored. Returns the ones that were.
+            A source replaced by a new file (e.g. written to a temporary file and renamed) has a new inode and isn't counted:
+            a hard link still has the old file. A symlink follows the name though, so those are reported separately.
+        """
+
+        modified = []
+        replaced = []
+        for fileName, (inode, size, mtime, placed) in self.linked.items():
+            try:
+                stat = os.stat(fileName)
+            except FileNotFoundError:
+                stat = None
+            if stat is not None and stat.st_ino == inode:
+                if (stat.st_size, stat.st_mtime_ns) != (size, mtime):
+                    modified.append(fileName)
+            elif placed == 'symlink':
+                replaced.append(fileName)
+
+        if modified:
+            self.cfg.error(str(len(modified))+" mirrored product files were modified in place after they were linked, so the mirror changed too. Set ProductMirror to reflink or copy. "+str(modified[0:20]))
+        elif self.linked:
+            self.cfg.log("None of the "+str(len(self.linked))+" linked product files were modified in place")
+
+        if replaced:
+            self.cfg.error(str(len(replaced))+" symlinked product files were replaced or removed after they were linked, so the mirror points at something else. "+str(replaced[0:20]))
+
+        return modified
@@ -0,0 +1,145 @@
+#Per-case data drawn over the figures: the centroids in the case's prelim.csv and the times of the cluster shed files
+#createPlots builds the index once before plotting a case and hands it to the plot processes, so a frame only has to
+#look things up instead of reading prelim.csv and listing the shed directories again.
+
+import os
+import hashlib
+from ttrappy import timeindex
+
+INVALIDDTS = ('-99900', '-99904')
+
+
+def getShedDirectories(cfg, case):
+    """ Every shed directory the cluster overlays (plotCluster, plotETCluster, plotShearClusters) read for a case """
+
+    directories = []
+    if case.hasDir['cluster']:
+        directories.append(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/')
+    if case.hasDir['ETCluster']:
+        directories.append(case.productDirs['ETCluster']+'/'+case.productVars['ETCluster']+'/scale_0/')
+    for product in ('maxShearCluster', 'minShearCluster'):
+        if case.hasDir[product]:
+            for tilt in cfg.tiltList:
+                directories.append(case.productDirs[product]+'/'+tilt+'/'+case.productVars[product]+'/scale_0/')
+
+    return directories
+
+
+class OverlayIndex():
+
+    """ The rows of a case's prelim.csv and the shed file TimeIndexes, loaded once and then only read.
+
+        fullPath (str): The case's prelim.csv. If it doesn't exist index() and getRows() raise FileNotFoundError the way
+                        opening it did, so the centroid plots carry on without it.
+        directories (list): Shed directories to index up front. Others are indexed by getShedFiles when asked for.
+    """
+
+    def __init__(self, fullPath, directories=()):
+
+        self.fullPath = fullPath
+        self.found = os.path.exists(fullPath)
+
+        self.header = []
+        self.rows = []
+        if self.found:
+            with open(fullPath, 'r') as analysisFi:
+                lines = analysisFi.read().splitlines()
+            if lines:
+                self.header = lines[0].split(',')
+                self.rows = [line.split(',') for line in lines[1:]]
+
+        #First index of each label, the same as list.index
+        self.columns = {}
+        for i, label in enumerate(self.header):
+            self.columns.setdefault(label, i)
+
+        self.timeRows = {}
+        self.timeIndexes = {}
+
+        self.shedFiles = {}
+        for directory in directories:
+            if os.path.isdir(directory):
+                self.shedFiles[directory] = timeindex.indexDirectory(directory)
+
+        return
+
+    def index(self, label):
+        """ Index of the label in the header. ValueError if it isn't there """
+
+        if not self.found:
+            raise FileNotFoundError(self.fullPath)
+
+        if label not in self.columns:
+            raise ValueError(label+' is not in the header of '+self.fullPath)
+
+        return self.columns[label]
+
+    def getRows(self, DTIndex):
+        """ (epoch, row) for every row (in file order) with a time in column DTIndex. Rows are the split lines of the file """
+
+        if not self.found:
+            raise FileNotFoundError(self.fullPath)
+
+        if DTIndex not in self.timeRows:
+            self.timeRows[DTIndex] = [(timeindex.toEpoch(row[DTIndex]), row) for row in self.rows if row[DTIndex] not in INVALIDDTS]
+
+        return self.timeRows[DTIndex]
+
+    def getTimeIndex(self, DTIndex):
+        """ TimeIndex of every row by the time in column DTIndex (rows without one are left out) """
+
+        if DTIndex not in self.timeIndexes:
+            self.timeIndexes[DTIndex] = timeindex.TimeIndex([None if row[DTIndex] in INVALIDDTS else row[DTIndex] for row in self.rows])
+
+        return self.timeIndexes[DTIndex]
+
+    def getFrameSignature(self, tString, window):
+        """ Hash of everything the overlays on a frame at tString can use. For every time column of prelim.csv that's the rows
+            within window (s) of the frame and the last rows at or before it (the lowest tilt centroid), and for every shed
+            directory the files within window of it and the nearest one and the first at or after it (with their sizes and mtimes).
+            Changing anything else in prelim.csv or the shed directories doesn't change the signature.
+        """
+
+        tEpoch = timeindex.toEpoch(tString)
+        h = hashlib.sha1()
+
+        if self.found:
+            rows = set()
+            for label, DTIndex in self.columns.items():
+                if not label.startswith('DateTime'):
+                    continue
+                rowIndex = self.getTimeIndex(DTIndex)
+                rows.update(rowIndex.within(tEpoch, window))
+                before = rowIndex.atOrBefore(tEpoch)
+                if before is not None:
+                    rows.update(rowIndex.within(rowIndex.getEpoch(before), 0))
+
+            for i in sorted(rows):
+                h.update((','.join(self.rows[i])+'\n').encode())
+        else:
+            h.update(b'no prelim')
+
+        for directory in sorted(self.shedFiles.keys()):
+            files, fileIndex = self.shedFiles[directory]
+            picked = set(fileIndex.within(tEpoch, window))
+            for i in (fileIndex.nearest(tEpoch), fileIndex.atOrAfter(tEpoch)):
+                if i is not None:
+                    picked.add(i)
+
+            h.update(('\n'+directory+'\n').encode())
+            for i in sorted(picked):
+                try:
+                    stat = os.stat(os.path.join(directory, files[i]))
+                    h.update((files[i]+' '+str(stat.st_size)+' '+str(stat.st_mtime_ns)+'\n').encode())
+                except FileNotFoundError:
+                    h.update((files[i]+' missing\n').encode())
+
+        return h.hexdigest()
+
+    def getShedFiles(self, directory):
+        """ The files in a shed directory and a TimeIndex of them (see timeindex.indexDirectory) """
+
+        if directory in self.shedFiles:
+            return self.shedFiles[directory]
+
+        return timeindex.indexDirectory(directory)
@@ -0,0 +1,242 @@
+#Catalog of the RAP archive and the RAP files downloaded for every case
+#The NCEI "current" and "historical" trees (ROOT/YYYYMM/YYYYMMDD/file) are listed one directory at a time and the listings
+#are kept in a local index for cfg.rapCatalogTTL hours, so cases sharing RAP hours don't fetch and parse them again.
+#Each model hour is downloaded once into cfg.rapStoreDir and linked into the cases that need it.
+#A root that isn't a URL is read as a local directory with the same layout (a mirror for tests or clusters without the internet).
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import tempfile
+import requests
+from bs4 import BeautifulSoup as bs
+from ttrappy import l2store
+
+MISSINGTTL = 600 #Seconds to keep a listing for a directory that isn't there (e.g. a day that hasn't been archived yet)
+
+
+class HTTPBackend():
+
+    """ Directory listings and files from a web server (e.g. NCEI). One session is used for every request. """
+
+    def __init__(self):
+
+        self.session = requests.Session()
+
+        return
+
+    def join(self, location, name):
+        return location.rstrip('/')+'/'+name
+
+    def listDirectory(self, location):
+        """ Names linked from a directory page (without the trailing / of directories). None if it isn't there """
+
+        r = self.session.get(location, timeout=60)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+
+        soup = bs(r.content, 'html.parser')
+
+        return [x.string.rstrip('/') for x in soup.find_all('a') if x.string]
+
+    def fetch(self, location, fileName):
+        """ Download location to fileName """
+
+        with self.session.get(location, stream=True, timeout=120) as r:
+            r.raise_for_status()
+            with open(fileName, 'wb') as fi:
+                for chunk in r.iter_content(1024*1024):
+                    fi.write(chunk)
+
+        return
+
+
+class LocalBackend():
+
+    """ Directory listings and files from a local mirror of the archive """
+
+    def join(self, location, name):
+        return os.path.join(location, name)
+
+    def listDirectory(self, location):
+        """ Names in a directory. None if it isn't there """
+
+        if not os.path.isdir(location):
+            return None
+
+        return os.listdir(location)
+
+    def fetch(self, location, fileName):
+        """ Copy location to fileName """
+
+        shutil.copyfile(location, fileName)
+
+        return
+
+
+def getBackend(root):
+    """ Backend for an archive root (a URL or a directory) """
+
+    if root.startswith('http://') or root.startswith('https://'):
+        return HTTPBackend()
+
+    return LocalBackend()
+
+
+class RapCatalog():
+
+    """ Finds and downloads RAP files for the cases.
+
+        The roots are searched in order (current first, then historical) and a file is taken from the first one whose day
+        directory lists it. Listings are kept in cfg.rapCatalogFile for cfg.rapCatalogTTL hours. Call save() when done to
+        keep the listings fetched for the next case.
+    """
+
+    def __init__(self, cfg):
+
+        self.cfg = cfg
+        self.roots = [root for root in (cfg.rapCurrent, cfg.rapHistorical) if root]
+        self.backends = {root: getBackend(root) for root in self.roots}
+        self.fileName = cfg.rapCatalogFile
+        self.ttl = cfg.rapCatalogTTL*3600
+
+        self.listings = {} #Location -> {'time': when it was listed, 'names': [...] or None if it isn't there}
+        self.changed = False
+        self.load()
+
+        return
+
+    def load(self):
+        """ Read the saved listings (if any) that haven't expired """
+
+        if not os.path.exists(self.fileName):
+            return
+
+        try:
+            with open(self.fileName, 'r') as fi:
+                listings = json.load(fi)
+        except (OSError, ValueError) as E:
+            self.cfg.error("Unable to read RAP catalog "+self.fileName+": "+str(E))
+            return
+
+        self.listings = self.dropExpired(listings)
+
+        return
+
+    def isCurrent(self, listing, now):
+        """ Whether a listing is younger than the TTL. Directories that weren't there are only trusted for MISSINGTTL """
+
+        return now - listing['time'] < (self.ttl if listing['names'] is not None else min(self.ttl, MISSINGTTL))
+
+    def dropExpired(self, listings):
+        """ The listings that are younger than the TTL """
+
+        now = time.time()
+
+        return {location: listing for location, listing in listings.items() if self.isCurrent(listing, now)}
+
+    def save(self):
+        """ Write the listings if any were fetched. Listings saved by other cases in the meantime are kept and expired
+            ones are dropped so the file doesn't keep growing.
+        """
+
+        if not self.changed:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.fileName)), exist_ok=True)
+        with open(self.fileName+'.lock', 'w') as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+
+            listings = {}
+            if os.path.exists(self.fileName):
+                try:
+                    with open(self.fileName, 'r') as fi:
+                        listings = json.load(fi)
+                except (OSError, ValueError):
+                    listings = {}
+            listings.update(self.listings)
+            listings = self.dropExpired(listings)
+
+            fd, tempName = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.fileName)), suffix='.tmp')
+            with os.fdopen(fd, 'w') as fi:
+                json.dump(listings, fi)
+            os.replace(tempName, self.fileName)
+
+        self.changed = False
+
+        return
+
+    def listDirectory(self, root, location):
+        """ Names in a directory of root's tree from the catalog, or listed and added to it """
+
+        if location not in self.listings or not self.isCurrent(self.listings[location], time.time()):
+            self.cfg.log("Listing "+location)
+            try:
+                names = self.backends[root].listDirectory(location)
+            except (OSError, requests.RequestException) as E:
+                #Not kept so it's tried again next time
+                self.cfg.error("Unable to list "+location+": "+str(E))
+                return []
+            self.listings[location] = {'time':time.time(), 'names':names}
+            self.changed = True
+
+        return self.listings[location]['names'] or []
+
+    def find(self, fileName, fileDT):
+        """ Root and location of the RAP file for the hour fileDT (None, None if no root has it) """
+
+        month = fileDT.strftime('%Y%m')
+        day = fileDT.strftime('%Y%m%d')
+
+        for root in self.roots:
+            backend = self.backends[root]
+            if month not in self.listDirectory(root, root):
+                continue
+            monthLocation = backend.join(root, month)
+            if day not in self.listDirectory(root, monthLocation):
+                continue
+            dayLocation = backend.join(monthLocation, day)
+            if fileName in self.listDirectory(root, dayLocation):
+                return root, backend.join(dayLocation, fileName)
+
+        return None, None
+
+    def getFile(self, fileName, fileDT, savePath):
+        """ Link the RAP file for the hour fileDT to savePath, downloading it into the RAP store first if no case has.
+            Returns whether it was found.
+        """
+
+        storePath = os.path.join(self.cfg.rapStoreDir, fileName)
+        os.makedirs(self.cfg.rapStoreDir, exist_ok=True)
+
+        #Cases running at the same time can want the same hour. Only one downloads it
+        with open(storePath+'.lock', 'w') as lockFile:
+            fcntl.flock(lockFile, fcntl.LOCK_EX)
+
+            if not os.path.exists(storePath):
+                root, location = self.find(fileName, fileDT)
+                if location is None:
+                    self.cfg.error("RAP file "+fileName+" was not found in "+str(self.roots))
+                    return False
+
+                self.cfg.log("Downloading "+location)
+                fd, tempName = tempfile.mkstemp(dir=self.cfg.rapStoreDir, suffix='.tmp')
+                os.close(fd)
+                try:
+                    self.backends[root].fetch(location, tempName)
+                    os.replace(tempName, storePath)
+                except (OSError, requests.RequestException) as E:
+                    self.cfg.error("Unable to download "+location+": "+str(E))
+                    if os.path.exists(tempName):
+                        os.remove(tempName)
+                    return False
+            else:
+                self.cfg.log(fileName+" is in the RAP store")
+
+        os.makedirs(os.path.dirname(savePath), exist_ok=True)
+        l2store.linkFile(storePath, savePath)
+
+        return True
@@ -0,0 +1,412 @@
+#Run store: every case's _prelim.csv from a run merged into one column-oriented file (runTTRAP.py --compact <run>)
+#post_analysis and manual_vrot_comparison open it with a memory map instead of parsing thousands of CSVs each time.
+#
+#Layout (little endian):
+#   bytes 0-23   MAGIC, offset of the metadata, length of the metadata
+#   64 on        one block per column (each starting on a 64 byte boundary). Every column holds all of the rows of the run,
+#                as float64 or int64 if every value round trips through float or int, float64 followed by a block of
+#                int flags if it's a mix of the two, otherwise fixed width bytes
+#   metadata     JSON with the columns (label, dtype, offset), the headers, the cases (TC, case, header, first and last row)
+#                in the order they were listed, and the size/mtime of each _prelim.csv so a stale store isn't used
+#
+#The groups.pick files are object pickles and stay with each case.
+
+import os
+import json
+import struct
+import tempfile
+import numpy as np
+
+MAGIC = b'TTRAPRUN'
+VERSION = 1
+STOREFILE = 'run_store.ttrap'
+ALIGN = 64
+PREFIX = struct.Struct('<8sQQ')
+
+
+def getStoreFile(runFolder):
+    return os.path.join(runFolder, STOREFILE)
+
+
+def listPrelimFiles(runFolder):
+    """ The TCs in a run (the folder with the TC folders) and (TC, case, _prelim.csv) for each of their cases in listing order.
+        Files in the run folder (the store and any temporary file from a compaction that's running or was interrupted) are skipped.
+    """
+
+    TCs = []
+    prelimFiles = []
+    for TC in os.listdir(runFolder):
+        if not os.path.isdir(os.path.join(runFolder, TC)):
+            continue
+        TCs.append(TC)
+        currentCasesPath = os.path.join(runFolder, TC, 'cases')
+        for case in os.listdir(currentCasesPath):
+            prelimFiles.append((TC, case, os.path.join(currentCasesPath, case, 'results', case+'_prelim.csv')))
+
+    return TCs, prelimFiles
+
+
+def getFileStat(fileName):
+    """ [size, mtime_ns] of a file or None if it isn't there """
+
+    try:
+        stat = os.stat(fileName)
+    except FileNotFoundError:
+        return None
+
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def readPrelimCSV(prelimCSV):
+    """ Reads a _prelim.csv into its header and a 2D array of the row strings.
+        Returns (header, rows, None) or (None, None, error) if the file isn't there.
+    """
+
+    header = []
+    rows = []
+    try:
+        with open(prelimCSV, 'r') as fi:
+            for n, line in enumerate(fi):
+                if n == 0:
+                    header = line.lstrip('#').rstrip('\n').split(',')
+                else:
+                    rows.append(line.rstrip('\n').split(','))
+
+    except FileNotFoundError as err:
+        return None, None, err
+
+    for n, row in enumerate(rows):
+        if len(row) != len(header):
+            raise ValueError(prelimCSV+' line '+str(n+2)+' has '+str(len(row))+' columns but the header has '+str(len(header)))
+
+    if rows:
+        rows = np.array(rows, dtype=str)
+    else:
+        rows = np.empty((0, len(header)), dtype=str)
+
+    return header, rows, None
+
+
+def isFloatString(value):
+    try:
+        return str(float(value)) == value
+    except ValueError:
+        return False
+
+
+def isIntString(value):
+    try:
+        return str(int(value)) == value
+    except ValueError:
+        return False
+
+
+def getColumnKind(values):
+    """ How a column can be stored so every value is written back out as the same string. 'float', 'int', 'number'
+        (floats mixed with ints like the -99900 missing values), or 'bytes'
+    """
+
+    isFloat = [isFloatString(value) for value in values]
+    if all(isFloat):
+        return 'float'
+
+    isInt = [isIntString(value) for value in values]
+    if all(isInt):
+        return 'int'
+    if all(a or b for a, b in zip(isFloat, isInt)):
+        return 'number'
+
+    return 'bytes'
+
+
+def getTextColumns(header):
+    """ Positions of the columns in a _prelim.csv header that the dataloaders keep as text instead of converting them with
+        float() or int() (the IDs, date times, bins, and VCPs). StoreCase.getRows gives these as the _prelim.csv strings.
+    """
+
+    textColumns = set()
+    for i, label in enumerate(header):
+        if label in ('TC', 'case', 'F-EF-rating', 'class') or 'VCP' in label or label.startswith(('DateTime', 'Bin(minutes)', 'BinNumber')):
+            textColumns.add(i)
+
+    return textColumns
+
+
+def compactRun(cfg, runFolder):
+    """ Merge the _prelim.csv of every case in runFolder into runFolder/STOREFILE """
+
+    TCs, prelimFiles = listPrelimFiles(runFolder)
+    cfg.log("Compacting "+str(len(prelimFiles))+" cases in "+runFolder)
+
+    columnIDs = {} #(label, occurrence in the header) -> column number
+    columnValues = [] #column number -> [(first row, values), ...]
+    headers = []
+    headerIDs = {}
+    cases = []
+    nRows = 0
+
+    for TC, case, prelimCSV in prelimFiles:
+
+        stat = getFileStat(prelimCSV)
+        header, rows, err = readPrelimCSV(prelimCSV)
+        if err is not None:
+            cfg.log(str(err)+" Storing "+TC+" "+case+" without results")
+            cases.append({'TC': TC, 'case': case, 'header': None, 'start': nRows, 'stop': nRows, 'stat': None})
+            continue
+
+        #Headers repeat a few labels (e.g. potentialClusters(unitless)) so the columns are told apart by occurrence
+        seen = {}
+        ids = []
+        for label in header:
+            key = (label, seen.get(label, 0))
+            seen[label] = key[1] + 1
+            if key not in columnIDs:
+                columnIDs[key] = len(columnValues)
+                columnValues.append([])
+            ids.append(columnIDs[key])
+
+        if tuple(ids) not in headerIDs:
+            headerIDs[tuple(ids)] = len(headers)
+            headers.append(ids)
+
+        for i, columnID in enumerate(ids):
+            columnValues[columnID].append((nRows, rows[:, i].tolist()))
+
+        cases.append({'TC': TC, 'case': case, 'header': headerIDs[tuple(ids)], 'start': nRows, 'stop': nRows+len(rows), 'stat': stat})
+        nRows += len(rows)
+
+    labels = [None]*len(columnIDs)
+    for (label, occurrence), columnID in columnIDs.items():
+        labels[columnID] = label
+
+    fileName = getStoreFile(runFolder)
+    #Made next to the store so os.replace stays on one filesystem. listPrelimFiles skips it if it's left behind
+    fd, tempName = tempfile.mkstemp(dir=runFolder, prefix=STOREFILE+'.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fi:
+
+            fi.write(b'\0'*ALIGN)
+            offset = ALIGN
+            columns = []
+            for columnID, parts in enumerate(columnValues):
+
+                values = [value for start, part in parts for value in part]
+                kind = getColumnKind(values)
+                isInt = None
+                if kind == 'float' or kind == 'number':
+                    column = np.full(nRows, np.nan, dtype='<f8')
+                    for start, part in parts:
+                        column[start:start+len(part)] = np.array(part, dtype=float)
+                    if kind == 'number':
+                        #Which values were ints so they're written back without the .0
+                        isInt = np.zeros(nRows, dtype=bool)
+                        for start, part in parts:
+                            isInt[start:start+len(part)] = [isIntString(value) for value in part]
+                elif kind == 'int':
+                    column = np.zeros(nRows, dtype='<i8')
+                    for start, part in parts:
+                        column[start:start+len(part)] = np.array(part, dtype=np.int64)
+                else:
+                    column = np.zeros(nRows, dtype='S'+str(max([len(value.encode()) for value in values] + [1])))
+                    for start, part in parts:
+                        column[start:start+len(part)] = [value.encode() for value in part]
+
+                columns.append({'label': labels[columnID], 'dtype': column.dtype.str, 'offset': offset, 'intOffset': None})
+                for block in (column, isInt):
+                    if block is None:
+                        continue
+                    if block is isInt:
+                        columns[-1]['intOffset'] = offset
+                    data = block.tobytes()
+                    fi.write(data)
+                    offset += len(data)
+                    padding = (-offset) % ALIGN
+                    fi.write(b'\0'*padding)
+                    offset += padding
+
+            meta = json.dumps({'version': VERSION, 'rows': nRows, 'TCs': TCs, 'columns': columns, 'headers': headers, 'cases': cases}).encode()
+            fi.write(meta)
+            fi.seek(0)
+            fi.write(PREFIX.pack(MAGIC, offset, len(meta)))
+
+        os.replace(tempName, fileName)
+    except BaseException:
+        if os.path.exists(tempName):
+            os.remove(tempName)
+        raise
+
+    cfg.log("Wrote "+fileName+" with "+str(nRows)+" rows and "+str(len(columns))+" columns")
+
+    return fileName
+
+
+class StoreCase():
+
+    """ One case in a RunStore. header is its _prelim.csv header and getColumn(i) column i of that header """
+
+    def __init__(self, store, header, columnIDs, start, stop):
+
+        self.store = store
+        self.header = header
+        self.columnIDs = columnIDs
+        self.start = start
+        self.stop = stop
+
+        return
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def getColumn(self, i):
+        """ Column i as float64/int64 (a view of the memory map) or str """
+
+        column = self.store.getColumn(self.columnIDs[i])[self.start:self.stop]
+        if column.dtype.kind == 'S':
+            column = np.char.decode(column)
+            try:
+                column = column.astype(float)
+            except ValueError:
+                pass
+
+        return column
+
+    def getRows(self, textColumns=()):
+        """ The rows as tuples of values straight from the columns: float/int for numeric columns (float() of them is the
+            same as float() of the _prelim.csv string) and str for the others. Columns in textColumns are given as the
+            _prelim.csv strings.
+        """
+
+        columns = []
+        for i, columnID in enumerate(self.columnIDs):
+            if i in textColumns:
+                columns.append(self.store.getColumnStrings(columnID, self.start, self.stop))
+            else:
+                columns.append(self.store.getColumnValues(columnID, self.start, self.stop))
+
+        return list(zip(*columns))
+
+
+class RunStore():
+
+    """ A run store file opened with a memory map. Columns are only read from disk when they're used. """
+
+    def __init__(self, fileName):
+
+        self.fileName = fileName
+
+        with open(fileName, 'rb') as fi:
+            magic, metaOffset, metaLength = PREFIX.unpack(fi.read(PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(fileName+' is not a TTRAP run store')
+            fi.seek(metaOffset)
+            meta = json.loads(fi.read(metaLength).decode())
+
+        if meta['version'] != VERSION:
+            raise ValueError(fileName+' is run store version '+str(meta['version'])+' but '+str(VERSION)+' is needed. Run runTTRAP.py --compact again')
+
+        self.nRows = meta['rows']
+        self.TCs = meta['TCs']
+        self.columns = meta['columns']
+        self.headers = meta['headers']
+        self.cases = meta['cases']
+        #A plain ndarray view of the map so slicing it doesn't go through the memmap subclass
+        self.data = np.memmap(fileName, dtype=np.uint8, mode='r').view(np.ndarray)
+        self.columnViews = {}
+
+        self.caseIndex = {}
+        for n, case in enumerate(self.cases):
+            self.caseIndex[(case['TC'], case['case'])] = n
+
+        return
+
+    def getColumn(self, columnID):
+        """ A whole column (every row in the run) as a view of the memory map """
+
+        if columnID not in self.columnViews:
+            column = self.columns[columnID]
+            dtype = np.dtype(column['dtype'])
+            self.columnViews[columnID] = self.data[column['offset']:column['offset']+dtype.itemsize*self.nRows].view(dtype)
+
+        return self.columnViews[columnID]
+
+    def getColumnValues(self, columnID, start, stop):
+        """ Rows start to stop of a column as a list of floats/ints, or strs for a bytes column """
+
+        values = self.getColumn(columnID)[start:stop].tolist()
+        if self.columns[columnID]['dtype'][1] == 'S':
+            return [value.decode() for value in values]
+
+        return values
+
+    def getColumnStrings(self, columnID, start, stop):
+        """ Rows start to stop of a column as the strings from the _prelim.csv files """
+
+        values = self.getColumnValues(columnID, start, stop)
+        if self.columns[columnID]['dtype'][1] == 'S':
+            return values
+        isInt = self.getIntFlags(columnID)
+        if isInt is None:
+            return [str(value) for value in values]
+
+        return [str(int(value)) if flag else str(value) for value, flag in zip(values, isInt[start:stop].tolist())]
+
+    def getIntFlags(self, columnID):
+        """ Which values of a mixed float/int column were ints (None for other columns) """
+
+        column = self.columns[columnID]
+        if column['intOffset'] is None:
+            return None
+
+        return self.data[column['intOffset']:column['intOffset']+self.nRows].view(bool)
+
+    def getTCs(self):
+        return list(self.TCs)
+
+    def getCases(self, TC):
+        return [case['case'] for case in self.cases if case['TC'] == TC]
+
+    def getCase(self, TC, case):
+        """ The StoreCase for a case or None if it didn't have a _prelim.csv """
+
+        case = self.cases[self.caseIndex[(TC, case)]]
+        if case['header'] is None:
+            return None
+
+        columnIDs = self.headers[case['header']]
+
+        return StoreCase(self, [self.columns[columnID]['label'] for columnID in columnIDs], columnIDs, case['start'], case['stop'])
+
+    def isCurrent(self, runFolder):
+        """ Whether the run still has the same cases and _prelim.csv files as when the store was made """
+
+        TCs, prelimFiles = listPrelimFiles(runFolder)
+        if TCs != self.TCs or len(prelimFiles) != len(self.cases):
+            return False
+
+        for (TC, case, prelimCSV), stored in zip(prelimFiles, self.cases):
+            if TC != stored['TC'] or case != stored['case'] or getFileStat(prelimCSV) != stored['stat']:
+                return False
+
+        return True
+
+
+def openRunStore(runFolder):
+    """ The RunStore for a run if it has one that's up to date, otherwise None (and the CSVs should be read) """
+
+    fileName = getStoreFile(runFolder)
+    if not os.path.exists(fileName):
+        return None
+
+    try:
+        store = RunStore(fileName)
+    except (OSError, ValueError, KeyError, struct.error) as E:
+        print('Unable to read run store', fileName, E, '\b. Reading the _prelim.csv files')
+        return None
+
+    if not store.isCurrent(runFolder):
+        print('Run store', fileName, 'is older than the _prelim.csv files. Reading the CSVs (run runTTRAP.py --compact', runFolder, 'to update it)')
+        return None
+
+    print('Using run store', fileName)
+
+    return store
@@ -0,0 +1,95 @@
+#Spatial index used to find the clusters near a point without measuring the distance to every cluster
+#The clusters are hashed into a lat/lon grid once and a radius query only looks at the grid cells its bounding box touches
+
+import math
+import numpy as np
+from ttrappy import distance
+
+
+class ClusterIndex():
+
+    """ Grid hash of cluster locations for radius queries.
+
+        clusters (list): Clusters with getLatitude()/getLongitude() (degrees)
+        cellSize (float): Size of the grid cells in km (north-south). Around the typical query radius works best.
+
+        query() returns the indices of every cluster that could be within the radius and count() the number that are. Both
+        measure the candidates with distance.calculateDistanceArray, so counts match measuring every cluster.
+    """
+
+    def __init__(self, clusters, cellSize=25):
+
+        self.lats = np.array([cluster.getLatitude()[0] for cluster in clusters], dtype=float)
+        self.lons = np.array([cluster.getLongitude()[0] for cluster in clusters], dtype=float)
+        self.cellDeg = math.degrees(max(float(cellSize), 1)/distance.R)
+
+        self.cells = {}
+        if len(self.lats):
+            rows = np.floor(self.lats/self.cellDeg).astype(np.int64)
+            cols = np.floor(self.lons/self.cellDeg).astype(np.int64)
+            for i, cell in enumerate(zip(rows.tolist(), cols.tolist())):
+                self.cells.setdefault(cell, []).append(i)
+
+        return
+
+    def __len__(self):
+        return len(self.lats)
+
+    def getCandidates(self, lat, lon, radius):
+        """ Indices (sorted) of the clusters in the grid cells covering the bounding box of the circle """
+
+        if not len(self.lats):
+            return np.array([], dtype=np.int64)
+
+        #Bounding box of a circle on the sphere (https://www.movable-type.co.uk/scripts/latlong-db.html)
+        angular = radius/distance.R
+        latR = math.radians(lat)
+        if abs(latR) + angular >= math.pi/2:
+            return np.arange(len(self.lats)) #The box reaches a pole. Just check everything
+
+        dLon = math.degrees(math.asin(min(1, math.sin(angular)/math.cos(latR))))
+        dLat = math.degrees(angular)
+        if lon - dLon < -180 or lon + dLon > 180:
+            return np.arange(len(self.lats)) #Crosses the antimeridian
+
+        #Pad by a cell so points sitting on a cell edge aren't missed to rounding
+        rowStart = int(math.floor((lat - dLat)/self.cellDeg)) - 1
+        rowEnd = int(math.floor((lat + dLat)/self.cellDeg)) + 1
+        colStart = int(math.floor((lon - dLon)/self.cellDeg)) - 1
+        colEnd = int(math.floor((lon + dLon)/self.cellDeg)) + 1
+
+        if (rowEnd - rowStart + 1)*(colEnd - colStart + 1) > len(self.cells):
+            #More cells in the box than occupied cells. Walk the occupied ones instead
+            candidates = [i for (row, col), indices in self.cells.items() if rowStart <= row <= rowEnd and colStart <= col <= colEnd for i in indices]
+        else:
+            candidates = []
+            for row in range(rowStart, rowEnd + 1):
+                for col in range(colStart, colEnd + 1):
+                    candidates.extend(self.cells.get((row, col), ()))
+
+        return np.sort(np.array(candidates, dtype=np.int64))
+
+    def getDistances(self, lat, lon, radius):
+        """ Candidate indices and their great circle distances (km) from lat/lon """
+
+        candidates = self.getCandidates(lat, lon, radius)
+        if not len(candidates):
+            return candidates, np.array([], dtype=float)
+
+        return candidates, distance.calculateDistanceArray(lat, lon, self.lats[candidates], self.lons[candidates])
+
+    def query(self, lat, lon, radius, slack=1e-6):
+        """ Indices (in order) of the clusters within radius (km) of lat/lon. slack (km) widens the radius a hair so a caller
+            that measures the distance again with the scalar functions never loses a cluster sitting right on the radius
+        """
+
+        candidates, distances = self.getDistances(lat, lon, radius + slack)
+
+        return candidates[distances <= radius + slack].tolist()
+
+    def count(self, lat, lon, radius):
+        """ Number of clusters within radius (km) of lat/lon """
+
+        candidates, distances = self.getDistances(lat, lon, radius)
+
+        return int(np.count_nonzero(distances <= radius))
@@ -6,9 +6,23 @@ from datetime import timedelta as td
 from datetime import datetime
 from ttrappy import error as err
 from ttrappy import distance
+from ttrappy import spatialindex
 import math
+import numpy as np
 import os
 
+#The batch interest scores use the scalar distance functions elementwise instead of the NumPy versions so they come out exactly
+#the same as the scalar scores (NumPy's trig can differ in the last bit). There are only a few candidates left to score after
+#getNearbyClusters prunes them.
+distanceUfunc = np.frompyfunc(distance.calculateDistance, 4, 1)
+bearingUfunc = np.frompyfunc(distance.calculateBearingAT, 4, 1)
+
+def calculateDistances(lat1, lon1, lat2, lon2):
+    return np.asarray(distanceUfunc(lat1, lon1, lat2, lon2), dtype=float)
+    
+def calculateBearings(lat1, lon1, lat2, lon2):
+    return np.asarray(bearingUfunc(lat1, lon1, lat2, lon2), dtype=float)
+
 class StormBuilder():
 
     
@@ -40,6 +54,7 @@ class StormBuilder():
         self.case = case
         self.stormGroups = None
         self.shearGroups = None
+        self.clusterIndexes = {} #id of a cluster list -> (the list, its ClusterIndex). See getClusterIndex()
         
         return
     
@@ -77,17 +92,15 @@ class StormBuilder():
                 
                 if sg.getFirstTime().strftime('%Y%m%d-%H%M%S') == time.getDT() and time.getTrackClusters():
 
-                    for trackCluster in time.getTrackClusters():
+                    #Only clusters within maxTrackDist can have an interest score
+                    trackClusters = self.getNearbyClusters(sg.getLowestLat(), sg.getLowestLon(), time.getTrackClusters(), self.cfg.maxTrackDist)
                     
-                        currentTrackInterest = self.calculateTrackInterest(sg, trackCluster)
-                    
-                        if currentTrackInterest:
-                            if currentTrackInterest > bestTrackInterest:
-                                
-                                bestTrackInterest = currentTrackInterest
-                                
-                                if bestTrackInterest >= self.cfg.minTrackScore:
-                                    bestTrackCluster = trackCluster
+                    if trackClusters:
+                        trackInterest = self.calculateTrackInterestBatch(sg, trackClusters)
+                        index, bestTrackInterest = self.pickBestScore(trackInterest['score'], self.cfg.minTrackScore, floor=bestTrackInterest)
+                        
+                        if index is not None:
+                            bestTrackCluster = trackClusters[index]
                     
                     if bestTrackCluster:
                         
@@ -99,18 +112,14 @@ class StormBuilder():
                             
                             #Now do the same with the echo tops and the best track cluster if one was found
                         
-                            for etCluster in time.getETClusters():
+                            etClusters = self.getNearbyClusters(bestTrackCluster.getLatitude()[0], bestTrackCluster.getLongitude()[0], time.getETClusters(), self.cfg.maxTopDist)
                             
-                                currentETInterest = self.calculateETInterest(etCluster, bestTrackCluster)
+                            if etClusters:
+                                etInterest = self.calculateETInterestBatch(etClusters, bestTrackCluster)
+                                index, bestETInterest = self.pickBestScore(etInterest['score'], self.cfg.minTopScore, floor=bestETInterest)
                                 
-                                if currentETInterest:
-                                    if currentETInterest > bestETInterest:
-                                        
-                                        bestETInterest = currentETInterest
-                                        
-                                        if bestETInterest >= self.cfg.minTopScore:
-                                        
-                                            bestETCluster = etCluster
+                                if index is not None:
+                                    bestETCluster = etClusters[index]
                                         
                             
                             if bestETCluster:
@@ -203,9 +212,10 @@ class StormBuilder():
                 try:
                     if isMax:
                         currentClusters = []
+                        tiltClusters = self.getCorrespondingTime(iCluster).getMaxShearClusters(tilt)
                         
                         #self.cfg.error("current cluster check "+str(self.getCorrespondingTime(iCluster).getMaxShearClusters(tilt)))
-                        for currentCluster in self.getCorrespondingTime(iCluster).getMaxShearClusters(tilt):
+                        for currentCluster in tiltClusters:
                             currentCluster.setVLat(iCluster.getVLat()[0])
                             currentCluster.setVLon(iCluster.getVLon()[0])
                             currentCluster.setMotionDirection(iCluster.getMotionDirection()[0])
@@ -214,8 +224,9 @@ class StormBuilder():
                             currentClusters.append(currentCluster)
                     else:
                         currentClusters = []
+                        tiltClusters = self.getCorrespondingTime(iCluster).getMinShearClusters(tilt)
                         
-                        for currentCluster in self.getCorrespondingTime(iCluster).getMinShearClusters(tilt):
+                        for currentCluster in tiltClusters:
                             currentCluster.setVLat(iCluster.getVLat()[0])
                             currentCluster.setVLon(iCluster.getVLon()[0])
                             currentCluster.setMotionDirection(iCluster.getMotionDirection()[0])
@@ -235,20 +246,19 @@ class StormBuilder():
                 bestInterest = 0
                 
                 self.cfg.log(tilt+" Current Clusters\n"+str(currentClusters))
-                for cluster in currentClusters:
-                    
-                    #currentInterest = self.calculateShearInterest(latestCluster, cluster, iCluster.getMotionDirection()[0])
-                    currentInterest = self.calculateShearInterest(iCluster, cluster, iCluster.getMotionDirection()[0], isTilt=True)
-                    
-                    if not currentInterest:
-                        continue
+                
+                #With projection, clusters further than maxShearDistTilt from the projected point are rejected so don't score them
+                candidateClusters = currentClusters
+                if self.cfg.projectReference and currentClusters:
+                    projLat, projLon = self.getSearchPoint(iCluster, currentClusters)
+                    candidateClusters = self.getNearbyClusters(projLat, projLon, tiltClusters, self.cfg.maxShearDistTilt)
                     
-                    if currentInterest > bestInterest:
+                if candidateClusters:
+                    tiltInterest = self.calculateShearInterestBatch(iCluster, candidateClusters, iCluster.getMotionDirection()[0], isTilt=True)
+                    index, bestInterest = self.pickBestScore(tiltInterest['score'], self.cfg.minShearScore, floor=bestInterest)
                     
-                        bestInterest = currentInterest
-                        
-                        if bestInterest >= self.cfg.minShearScore:
-                            bestCluster = cluster
+                    if index is not None:
+                        bestCluster = candidateClusters[index]
                 
                 #Check that the tilt has a folder in the AzShear folder
                 if tilt not in referenceTilts:
@@ -274,10 +284,10 @@ class StormBuilder():
                 if self.cfg.projectReference:
                     dt = abs((iCluster.getDT() - bestCluster.getDT()).total_seconds())
                     projLat, projLon = iCluster.getClusterProjection(dt)
-                    clusterCount = self.getNearbyClusterCount(projLat, projLon, currentClusters, self.cfg.maxShearDistTilt)
+                    clusterCount = self.getNearbyClusterCount(projLat, projLon, tiltClusters, self.cfg.maxShearDistTilt)
                     bestCluster.setPotentialClusterCount(clusterCount)
                 else:
-                    clusterCount = self.getNearbyClusterCount(iCluster.getLatitude()[0], iCluster.getLongitude()[0], currentClusters, self.cfg.maxShearDistTilt)
+                    clusterCount = self.getNearbyClusterCount(iCluster.getLatitude()[0], iCluster.getLongitude()[0], tiltClusters, self.cfg.maxShearDistTilt)
                     bestCluster.setPotentialClusterCount(clusterCount)
                     
                 currentGroup.setCluster(bestCluster, tilt)
@@ -330,7 +340,7 @@ class StormBuilder():
         #Finally, add them all up 
         interestScore = distanceTerm + directionTerm
         
-        self.cfg.log("Calculated echo top interest "+str(interestScore)+" from DT distance, direction,difference and terms terms "+str(et.getDT())+" "+str(distanceBetween)+" "+str(direction)+" "+str(directionDifference)+" "+str(distanceTerm)+","+str(directionTerm))
+        self.cfg.debug("Calculated echo top interest "+str(interestScore)+" from DT distance, direction,difference and terms terms "+str(et.getDT())+" "+str(distanceBetween)+" "+str(direction)+" "+str(directionDifference)+" "+str(distanceTerm)+","+str(directionTerm))
                 
         return interestScore
         
@@ -372,7 +382,7 @@ class StormBuilder():
         #Finally, add them all up 
         interestScore = distanceTerm + directionTerm
         
-        self.cfg.log("Calculated track interest score "+str(interestScore)+" from distance, direction terms "+str(distanceTerm)+","+str(directionTerm))
+        self.cfg.debug("Calculated track interest score "+str(interestScore)+" from distance, direction terms "+str(distanceTerm)+","+str(directionTerm))
                 
         return interestScore
         
@@ -449,8 +459,7 @@ class StormBuilder():
                 return orderedMaxShearsOfInterest, True
             else:
             
-                with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                    fi.write(str(self.case.storm)+','+str(self.case.ID)+','+str(self.case.isTor)+',5,NA,The min AzShear won\n')
+                self.cfg.appendCSV(self.cfg.logName+'_events.csv', str(self.case.storm)+','+str(self.case.ID)+','+str(self.case.isTor)+',5,NA,The min AzShear won\n')
                     
                 return orderedMinShearsOfInterest, False
                 
@@ -461,8 +470,7 @@ class StormBuilder():
         
         elif orderedMinShearsOfInterest and not orderedMaxShearsOfInterest:
             
-            with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                fi.write(str(self.case.storm)+','+str(self.case.ID)+','+str(self.case.isTor)+',5,NA,The min AzShear won\n')
+            self.cfg.appendCSV(self.cfg.logName+'_events.csv', str(self.case.storm)+','+str(self.case.ID)+','+str(self.case.isTor)+',5,NA,The min AzShear won\n')
             
             self.cfg.log("Min shear won with "+str(minShearPoints)+" points")
             
@@ -503,16 +511,16 @@ class StormBuilder():
         
         #First, calculate the distance term
         if self.cfg.projectReference and not isTilt:
-            self.cfg.log("Calculating IS score with projections")
+            self.cfg.debug("Calculating IS score with projections")
             if forward:
-                self.cfg.log("Calculating distance between "+str(coi.getForwardLat()[0])+" "+str(coi.getForwardLon()[0])+" and "+str(tc.getLatitude()[0])+" "+str(tc.getLongitude()[0]))
+                self.cfg.debug("Calculating distance between "+str(coi.getForwardLat()[0])+" "+str(coi.getForwardLon()[0])+" and "+str(tc.getLatitude()[0])+" "+str(tc.getLongitude()[0]))
                 distanceBetween = distance.calculateDistance(coi.getForwardLat()[0], coi.getForwardLon()[0], tc.getLatitude()[0], tc.getLongitude()[0])
             else:
-                self.cfg.log("Calculating distance between "+str(coi.getLatitude()[0])+" "+str(coi.getLongitude()[0])+" and "+str(tc.getBackwardLat()[0])+" "+str(tc.getBackwardLon()[0]))
+                self.cfg.debug("Calculating distance between "+str(coi.getLatitude()[0])+" "+str(coi.getLongitude()[0])+" and "+str(tc.getBackwardLat()[0])+" "+str(tc.getBackwardLon()[0]))
                 distanceBetween = distance.calculateDistance(coi.getLatitude()[0], coi.getLongitude()[0], tc.getBackwardLat()[0], tc.getBackwardLon()[0])
         #If this is an isTilt, use the projection from the coi
         elif self.cfg.projectReference and isTilt:
-            self.cfg.log("Calculating IS score with projection by tilt")
+            self.cfg.debug("Calculating IS score with projection by tilt")
             #Since we are only projecting foward, we don't need to check if it's foward or backward 
             dt = abs((tc.getDT() - coi.getDT()).total_seconds())
             projLat, projLon = coi.getClusterProjection(dt)
@@ -523,11 +531,11 @@ class StormBuilder():
         
         #Check for a disqualifying distance and return None if it is disqualified
         if (distanceBetween > self.cfg.maxShearDist) and not isTilt and float(self.cfg.shearDistWeight) != 0:
-            self.cfg.log("Rejected with distance between "+str(distanceBetween))
+            self.cfg.debug("Rejected with distance between "+str(distanceBetween))
             return None
         elif isTilt and (distanceBetween > self.cfg.maxShearDistTilt) and self.cfg.projectReference:
             #If we are calculating the interest score for tilt-by-tilt associations using the projected location, use a different, ideally smaller, rejection distance to hopefully reduce false associations
-            self.cfg.log("Rejected tilt with distance between "+str(distanceBetween))
+            self.cfg.debug("Rejected tilt with distance between "+str(distanceBetween))
             return None
         
         
@@ -542,7 +550,7 @@ class StormBuilder():
                 direction = distance.calculateBearingAT(coi.getLatitude()[0], coi.getLongitude()[0], tc.getBackwardLat()[0], tc.getBackwardLon()[0])
                 
         elif self.cfg.projectReference and isTilt:
-            self.cfg.log("Calculating IS score with projection by tilt")
+            self.cfg.debug("Calculating IS score with projection by tilt")
             #Since we are only projecting foward, we don't need to check if it's foward or backward 
             dt = abs((tc.getDT() - coi.getDT()).total_seconds())
             projLat, projLon = coi.getClusterProjection(dt)
@@ -569,7 +577,7 @@ class StormBuilder():
         #Also stop calculating in the dirrection difference is greater than that allowed. This rejection should not be used if the weight for the direction term is 0.
         #Also note: using projected points may require higher maximum deviations for tracking to perform properly.
         if directionDifference > self.cfg.maxBearingDev and distanceBetween > (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor) and float(self.cfg.shearVectorWeight) != 0:
-            self.cfg.log("Rejected with bearing difference "+str(directionDifference)+" bearing "+str(direction)+" "+str(avgMotion)+" at dist "+str(distanceBetween))
+            self.cfg.debug("Rejected with bearing difference "+str(directionDifference)+" bearing "+str(direction)+" "+str(avgMotion)+" at dist "+str(distanceBetween))
             return None
         
         
@@ -585,10 +593,10 @@ class StormBuilder():
 
         
         #Finally, add them all up 
-        self.cfg.log("distance, and distance, direction, and intensity terms "+str(distanceBetween)+","+str(distanceTerm)+","+str(directionTerm)+","+str(intensityTerm))
+        self.cfg.debug("distance, and distance, direction, and intensity terms "+str(distanceBetween)+","+str(distanceTerm)+","+str(directionTerm)+","+str(intensityTerm))
         interestScore = distanceTerm + directionTerm + intensityTerm
         
-        self.cfg.log("Calculated shear interest score "+str(interestScore))
+        self.cfg.debug("Calculated shear interest score "+str(interestScore))
                 
         return interestScore
         
@@ -629,21 +637,332 @@ class StormBuilder():
         #self.cfg.error("distance and distance and intensity terms "+str(distanceBetween)+" "+str(distanceTerm)+","+str(intensityTerm)+" initial")
         interestScore = distanceTerm + intensityTerm
         
-        self.cfg.log("Calculated shear initial interest score "+str(interestScore))
+        self.cfg.debug("Calculated shear initial interest score "+str(interestScore))
                 
         return interestScore
 
+    def getClusterLocations(self, clusters):
+        """ Arrays of the latitudes and longitudes of a list of clusters """
+        
+        lats = np.array([cluster.getLatitude()[0] for cluster in clusters], dtype=float)
+        lons = np.array([cluster.getLongitude()[0] for cluster in clusters], dtype=float)
+        
+        return lats, lons
+        
+    def getProjectionArrays(self, reference, clusters, backward=False):
+        """ Arrays of the reference cluster projected to the time of each cluster (backward in time if backward) """
+        
+        dts = [abs((cluster.getDT() - reference.getDT()).total_seconds()) for cluster in clusters]
+        
+        #Clusters from the same time share a projection so only project once per time difference
+        projections = {}
+        for dt in dts:
+            if dt not in projections:
+                projections[dt] = reference.getClusterProjection(dt*-1 if backward else dt)
+                
+        projLats = np.array([projections[dt][0] for dt in dts], dtype=float)
+        projLons = np.array([projections[dt][1] for dt in dts], dtype=float)
+        
+        return projLats, projLons
+        
+    def calculateDirectionDifference(self, reference, directions):
+        """ Array of the difference between the reference bearing and directions (deg) worked out the same way as the scalar interest scores """
+        
+        directions = np.where(directions < 0, directions + 360, directions)
+        differences = np.abs(reference - directions)
+        
+        wrapped = np.where(directions < reference, np.abs(reference - (directions + 360)), np.where(directions > reference, np.abs((reference + 360) - directions), differences))
+        differences = np.where(differences > 180, wrapped, differences)
+        
+        return directions, differences
+        
+    def calculateShearInterestBatch(self, reference, candidates, avgMotion, forward=True, isTilt=False):
+        """ calculateShearInterest between a reference cluster and a list of candidate clusters at once.
+        
+            The reference is the coi and the candidates the tc when forward or isTilt. Otherwise the candidates are the coi and the
+            reference the tc, the same as calling calculateShearInterest(candidate, reference, avgMotion, forward=False).
+            
+            Returns a dictionary of arrays with an element per candidate: distance, direction, directionDifference, distanceTerm,
+            directionTerm, intensityTerm, score, and rejected. Rejected candidates (where calculateShearInterest returns None) have a NaN score.
+        """
+        
+        lats, lons = self.getClusterLocations(candidates)
+        absShears = np.array([cluster.getAbsShear()[0] for cluster in candidates], dtype=float)
+        
+        #Same points as calculateShearInterest
+        if self.cfg.projectReference and not isTilt:
+            if forward:
+                lat1, lon1, lat2, lon2 = reference.getForwardLat()[0], reference.getForwardLon()[0], lats, lons
+            else:
+                lat1, lon1, lat2, lon2 = lats, lons, reference.getBackwardLat()[0], reference.getBackwardLon()[0]
+        elif self.cfg.projectReference and isTilt:
+            projLats, projLons = self.getProjectionArrays(reference, candidates)
+            lat1, lon1, lat2, lon2 = projLats, projLons, lats, lons
+        elif forward or isTilt:
+            lat1, lon1, lat2, lon2 = reference.getLatitude()[0], reference.getLongitude()[0], lats, lons
+        else:
+            lat1, lon1, lat2, lon2 = lats, lons, reference.getLatitude()[0], reference.getLongitude()[0]
+            
+        distances = calculateDistances(lat1, lon1, lat2, lon2)
+        
+        rejected = np.zeros(len(candidates), dtype=bool)
+        if not isTilt and float(self.cfg.shearDistWeight) != 0:
+            rejected |= distances > self.cfg.maxShearDist
+        elif isTilt and self.cfg.projectReference:
+            rejected |= distances > self.cfg.maxShearDistTilt
+            
+        distanceTerms = ((self.cfg.maxShearDist - distances)/self.cfg.maxShearDist) * self.cfg.shearDistWeight
+        
+        directions, directionDifferences = self.calculateDirectionDifference(avgMotion, calculateBearings(lat1, lon1, lat2, lon2))
+        
+        if float(self.cfg.shearVectorWeight) != 0:
+            rejected |= (directionDifferences > self.cfg.maxBearingDev) & (distances > (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor))
+            
+        directionTerms = ((180 - directionDifferences)/180) * self.cfg.shearVectorWeight
+        
+        if forward or isTilt:
+            coiShears, tcShears = np.full(len(candidates), reference.getAbsShear()[0], dtype=float), absShears
+        else:
+            coiShears, tcShears = absShears, np.full(len(candidates), reference.getAbsShear()[0], dtype=float)
+            
+        with np.errstate(divide='ignore', invalid='ignore'):
+            intensityTerms = np.where(coiShears >= tcShears, (tcShears / coiShears) * self.cfg.shearIntensityWeight,\
+                                np.where(coiShears < tcShears, (coiShears / tcShears) * self.cfg.shearIntensityWeight, 0))
+                                
+        scores = distanceTerms + directionTerms + intensityTerms
+        scores[rejected] = np.nan
+        
+        self.cfg.debug("Calculated "+str(len(candidates))+" shear interest scores against "+str(reference.getID()[0])+" with "+str(int(np.count_nonzero(rejected)))+" rejected")
+        
+        return {'distance': distances, 'direction': directions, 'directionDifference': directionDifferences, 'distanceTerm': distanceTerms,
+                'directionTerm': directionTerms, 'intensityTerm': intensityTerms, 'score': scores, 'rejected': rejected}
+                
+    def calculateTrackInterestBatch(self, sg, candidates):
+        """ calculateTrackInterest between a ShearGroup and a list of TrackClusters at once. Returns the same dictionary as calculateShearInterestBatch without intensityTerm """
+        
+        lats, lons = self.getClusterLocations(candidates)
+        
+        distances = calculateDistances(sg.getLowestLat(), sg.getLowestLon(), lats, lons)
+        rejected = distances > self.cfg.maxTrackDist
+        
+        distanceTerms = ((self.cfg.maxTrackDist - distances)/self.cfg.maxTrackDist) * self.cfg.trackDistWeight
+        
+        directions, directionDifferences = self.calculateDirectionDifference(sg.getCluster(self.cfg.tiltList[0]).getShearDirection(),\
+                                                calculateBearings(sg.getLowestLat(), sg.getLowestLon(), lats, lons))
+        directionTerms = ((180 - directionDifferences)/180) * self.cfg.trackVectorWeight
+        
+        scores = distanceTerms + directionTerms
+        scores[rejected] = np.nan
+        
+        self.cfg.debug("Calculated "+str(len(candidates))+" track interest scores for "+str(sg.getID())+" with "+str(int(np.count_nonzero(rejected)))+" rejected")
+        
+        return {'distance': distances, 'direction': directions, 'directionDifference': directionDifferences, 'distanceTerm': distanceTerms,
+                'directionTerm': directionTerms, 'score': scores, 'rejected': rejected}
+                
+    def calculateETInterestBatch(self, candidates, tc):
+        """ calculateETInterest between a list of Echo-Top clusters and a TrackCluster at once. Returns the same dictionary as calculateTrackInterestBatch """
+        
+        lats, lons = self.getClusterLocations(candidates)
+        
+        distances = calculateDistances(tc.getLatitude()[0], tc.getLongitude()[0], lats, lons)
+        rejected = distances > self.cfg.maxTopDist
+        
+        distanceTerms = ((self.cfg.maxTopDist - distances)/self.cfg.maxTopDist) * self.cfg.topDistWeight
+        
+        directions, directionDifferences = self.calculateDirectionDifference(tc.getShearDirection(),\
+                                                calculateBearings(tc.getLatitude()[0], tc.getLongitude()[0], lats, lons))
+        directionTerms = ((180 - directionDifferences)/180) * self.cfg.topVectorWeight
+        
+        scores = distanceTerms + directionTerms
+        scores[rejected] = np.nan
+        
+        self.cfg.debug("Calculated "+str(len(candidates))+" echo top interest scores for "+str(tc.getID()[0])+" with "+str(int(np.count_nonzero(rejected)))+" rejected")
+        
+        return {'distance': distances, 'direction': directions, 'directionDifference': directionDifferences, 'distanceTerm': distanceTerms,
+                'directionTerm': directionTerms, 'score': scores, 'rejected': rejected}
+                
+    def calculateShearInterestInitialBatch(self, candidates):
+        """ calculateShearInterestInitial for a list of clusters at once. Returns a dictionary of distance, distanceTerm, intensityTerm, score, and rejected arrays """
+        
+        lats, lons = self.getClusterLocations(candidates)
+        absShears = np.array([cluster.getAbsShear()[0] for cluster in candidates], dtype=float)
+        
+        distances = calculateDistances(self.case.startLat, self.case.startLon, lats, lons)
+        rejected = distances > self.cfg.maxShearDistInit
+        
+        distanceTerms = ((self.cfg.maxShearDistInit - distances)/self.cfg.maxShearDistInit) * self.cfg.shearDistWeight
+        intensityTerms = (absShears/0.005)*self.cfg.shearIntensityWeight
+        
+        scores = distanceTerms + intensityTerms
+        scores[rejected] = np.nan
+        
+        self.cfg.debug("Calculated "+str(len(candidates))+" shear initial interest scores with "+str(int(np.count_nonzero(rejected)))+" rejected")
+        
+        return {'distance': distances, 'distanceTerm': distanceTerms, 'intensityTerm': intensityTerms, 'score': scores, 'rejected': rejected}
+        
+    def pickBestScore(self, scores, minScore, floor=0, mask=None):
+        """ Picks the winning score the same way the scalar loops do. Scores that were rejected (NaN) or are 0 never count.
+            The winner is the first of the highest scores above floor that is at least minScore (and in mask if given).
+            
+            Returns the index of the winner (None if there isn't one) and the highest score above floor (floor if none), which
+            is what the loops report as the max interest.
+        """
+        
+        scores = np.asarray(scores, dtype=float)
+        valid = (scores != 0) & (scores > floor)
+        
+        best = float(scores[valid].max()) if valid.any() else floor
+        
+        winners = valid & (scores >= minScore)
+        if mask is not None:
+            winners &= mask
+            
+        if not winners.any():
+            return None, best
+            
+        return int(np.argmax(np.where(winners, scores, -np.inf))), best
+        
+    def calculateTrackStepBatch(self, lastCluster, candidates, backward=False, fromCandidate=True):
+        """ Distances and bearing deviations getInterestingClusters checks the next cluster in a track against.
+        
+            Measured from the candidates to lastCluster (or its projection back to their time) when backward, otherwise from lastCluster
+            (or its projection forward) to the candidates. With fromCandidate=False a backward step with projection measures from the
+            projection to lastCluster itself like the negative shear tracking does.
+            
+            Returns the distance and bearing deviation arrays and the projected lats and lons (None if not projecting).
+        """
+        
+        lats, lons = self.getClusterLocations(candidates)
+        lastLat, lastLon = lastCluster.getLatitude()[0], lastCluster.getLongitude()[0]
+        
+        projLats, projLons = None, None
+        if self.cfg.projectReference:
+            projLats, projLons = self.getProjectionArrays(lastCluster, candidates, backward=backward)
+            
+            if backward and fromCandidate:
+                lat1, lon1, lat2, lon2 = lats, lons, projLats, projLons
+            elif backward:
+                lat1, lon1, lat2, lon2 = projLats, projLons, lastLat, lastLon
+            else:
+                lat1, lon1, lat2, lon2 = projLats, projLons, lats, lons
+        elif backward:
+            lat1, lon1, lat2, lon2 = lats, lons, lastLat, lastLon
+        else:
+            lat1, lon1, lat2, lon2 = lastLat, lastLon, lats, lons
+            
+        distances = calculateDistances(lat1, lon1, lat2, lon2)
+        
+        bearings = calculateBearings(lat1, lon1, lat2, lon2)
+        bearings = np.where(bearings < 0, bearings + 360, bearings)
+        
+        bearingDevs = np.abs(bearings - lastCluster.getMotionDirection()[0])
+        bearingDevs = np.where(bearingDevs > 180, 360 - bearingDevs, bearingDevs)
+        
+        return distances, bearingDevs, projLats, projLons
+        
+    def getBestShearCandidate(self, lastCluster, candidates, backward=False, fromCandidate=True):
+        """ The interest check getInterestingClusters does for the next cluster in a track.
+        
+            Scores the candidates against lastCluster with calculateShearInterestBatch and picks the best that is at least minShearScore
+            and passes the track step check (within maxShearDist and maxBearingDev, or close enough that the bearing doesn't matter).
+            
+            Returns the best cluster (None if there isn't one) and the projected lat and lon the cluster counts are taken around
+            (None if not projecting).
+        """
+        
+        if not candidates:
+            return None, None, None
+            
+        interest = self.calculateShearInterestBatch(lastCluster, candidates, lastCluster.getMotionDirection()[0], forward=not backward)
+        scores = interest['score']
+        
+        distances, bearingDevs, projLats, projLons = self.calculateTrackStepBatch(lastCluster, candidates, backward=backward, fromCandidate=fromCandidate)
+        
+        stepOK = (distances <= self.cfg.maxShearDist) & ((bearingDevs <= self.cfg.maxBearingDev) | (distances <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)))
+        
+        index = self.pickBestScore(scores, self.cfg.minShearScore, floor=-99999999, mask=stepOK)[0]
+        
+        #The projection of the last candidate that was scored is the one used for the cluster counts
+        projLat, projLon = None, None
+        scored = np.flatnonzero(~interest['rejected'] & (scores != 0))
+        if projLats is not None and scored.size:
+            projLat, projLon = float(projLats[scored[-1]]), float(projLons[scored[-1]])
+            
+        for i in scored:
+            self.cfg.debug("Checking next cluster "+str(candidates[i].getID()[0])+" at "+str(candidates[i].getLatitude()[0])+" "+str(candidates[i].getLongitude()[0])+" from "+\
+                str(lastCluster.getID()[0])+" score "+str(scores[i])+" distance "+str(distances[i])+" bearing dev "+str(bearingDevs[i])+" DT "+str(candidates[i].getDT()))
+                
+        if index is None:
+            return None, projLat, projLon
+            
+        self.cfg.debug("Best interest score "+str(scores[index])+" for "+str(candidates[index].getID()[0]))
+        
+        return candidates[index], projLat, projLon
+        
     def getNearbyClusterCount(self, lat, lon, clusters, maxDist):
         """ Returns all clusters from the clusters list within a maximum distance (maxDist) of the lat lon """
         
-        clusterCount = 0
-        for cluster in clusters:
-            distBetween = distance.calculateDistance(lat, lon, cluster.getLatitude()[0], cluster.getLongitude()[0])
+        if not clusters:
+            return 0
             
-            if distBetween <= maxDist:
-                clusterCount += 1
-                
-        return clusterCount
+        return self.getClusterIndex(clusters).count(lat, lon, maxDist)
+        
+    def getNearbyClusters(self, lat, lon, clusters, maxDist):
+        """ Returns the clusters (in their original order) within maxDist of the lat lon. Used to skip scoring clusters the
+            interest score would reject for distance anyway.
+        """
+        
+        if not clusters:
+            return []
+            
+        return [clusters[i] for i in self.getClusterIndex(clusters).query(lat, lon, maxDist)]
+        
+    def getClusterIndex(self, clusters):
+        """ Spatial index of a list of clusters. The lists come from the Time objects, so this is built once per Time and cluster type """
+        
+        key = id(clusters)
+        if key not in self.clusterIndexes or self.clusterIndexes[key][0] is not clusters:
+            self.clusterIndexes[key] = (clusters, spatialindex.ClusterIndex(clusters, cellSize=self.cfg.maxShearDist))
+            
+        return self.clusterIndexes[key][1]
+        
+    def getShearCandidates(self, lastCluster, clusters, forward=True):
+        """ Returns the clusters that calculateShearInterest could score against lastCluster when tracking forward (lastCluster is the coi)
+            or backward (the clusters are the coi). The rest are past maxShearDist from the point it measures from and would be rejected.
+        """
+        
+        if not clusters or float(self.cfg.shearDistWeight) == 0:
+            return clusters
+            
+        if self.cfg.projectReference and forward:
+            lat, lon = lastCluster.getForwardLat()[0], lastCluster.getForwardLon()[0]
+        elif self.cfg.projectReference:
+            lat, lon = lastCluster.getBackwardLat()[0], lastCluster.getBackwardLon()[0]
+        else:
+            lat, lon = lastCluster.getLatitude()[0], lastCluster.getLongitude()[0]
+            
+        #Without a usable point nothing gets rejected, so check them all
+        try:
+            lat, lon = float(lat), float(lon)
+        except (TypeError, ValueError):
+            return clusters
+        if math.isnan(lat) or math.isnan(lon):
+            return clusters
+            
+        return self.getNearbyClusters(lat, lon, clusters, self.cfg.maxShearDist)
+        
+    def getSearchPoint(self, lastCluster, clusters, backward=False):
+        """ The point the next cluster in a track is looked for around. This is the last cluster projected to the time of clusters
+            when projecting the reference, otherwise the last cluster itself.
+        """
+        
+        if self.cfg.projectReference and clusters:
+            dt = abs((clusters[0].getDT() - lastCluster.getDT()).total_seconds())
+            if backward:
+                return lastCluster.getClusterProjection(dt*-1)
+            return lastCluster.getClusterProjection(dt)
+            
+        return lastCluster.getLatitude()[0], lastCluster.getLongitude()[0]
         
     def calculateShearMotionVector(self, cluster1, cluster2, motions):
 
@@ -818,12 +1137,13 @@ class StormBuilder():
         highestScore = -1
         referenceCluster = None
         #Step 2, at the closest time, find the closest cluster spatially
-        for cluster in refClusters[closestTime]:
-            score = self.calculateShearInterestInitial(cluster)
-            if score:
-                if score >= self.cfg.minShearScore and score > highestScore:
-                    highestScore = score
-                    referenceCluster = cluster
+        nearbyClusters = self.getNearbyClusters(self.case.startLat, self.case.startLon, refClusters[closestTime], self.cfg.maxShearDistInit)
+        if nearbyClusters:
+            initialInterest = self.calculateShearInterestInitialBatch(nearbyClusters)
+            index, highestScore = self.pickBestScore(initialInterest['score'], self.cfg.minShearScore, floor=highestScore)
+            
+            if index is not None:
+                referenceCluster = nearbyClusters[index]
         
         if not referenceCluster:
             if isMax:
@@ -961,17 +1281,17 @@ class StormBuilder():
                             bearingDev = 360 - bearingDev
                          
                         if self.cfg.projectReference:
-                            self.cfg.log("+backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
+                            self.cfg.debug("+backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
                                        str(projLat)+" "+str(projLon)+" "+str(maxInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                         else:
-                            self.cfg.log("+backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
+                            self.cfg.debug("+backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
                                        str(maxInterestingClusters[-1][0].getID()[0])+" at "+str(maxInterestingClusters[-1][0].getLatitude()[0])+" "+str(maxInterestingClusters[-1][0].getLongitude()[0])+" "+str(maxInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                             
                         #If the distance / bearing deviation criteria are met, append the cluster. (Removed the maxInterestingClusters.isReference() check)
                         if dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                            self.cfg.log("Pass!")
+                            self.cfg.debug("Pass!")
                             clusterA, maxMotions = self.calculateShearMotionVector(cluster, maxInterestingClusters[-1][0], maxMotions)
                             
                             if self.cfg.projectReference:
@@ -996,64 +1316,10 @@ class StormBuilder():
                         else:
                             
                             #If it does not meet the criteria then perform an interest check.
-                            bestInterestScore = -99999999
-                            bestISCluster = None
-                            
-                            self.cfg.log("Performing interest check maxBack")
+                            self.cfg.debug("Performing interest check maxBack")
                             
-                            for cluster2 in oldClusters:
-                                
-                                #Note, the cluster2 does not have an updated motion yet so the interest score here won't be ideal
-                                #currentScore = self.calculateShearInterest(cluster2, maxInterestingClusters[-1][0], cluster2.getMotionDirection()[0])
-                                currentScore = self.calculateShearInterest(cluster2, maxInterestingClusters[-1][0], maxInterestingClusters[-1][0].getMotionDirection()[0], forward=False)
-                                
-                                self.cfg.log("+backwards Calculated interest score for "+str(cluster2.getID()[0])+" to "+\
-                                   str(maxInterestingClusters[-1][0].getID()[0])+" at "+str(maxInterestingClusters[-1][0].getLatitude()[0])+" "+str(maxInterestingClusters[-1][0].getLongitude()[0])+" score "+str(currentScore))
-                                   
-                                if currentScore:
-                                
-                                    projLat, projLon = None, None
-                                    
-                                    if self.cfg.projectReference:
-                                    
-                                        dt = abs((cluster2.getDT() - maxInterestingClusters[-1][0].getDT()).total_seconds())
-                                        
-                                        projLat, projLon = maxInterestingClusters[-1][0].getClusterProjection(dt*-1)
-                                        
-                                        dist = distance.calculateDistance(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                                    projLat, projLon)
-                                    
-                                        bearing = distance.calculateBearingAT(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                                    projLat, projLon)
-                                    
-                                    else:
-                                        dist = distance.calculateDistance(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                            maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0])
+                            bestISCluster, projLat, projLon = self.getBestShearCandidate(maxInterestingClusters[-1][0], self.getShearCandidates(maxInterestingClusters[-1][0], oldClusters, forward=False), backward=True)
                             
-                                        bearing = distance.calculateBearingAT(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                            maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0])
-                                        
-                                    if bearing < 0:
-                                        bearing += 360
-                                        
-                                    bearingDev = abs(bearing - maxInterestingClusters[-1][0].getMotionDirection()[0])
-                                    
-                                    if bearingDev > 180:
-                                        bearingDev = 360 - bearingDev
-                                        
-                                    if self.cfg.projectReference:
-                                        self.cfg.log("+backwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from projected "+\
-                                            str(projLat)+" "+str(projLon)+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                    else:    
-                                        self.cfg.log("+backwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                            str(maxInterestingClusters[-1][0].getID()[0])+" at "+str(maxInterestingClusters[-1][0].getLatitude()[0])+" "+str(maxInterestingClusters[-1][0].getLongitude()[0])+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                        
-                                    if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                        bestInterestScore = currentScore
-                                        bestISCluster = cluster2
-                                    
                             if bestISCluster:
                                 self.cfg.log("Found 1 max! "+str(bestISCluster.getID()[0]))
                                 bestISClusterA, maxMotions = self.calculateShearMotionVector(bestISCluster, maxInterestingClusters[-1][0], maxMotions)
@@ -1078,8 +1344,7 @@ class StormBuilder():
                                 self.cfg.log("Didn't find another cluster. Stopping tracking. maxBack")
                                 keepTracking = False
                                 
-                                with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                                    fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',1,'+str(timeIndex)+',Stopped tracking +backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
+                                self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',1,'+str(timeIndex)+',Stopped tracking +backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
                                 break
                             
                             
@@ -1087,58 +1352,10 @@ class StormBuilder():
                 #If we don't have an associated track, then perform the interest check
                 if not foundOldTrack:
                     
-                    bestInterestScore = -99999999
-                    bestISCluster = None
+                    self.cfg.debug("Performing interest check maxBack2")
                     
-                    self.cfg.log("Performing interest check maxBack2")
+                    bestISCluster, projLat, projLon = self.getBestShearCandidate(maxInterestingClusters[-1][0], self.getShearCandidates(maxInterestingClusters[-1][0], oldClusters, forward=False), backward=True)
                     
-                    for cluster2 in oldClusters:
-                        #currentScore = self.calculateShearInterest(cluster2, maxInterestingClusters[-1][0], cluster2.getMotionDirection()[0])
-                        currentScore = self.calculateShearInterest(cluster2, maxInterestingClusters[-1][0], maxInterestingClusters[-1][0].getMotionDirection()[0], forward=False)
-                        if currentScore:
-                        
-                            projLat, projLon = None, None
-                            
-                            if self.cfg.projectReference:
-                                    
-                                dt = abs((cluster2.getDT() - maxInterestingClusters[-1][0].getDT()).total_seconds())
-                    
-                                projLat, projLon = maxInterestingClusters[-1][0].getClusterProjection(dt*-1)
-                                
-                                dist = distance.calculateDistance(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                            projLat, projLon)
-                            
-                                bearing = distance.calculateBearingAT(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                            projLat, projLon)
-                            
-                            else:
-                                dist = distance.calculateDistance(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                    maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0])
-                    
-                                bearing = distance.calculateBearingAT(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                    maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0])
-                                
-                            if bearing < 0:
-                                bearing += 360
-                                        
-                            bearingDev = abs(bearing - maxInterestingClusters[-1][0].getMotionDirection()[0])
-     
-                            if bearingDev > 180:
-                                bearingDev = 360 - bearingDev
-                            
-                            if self.cfg.projectReference:
-                                self.cfg.log("+backwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from projected "+\
-                                       str(projLat)+" "+str(projLon)+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                            else:
-                                self.cfg.log("+backwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                       str(maxInterestingClusters[-1][0].getID()[0])+" at "+str(maxInterestingClusters[-1][0].getLatitude()[0])+" "+str(maxInterestingClusters[-1][0].getLongitude()[0])+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("+backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                        
-                            if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                bestInterestScore = currentScore
-                                bestISCluster = cluster2
-                            
                     if bestISCluster:
                         self.cfg.log("Found 1 max2! "+str(bestISCluster.getID()[0]))
                         bestISClusterA, maxMotions = self.calculateShearMotionVector(bestISCluster, maxInterestingClusters[-1][0], maxMotions)
@@ -1164,8 +1381,7 @@ class StormBuilder():
                         self.cfg.log("Didn't find another cluster. Stopping tracking maxBack 2")
                         keepTracking = False
                         
-                        with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                            fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',1,'+str(timeIndex)+',Stopped tracking +backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
+                        self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',1,'+str(timeIndex)+',Stopped tracking +backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
                                     
                         break
                     
@@ -1219,13 +1435,13 @@ class StormBuilder():
                         bearingDev = abs(bearing - maxInterestingClusters[-1][0].getMotionDirection()[0])
                         
                         if self.cfg.projectReference:
-                            self.cfg.log("+forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
+                            self.cfg.debug("+forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
                                        str(projLat)+" "+str(projLon)+" "+str(maxInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                         else:
-                            self.cfg.log("+forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
+                            self.cfg.debug("+forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
                                        str(maxInterestingClusters[-1][0].getID()[0])+" at "+str(maxInterestingClusters[-1][0].getLatitude()[0])+" "+str(maxInterestingClusters[-1][0].getLongitude()[0])+" "+str(maxInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                         
                         if bearingDev > 180:
                             bearingDev = 360 - bearingDev
@@ -1233,7 +1449,7 @@ class StormBuilder():
                             
                          #If the distance and bearing deviation criteria are met, append the cluster
                         if dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                            self.cfg.log("Pass!")
+                            self.cfg.debug("Pass!")
                             maxInterestingClusters[-1][0], maxMotions = self.calculateShearMotionVector(maxInterestingClusters[-1][0], cluster, maxMotions)
                             
                             #Because the future cluster's motion is unknown, we'll assume it's the previous cluster's motion for now
@@ -1266,55 +1482,10 @@ class StormBuilder():
                         else:
                             
                             #If it does not meet the criteria then perform an interest check.
-                            bestInterestScore = -99999999
-                            bestISCluster = None
-                            
-                            self.cfg.log("Performing interest check maxForward")
+                            self.cfg.debug("Performing interest check maxForward")
                             
-                            for cluster2 in newClusters:
-                                currentScore = self.calculateShearInterest(maxInterestingClusters[-1][0], cluster2, maxInterestingClusters[-1][0].getMotionDirection()[0], forward=True)
-                                if currentScore:
-                                    
-                                    projLat, projLon = None, None
-                                    
-                                    if self.cfg.projectReference:
-                                    
-                                        dt = abs((cluster2.getDT() - maxInterestingClusters[-1][0].getDT()).total_seconds())
+                            bestISCluster, projLat, projLon = self.getBestShearCandidate(maxInterestingClusters[-1][0], self.getShearCandidates(maxInterestingClusters[-1][0], newClusters, forward=True))
                             
-                                        projLat, projLon = maxInterestingClusters[-1][0].getClusterProjection(dt)
-                                        
-                                        dist = distance.calculateDistance(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                                    
-                                        bearing = distance.calculateBearingAT(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                                    
-                                    else:
-                                        dist = distance.calculateDistance(maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0],\
-                                                                            cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                            
-                                        bearing = distance.calculateBearingAT(maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0],\
-                                                                            cluster2.getLatitude()[0], cluster2.getLongitude()[0])
- 
-                                    if bearing < 0:
-                                        bearing += 360
-                                        
-                                    bearingDev = abs(bearing - maxInterestingClusters[-1][0].getMotionDirection()[0])
-                                    
-                                    if bearingDev > 180:
-                                        bearingDev = 360 - bearingDev
-                                        
-                                    if self.cfg.projectReference:    
-                                        self.cfg.log("+forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from projected "+\
-                                            str(projLat)+" "+str(projLon)+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                    else:
-                                        self.cfg.log("+forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                            str(maxInterestingClusters[-1][0].getID()[0])+" at "+str(maxInterestingClusters[-1][0].getLatitude()[0])+" "+str(maxInterestingClusters[-1][0].getLongitude()[0])+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                        
-                                    if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                        bestInterestScore = currentScore
-                                        bestISCluster = cluster2
-                                    
                             if bestISCluster:
                                 self.cfg.log("Found 2 max!")
                                 
@@ -1349,64 +1520,17 @@ class StormBuilder():
                                 self.cfg.log("Didn't find another cluster. Will stop tracking. maxForward")
                                 keepTracking = False
                                 
-                                with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                                    fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',2,'+str(len(self.times) - int(timeIndex))+',Stopped tracking +forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
+                                self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',2,'+str(len(self.times) - int(timeIndex))+',Stopped tracking +forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
                                 break
                                 
                 
                 #If we don't have an associated track, then stop looking foward
                 if not foundName:
                     
-                    bestInterestScore = -99999999
-                    bestISCluster = None
+                    self.cfg.debug("Performing interest check maxForward 2")
                     
-                    self.cfg.log("Performing interest check maxForward 2")
+                    bestISCluster, projLat, projLon = self.getBestShearCandidate(maxInterestingClusters[-1][0], self.getShearCandidates(maxInterestingClusters[-1][0], newClusters, forward=True))
                     
-                    for cluster2 in newClusters:
-                        currentScore = self.calculateShearInterest(maxInterestingClusters[-1][0], cluster2, maxInterestingClusters[-1][0].getMotionDirection()[0], forward=True)
-                        if currentScore:
-                        
-                            projLat, projLon = None, None
-                            
-                            if self.cfg.projectReference:
-                                    
-                                dt = abs((cluster2.getDT() - maxInterestingClusters[-1][0].getDT()).total_seconds())
-                    
-                                projLat, projLon = maxInterestingClusters[-1][0].getClusterProjection(dt)
-                                
-                                dist = distance.calculateDistance(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                            
-                                bearing = distance.calculateBearingAT(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                            
-                            else:
-                                dist = distance.calculateDistance(maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0],\
-                                                                    cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                    
-                                bearing = distance.calculateBearingAT(maxInterestingClusters[-1][0].getLatitude()[0], maxInterestingClusters[-1][0].getLongitude()[0],\
-                                                                      cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                                        
-                            if bearing < 0:
-                                bearing += 360
-                                
-                            bearingDev = abs(bearing - maxInterestingClusters[-1][0].getMotionDirection()[0])
-                            
-                            if bearingDev > 180:
-                                bearingDev = 360 - bearingDev
-                                
-                            
-                            if self.cfg.projectReference:
-                                self.cfg.log("+forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from projected "+\
-                                       str(projLat)+" "+str(projLon)+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                            else:
-                                self.cfg.log("+forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                       str(maxInterestingClusters[-1][0].getID()[0])+" at "+str(maxInterestingClusters[-1][0].getLatitude()[0])+" "+str(maxInterestingClusters[-1][0].getLongitude()[0])+" "+str(maxInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("+forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(maxInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                
-                            if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                bestInterestScore = currentScore
-                                bestISCluster = cluster2
-                            
                     if bestISCluster:
                         self.cfg.log("Found 2 max2 !"+str(bestISCluster.getID()[0]))
                         maxInterestingClusters[-1][0], maxMotions = self.calculateShearMotionVector(maxInterestingClusters[-1][0], bestISCluster, maxMotions)
@@ -1442,8 +1566,7 @@ class StormBuilder():
                         
                         keepTracking = False
                         
-                        with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                            fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',2,'+str(len(self.times) - int(timeIndex))+',Stopped tracking +forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
+                        self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',2,'+str(len(self.times) - int(timeIndex))+',Stopped tracking +forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
                                     
                         break
             
@@ -1563,20 +1686,20 @@ class StormBuilder():
                         bearingDev = abs(bearing - minInterestingClusters[-1][0].getMotionDirection()[0])
                         
                         if self.cfg.projectReference:
-                            self.cfg.log("-backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
+                            self.cfg.debug("-backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
                                        str(projLat)+" "+str(projLon)+" "+str(minInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                         else:
-                            self.cfg.log("-backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
+                            self.cfg.debug("-backwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
                                        str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" "+str(minInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                         
                         if bearingDev > 180:
                             bearingDev = 360 - bearingDev
                             
                         #If the distance and bearing deviation criteria  are met, append the cluster
                         if dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor) or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                            self.cfg.log("Pass!")
+                            self.cfg.debug("Pass!")
                             cluster, minMotions = self.calculateShearMotionVector(cluster, minInterestingClusters[-1][0], minMotions)
                             
                             if self.cfg.projectReference:
@@ -1600,66 +1723,10 @@ class StormBuilder():
                         else:
                             
                             #If it does not meet the criteria then perform an interest check.
-                            bestInterestScore = -99999999
-                            bestISCluster = None
-                            
-                            self.cfg.log("Performing interest check minBack")
+                            self.cfg.debug("Performing interest check minBack")
                             
-                            for cluster2 in oldClusters:
-                            
-                                #Note, the cluster2 does not have an updated motion yet so the interest score here won't be ideal
-                                #currentScore = self.calculateShearInterest(cluster2, minInterestingClusters[-1][0], cluster2.getMotionDirection()[0])
-                                #currentScore = self.calculateShearInterest(minInterestingClusters[-1][0], cluster2, minInterestingClusters[-1][0].getMotionDirection()[0], forward=False)
-                                currentScore = self.calculateShearInterest(cluster2, minInterestingClusters[-1][0], minInterestingClusters[-1][0].getMotionDirection()[0], forward=False)
-                                
-                                self.cfg.log("-backwards Calculated interest score for "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" for "+\
-                                   str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" score "+str(currentScore))
-                                   
-                                if currentScore:
-                                
-                                    if self.cfg.projectReference:
-                        
-                                        dt = abs((cluster2.getDT() - minInterestingClusters[-1][0].getDT()).total_seconds())
+                            bestISCluster, projLat, projLon = self.getBestShearCandidate(minInterestingClusters[-1][0], self.getShearCandidates(minInterestingClusters[-1][0], oldClusters, forward=False), backward=True, fromCandidate=False)
                             
-                                        projLat, projLon = minInterestingClusters[-1][0].getClusterProjection(dt*-1)
-                                        
-                                        dist = distance.calculateDistance(projLat, projLon,\
-                                                        minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                                        
-                                        
-                                        bearing = distance.calculateBearingAT(projLat, projLon,\
-                                                        minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                                    else:
-                                    
-                                        dist = distance.calculateDistance(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                                        minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                                        
-                                        
-                                        bearing = distance.calculateBearingAT(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                                        minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                                        
-                                    if bearing < 0:
-                                        bearing += 360
-                                        
-                                    bearingDev = abs(bearing - minInterestingClusters[-1][0].getMotionDirection()[0])
-                                    
-                                    if bearingDev > 180:
-                                        bearingDev = 360 - bearingDev
-                                    
-                                    if self.cfg.projectReference:
-                                        self.cfg.log("-backwards Checking next cluster "+str(cluster2.getID()[0])+" "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from projected "+\
-                                            str(projLat)+" "+str(projLon)+" "+str(minInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                        
-                                    else:
-                                        self.cfg.log("-backwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                            str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" "+str(minInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                    
-                                    if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                        bestInterestScore = currentScore
-                                        bestISCluster = cluster2
-                                    
                             if bestISCluster:
                                 self.cfg.log("Found 1 min !"+str(bestISCluster.getID()[0]))
                                 
@@ -1686,8 +1753,7 @@ class StormBuilder():
                                 self.cfg.log("Didn't find another cluster. Stopping tracking. minBack")
                                 keepTracking = False
                                 
-                                with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                                    fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',3,'+str(timeIndex)+',Stopped tracking -backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
+                                self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',3,'+str(timeIndex)+',Stopped tracking -backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
                                     
                                 break
                             
@@ -1696,68 +1762,10 @@ class StormBuilder():
                 #If we don't have an associated track, then perform the interest check
                 if not foundOldTrack:
                     
-                    bestInterestScore = -99999999
-                    bestISCluster = None
-                    
-                    self.cfg.log("Performing interest check minBack2")
-                    
-                    for cluster2 in oldClusters:
+                    self.cfg.debug("Performing interest check minBack2")
                     
-                        #Note, the cluster2 does not have an updated motion yet so the interest score here won't be ideal
-                        #currentScore = self.calculateShearInterest(cluster2, minInterestingClusters[-1][0], cluster2.getMotionDirection()[0])
-                        #currentScore = self.calculateShearInterest(minInterestingClusters[-1][0], cluster2, minInterestingClusters[-1][0].getMotionDirection()[0], forward=False)
-                        currentScore = self.calculateShearInterest(cluster2, minInterestingClusters[-1][0], minInterestingClusters[-1][0].getMotionDirection()[0], forward=False)
-                        
-                        self.cfg.log("-backwards Calculated interest score for "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" for "+\
-                           str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" score "+str(currentScore))
-                           
-                        if currentScore:
-                                
-                            projLat, projLon = None, None
-                            
-                            if self.cfg.projectReference:
-                        
-                                dt = abs((cluster2.getDT() - minInterestingClusters[-1][0].getDT()).total_seconds())
+                    bestISCluster, projLat, projLon = self.getBestShearCandidate(minInterestingClusters[-1][0], self.getShearCandidates(minInterestingClusters[-1][0], oldClusters, forward=False), backward=True, fromCandidate=False)
                     
-                                projLat, projLon = minInterestingClusters[-1][0].getClusterProjection(dt*-1)
-                                
-                                dist = distance.calculateDistance(projLat, projLon,\
-                                                minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                                
-                                
-                                bearing = distance.calculateBearingAT(projLat, projLon,\
-                                                minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                            else:
-                            
-                                dist = distance.calculateDistance(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                                minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                                
-                                
-                                bearing = distance.calculateBearingAT(cluster2.getLatitude()[0], cluster2.getLongitude()[0],\
-                                                minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0])
-                                        
-                                
-                            if bearing < 0:
-                                bearing += 360
-                                
-                            bearingDev = abs(bearing - minInterestingClusters[-1][0].getMotionDirection()[0])
-                            
-                            if bearingDev > 180:
-                                bearingDev = 360 - bearingDev
-                             
-                            if self.cfg.projectReference:
-                                self.cfg.log("-backwards Checking next cluster "+str(cluster2.getID()[0])+" project at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from projected "+\
-                                       str(projLat)+" "+str(projLon)+" "+str(minInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                            else:
-                                self.cfg.log("-backwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                       str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" "+str(minInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("-backwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                            
-                            if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                bestInterestScore = currentScore
-                                bestISCluster = cluster2
-                        
                     if bestISCluster:
                         self.cfg.log("Found 1 min2! "+str(bestISCluster.getID()[0]))
                         bestIsCluster, minMotions = self.calculateShearMotionVector(bestISCluster, minInterestingClusters[-1][0], minMotions)
@@ -1783,8 +1791,7 @@ class StormBuilder():
                         self.cfg.log("Didn't find another cluster. Stopping tracking minBack 2")
                         keepTracking = False
                         
-                        with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                            fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',3,'+str(timeIndex)+',Stopped tracking -backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
+                        self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',3,'+str(timeIndex)+',Stopped tracking -backwards with '+str(self.times[timeIndex-1].getDT())+'\n')
                                     
                         break
                 
@@ -1831,14 +1838,14 @@ class StormBuilder():
                         bearingDev = abs(bearing - minInterestingClusters[-1][0].getMotionDirection()[0])
                         
                         if self.cfg.projectReference:
-                            self.cfg.log("-forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
+                            self.cfg.debug("-forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from projected "+\
                                        str(projLat)+" "+str(projLon)+" "+str(minInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                         
                         else:
-                            self.cfg.log("-forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
+                            self.cfg.debug("-forwards Checking next cluster "+str(cluster.getID()[0])+" at "+str(cluster.getLatitude()[0])+" "+str(cluster.getLongitude()[0])+" from "+\
                                    str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" "+str(minInterestingClusters[-1][0].isReference()))
-                            self.cfg.log("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
+                            self.cfg.debug("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster.getDT()))
                         
                         if bearingDev > 180:
                             bearingDev = 360 - bearingDev
@@ -1877,49 +1884,10 @@ class StormBuilder():
                         else:
                             
                             #If it does not meet the criteria then perform an interest check.
-                            bestInterestScore = -99999999
-                            bestISCluster = None
-                            
-                            self.cfg.log("Performing interest check minForward")
+                            self.cfg.debug("Performing interest check minForward")
                             
-                            for cluster2 in newClusters:
-                                currentScore = self.calculateShearInterest(minInterestingClusters[-1][0], cluster2, minInterestingClusters[-1][0].getMotionDirection()[0], forward=True)
-                                if currentScore:
-                                
-                                    projLat, projLon = None, None
-                        
-                                    if self.cfg.projectReference:
-                                                
-                                        dt = abs((cluster2.getDT() - minInterestingClusters[-1][0].getDT()).total_seconds())
-                            
-                                        projLat, projLon = minInterestingClusters[-1][0].getClusterProjection(dt)
-                                        
-                                        dist = distance.calculateDistance(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                                    
-                                        bearing = distance.calculateBearingAT(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                                    
-                                    else:
-                                        dist = distance.calculateDistance(minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0],\
-                                                                        cluster2.getLatitude()[0], cluster2.getLongitude()[0])
+                            bestISCluster, projLat, projLon = self.getBestShearCandidate(minInterestingClusters[-1][0], self.getShearCandidates(minInterestingClusters[-1][0], newClusters, forward=True))
                             
-                                        bearing = distance.calculateBearingAT(minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0],\
-                                                                        cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                                    
-                                    if self.cfg.projectReference:
-                                    
-                                        self.cfg.log("-forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from projected "+\
-                                            str(projLat)+" "+str(projLon)+" "+str(minInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                    
-                                    else:
-                                        self.cfg.log("-forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                            str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" "+str(minInterestingClusters[-1][0].isReference()))
-                                        self.cfg.log("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                        
-                                    if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                        bestInterestScore = currentScore
-                                        bestISCluster = cluster2
-                                    
                             if bestISCluster:
                                 self.cfg.log("Found 2 min!")
                                 
@@ -1955,8 +1923,7 @@ class StormBuilder():
                                 self.cfg.log("Didn't find another cluster. Stopping tracking. minForward")
                                 keepTracking = False
                                 
-                                with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                                    fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',4,'+str(len(self.times) - int(timeIndex))+',Stopped tracking -forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
+                                self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',4,'+str(len(self.times) - int(timeIndex))+',Stopped tracking -forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
                                     
                                 break
                                 
@@ -1964,55 +1931,10 @@ class StormBuilder():
                 #If we don't have an associated track, then stop looking foward
                 if not foundName:
                    
-                    bestInterestScore = -99999999
-                    bestISCluster = None
-                    
-                    self.cfg.log("Performing interest check minForward 2")
-                    
-                    for cluster2 in newClusters:
-                        currentScore = self.calculateShearInterest(minInterestingClusters[-1][0], cluster2, minInterestingClusters[-1][0].getMotionDirection()[0], forward=True)
-                        if currentScore:
-                        
-                            projLat, projLon = None, None
-                        
-                            if self.cfg.projectReference:
-                                        
-                                dt = abs((cluster2.getDT() - minInterestingClusters[-1][0].getDT()).total_seconds())
+                    self.cfg.debug("Performing interest check minForward 2")
                     
-                                projLat, projLon = minInterestingClusters[-1][0].getClusterProjection(dt)
-                                
-                                dist = distance.calculateDistance(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                            
-                                bearing = distance.calculateBearingAT(projLat, projLon, cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                            
-                            else:
-                                dist = distance.calculateDistance(minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0],\
-                                                                cluster2.getLatitude()[0], cluster2.getLongitude()[0])
+                    bestISCluster, projLat, projLon = self.getBestShearCandidate(minInterestingClusters[-1][0], self.getShearCandidates(minInterestingClusters[-1][0], newClusters, forward=True))
                     
-                                bearing = distance.calculateBearingAT(minInterestingClusters[-1][0].getLatitude()[0], minInterestingClusters[-1][0].getLongitude()[0],\
-                                                                cluster2.getLatitude()[0], cluster2.getLongitude()[0])
-                                        
-                            if bearing < 0:
-                                bearing += 360
-                                
-                            bearingDev = abs(bearing - minInterestingClusters[-1][0].getMotionDirection()[0])
-                            
-                            if bearingDev > 180:
-                                bearingDev = 360 - bearingDev
-                            
-                            if self.cfg.projectReference:
-                                self.cfg.log("-forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                       str(projLat)+" "+str(projLon)+" "+str(minInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                            else:
-                                self.cfg.log("-forwards Checking next cluster "+str(cluster2.getID()[0])+" at "+str(cluster2.getLatitude()[0])+" "+str(cluster2.getLongitude()[0])+" from "+\
-                                   str(minInterestingClusters[-1][0].getID()[0])+" at "+str(minInterestingClusters[-1][0].getLatitude()[0])+" "+str(minInterestingClusters[-1][0].getLongitude()[0])+" "+str(minInterestingClusters[-1][0].isReference()))
-                                self.cfg.log("-forwards Distance "+str(dist)+" bearing "+str(bearing)+" direction "+str(minInterestingClusters[-1][0].getMotionDirection()[0])+" bearing dev "+str(bearingDev)+" DT "+str(cluster2.getDT()))
-                                        
-                            if currentScore > bestInterestScore and currentScore >= self.cfg.minShearScore and dist <= self.cfg.maxShearDist and (bearingDev <= self.cfg.maxBearingDev or dist <= (self.cfg.maxShearDist*self.cfg.shearVectorDistanceFactor)):
-                                bestInterestScore = currentScore
-                                bestISCluster = cluster2
-                            
                     if bestISCluster:
                         self.cfg.log("Found 2 min2 !"+str(bestISCluster.getID()[0]))
                         minInterestingClusters[-1][0], minMotions = self.calculateShearMotionVector(minInterestingClusters[-1][0], bestISCluster, minMotions)
@@ -2048,8 +1970,7 @@ class StormBuilder():
                         
                         keepTracking = False
                         
-                        with open(self.cfg.logName+'_events.csv', 'a') as fi:
-                            fi.write(self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',4,'+str(len(self.times) - int(timeIndex))+',Stopped tracking -forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
+                        self.cfg.appendCSV(self.cfg.logName+'_events.csv', self.case.storm+','+self.case.ID+','+str(self.case.isTor)+',4,'+str(len(self.times) - int(timeIndex))+',Stopped tracking -forwards with '+str(self.times[timeIndex+1].getDT())+'\n')
                                     
                         break
             
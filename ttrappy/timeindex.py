@@ -0,0 +1,173 @@
+#Time index used to match cluster sets, files, and rows up by time
+#The times are turned into epoch seconds once and sorted so each lookup is a binary search instead of parsing every time string again
+
+import os
+import calendar
+from datetime import datetime
+import numpy as np
+
+
+def toEpoch(DT):
+    """ Epoch seconds for a '%Y%m%d-%H%M%S' string or a datetime. Strings and naive datetimes are taken as UTC """
+
+    if isinstance(DT, (int, np.integer)):
+        return int(DT)
+
+    if isinstance(DT, datetime):
+        if DT.tzinfo is None:
+            return calendar.timegm(DT.timetuple())
+        return int(DT.timestamp())
+
+    return calendar.timegm((int(DT[0:4]), int(DT[4:6]), int(DT[6:8]), int(DT[9:11]), int(DT[11:13]), int(DT[13:15]), 0, 0, 0))
+
+
+def findDTString(fileName, UNIVDT):
+    """ The 15 character datetime string in a file name starting at the first UNIVDT character. '' if there isn't one """
+
+    start = fileName.find(UNIVDT)
+    if start < 0:
+        return ''
+
+    return fileName[start:start+15]
+
+
+class TimeIndex():
+
+    """ Sorted epoch times for a list of things so the one closest to, at or after, or at or before a time can be found with
+        a binary search. Every lookup returns the index of the item in the original list (or None), and ties go to the item
+        that came first in the list unless last=True.
+
+        times (list): '%Y%m%d-%H%M%S' strings, datetimes, or epoch seconds. None or '' entries are left out of the index.
+    """
+
+    def __init__(self, times):
+
+        indices = []
+        epochs = []
+        for i, DT in enumerate(times):
+            if DT is None or DT == '':
+                continue
+            indices.append(i)
+            epochs.append(toEpoch(DT))
+
+        self.__epochByIndex = dict(zip(indices, epochs))
+        epochs = np.array(epochs, dtype=np.int64)
+        order = np.argsort(epochs, kind='stable')
+        self.epochs = epochs[order]
+        self.order = np.array(indices, dtype=np.int64)[order]
+
+        return
+
+    def __len__(self):
+        return len(self.epochs)
+
+    def getSortedIndices(self):
+        """ The indices of the original list in time order """
+        return self.order.tolist()
+
+    def __pick(self, start, end, last):
+        """ Original index of the first (or last) item among the equal times at sorted positions start to end-1 """
+
+        if last:
+            return int(self.order[end-1])
+        return int(self.order[start])
+
+    def exact(self, DT, last=False):
+        """ Index of the item at exactly DT """
+
+        t = toEpoch(DT)
+        start = np.searchsorted(self.epochs, t, side='left')
+        end = np.searchsorted(self.epochs, t, side='right')
+
+        if start == end:
+            return None
+
+        return self.__pick(start, end, last)
+
+    def atOrAfter(self, DT, tolerance=None, last=False):
+        """ Index of the earliest item at or after DT. tolerance (s) is the furthest after DT it can be """
+
+        t = toEpoch(DT)
+        start = np.searchsorted(self.epochs, t, side='left')
+        if start == len(self.epochs):
+            return None
+
+        found = self.epochs[start]
+        if tolerance is not None and found - t > tolerance:
+            return None
+
+        return self.__pick(start, np.searchsorted(self.epochs, found, side='right'), last)
+
+    def atOrBefore(self, DT, tolerance=None, last=False):
+        """ Index of the latest item at or before DT. tolerance (s) is the furthest before DT it can be """
+
+        t = toEpoch(DT)
+        end = np.searchsorted(self.epochs, t, side='right')
+        if end == 0:
+            return None
+
+        found = self.epochs[end-1]
+        if tolerance is not None and t - found > tolerance:
+            return None
+
+        return self.__pick(np.searchsorted(self.epochs, found, side='left'), end, last)
+
+    def nearest(self, DT, tolerance=None):
+        """ Index of the item closest to DT either way. tolerance (s) is the furthest from DT it can be """
+
+        t = toEpoch(DT)
+        after = self.atOrAfter(t)
+        before = self.atOrBefore(t)
+
+        candidates = []
+        for i in (before, after):
+            if i is not None:
+                candidates.append((abs(self.getEpoch(i) - t), i))
+
+        if not candidates:
+            return None
+
+        difference, i = min(candidates)
+        if tolerance is not None and difference > tolerance:
+            return None
+
+        return i
+
+    def within(self, DT, tolerance):
+        """ Indices (in their original order) of every item within tolerance (s) of DT """
+
+        t = toEpoch(DT)
+        start = np.searchsorted(self.epochs, t - tolerance, side='left')
+        end = np.searchsorted(self.epochs, t + tolerance, side='right')
+
+        return sorted(self.order[start:end].tolist())
+
+    def getEpoch(self, i):
+        """ Epoch time of item i of the original list """
+        return self.__epochByIndex[i]
+
+
+#(directory, UNIVDT) -> (mtime, files, TimeIndex) for indexDirectory
+directoryIndexes = {}
+
+def indexDirectory(directory, UNIVDT=None):
+    """ The files in directory and a TimeIndex of them by their datetime string. The string is the first 15 characters of the name,
+        or starts at the first UNIVDT character if given. Kept until the directory changes.
+    """
+
+    key = (directory, UNIVDT)
+    mtime = os.stat(directory).st_mtime_ns
+    if key not in directoryIndexes or directoryIndexes[key][0] != mtime:
+        files = os.listdir(directory)
+        times = []
+        for fi in files:
+            DT = fi[0:15] if UNIVDT is None else findDTString(fi, UNIVDT)
+            try:
+                toEpoch(DT)
+            except ValueError:
+                DT = None #Not a time-stamped file
+            times.append(DT)
+
+        directoryIndexes[key] = (mtime, files, TimeIndex(times))
+
+    return directoryIndexes[key][1:]
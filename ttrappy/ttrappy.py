@@ -3,11 +3,12 @@
 #Import Modules
 from ttrappy import WDSSII as wds
 from ttrappy import analysis
+from ttrappy import analysiscache
+from ttrappy import l2store
+from ttrappy import mirror
 from ttrappy import error as err
-import subprocess
 import multiprocessing as mp
 import os
-import time
 from datetime import datetime as dt
 import sys
 import traceback
@@ -25,6 +26,7 @@ class Processor():
     cfg = None
     case = None
     spm = None #SubProcess Manager. Another name for SubprocessHandler
+    mirror = None #ProductMirror for the current run of WDSSII
     
     def __init__(self, cfg, case, q=None, m=None):
     
@@ -229,41 +231,86 @@ class Processor():
 
             copyFrom = os.path.join(tiltDir, tilt)
             copyTo = os.path.join(dataDir, product+'_tilt', tilt)
-            copyToList = copyTo.split('/')
             
         else:
             copyFrom = os.path.join(tiltDir, altString)
             copyTo = os.path.join(dataDir, product+'_tilt', tilt)
-            copyToList = copyTo.split('/')
         
-        #Make the output directories so cp is happy
-        currentDir = ''
-        for dir in copyToList:
-            currentDir = os.path.join(currentDir, dir)
-            try:
-                os.mkdir(currentDir)
-            except FileExistsError:
-                pass
-        
-        proc = subprocess.run(['cp', '-f', '-R', '-T',  copyFrom, copyTo])
-        
-        self.cfg.log(str(proc))
-        
-        #Remove the folder we copied from to save disk space
-        proc = subprocess.run(['rm', '-r', copyFrom])
+        if not os.path.isdir(copyFrom):
+            self.cfg.error("Unable to reformat "+copyFrom+". It doesn't exist")
+            return
+            
+        os.makedirs(os.path.dirname(copyTo), exist_ok=True)
         
-        self.cfg.log(str(proc))
+        #Move the files instead of copying them and removing the folder we copied from
+        mirror.moveTree(copyFrom, copyTo)
         
+        self.cfg.log("Moved "+copyFrom+" to "+copyTo)
+
         return
-    
+
+    def reformatTiltProducts(self, tilt, products, isThreshold):
+        """ Reformat every product for a single tilt. Run by the scheduler once that tilt's grids are finished. """
+
+        for product in products:
+            self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, product), self.case.dataDir, isThreshold, tilt)
+
+        return
+
+    def storeIngest(self, jobs, store, site, ingestOutputDir, toIngest):
+        """ Move ldm2netcdf's output for a site into the L2 store and link it into the data directory. Nothing is kept in the store if
+            ldm2netcdf failed, since some of the scans may be missing products.
+        """
+
+        returncode = jobs.jobs['ldm2netcdf'+site].returncode
+        store.saveIngest(self.cfg, self.case, site, ingestOutputDir, toIngest, save=(returncode == 0))
+
+        return
+
+    def copyProducts(self, site):
+        """ Mirror the products of a velocity radar into the data directory (see mirror.py) """
+
+        for product in ['AliasedVelocity', 'SpectrumWidth', 'Reflectivity']:
+            source = os.path.join(self.case.dataDir, site, product)
+            if not os.path.isdir(source):
+                self.cfg.error("Unable to copy "+source+". It doesn't exist")
+                continue
+            counts = self.mirror.mirrorTree(source, os.path.join(self.case.dataDir, product))
+            self.cfg.log("Mirrored "+source+" to "+self.case.dataDir+" "+str(counts))
+
+        return
+
+    def getTableHeaders(self, tableDir):
+        """ Go through a table in a BTRT table directory and grab the column names. Some code adapted/taken from BTRT. """
+
+        headerString = ''
+        for table in os.listdir(tableDir):
+            #Check to make sure it's an xml file
+            if table.endswith('.xml'):
+                with open(os.path.join(tableDir, table), 'r') as tableFile:
+                    for line in tableFile:
+                        #Check to see if the line is a data column
+                        if line.strip().startswith('<datacolumn '):
+                            headerString += line.strip().split(' ')[1].split('"')[1]+' '
+
+                break
+
+        return headerString
+
+    def hailTruth(self, clusterDir, outDir, logDir, **kwargs):
+        """ Runs w2hailtruth_size on the ClusterBT tables in clusterDir. The column headers are only known once BTRT has
+            finished, so they are read here when the scheduler starts the job instead of when the job is added.
+        """
+
+        kwargs['dataColumn'] = self.getTableHeaders(os.path.join(clusterDir, 'ClusterBT'))
+
+        return wds.w2hailtruth_size(self.cfg, os.path.join(clusterDir, 'index.xml'), outDir, logDir, **kwargs)
+
         
         
     #WDSII Processing for TTRAP   
     def wdssii(self):
         
-        q = self.spm.getQ() #The queue to put messages for the listener into
-        self.spm.startListener()
-        
         cfg = self.cfg
         
         startTime = dt.now()
@@ -272,18 +319,38 @@ class Processor():
         
         logDir = self.case.logDir
         
+        #Each job waits only on the jobs that make its input. siteTails holds the most recent job(s) for each radar so that one radar 
+        #doesn't have to wait on the others. Jobs that index or read all of dataDir wait on everything added before them (jobs.getNames()).
+        jobs = wds.JobScheduler(self.cfg, self.cfg.maxProcesses)
+        self.mirror = mirror.ProductMirror(self.cfg)
+        siteTails = {site.name:[] for site in self.case.sites}
+        
         #Convert L2 to WDSII netcdf format
         try:
         
             if self.cfg.doIngest:
                 self.cfg.log("Ingesting Data")
                 #Start by converting the downloaded L2 data into WDSSII netcdf format for each site
+                #With the L2 store only the scans no other case has converted are given to ldm2netcdf and the rest are linked from it
+                store = l2store.getStore(self.cfg)
                 for a in range(self.case.sitesNum):
                     if self.case.sites[a].active:
+                        inputDir = self.case.radDir
+                        outputDir = self.case.dataDir+"/"+self.case.sites[a].name
+                        if store is not None:
+                            inputDir, outputDir, toIngest = store.prepareIngest(self.cfg, self.case, self.case.sites[a].name)
+                            if inputDir is None:
+                                continue
+                                
                         if self.cfg.useSails:
-                            q.put((wds.ldm2netcdf, (self.cfg, self.case.radDir, self.case.dataDir+"/"+self.case.sites[a].name, self.case.sites[a].name, self.case.sites[a].name, logDir), {'once':True, 'readOld':True, 'logLevel':'info', 'products':'all'}, 'ldm2netcdf'+self.case.sites[a].name))
+                            jobs.addProcess(wds.ldm2netcdf, (self.cfg, inputDir, outputDir, self.case.sites[a].name, self.case.sites[a].name, logDir), {'once':True, 'readOld':True, 'logLevel':'info', 'products':'all'}, 'ldm2netcdf'+self.case.sites[a].name)
                         else:
-                            q.put((wds.ldm2netcdf, (self.cfg, self.case.radDir, self.case.dataDir+"/"+self.case.sites[a].name, self.case.sites[a].name, self.case.sites[a].name, logDir), {'once':True, 'readOld':True, 'logLevel':'info', 'nosails':True, 'products':'all'}, 'ldm2netcdf'+self.case.sites[a].name))
+                            jobs.addProcess(wds.ldm2netcdf, (self.cfg, inputDir, outputDir, self.case.sites[a].name, self.case.sites[a].name, logDir), {'once':True, 'readOld':True, 'logLevel':'info', 'nosails':True, 'products':'all'}, 'ldm2netcdf'+self.case.sites[a].name)
+                        siteTails[self.case.sites[a].name] = ['ldm2netcdf'+self.case.sites[a].name]
+                        
+                        if store is not None:
+                            jobs.addCall(self.storeIngest, (jobs, store, self.case.sites[a].name, outputDir, toIngest), {}, 'ldm2netcdfStore'+self.case.sites[a].name, deps=['ldm2netcdf'+self.case.sites[a].name])
+                            siteTails[self.case.sites[a].name] = ['ldm2netcdfStore'+self.case.sites[a].name]
                 
                 #Get folders of rap data to process
                 rapFolders = os.listdir(self.case.rapDir)
@@ -292,10 +359,10 @@ class Processor():
                 
                 #Convert downloaded RAP grib2 files to WDSSII format
                 for hour in rapFolders:
-                    q.put((wds.g2w2, (self.cfg, os.path.join(self.case.rapDir, hour), os.path.join(self.case.rapConvDir, hour), logDir), {}, 'g2w2'+hour))
+                    jobs.addProcess(wds.g2w2, (self.cfg, os.path.join(self.case.rapDir, hour), os.path.join(self.case.rapConvDir, hour), logDir), {}, 'g2w2'+hour)
                     
                     
-                q.put((wds.w2csv2table, (self.cfg, self.case.reportDir, self.case.reportTableDir, logDir), {'table':'Reports'}, 'csv2table'))
+                jobs.addProcess(wds.w2csv2table, (self.cfg, self.case.reportDir, self.case.reportTableDir, logDir), {'table':'Reports'}, 'csv2table')
                 
                 #Put the cache in the w2mergercache folder for w2merger if desired to not save cache in the home directory
                 
@@ -304,60 +371,37 @@ class Processor():
                     # #Create cache for composite domains
                     for b in range(self.case.sitesNum):
                         if self.case.sites[b].active:
-                            q.put((wds.createCache, (self.cfg, 'w2mergercache', self.case.sites[b].name, logDir), {'top':(self.case.topLat, self.case.topLon, self.cfg.top), 'bot':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'spacing':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing))}, 'createCache'+self.case.sites[b].name+'large'))
+                            jobs.addProcess(wds.createCache, (self.cfg, 'w2mergercache', self.case.sites[b].name, logDir), {'top':(self.case.topLat, self.case.topLon, self.cfg.top), 'bot':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'spacing':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing))}, 'createCache'+self.case.sites[b].name+'large')
                 
                     # #Create cache for individual tilt domains
-                    q.put((wds.createCache, (self.cfg, 'w2mergercache', self.case.sites[0].name, logDir), {'top':(self.case.topLat, self.case.topLon, self.cfg.top), 'bot':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'spacing':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing))}, 'createCache'+self.case.sites[0].name+'small'))
+                    jobs.addProcess(wds.createCache, (self.cfg, 'w2mergercache', self.case.sites[0].name, logDir), {'top':(self.case.topLat, self.case.topLon, self.cfg.top), 'bot':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'spacing':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing))}, 'createCache'+self.case.sites[0].name+'small')
                     
-                #Wait for them to finish
-                q.put('waitAll')
-                self.spm.waitForRelease()
-                 
-                #Create and index.xml for that output
+                #Create and index.xml for that output as soon as each radar is converted
                 for b in range(self.case.sitesNum):
                     if self.case.sites[b].active:
-                        q.put((wds.makeindex,(self.cfg, self.case.dataDir+"/"+self.case.sites[b].name, logDir), {}, 'LDMmakeindex'+self.case.sites[b].name))
+                        jobs.addProcess(wds.makeindex,(self.cfg, self.case.dataDir+"/"+self.case.sites[b].name, logDir), {}, 'LDMmakeindex'+self.case.sites[b].name, deps=siteTails[self.case.sites[b].name])
+                        siteTails[self.case.sites[b].name] = ['LDMmakeindex'+self.case.sites[b].name]
                 
-
-                q.put((wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'data_dir'))
+                jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'data_dir', deps=[name for name in jobs.getNames() if name.startswith('ldm2netcdf')]+['csv2table'])
                 
                 for hour in rapFolders:
-                    q.put((wds.makeindex, (self.cfg, os.path.join(self.case.rapConvDir, hour), logDir), {}, 'rapconv'))
+                    jobs.addProcess(wds.makeindex, (self.cfg, os.path.join(self.case.rapConvDir, hour), logDir), {}, 'rapconv'+hour, deps=['g2w2'+hour])
                 
-                q.put('waitAll')
-                self.spm.waitForRelease()
-            
-            
+                #Copy the velocity radar's products to dataDir once that radar is converted
                 for a in range(self.cfg.numVelRadars):
-                    proc = subprocess.run(['cp', '-r', '-f', os.path.join(self.case.dataDir, self.case.sites[a].name, 'AliasedVelocity'), self.case.dataDir])
-                    cfg.log(str(proc))
-                    proc = subprocess.run(['cp', '-r', '-f', os.path.join(self.case.dataDir, self.case.sites[a].name, 'SpectrumWidth'), self.case.dataDir])
-                    cfg.log(str(proc))
-                    proc = subprocess.run(['cp', '-r', '-f', os.path.join(self.case.dataDir, self.case.sites[a].name, 'Reflectivity'), self.case.dataDir])
-                    cfg.log(str(proc))
+                    jobs.addCall(self.copyProducts, (self.case.sites[a].name,), {}, 'copy'+self.case.sites[a].name, deps=siteTails[self.case.sites[a].name]+['data_dir'])
                     
-                #Calculate environmental indices from the model data
-                convFolders = os.listdir(self.case.rapConvDir)
-                if '.working' in convFolders:
-                    convFolders.remove('.working')
-                if 'index.xml' in convFolders:
-                    convFolders.remove('index.xml')
-                    
-                for hour in convFolders:
-                    q.put((wds.nse, (self.cfg, os.path.join(self.case.rapConvDir, hour, 'index.xml'), self.case.dataDir, logDir), {'fields':True, 'dealiasWind':True, 'outputProducts':'SoundingTable,UWind3D,VWind3D,SfcUWind,SfcVWind,UWindMean0-6km,VWindMean0-6km'}, 'nse_'+str(hour)))
-                
-                q.put('waitAll')
-                self.spm.waitForRelease()
-                
-                q.put((wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'makeindex_nse'))
-                                
-                q.put('waitAll')
-                self.spm.waitForRelease()
+                #Calculate environmental indices from the model data. The converted folders have the same names as the RAP folders.
+                for hour in rapFolders:
+                    jobs.addProcess(wds.nse, (self.cfg, os.path.join(self.case.rapConvDir, hour, 'index.xml'), self.case.dataDir, logDir), {'fields':True, 'dealiasWind':True, 'outputProducts':'SoundingTable,UWind3D,VWind3D,SfcUWind,SfcVWind,UWindMean0-6km,VWindMean0-6km'}, 'nse_'+str(hour), deps=['rapconv'+hour])
                 
+                jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'makeindex_nse', deps=jobs.getNames())
                 
-                q.put((wds.w2difference, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), self.case.dataDir, 'UWind3D:06.00', 'SfcUWind:modelanalysis', 'udiff', logDir), {}, 'udiff'))
-                q.put((wds.w2difference, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), self.case.dataDir, 'VWind3D:06.00', 'SfcVWind:modelanalysis', 'vdiff', logDir), {}, 'vdiff'))
+                jobs.addProcess(wds.w2difference, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), self.case.dataDir, 'UWind3D:06.00', 'SfcUWind:modelanalysis', 'udiff', logDir), {}, 'udiff', deps=['makeindex_nse'])
+                jobs.addProcess(wds.w2difference, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), self.case.dataDir, 'VWind3D:06.00', 'SfcVWind:modelanalysis', 'vdiff', logDir), {}, 'vdiff', deps=['makeindex_nse'])
                 
+                for name in siteTails:
+                    siteTails[name] = ['makeindex_nse']
             
                 self.cfg.log("Done!")
                 
@@ -376,27 +420,19 @@ class Processor():
                 #Run the dual-pol quality control algorithm
                 for a in range(self.case.sitesNum):
                     if self.case.sites[a].active:
-                        q.put((wds.w2qcnndp, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+'/index.xml', self.case.dataDir+"/"+self.case.sites[a].name, self.case.sites[a].name, logDir), {'realtime':False,'logLevel':'debug', 'products':'ReflectivityQC'}, 'qcnndp'+self.case.sites[a].name))
+                        jobs.addProcess(wds.w2qcnndp, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+'/index.xml', self.case.dataDir+"/"+self.case.sites[a].name, self.case.sites[a].name, logDir), {'realtime':False,'logLevel':'debug', 'products':'ReflectivityQC'}, 'qcnndp'+self.case.sites[a].name, deps=siteTails[self.case.sites[a].name])
                
                #Dealias the velocity
                 for a in range(self.cfg.numVelRadars):
                     if self.case.sites[a].active:
-                        q.put((wds.dealiasVel, (self.cfg, '"'+self.case.dataDir+'/index.xml"', self.case.dataDir+"/"+self.case.sites[a].name, self.case.sites[a].name, logDir), {'realtime':False}, 'dealiasVel'+self.case.sites[a].name))
-                
-                
-                q.put('waitAll')
-                self.spm.waitForRelease()
-                
+                        jobs.addProcess(wds.dealiasVel, (self.cfg, '"'+self.case.dataDir+'/index.xml"', self.case.dataDir+"/"+self.case.sites[a].name, self.case.sites[a].name, logDir), {'realtime':False}, 'dealiasVel'+self.case.sites[a].name, deps=siteTails[self.case.sites[a].name])
                 
+                #Re-index each radar as soon as its own QC is done
                 for b in range(self.case.sitesNum):
                     if self.case.sites[b].active:
-                        q.put((wds.makeindex, (self.cfg, self.case.dataDir+"/"+self.case.sites[b].name, logDir), {'start':latestStartString}, 'NCmakeindex'+self.case.sites[b].name))
-                
+                        jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir+"/"+self.case.sites[b].name, logDir), {'start':latestStartString}, 'NCmakeindex'+self.case.sites[b].name, deps=[name for name in ('qcnndp'+self.case.sites[b].name, 'dealiasVel'+self.case.sites[b].name) if name in jobs.jobs])
+                        siteTails[self.case.sites[b].name] = ['NCmakeindex'+self.case.sites[b].name]
                 
-                q.put('waitAll')
-                self.spm.waitForRelease()
-                
-
                 self.cfg.log("Completed Data QC")
             else:
                 self.cfg.log("Skipping QC")
@@ -417,27 +453,21 @@ class Processor():
                     if self.case.sites[a].active:
                     
                         if self.cfg.thresholdShear:
-                            q.put((wds.w2circ, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+"/index.xml", self.case.dataDir+"/"+self.case.sites[a].name, logDir), {'divergence':False, 'cressman':self.cfg.shearCressman, 'noSpike':True, 'refThreshold':self.cfg.thresholdValue, 'refType':'ReflectivityQC', 'writeStamped':True, 'dilate':True, 'writeMedian':True, 'logLevel':'debug'}, 'circ'+self.case.sites[a].name+'threshold'))
+                            jobs.addProcess(wds.w2circ, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+"/index.xml", self.case.dataDir+"/"+self.case.sites[a].name, logDir), {'divergence':False, 'cressman':self.cfg.shearCressman, 'noSpike':True, 'refThreshold':self.cfg.thresholdValue, 'refType':'ReflectivityQC', 'writeStamped':True, 'dilate':True, 'writeMedian':True, 'logLevel':'debug'}, 'circ'+self.case.sites[a].name+'threshold', deps=siteTails[self.case.sites[a].name])
                         else:
-                            q.put((wds.w2circ, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+"/index.xml", self.case.dataDir+"/"+self.case.sites[a].name, logDir), {'divergence':False, 'cressman':self.cfg.shearCressman, 'noSpike':True, 'logLevel':'debug'}, 'circ'+self.case.sites[a].name))
+                            jobs.addProcess(wds.w2circ, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+"/index.xml", self.case.dataDir+"/"+self.case.sites[a].name, logDir), {'divergence':False, 'cressman':self.cfg.shearCressman, 'noSpike':True, 'logLevel':'debug'}, 'circ'+self.case.sites[a].name, deps=siteTails[self.case.sites[a].name])
                 
                     
                 #Calculate echo tops
                 for a in range(self.case.sitesNum):
                     if self.case.sites[a].active:
-                        q.put((wds.w2echotop, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+"/index.xml", self.case.dataDir+"/"+self.case.sites[a].name, logDir), {'inputName':"ReflectivityQC", 'thresholds':self.cfg.ETThresholds, 'products':'InterpDbZEchoTop_20'}, 'echotop'+self.case.sites[a].name))
-            
+                        jobs.addProcess(wds.w2echotop, (self.cfg, self.case.dataDir+"/"+self.case.sites[a].name+"/index.xml", self.case.dataDir+"/"+self.case.sites[a].name, logDir), {'inputName':"ReflectivityQC", 'thresholds':self.cfg.ETThresholds, 'products':'InterpDbZEchoTop_20'}, 'echotop'+self.case.sites[a].name, deps=siteTails[self.case.sites[a].name])
             
-                q.put('waitAll')
-                self.spm.waitForRelease()
-                
-                
                 for b in range(self.case.sitesNum):
                     if self.case.sites[b].active:
-                        q.put((wds.makeindex, (self.cfg, self.case.dataDir+"/"+self.case.sites[b].name, logDir), {'start':latestStartString}, 'ETmakeindex'+self.case.sites[b].name))
+                        jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir+"/"+self.case.sites[b].name, logDir), {'start':latestStartString}, 'ETmakeindex'+self.case.sites[b].name, deps=[name for name in ('circ'+self.case.sites[b].name, 'circ'+self.case.sites[b].name+'threshold', 'echotop'+self.case.sites[b].name) if name in jobs.jobs])
+                        siteTails[self.case.sites[b].name] = ['ETmakeindex'+self.case.sites[b].name]
                     
-                q.put('waitAll')
-                self.spm.waitForRelease()
             
                 self.cfg.log("Done!")
                 
@@ -476,34 +506,16 @@ class Processor():
                 #Calculate TDS signatures.
                 for a in range(self.cfg.numVelRadars):
                     if self.case.sites[a].active:
-                        q.put((wds.w2tds, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name+'/index.xml', self.case.dataDir+'/'+self.case.sites[a].name, logDir), {'rhoHVThreshold':0.90, 'azShearThreshold':0.0025, 'products':'TDS_CC', 'reflectivityThresh':35, 'azShearType':azShearName}, 'w2tds'))
-                
-                q.put('waitAll')
-                self.spm.waitForRelease() 
-
-                for b in range(self.cfg.numVelRadars):
-                    if self.case.sites[b].active:
-                        q.put((wds.makeindex, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name, logDir), {'start':latestStartString}, 'tdsindex'))
-                                
-                q.put('waitAll')
-                self.spm.waitForRelease() 
-                
-                #Threshold the Zdr and Ref for where CC > 0
-                
-                for a in range(self.cfg.numVelRadars):
-                    if self.case.sites[a].active:
-                        q.put((wds.w2threshold, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name+'/index.xml', self.case.dataDir+'/'+self.case.sites[a].name, 'ReflectivityQC', 'TDS_CC', logDir), {'searchRadius':0, 'thresholdValue':0, 'wait':True}, 'threshold'+self.case.sites[a].name)) 
-                        q.put((wds.w2threshold, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name+'/index.xml', self.case.dataDir+'/'+self.case.sites[a].name, 'Zdr', 'TDS_CC', logDir), {'searchRadius':0, 'thresholdValue':0, 'wait':True}, 'threshold'+self.case.sites[a].name)) 
+                        jobs.addProcess(wds.w2tds, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name+'/index.xml', self.case.dataDir+'/'+self.case.sites[a].name, logDir), {'rhoHVThreshold':0.90, 'azShearThreshold':0.0025, 'products':'TDS_CC', 'reflectivityThresh':35, 'azShearType':azShearName}, 'w2tds'+self.case.sites[a].name, deps=siteTails[self.case.sites[a].name])
+                        jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name, logDir), {'start':latestStartString}, 'tdsindex'+self.case.sites[a].name, deps=['w2tds'+self.case.sites[a].name])
                 
-                q.put('waitAll')
-                self.spm.waitForRelease() 
+                        #Threshold the Zdr and Ref for where CC > 0
+                        jobs.addProcess(wds.w2threshold, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name+'/index.xml', self.case.dataDir+'/'+self.case.sites[a].name, 'ReflectivityQC', 'TDS_CC', logDir), {'searchRadius':0, 'thresholdValue':0, 'wait':True}, 'threshold'+self.case.sites[a].name+'ref', deps=['tdsindex'+self.case.sites[a].name])
+                        jobs.addProcess(wds.w2threshold, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name+'/index.xml', self.case.dataDir+'/'+self.case.sites[a].name, 'Zdr', 'TDS_CC', logDir), {'searchRadius':0, 'thresholdValue':0, 'wait':True}, 'threshold'+self.case.sites[a].name+'zdr', deps=['tdsindex'+self.case.sites[a].name])
                 
-                for b in range(self.cfg.numVelRadars):
-                    if self.case.sites[b].active:
-                        q.put((wds.makeindex, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name, logDir), {'start':latestStartString}, 'threshold_index_'+str(self.case.sites[a].name)))
+                        jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir+'/'+self.case.sites[a].name, logDir), {'start':latestStartString}, 'threshold_index_'+str(self.case.sites[a].name), deps=['threshold'+self.case.sites[a].name+'ref', 'threshold'+self.case.sites[a].name+'zdr'])
+                        siteTails[self.case.sites[a].name] = ['threshold_index_'+str(self.case.sites[a].name)]
                         
-                q.put('waitAll')
-                self.spm.waitForRelease() 
                 
                 self.cfg.log("Done")
             else:
@@ -514,16 +526,22 @@ class Processor():
             if self.cfg.makeGrids:
             
                 self.cfg.log("Making grids")
+                
+                #Everything gridded needs every radar to be finished. w2simulator streams the data to the mergers reading from it, so
+                #those are started together regardless of the process limit.
+                gridDeps = jobs.getNames()
+                tiltJobs = {tilt:[] for tilt in self.cfg.tiltList}
+                
                 #Start simulator for rest of products
-                q.put((wds.w2simulator, (self.case, self.cfg, '"'+self.buildInput('simulator', overDir=self.case.dataDir)+' '+self.case.dataDir+'/index.xml"', self.buildOutput('simulator'), logDir), {'endOfDataset':True, 'simFactor':self.cfg.simMerge, 'notify':self.cfg.notify}, 'simulator1'))
+                jobs.addProcess(wds.w2simulator, (self.case, self.cfg, '"'+self.buildInput('simulator', overDir=self.case.dataDir)+' '+self.case.dataDir+'/index.xml"', self.buildOutput('simulator'), logDir), {'endOfDataset':True, 'simFactor':self.cfg.simMerge, 'notify':self.cfg.notify}, 'simulator1', deps=gridDeps, stream=True)
                 
                     
                 #Start Echo Top Merger
                 ETs = self.cfg.ETThresholds.split(' ')
-                q.put((wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"', self.case.dataDir, logDir), {'realtime':False, 'algorithms':'Composite', 'noVolume':True, 'method':1, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'InterpDbZEchoTop_'+ETs[0], 'outputTiming':(self.cfg.gridTime, 1, 1), 'logLevel':'debug'}, 'ETmerge'))
+                jobs.addProcess(wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"', self.case.dataDir, logDir), {'realtime':False, 'algorithms':'Composite', 'noVolume':True, 'method':1, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'InterpDbZEchoTop_'+ETs[0], 'outputTiming':(self.cfg.gridTime, 1, 1), 'logLevel':'debug'}, 'ETmerge', deps=gridDeps, stream=True)
                 
                 #Start Reflectivity Merger 'products':'VIL,MergedReflectivityQCComposite'
-                q.put((wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"', self.case.dataDir, logDir), {'realtime':False, 'algorithms':'Composite VIL', 'noVolume':True, 'method':self.cfg.refMethod, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'ReflectivityQC', 'outputTiming':(self.cfg.gridTime, 1, 1), 'sigma':self.cfg.sigma, 'logLevel':'debug', 'products':'VIL,MergedReflectivityQCComposite'}, 'refQCmerge1'))
+                jobs.addProcess(wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"', self.case.dataDir, logDir), {'realtime':False, 'algorithms':'Composite VIL', 'noVolume':True, 'method':self.cfg.refMethod, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'ReflectivityQC', 'outputTiming':(self.cfg.gridTime, 1, 1), 'sigma':self.cfg.sigma, 'logLevel':'debug', 'products':'VIL,MergedReflectivityQCComposite'}, 'refQCmerge1', deps=gridDeps, stream=True)
                 # q.put((wds.w2merger, ('"'+self.buildInput('merger')+'"', self.case.dataDir), {'realtime':False, 'algorithms':'Composite VIL', 'noVolume':True, 'method':self.cfg.refMethod, 'upperLeft':(self.case.topLat, self.case.topLon, float(self.cfg.top)+(round(float(self.case.sites[0].hgt)/1000,2))), 'bottomRight':(self.case.botLat, self.case.botLon, float(self.cfg.bottom)+(round(float(self.case.sites[0].hgt)/1000,2))), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'ReflectivityQC', 'outputTiming':(self.cfg.gridTime, 2, 5), 'logLevel':'debug', 'products':'VIL,MergedReflectivityQCComposite'}, 'refQCmerge2'))
                 # q.put((wds.w2merger, ('"'+self.buildInput('merger')+'"', self.case.dataDir), {'realtime':False, 'algorithms':'Composite VIL', 'noVolume':True, 'method':self.cfg.refMethod, 'upperLeft':(self.case.topLat, self.case.topLon, float(self.cfg.top)+(round(float(self.case.sites[0].hgt)/1000,2))), 'bottomRight':(self.case.botLat, self.case.botLon, float(self.cfg.bottom)+(round(float(self.case.sites[0].hgt)/1000,2))), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'ReflectivityQC', 'outputTiming':(self.cfg.gridTime, 3, 5), 'logLevel':'debug', 'products':'VIL,MergedReflectivityQCComposite'}, 'refQCmerge3'))
                 # q.put((wds.w2merger, ('"'+self.buildInput('merger')+'"', self.case.dataDir), {'realtime':False, 'algorithms':'Composite VIL', 'noVolume':True, 'method':self.cfg.refMethod, 'upperLeft':(self.case.topLat, self.case.topLon, float(self.cfg.top)+(round(float(self.case.sites[0].hgt)/1000,2))), 'bottomRight':(self.case.botLat, self.case.botLon, float(self.cfg.bottom)+(round(float(self.case.sites[0].hgt)/1000,2))), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'ReflectivityQC', 'outputTiming':(self.cfg.gridTime, 4, 5), 'logLevel':'debug', 'products':'VIL,MergedReflectivityQCComposite'}, 'refQCmerge4'))
@@ -538,33 +556,22 @@ class Processor():
                         #q.put((wds.w2merger, ('"'+self.buildInput('merger')+'"', self.case.dataDir), {'method':self.cfg.velMethod, 'upperLeft':(self.case.topLat, self.case.topLon, float(self.cfg.vTop)), 'bottomRight':(self.case.botLat, self.case.botLon, float(self.cfg.bottom)), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vSpacing)), 'inputName':type, 'outputTiming':(self.cfg.gridTime, 1, 1), 'logLevel':'debug'}, type+'merge'))
                         
                         for tilt in self.cfg.tiltList:
-                            q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), type+':'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, type+tilt+'crop'))
+                            tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), type+':'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, type+tilt+'crop', deps=gridDeps))
                             
                     for tilt in self.cfg.tiltList:
                         #Get correlation coeffecient only from the nearest radar, not the full data stream
-                        q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'RhoHV:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'cccrop'+str(tilt)))
-                        q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), 'TDS_CC:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'tdscrop'+tilt))
-                        q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), 'Zdr:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'zdrcrop'+tilt))
-                        q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'ReflectivityQC:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'refcrop'+tilt))
-                        q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'SpectrumWidth:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'spectrumwidthcrop'+tilt))
-                        q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), 'Zdr_Threshold:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'zdrcrop'+tilt))
-                        q.put((wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'ReflectivityQC_Threshold:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'refcrop'+tilt))
-                
-                    q.put('waitAll')
-                    self.spm.waitForRelease()
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'RhoHV:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'cccrop'+str(tilt), deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), 'TDS_CC:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'tdscrop'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), 'Zdr:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'zdrcrop'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'ReflectivityQC:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'refcrop'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'SpectrumWidth:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'spectrumwidthcrop'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), 'Zdr_Threshold:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'zdrcrop_thresh'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2cropconv, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), 'ReflectivityQC_Threshold:'+tilt, logDir), {'upperLeft':(self.case.topLat, self.case.topLon), 'bottomRight':(self.case.botLat, self.case.botLon), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing)), 'gateWidth':0.25, 'source':self.case.sites[0].name}, 'refcrop_thresh'+tilt, deps=gridDeps))
+                
                     
-                    #Reformat the tilt for the cropped data
+                    #Reformat each tilt for the cropped data once that tilt is cropped
                     for tilt in self.cfg.tiltList:
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, azShearName), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'RhoHV'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'Velocity'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'TDS_CC'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'Zdr'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'ReflectivityQC'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'SpectrumWidth'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'Zdr_Threshold'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'ReflectivityQC_Threshold'), self.case.dataDir, isCrop, tilt)
-                        time.sleep(0.25)
+                        jobs.addCall(self.reformatTiltProducts, (tilt, [azShearName, 'RhoHV', 'Velocity', 'TDS_CC', 'Zdr', 'ReflectivityQC', 'SpectrumWidth', 'Zdr_Threshold', 'ReflectivityQC_Threshold'], isCrop), {}, 'reformat'+tilt, deps=tiltJobs[tilt])
                         
                     
                     #Because w2cropconv does not follow the same naming convention as w2merger for it's output, we'll need to define the variables used later separately for the two programs
@@ -590,35 +597,24 @@ class Processor():
                         #q.put((wds.w2merger, ('"'+self.buildInput('merger')+'"', self.case.dataDir), {'method':self.cfg.velMethod, 'upperLeft':(self.case.topLat, self.case.topLon, float(self.cfg.vTop)), 'bottomRight':(self.case.botLat, self.case.botLon, float(self.cfg.bottom)), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vSpacing)), 'inputName':type, 'outputTiming':(self.cfg.gridTime, 1, 1), 'logLevel':'debug'}, type+'merge'))
                         
                         for tilt in self.cfg.tiltList:
-                            q.put((wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"', os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.vTop), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':type+':'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, type+tilt+'merge'))
+                            tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"', os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.vTop), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':type+':'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, type+tilt+'merge', deps=gridDeps, stream=True))
                             
                     for tilt in self.cfg.tiltList:
                         #Get correlation coeffecient only from the nearest radar, not the full data stream
-                        q.put((wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon,self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'RhoHV:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'ccmerge'+str(tilt)))
-                        q.put((wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"',  os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'TDS_CC:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'tdsmerge'+tilt))
-                        q.put((wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'Zdr:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'zdrmerge'+tilt))
-                        q.put((wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'ReflectivityQC:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'refmerge'+tilt))
-                        q.put((wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, round(float(self.cfg.bottom)+(round(float(self.case.sites[0].hgt)/1000,2)), 2)), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'SpectrumWidth:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'spectrumwidth'+tilt))
-                        q.put((wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, round(float(self.cfg.bottom)+(round(float(self.case.sites[0].hgt)/1000,2)), 2)), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'ReflectivityQC_Threshold:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'refmerge_thresh'+tilt))
-                        q.put((wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'Zdr_Threshold:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'zdrmerge_thresh'+tilt))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon,self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'RhoHV:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'ccmerge'+str(tilt), deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, '"'+self.buildInput('merger')+'"',  os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'TDS_CC:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'tdsmerge'+tilt, deps=gridDeps, stream=True))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'Zdr:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'zdrmerge'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'ReflectivityQC:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'refmerge'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, round(float(self.cfg.bottom)+(round(float(self.case.sites[0].hgt)/1000,2)), 2)), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'SpectrumWidth:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'spectrumwidth'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'), os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'Composite', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, round(float(self.cfg.bottom)+(round(float(self.case.sites[0].hgt)/1000,2)), 2)), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'ReflectivityQC_Threshold:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'refmerge_thresh'+tilt, deps=gridDeps))
+                        tiltJobs[tilt].append(jobs.addProcess(wds.w2merger, (self.cfg, os.path.join(self.case.dataDir, self.case.sites[0].name, 'index.xml'),  os.path.join(self.case.dataDir, 'tilt', tilt), logDir), {'method':self.cfg.velMethod, 'algorithms':'VerticalMinimum', 'noVolume':True, 'upperLeft':(self.case.topLat, self.case.topLon, self.cfg.top), 'bottomRight':(self.case.botLat, self.case.botLon, self.cfg.bottom), 'resolution':(float(self.cfg.hvSpacing), float(self.cfg.hvSpacing), float(self.cfg.vvSpacing)), 'inputName':'Zdr_Threshold:'+tilt, 'outputTiming':(0, 1, 1), 'logLevel':'debug'}, 'zdrmerge_thresh'+tilt, deps=gridDeps))
                         
                     # q.put((wds.w2merger, ('"'+self.buildInput('merger')+'"', self.case.dataDir), {'method':self.cfg.velMethod, 'refURL':self.buildOutput('merger')+'/index.xml', 'refType':'MergedReflectivityQC', 'upperLeft':(self.case.topLat, self.case.topLon, float(self.cfg.vTop)), 'bottomRight':(self.case.botLat, self.case.botLon, float(self.cfg.bottom)), 'resolution':(float(self.cfg.hSpacing), float(self.cfg.hSpacing), float(self.cfg.vSpacing)), 'inputName':'PrecipConfidencePixelwise', 'outputTiming':(self.cfg.gridTime, 1, 1), 'logLevel':'debug'}, type+'merge'))
                 
                 
-                    q.put('waitAll')
-                    self.spm.waitForRelease()
                     
                     for tilt in self.cfg.tiltList:
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'Merged'+azShearName+'Composite'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedRhoHVCompositeMin'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedVelocityComposite'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedTDS_CCCompositeMin'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedZdrCompositeMin'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedReflectivityQCComposite'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedSpectrumWidthComposite'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedZdr_ThresholdCompositeMin'), self.case.dataDir, isCrop, tilt)
-                        self.reformatTilt(os.path.join(self.case.dataDir, 'tilt', tilt, 'MergedReflectivityQC_ThresholdComposite'), self.case.dataDir, isCrop, tilt)
-                        time.sleep(0.25)
+                        jobs.addCall(self.reformatTiltProducts, (tilt, ['Merged'+azShearName+'Composite', 'MergedRhoHVCompositeMin', 'MergedVelocityComposite', 'MergedTDS_CCCompositeMin', 'MergedZdrCompositeMin', 'MergedReflectivityQCComposite', 'MergedSpectrumWidthComposite', 'MergedZdr_ThresholdCompositeMin', 'MergedReflectivityQC_ThresholdComposite'], isCrop), {}, 'reformat'+tilt, deps=tiltJobs[tilt])
                      
                      
                     self.case.updateOutputDir('Zdr', self.case.dataDir)
@@ -635,18 +631,17 @@ class Processor():
                     self.case.updateOutputDir('tds', self.case.dataDir)
                     
                 
-                q.put((wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'mergecrop1Index'))
+                jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'mergecrop1Index', deps=jobs.getNames())
                 
-                q.put('waitAll')
-                self.spm.waitForRelease()
                 
                 self.cfg.log("Done!")
             else:
                 self.cfg.log("Skipping grid creating")
             
             #Create xml tables for AzShears at the 0.5 deg tilts
-            q.put((wds.w2csv2table, (self.cfg, self.case.reportDir, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', '00.50'), logDir), {'table':'Reports'}, 'csv2tablemax'))
-            q.put((wds.w2csv2table, (self.cfg, self.case.reportDir, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', '00.50'), logDir), {'table':'Reports'}, 'csv2tablemin'))
+            reportDeps = jobs.getNames()
+            jobs.addProcess(wds.w2csv2table, (self.cfg, self.case.reportDir, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', '00.50'), logDir), {'table':'Reports'}, 'csv2tablemax', deps=reportDeps)
+            jobs.addProcess(wds.w2csv2table, (self.cfg, self.case.reportDir, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', '00.50'), logDir), {'table':'Reports'}, 'csv2tablemin', deps=reportDeps)
             
             self.case.updateOutputDir('vil', self.case.dataDir)
             self.case.updateOutputDir('ref', self.case.dataDir)
@@ -657,8 +652,6 @@ class Processor():
                 self.case.updateProductVar('ref', 'MergedReflectivityQC')
                 
             
-            q.put('waitAll')
-            self.spm.waitForRelease()
             
             azShearName2 = azShearName
             if not self.cfg.thresholdShear:
@@ -695,26 +688,23 @@ class Processor():
                     etGrids = 'MergedInterpDbZEchoTop_20Composite'
 
                 self.cfg.log("Creating clusters")
+                clusterDeps = jobs.getNames()
                 #Now create clusters of VIL, AzShear, and Echo Tops
-                q.put((wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/VIL', 'VIL', logDir), {'dataRange':self.cfg.trackClusterTuple, 'cluster':self.cfg.trackCluster, 'grids':vilGrids, 'smooth':'threshold:95:100:percent,scaling:100:0,percent:75:3:0:3', 'scaling':self.cfg.trackScalingString, 'sizefactor':2, 'disthresh':10, 'coastframes':0, 'products':'TrackClusterTable,ClusterID'}, 'segmotionllTrack'))
+                jobs.addProcess(wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/VIL', 'VIL', logDir), {'dataRange':self.cfg.trackClusterTuple, 'cluster':self.cfg.trackCluster, 'grids':vilGrids, 'smooth':'threshold:95:100:percent,scaling:100:0,percent:75:3:0:3', 'scaling':self.cfg.trackScalingString, 'sizefactor':2, 'disthresh':10, 'coastframes':0, 'products':'TrackClusterTable,ClusterID'}, 'segmotionllTrack', deps=clusterDeps)
                 
                 for tilt in self.cfg.tiltList:
-                    q.put((wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/shear/max/'+tilt, azShearName2+':'+tilt, logDir), {'dataRange':self.cfg.shearClusterTuple, 'smooth':'threshold:96:100:percent,scaling:1000000:0', 'cluster':self.cfg.shearCluster+tilt+clusterSuffix+'.xml', 'grids':shearGrids, 'scaling':self.cfg.shearScalingString, 'sizefactor':2, 'disthresh':self.cfg.maxShearDist, 'coastframes':0, 'products':'MaxShearClusterTable,ClusterID'}, 'segmotionllMaxShear'+tilt))
-                    q.put((wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/shear/min/'+tilt, azShearName2+':'+tilt, logDir), {'dataRange':self.cfg.minShearClusterTuple, 'smooth':'scaling:-1:0,threshold:96:100:percent,scaling:1000000:0', 'cluster':self.cfg.minShearCluster+tilt+clusterSuffix+'.xml', 'grids':shearGrids, 'scaling':self.cfg.minShearScalingString, 'sizefactor':2, 'disthresh':self.cfg.maxShearDist, 'coastframes':0, 'products':'MinShearClusterTable,ClusterID'}, 'segmotionllMinShear'+tilt))
+                    jobs.addProcess(wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/shear/max/'+tilt, azShearName2+':'+tilt, logDir), {'dataRange':self.cfg.shearClusterTuple, 'smooth':'threshold:96:100:percent,scaling:1000000:0', 'cluster':self.cfg.shearCluster+tilt+clusterSuffix+'.xml', 'grids':shearGrids, 'scaling':self.cfg.shearScalingString, 'sizefactor':2, 'disthresh':self.cfg.maxShearDist, 'coastframes':0, 'products':'MaxShearClusterTable,ClusterID'}, 'segmotionllMaxShear'+tilt, deps=clusterDeps)
+                    jobs.addProcess(wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/shear/min/'+tilt, azShearName2+':'+tilt, logDir), {'dataRange':self.cfg.minShearClusterTuple, 'smooth':'scaling:-1:0,threshold:96:100:percent,scaling:1000000:0', 'cluster':self.cfg.minShearCluster+tilt+clusterSuffix+'.xml', 'grids':shearGrids, 'scaling':self.cfg.minShearScalingString, 'sizefactor':2, 'disthresh':self.cfg.maxShearDist, 'coastframes':0, 'products':'MinShearClusterTable,ClusterID'}, 'segmotionllMinShear'+tilt, deps=clusterDeps)
                     
-                q.put((wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/ET', 'MergedInterpDbZEchoTop_20Composite', logDir), {'dataRange':self.cfg.topClusterTuple, 'smooth':'threshold:72:100:percent,scaling:100:0,percent:50:1:0:1', 'cluster':self.cfg.topCluster, 'grids':etGrids, 'scaling':self.cfg.topScalingString, 'sizefactor':2, 'disthresh':10, 'coastframes':0, 'products':'ETClusterTable,ClusterID'}, 'segmotionllTop'))
+                jobs.addProcess(wds.w2segmotionll, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir+'/clusters/ET', 'MergedInterpDbZEchoTop_20Composite', logDir), {'dataRange':self.cfg.topClusterTuple, 'smooth':'threshold:72:100:percent,scaling:100:0,percent:50:1:0:1', 'cluster':self.cfg.topCluster, 'grids':etGrids, 'scaling':self.cfg.topScalingString, 'sizefactor':2, 'disthresh':10, 'coastframes':0, 'products':'ETClusterTable,ClusterID'}, 'segmotionllTop', deps=clusterDeps)
                 
 
                 #Create output of the smoothed data to see what's happening
-                q.put((wds.w2smooth, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir, 'MergedInterpDbZEchoTop_20Composite', logDir), {'smoothing':'threshold:72:100:percent,scaling:100:0,percent:50:1:0:1', 'missing':True, 'outputName':'_smoothed1'}, 'tracksmooth1'))
+                jobs.addProcess(wds.w2smooth, (self.cfg, self.case.dataDir+'/index.xml', self.case.dataDir, 'MergedInterpDbZEchoTop_20Composite', logDir), {'smoothing':'threshold:72:100:percent,scaling:100:0,percent:50:1:0:1', 'missing':True, 'outputName':'_smoothed1'}, 'tracksmooth1', deps=clusterDeps)
 
-                q.put('waitAll')
-                self.spm.waitForRelease()
                 
-                q.put((wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'clusterMakeIndex1'))
+                jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'clusterMakeIndex1', deps=jobs.getNames())
                 
-                q.put('waitAll')
-                self.spm.waitForRelease()
                 
                 self.cfg.log("Done!")
             else:
@@ -726,85 +716,49 @@ class Processor():
                 
                 start = self.case.startTime.strftime('%Y%m%d')
                 end = self.case.endTime.strftime('%Y%m%d')
+                btrtDeps = jobs.getNames()
                 
                 #Make scale directories for BTRT
                 try:
-                    os.mkdir(os.path.join(self.case.dataDir, 'clusters', 'VIL', 'ClusterBT'))
+                    os.makedirs(os.path.join(self.case.dataDir, 'clusters', 'VIL', 'ClusterBT'))
                 except FileExistsError:
                     pass
                 
                 try:
-                    os.mkdir(os.path.join(self.case.dataDir, 'clusters', 'ET', 'ClusterBT'))
+                    os.makedirs(os.path.join(self.case.dataDir, 'clusters', 'ET', 'ClusterBT'))
                 except FileExistsError:
                     pass
                     
-                q.put((wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'VIL', 'TrackClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'VIL', 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8}, 'archiveBTRTVIL'))
-                q.put((wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'ET', 'ETClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'ET', 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8}, 'archiveBTRTET'))
+                jobs.addProcess(wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'VIL', 'TrackClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'VIL', 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8}, 'archiveBTRTVIL', deps=btrtDeps)
+                jobs.addProcess(wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'ET', 'ETClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'ET', 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8}, 'archiveBTRTET', deps=btrtDeps)
                 
                 for tilt in self.cfg.tiltList:
                     
                     #Also make output directories for archiveBTRT.py here
                     try:
-                        os.mkdir(os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'ClusterBT'))
+                        os.makedirs(os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'ClusterBT'))
                     except FileExistsError:
                         pass
                         
                     try:
-                        os.mkdir(os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'ClusterBT'))
+                        os.makedirs(os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'ClusterBT'))
                     except FileExistsError:
                         pass
                         
-                    q.put((wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'MaxShearClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8, 'bufDist':round(self.cfg.maxShearDist)}, 'archiveBTRTMax'+tilt))
-                    q.put((wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'MinShearClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8, 'bufDist':round(self.cfg.maxShearDist)}, 'archiveBTRTMin'+tilt))
-                
-                q.put('waitAll')
-                self.spm.waitForRelease()
-                
-                #Go through a table in the newly created table directory and grab the headers to copy. Some code adapted/taken from BTRT for the maximum 0.5 deg clusters
-                maxbtrtTables = os.listdir(os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', '00.50', 'ClusterBT'))
-                maxHeaderString = ''
-                for table in maxbtrtTables:
-                    #Check to make sure it's an xml file
-                    if table.endswith('.xml'):
-                        tableFile = open(os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', '00.50', 'ClusterBT', table), 'r')
-                        for line in tableFile:
-                            #Check to see if the line is a data column
-                            if line.strip().startswith('<datacolumn '):
-                                maxHeaderString += line.strip().split(' ')[1].split('"')[1]+' '
-                        
-                        maxHeaderString.strip(' ')
-                        break
-                
-                
-                #Same thing, but for the minimum clusters
-                minbtrtTables = os.listdir(os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', '00.50', 'ClusterBT'))
-                minHeaderString = ''
-                for table in minbtrtTables:
-                    #Check to make sure it's an xml file
-                    if table.endswith('.xml'):
-                        tableFile = open(os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', '00.50', 'ClusterBT', table), 'r')
-                        for line in tableFile:
-                            #Check to see if the line is a data column
-                            if line.strip().startswith('<datacolumn '):
-                                minHeaderString += line.strip().split(' ')[1].split('"')[1]+' '
-                        
-                        minHeaderString.strip(' ')
-                        break
-                        
+                    jobs.addProcess(wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'MaxShearClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8, 'bufDist':round(self.cfg.maxShearDist)}, 'archiveBTRTMax'+tilt, deps=btrtDeps)
+                    jobs.addProcess(wds.archiveBTRT, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'MinShearClusterTable', 'scale_0'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'ClusterBT')+'/', start, end, logDir), {'inType':'xml', 'outType':'xml', 'bufTime':8, 'bufDist':round(self.cfg.maxShearDist)}, 'archiveBTRTMin'+tilt, deps=btrtDeps)
                 
                 
-                q.put((wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'bestTrackIndex'))
-                q.put((wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'VIL'), logDir), {}, 'vilclusterindex'))
-                q.put((wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'ET'), logDir), {}, 'etclusterindex'))
+                jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'bestTrackIndex', deps=jobs.getNames())
+                jobs.addProcess(wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'VIL'), logDir), {}, 'vilclusterindex', deps=['archiveBTRTVIL'])
+                jobs.addProcess(wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'ET'), logDir), {}, 'etclusterindex', deps=['archiveBTRTET'])
                 
                 for tilt in self.cfg.tiltList:
-                    q.put((wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt), logDir), {}, tilt+'maxshearclusterindex'))
-                    q.put((wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt), logDir), {}, tilt+'minshearclusterindex'))
+                    jobs.addProcess(wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt), logDir), {}, tilt+'maxshearclusterindex', deps=['archiveBTRTMax'+tilt])
+                    jobs.addProcess(wds.makeindex, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt), logDir), {}, tilt+'minshearclusterindex', deps=['archiveBTRTMin'+tilt])
                 
                 
                 
-                q.put('waitAll')
-                self.spm.waitForRelease()
                 
                 self.cfg.log("Done!")
             else:
@@ -814,30 +768,25 @@ class Processor():
             if self.cfg.doCSV:
             
                 self.cfg.log("Running w2hailtruth_size and converting tables to csv")
+                csvDeps = jobs.getNames()
                 
-                q.put((wds.w2hailtruth_size,  (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', '00.50', 'index.xml'), os.path.join(self.case.dataDir, 'maxtruth'), logDir), {'cellName':'ClusterBT', 'reportName':'Reports', 'reportColumn':'RowName', 'cellMaxAge':480, 'dataColumn':maxHeaderString, 'searchRadius':self.cfg.maxShearDistInit, 'searchMethod':2, 'timeWindow':(-5, 5)}, 'hailtruth_size_max'))
-                q.put((wds.w2hailtruth_size,  (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', '00.50', 'index.xml'), os.path.join(self.case.dataDir, 'mintruth'), logDir), {'cellName':'ClusterBT', 'reportName':'Reports', 'reportColumn':'RowName', 'cellMaxAge':480, 'dataColumn':minHeaderString, 'searchRadius':self.cfg.maxShearDistInit, 'searchMethod':2, 'timeWindow':(-5, 5)}, 'hailtruth_size_min'))
+                jobs.addProcess(self.hailTruth,  (os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', '00.50'), os.path.join(self.case.dataDir, 'maxtruth'), logDir), {'cellName':'ClusterBT', 'reportName':'Reports', 'reportColumn':'RowName', 'cellMaxAge':480, 'searchRadius':self.cfg.maxShearDistInit, 'searchMethod':2, 'timeWindow':(-5, 5)}, 'hailtruth_size_max', deps=csvDeps)
+                jobs.addProcess(self.hailTruth,  (os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', '00.50'), os.path.join(self.case.dataDir, 'mintruth'), logDir), {'cellName':'ClusterBT', 'reportName':'Reports', 'reportColumn':'RowName', 'cellMaxAge':480, 'searchRadius':self.cfg.maxShearDistInit, 'searchMethod':2, 'timeWindow':(-5, 5)}, 'hailtruth_size_min', deps=csvDeps)
                 
-                q.put('waitAll')
-                self.spm.waitForRelease()
                 
-                q.put((wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'TruthTableIndex'))
+                jobs.addProcess(wds.makeindex, (self.cfg, self.case.dataDir, logDir), {}, 'TruthTableIndex', deps=jobs.getNames())
                 
-                q.put('waitAll')
-                self.spm.waitForRelease()
                  
-                q.put((wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), os.path.join(self.case.hailTruthDir, 'maxshear'), 'maxtruth:TruthTable', logDir), {'units':True, 'header':True}, 'maxcluster2csvTruth'))
-                q.put((wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), os.path.join(self.case.hailTruthDir, 'minshear'), 'mintruth:TruthTable', logDir), {'units':True, 'header':True}, 'mincluster2csvTruth'))
+                jobs.addProcess(wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), os.path.join(self.case.hailTruthDir, 'maxshear'), 'maxtruth:TruthTable', logDir), {'units':True, 'header':True}, 'maxcluster2csvTruth', deps=['TruthTableIndex'])
+                jobs.addProcess(wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'index.xml'), os.path.join(self.case.hailTruthDir, 'minshear'), 'mintruth:TruthTable', logDir), {'units':True, 'header':True}, 'mincluster2csvTruth', deps=['TruthTableIndex'])
                  
-                q.put((wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'VIL', 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'VIL', 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'vilcluster2csv'))
-                q.put((wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'ET', 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'ET', 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'et2csv'))
+                jobs.addProcess(wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'VIL', 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'VIL', 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'vilcluster2csv', deps=csvDeps)
+                jobs.addProcess(wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'ET', 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'ET', 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'et2csv', deps=csvDeps)
                 
                 for tilt in self.cfg.tiltList:
-                    q.put((wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'maxshear2csv'))
-                    q.put((wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'minshear2csv'))
+                    jobs.addProcess(wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'max', tilt, 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'maxshear2csv'+tilt, deps=csvDeps)
+                    jobs.addProcess(wds.w2table2csv, (self.cfg, os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'index.xml'), os.path.join(self.case.dataDir, 'clusters', 'shear', 'min', tilt, 'ClusterCSV'), 'ClusterBT', logDir), {'units':True, 'header':True}, 'minshear2csv'+tilt, deps=csvDeps)
                     
-                q.put('waitAll')
-                self.spm.waitForRelease()
                 
                 self.cfg.log("Done")
                 
@@ -866,6 +815,13 @@ class Processor():
             self.case.updateOutputDir('clustertable', os.path.join(self.case.dataDir, 'clusters', 'VIL', 'ClusterCSV'))
             self.case.updateProductVar('et', 'MergedInterpDbZEchoTop_20Composite')
             self.case.updateOutputDir('et', self.case.dataDir)
+            
+            failed = jobs.run()
+            if failed:
+                self.cfg.error("Jobs that exited with an error: "+str(failed))
+                
+            #Linked products are shared with their source, so make sure nothing wrote into one
+            self.mirror.verify()
 
             
             finish = True #Let the program know we made it to the end (having an exception would have skipped this)
@@ -885,8 +841,6 @@ class Processor():
 
         self.case.saveVars(self.cfg, self.case.baseDir, 'vars.pkl')
         
-        self.spm.stopListener()
-        
         self.cfg = cfg
         
         elapsed = (dt.now() - startTime).seconds
@@ -944,10 +898,18 @@ class Processor():
     #The actual TTRAP algorithm
     def ttrap(self, cases=None):
 
+        #Parsed inputs from an earlier run on the same data (e.g. ttrapOnly re-runs) are loaded from the analysis cache
+        cache = None
+        if self.cfg.useAnalysisCache:
+            cache = analysiscache.AnalysisCache(self.cfg, self.case)
+            
         #Pull the VCPs out of the AliasedVelocity files
-        self.case.getVCPs(self.cfg)
+        if not cache or not cache.loadVCPs(self.case):
+            self.case.getVCPs(self.cfg)
+            if cache:
+                cache.setVCPs(self.case)
         
-        ana = analysis.Analysis(self.cfg, self.case)
+        ana = analysis.Analysis(self.cfg, self.case, cache)
         
         try:
             #Get the frames that have beeen analyzed 
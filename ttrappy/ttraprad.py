@@ -1,9 +1,19 @@
 #Module containing functions related to individual radars
+#The WSR-88Ds in radarinfo.xml are read once per process into a RadarRegistry. The nearest radars to a case come from one
+#vectorized distance calculation and are checked for data at the same time, and what the L2 archive has for each (site, day)
+#is kept so the cases sharing it and the download use it instead of asking the archive again.
 
+import threading
 import xml.etree.ElementTree as ET
+from datetime import datetime as dt
+from datetime import timedelta as td
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from ttrappy import distance
+from ttrappy import download
+from ttrappy import error as err
 
-import nexradaws
+PROBESPARE = 2 #Radars past the ones still needed to check at the same time in case some of the nearer ones have no data
 
 #Sort radars by distance
 def sortRadars(sites, distances, names):
@@ -15,61 +25,146 @@ def sortRadars(sites, distances, names):
     
     return sortedSites, sortedDistances, sortedNames
 
+
+class RadarRegistry():
+
+    """ The WSR-88Ds in a radarinfo file as arrays, and the scans the L2 archive has for them by (site, day).
+        A day is kept once it's over. None is kept for a site the archive doesn't have (nexradaws raises TypeError).
+    """
+
+    def __init__(self, radarinfo):
+
+        root = ET.parse(radarinfo).getroot()
+
+        self.names = []
+        self.locations = [] #(lat, lon, ht) as they are in the file
+        for radar in root:
+            #Make sure the radar is a WSR-88D
+            if (radar.get('name')[0] == 'K' and radar.get('freqband') == "S"):
+                location = radar.find('location')
+                self.names.append(radar.get('name'))
+                self.locations.append((location.get('lat'), location.get('lon'), location.get('ht')))
+
+        self.indices = {name:i for i, name in enumerate(self.names)}
+        self.lats = np.array([float(lat) for lat, _, _ in self.locations])
+        self.lons = np.array([float(lon) for _, lon, _ in self.locations])
+
+        self.inventory = {} #(site, 'YYYY-MM-DD') -> scans that day
+        self.lock = threading.Lock()
+
+        return
+
+    def getRadar(self, i):
+        """ New Radar for the ith radar """
+
+        lat, lon, hgt = self.locations[i]
+
+        return Radar(self.names[i], lat, lon, hgt)
+
+    def getRadarByName(self, name):
+        """ New Radar for the named radar. KeyError if it isn't in the file """
+        return self.getRadar(self.indices[name])
+
+    def getNearest(self, lat, lon):
+        """ Indices of the radars from nearest to farthest from lat/lon and their distances (km) """
+
+        distances = distance.calculateDistanceArray(self.lats, self.lons, float(lat), float(lon))
+        order = np.argsort(distances, kind='stable')
+
+        return order, distances[order]
+
+    def getDayScans(self, cfg, archive, name, day):
+        """ Every scan for the radar on day (a date) from the archive or the inventory. None if the archive doesn't have the radar """
+
+        key = (name, day.isoformat())
+        with self.lock:
+            if key in self.inventory:
+                return self.inventory[key]
+
+        dayStart = cfg.utc.localize(dt(day.year, day.month, day.day))
+        dayEnd = dayStart+td(days=1)
+        try:
+            scans = archive.listScans(name, dayStart, dayEnd-td(microseconds=1))
+        except TypeError:
+            scans = None
+
+        #A day that isn't over yet can still get scans
+        if dayEnd <= cfg.utc.localize(dt.utcnow()):
+            with self.lock:
+                self.inventory[key] = scans
+
+        return scans
+
+    def getScans(self, cfg, archive, name, start, end):
+        """ The radar's scans from start to end. None if the archive doesn't have it on one of the days """
+
+        scans = []
+        day = start.date()
+        while day <= end.date():
+            dayScans = self.getDayScans(cfg, archive, name, day)
+            if dayScans is None:
+                return None
+            scans.extend(scan for scan in dayScans if scan.scan_time is not None and start <= scan.scan_time <= end)
+            day += td(days=1)
+
+        return scans
+
+
+registries = {} #radarinfo file -> RadarRegistry for this process
+
+def getRegistry(cfg):
+    """ The RadarRegistry for cfg.radarinfo. Read the first time it's needed, then kept """
+
+    if cfg.radarinfo not in registries:
+        registries[cfg.radarinfo] = RadarRegistry(cfg.radarinfo)
+
+    return registries[cfg.radarinfo]
+
+
 def findNearestRadars(cfg, lat, lon, num, start, end):
 
-    """ Returns the nearest num radars to a lattiude and longitude. 
-        radars radarNameList"""
+    """ Returns the nearest num radars to a lattiude and longitude that have data in the L2 archive from start to end,
+        their distances, and their names. Each radar's scans are kept in radar.availableScans for the download.
+        The nearest radars still needed (and PROBESPARE more) are checked at the same time. """
 
-    tree = ET.parse(cfg.radarinfo)
-    root = tree.getroot()
+    registry = getRegistry(cfg)
+    archive = download.getArchive(cfg)
+    order, distances = registry.getNearest(lat, lon)
 
     sites = []
     closestDistances = []
-    distances = [] 
-    radars = []
+    sitesNames = []
+    position = 0
+    with ThreadPoolExecutor(max_workers=num+PROBESPARE) as executor:
+        while len(sites) < num and position < len(order):
 
-    for radar in root:
-        
-        #Make sure the radar is a WSR-88D
-        if (radar.get('name')[0] == 'K' and radar.get('freqband') == "S"):
-            location = radar.find('location')
-            radars.append(Radar(radar.get('name'), location.get('lat'), location.get('lon'), location.get('ht')))
-            distances.append(distance.calculateDistance(float(location.get('lat')), float(location.get('lon')), float(lat), float(lon)))
+            batch = range(position, min(position+num-len(sites)+PROBESPARE, len(order)))
+            position = batch.stop
+            futures = [executor.submit(registry.getScans, cfg, archive, registry.names[order[i]], start, end) for i in batch]
 
-    radarsCopy = radars
+            #Take them nearest first. Extra ones that were checked stay in the inventory
+            for i, future in zip(batch, futures):
+                scans = future.result()
+                if len(sites) == num:
+                    continue
+                name = registry.names[order[i]]
+                if scans is None:
+                    cfg.error("Radar "+str(name)+' did not appear in AWS (TypeError was raised). Trying the next nearest radar')
+                    continue
 
-    conn = nexradaws.NexradAwsInterface()
-    sitesNames = []
-    appendedSites = 0 #Count the number of sites we've found
-    while appendedSites < num:
-                
-        minDist = min(distances)
-        ind = distances.index(minDist)
-        
-        #Ping AWS to see if the radar exists
-        try:
-            fileObjects = conn.get_avail_scans_in_range(start, end, radars[ind].name)
-        except TypeError as E:
-            cfg.error("Radar "+str(radars[ind].name)+' did not appear in AWS (TypeError was raised). Trying the next nearest radar')
-            distances.remove(minDist)#Remove the closest radar from the list of distances
-            radarsCopy.remove(radars[ind])
-        else:
-            closestDistances.append(minDist)
-            sites.append(radars[ind])
-            sitesNames.append(radars[ind].name)
-            cfg.log("Appended radar "+str(radars[ind].name)+" at distance "+str(minDist)+ ' km')
-            distances.remove(minDist)#Remove the closest radar from the list of distances
-            radarsCopy.remove(radars[ind])
-            appendedSites += 1
-          
-  
-  
-    sortedSites, sortedDistances, sortedNames = sortRadars(sites, closestDistances, sitesNames)
-    closestSite = sortedSites[0]
-    closestSite.setIsClosest(True)
-    sortedSites[0] = closestSite #Make sure the closest radar site knows it's the closest
+                radar = registry.getRadar(order[i])
+                radar.availableScans = scans
+                sites.append(radar)
+                closestDistances.append(float(distances[i]))
+                sitesNames.append(name)
+                cfg.log("Appended radar "+str(name)+" at distance "+str(closestDistances[-1])+ ' km')
+
+    if not sites:
+        raise err.RadarNotFoundError("No radar near "+str(lat)+", "+str(lon)+" has data between "+str(start)+" and "+str(end))
+
+    sites[0].setIsClosest(True) #Make sure the closest radar site knows it's the closest
     
-    return sortedSites, sortedDistances, sortedNames			
+    return sites, closestDistances, sitesNames
 
 
 #Creates a list of radar objects
@@ -130,6 +225,7 @@ class Radar():
         self.distance = None
         self.hasData = False
         self.isClosest = False
+        self.availableScans = None #Scans found in the L2 archive when the radar was picked (see findNearestRadars)
 
     def getLatestScan(self):
         return self.latestScan
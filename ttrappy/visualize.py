@@ -8,17 +8,19 @@ from datetime import datetime
 from datetime import timedelta
 from ttrappy import ttrappy as ttr
 from ttrappy import colormaps as cm
+from ttrappy import timeindex
+from ttrappy import basemap
+from ttrappy import overlays as ovl
+from ttrappy import figuremanifest as fman
 import multiprocessing as mp
 import tkinter as tk
-import time
+import traceback
 import multiprocessing
 import cartopy.crs as ccrs
-import cartopy.io.shapereader as shpreader
 import cartopy.feature as cfeature
 #from cartopy.mpl.gridliner import LONGITUDE_FORMATTER, LATITUDE_FORMATTER
 import matplotlib.ticker as mticker
 import math
-from metpy.plots import USCOUNTIES
 from decimal import Decimal
 
 MATPLOTLIB = True
@@ -49,51 +51,16 @@ def createAxisTicks(cfg, start, size, spacing):
 		
 
 def getStringDT(cfg, string1, string2):
+    """ Time difference in seconds (within a day) between two %Y%m%d-%H%M%S strings, whether string2 is after string1, and whether they're equal.
+        Kept for anything comparing two single times. Use a timeindex.TimeIndex to match a time against many.
+    """
 
-    #Flag to determine if the time associated with string 2 is greater than or equal to string 1
-    greater = False
-    
-    #Assuming the format YYYYMMDD-HHMMSS
-    year1 = int(string1[0:4])
-    month1 = int(string1[4:6])
-    day1 = int(string1[6:8])
-    hour1 = int(string1[9:11])
-    minute1 = int(string1[11:13])
-    second1 = int(string1[13:])
-
-    year2 = int(string2[0:4])
-    month2 = int(string2[4:6])
-    day2 = int(string2[6:8])
-    hour2 = int(string2[9:11])
-    minute2 = int(string2[11:13])
-    second2 = int(string2[13:])
-        
-    #cfg.log('getStringDT()')
-    #cfg.log(str(string1)+' '+str(year1)+' '+str(month1)+' '+str(day1)+' '+str(hour1)+' '+str(minute1)+' '+str(second1))
-    #cfg.log(str(string2)+' '+str(year2)+' '+str(month2)+' '+str(day2)+' '+str(hour2)+' '+str(minute2)+' '+str(second2))
-
-    dt1 = datetime(year1, month1, day1, hour1, minute1, second1)
-    dt2 = datetime(year2, month2, day2, hour2, minute2, second2)
-    
-    equal = False
-    
-    if dt2 > dt1:
-        greater = True
-    else:
-        greater = False
-        
-    if dt2 == dt1:
-        equal = True
+    delta = timeindex.toEpoch(string2) - timeindex.toEpoch(string1)
 
-    delta = dt2 - dt1
-    #cfg.log('Resulting Delta = '+str(delta.seconds))
-    delta2 = dt1 - dt2
-    #cfg.log('Alternate Delta = '+str(delta2.seconds))
+    greater = delta > 0
+    equal = delta == 0
 
-    if (delta.seconds < delta2.seconds):
-        return delta.seconds, greater, equal
-    else:
-        return delta2.seconds, greater, equal
+    return min(delta % 86400, -delta % 86400), greater, equal
 
 
 def getSpatialAttributes(cfg, nc_data):
@@ -141,88 +108,8 @@ def retrieveTableInfo(cfg, fi, index, avgLon):
 
 def plotCities(ax, xticks, yticks, proj):
 
-    minLon = min(xticks)
-    maxLon = max(xticks)
-    minLat = min(yticks)
-    maxLat = max(yticks)
-    
-    states = {'Alabama':'AL',
-              'Alaska':'AK',
-              'Arizona':'AZ',
-              'Arkansas':'AR',
-              'American Samoa':'AS',
-              'California':'CA',
-              'Colorado':'CO',
-              'Connecticut':'CT',
-              'Deleware':'DE',
-              'District of Columbia':'DC',
-              'Florida':'FL',
-              'Georgia':'GA',
-              'Guam':'GU',
-              'Hawaii':'HI',
-              'Idaho':'ID',
-              'Illinois':'IL',
-              'Indiana':'IN',
-              'Iowa':'IA',
-              'Kansas':'KS',
-              'Kentucky':'KY',
-              'Louisiana':'LA',
-              'Maine':'ME',
-              'Maryland':'MD',
-              'Massachusetts':'MA',
-              'Michigan':'MI',
-              'Minnesota':'MN',
-              'Mississippi':'MS',
-              'Missouri':'MO',
-              'Montana':'MT',
-              'Nebraska':'NE',
-              'Nevada':'NV',
-              'New Hampshire':'NH',
-              'New Jersey':'NJ',
-              'New Mexico':'NM',
-              'New York':'NY',
-              'North Carolina':'NC',
-              'North Dakota':'ND',
-              'Northern Mariana Islands':'CM',
-              'Ohio':'OH',
-              'Oklahoma':'OK',
-              'Oregon':'OR',
-              'Pennsylvania':'PA',
-              'Puerto Rico':'PR',
-              'Rhode Island':'RI',
-              'South Carolina':'SC',
-              'South Dakota':'SD',
-              'Tennessee':'TN',
-              'Texas':'TX',
-              'Trust Territories':'TT',
-              'Utah':'UT',
-              'Vermont':'VT',
-              'Virginia':'VA',
-              'Virgin Islands':'VI',
-              'Washington':'WA',
-              'West Virginia':'WV',
-              'Wisconsin':'WI',
-              'Wyoming':'WY'}
-              
-    #Define a dictionary of states and their appreviations for use in the city names
-    fname = shpreader.natural_earth(resolution='10m', category='cultural', name='populated_places')
-    reader = shpreader.Reader(fname)
-    
-    cities = []
-    xlist = []
-    ylist = []
-    nameList = []
-    
-    records = list(reader.records())
-    
-    for city in records:
-        x = city.geometry.x
-        y = city.geometry.y
-        #print(x, y,  minLon <= x <= maxLon, minLat <= y <= maxLat, city.attributes['POP_MAX'], city.attributes['NAME_EN'])
-        if minLon <= x <= maxLon and minLat <= y <= maxLat:
-            xlist.append(x)
-            ylist.append(y)
-            nameList.append(city.attributes['NAME_EN']+','+str(states[city.attributes['ADM1NAME']]))
+    #The cities in the figure come from the basemap layer kept for this domain
+    xlist, ylist, nameList = basemap.getCityLayer(xticks, yticks)
             
     if len(xlist) > 0 and len(ylist) > 0 and len(nameList) > 0:
         ax.scatter(xlist, ylist, s=40, c='k', edgecolor='white')
@@ -239,80 +126,63 @@ def plotShearCentroid(cfg, case, plt, ax, tString, tilt, closestString, ax2=None
         #Now we're going to read through the preliminary analysis and get centroid lat/lons
         fileName = str(case.ID)+'_prelim.csv'
         fullPath = os.path.join(case.saveDir, fileName)
-        
-        with open(fullPath, 'r') as analysisFi:
-            first = True
-            DTIndex = None
-            latIndex = None
-            lonIndex = None
-            closestLocIndex = []
-            closestLocTDSeconds = 99999999
-            closestLat = None
-            closestLon = None
-            closestU = None
-            closestV = None
-            uIndex = None
-            vIndex = None
-            closestUShear = None
-            closestVShear = None
-            uShearIndex = None
-            vShearIndex = None
-            beamHeight = None
-            range = None
-            
-            
-            
-
-            if float(tilt) < 1:
-                modTilt = tilt.rstrip('0')
-            else:
-                modTilt = tilt.strip('0')
-                
-            paraModTilt = '('+modTilt+'deg)'
-        
-            for line in analysisFi:
-                lineList = line.rstrip('\n').split(',')
-                if first:
-                    DTIndex = lineList.index('DateTime'+paraModTilt)
-                    latIndex = lineList.index('Latitude(Degrees)'+paraModTilt)
-                    lonIndex = lineList.index('Longitude(Degrees)'+paraModTilt)
-                    uIndex = lineList.index('clusterU(m/s)'+paraModTilt)
-                    vIndex = lineList.index('clusterV(m/s)'+paraModTilt)
-                    uShearIndex = lineList.index('uShear(m/s)'+paraModTilt)
-                    vShearIndex = lineList.index('vShear(m/s)'+paraModTilt)
-                    forwardLatIndex = lineList.index('forwardLat(deg)'+paraModTilt)
-                    forwardLonIndex = lineList.index('forwardLon(deg)'+paraModTilt)
-                    backwardLatIndex = lineList.index('backLat(deg)'+paraModTilt)
-                    backwardLonIndex = lineList.index('backLon(deg)'+paraModTilt)
-                    beamHeightIndex = lineList.index('BeamHeight 0 '+paraModTilt+'(feet)')
-                    rangeIndex = lineList.index('GroundRange 0 (n mi)'+paraModTilt)
-                    first = False
-                
-                else:
-                    if lineList[DTIndex] != '-99900' and lineList[DTIndex] != '-99904':
-                        #cfg.error("Plt shear centroid times "+str(tString)+" "+str( lineList[DTIndex]))
-                        currentTDSeconds = getStringDT(cfg, tString, lineList[DTIndex])[0]
-                        if currentTDSeconds < closestLocTDSeconds:
-                            try:
-                                closestLat = float(lineList[latIndex])
-                                closestLon = float(lineList[lonIndex])
-                                closestLocTDSeconds = currentTDSeconds
-                                closestU = float(lineList[uIndex])
-                                closestV = float(lineList[vIndex])
-                                closestUShear = float(lineList[uShearIndex])
-                                closestVShear = float(lineList[vShearIndex])
-                                forwardLat = float(lineList[forwardLatIndex])
-                                forwardLon = float(lineList[forwardLonIndex])
-                                backwardLat = float(lineList[backwardLatIndex])
-                                backwardLon = float(lineList[backwardLonIndex])
-                                beamHeight = float(lineList[beamHeightIndex])
-                                range = float(lineList[rangeIndex])
-                                
-                            except ValueError as VE:
-                                cfg.error("Skipping None in shear centroid\n"+str(VE)+" DT "+str(lineList[DTIndex])+" tilt "+str(tilt))
-                                continue
-                    else:
-                        continue
+        tEpoch = timeindex.toEpoch(tString)
+        
+        overlays = getOverlayIndex(case)
+        closestLocTDSeconds = 99999999
+        closestLat = None
+        closestLon = None
+        closestU = None
+        closestV = None
+        closestUShear = None
+        closestVShear = None
+        beamHeight = None
+        range = None
+
+        if float(tilt) < 1:
+            modTilt = tilt.rstrip('0')
+        else:
+            modTilt = tilt.strip('0')
+            
+        paraModTilt = '('+modTilt+'deg)'
+
+        DTIndex = overlays.index('DateTime'+paraModTilt)
+        latIndex = overlays.index('Latitude(Degrees)'+paraModTilt)
+        lonIndex = overlays.index('Longitude(Degrees)'+paraModTilt)
+        uIndex = overlays.index('clusterU(m/s)'+paraModTilt)
+        vIndex = overlays.index('clusterV(m/s)'+paraModTilt)
+        uShearIndex = overlays.index('uShear(m/s)'+paraModTilt)
+        vShearIndex = overlays.index('vShear(m/s)'+paraModTilt)
+        forwardLatIndex = overlays.index('forwardLat(deg)'+paraModTilt)
+        forwardLonIndex = overlays.index('forwardLon(deg)'+paraModTilt)
+        backwardLatIndex = overlays.index('backLat(deg)'+paraModTilt)
+        backwardLonIndex = overlays.index('backLon(deg)'+paraModTilt)
+        beamHeightIndex = overlays.index('BeamHeight 0 '+paraModTilt+'(feet)')
+        rangeIndex = overlays.index('GroundRange 0 (n mi)'+paraModTilt)
+
+        for lineEpoch, lineList in overlays.getRows(DTIndex):
+            #cfg.error("Plt shear centroid times "+str(tString)+" "+str( lineList[DTIndex]))
+            currentTDSeconds = abs(lineEpoch - tEpoch)
+            if currentTDSeconds < closestLocTDSeconds:
+                try:
+                    closestLat = float(lineList[latIndex])
+                    closestLon = float(lineList[lonIndex])
+                    closestLocTDSeconds = currentTDSeconds
+                    closestU = float(lineList[uIndex])
+                    closestV = float(lineList[vIndex])
+                    closestUShear = float(lineList[uShearIndex])
+                    closestVShear = float(lineList[vShearIndex])
+                    forwardLat = float(lineList[forwardLatIndex])
+                    forwardLon = float(lineList[forwardLonIndex])
+                    backwardLat = float(lineList[backwardLatIndex])
+                    backwardLon = float(lineList[backwardLonIndex])
+                    beamHeight = float(lineList[beamHeightIndex])
+                    range = float(lineList[rangeIndex])
+                    
+                except ValueError as VE:
+                    cfg.error("Skipping None in shear centroid\n"+str(VE)+" DT "+str(lineList[DTIndex])+" tilt "+str(tilt))
+                    continue
+
                         
         if closestLocTDSeconds <= (60*cfg.maxAppendTimeV):
             ax.scatter(closestLon, closestLat, s=40, c=cfg.activeColor, edgecolor=[1, 1, 1])
@@ -370,7 +240,6 @@ def plotShearCentroid(cfg, case, plt, ax, tString, tilt, closestString, ax2=None
             if tilt != cfg.tiltList[0]:
             
                 #cfg.error("Trying to plot 0.5 deg tilt for tilt "+str(tilt))
-                first = True
                 
                 if float(cfg.tiltList[0]) < 1:
                     modTilt2 = cfg.tiltList[0].rstrip('0')
@@ -387,42 +256,33 @@ def plotShearCentroid(cfg, case, plt, ax, tString, tilt, closestString, ax2=None
                 closestVShear2 = None
                 currentTDSeconds2 = None
                 closestLocTDSeconds2 = 9999999999
-                    
-                with open(fullPath, 'r') as analysisFi2:
 
-                
-                    for line2 in analysisFi2:
-                        lineList2 = line2.rstrip('\n').split(',')
-                        if first:
-                            DTIndex2 = lineList2.index('DateTime'+paraModTilt2)
-                            latIndex2 = lineList2.index('Latitude(Degrees)'+paraModTilt2)
-                            lonIndex2 = lineList2.index('Longitude(Degrees)'+paraModTilt2)
-                            uIndex2 = lineList2.index('clusterU(m/s)'+paraModTilt2)
-                            vIndex2 = lineList2.index('clusterV(m/s)'+paraModTilt2)
-                            uShearIndex2 = lineList2.index('uShear(m/s)'+paraModTilt2)
-                            vShearIndex2 = lineList2.index('vShear(m/s)'+paraModTilt2)
-                            first = False
-                        
-                        else:
-                            if lineList[DTIndex] != '-99900' and lineList[DTIndex] != '-99904':
-                                currentTDSeconds2, greater, equal = getStringDT(cfg, tString, lineList2[DTIndex2])
-                                #cfg.error("Trying with "+str(currentTDSeconds2)+" greater? "+str(greater)+" latIndex2 "+str(latIndex2)+" "+str(paraModTilt2))
-                                #Make sure we are getting the closest 0.5 degree sweep BEFORE the current sweep
-                                if currentTDSeconds2 < closestLocTDSeconds2 and not greater:
-                                    try:
-                                        closestLat2 = float(lineList2[latIndex2])
-                                        closestLon2 = float(lineList2[lonIndex2])
-                                        closestLocTDSeconds2 = currentTDSeconds2
-                                        closestU2 = float(lineList2[uIndex2])
-                                        closestV2 = float(lineList2[vIndex2])
-                                        closestUShear2 = float(lineList2[uShearIndex2])
-                                        closestVShear2 = float(lineList2[vShearIndex2])
-                                    except ValueError as VE:
-                                        cfg.error("Skipping None in shear centroid for lowest tilt addon\n"+str(VE)+" DT "+str(lineList2[DTIndex])+" tilt "+str(modTilt2))
-                                        continue
-                            else:
-                                continue
-                             
+                DTIndex2 = overlays.index('DateTime'+paraModTilt2)
+                latIndex2 = overlays.index('Latitude(Degrees)'+paraModTilt2)
+                lonIndex2 = overlays.index('Longitude(Degrees)'+paraModTilt2)
+                uIndex2 = overlays.index('clusterU(m/s)'+paraModTilt2)
+                vIndex2 = overlays.index('clusterV(m/s)'+paraModTilt2)
+                uShearIndex2 = overlays.index('uShear(m/s)'+paraModTilt2)
+                vShearIndex2 = overlays.index('vShear(m/s)'+paraModTilt2)
+
+                for lineEpoch2, lineList2 in overlays.getRows(DTIndex2):
+                    currentTDSeconds2 = abs(lineEpoch2 - tEpoch)
+                    greater = lineEpoch2 > tEpoch
+                    #cfg.error("Trying with "+str(currentTDSeconds2)+" greater? "+str(greater)+" latIndex2 "+str(latIndex2)+" "+str(paraModTilt2))
+                    #Make sure we are getting the closest 0.5 degree sweep BEFORE the current sweep
+                    if currentTDSeconds2 < closestLocTDSeconds2 and not greater:
+                        try:
+                            closestLat2 = float(lineList2[latIndex2])
+                            closestLon2 = float(lineList2[lonIndex2])
+                            closestLocTDSeconds2 = currentTDSeconds2
+                            closestU2 = float(lineList2[uIndex2])
+                            closestV2 = float(lineList2[vIndex2])
+                            closestUShear2 = float(lineList2[uShearIndex2])
+                            closestVShear2 = float(lineList2[vShearIndex2])
+                        except ValueError as VE:
+                            cfg.error("Skipping None in shear centroid for lowest tilt addon\n"+str(VE)+" DT "+str(lineList2[DTIndex2])+" tilt "+str(modTilt2))
+                            continue
+
                 #cfg.error("Plotting "+str(closestLon2)+" "+str(closestLat2))         
                 ax.scatter(closestLon2, closestLat2, s=75, c=cfg.activeColor, marker="d", edgecolor=[1,1,1])
                     
@@ -445,50 +305,33 @@ def plotVILCentroid(cfg, case, plt, ax, tString, closestString):
         #Now we're going to read through the preliminary analysis and get centroid lat/lons
         fileName = str(case.ID)+'_prelim.csv'
         fullPath = os.path.join(case.saveDir, fileName)
-        
-        with open(fullPath, 'r') as analysisFi:
-            first = True
-            DTIndex = None
-            latIndex = None
-            lonIndex = None
-            closestLocIndex = []
-            closestLocTDSeconds = 99999999
-            closestLat = None
-            closestLon = None
-            closestU = None
-            closestV = None
-            uIndex = None
-            vIndex = None
-
-            for line in analysisFi:
-                lineList = line.rstrip('\n').split(',')
-                if first:
-                    DTIndex = lineList.index('DateTime(Track)')
-                    latIndex = lineList.index('Latitude(Degrees)(Track)')
-                    lonIndex = lineList.index('Longitude(Degrees)(Track)')
-                    uIndex = lineList.index('uShear(m/s)')
-                    vIndex = lineList.index('vShear(m/s)')
-                    
-                    first = False
-                
-                else:
-                    if lineList[DTIndex] != '-99900' and lineList[DTIndex] != '-99904':
-                        currentTDSeconds = getStringDT(cfg, tString, lineList[DTIndex])[0]
-                        if currentTDSeconds < closestLocTDSeconds:
-                            try:
-                                closestLat = float(lineList[latIndex])
-                                closestLon = float(lineList[lonIndex])
-                                closestLocTDSeconds = currentTDSeconds
-                                closestU = float(lineList[uIndex])
-                                closestV = float(lineList[vIndex])
-                            except ValueError as VE:
-                                cfg.error("Skipping None in VIL centroid\n"+str(VE)+" DT "+str(lineList[DTIndex])+" tilt "+str(tilt))
-                                continue
-                    else:
-                        continue
-                        
-                        
-            
+        tEpoch = timeindex.toEpoch(tString)
+        
+        overlays = getOverlayIndex(case)
+        DTIndex = overlays.index('DateTime(Track)')
+        latIndex = overlays.index('Latitude(Degrees)(Track)')
+        lonIndex = overlays.index('Longitude(Degrees)(Track)')
+        uIndex = overlays.index('uShear(m/s)')
+        vIndex = overlays.index('vShear(m/s)')
+        closestLocTDSeconds = 99999999
+        closestLat = None
+        closestLon = None
+        closestU = None
+        closestV = None
+
+        for lineEpoch, lineList in overlays.getRows(DTIndex):
+            currentTDSeconds = abs(lineEpoch - tEpoch)
+            if currentTDSeconds < closestLocTDSeconds:
+                try:
+                    closestLat = float(lineList[latIndex])
+                    closestLon = float(lineList[lonIndex])
+                    closestLocTDSeconds = currentTDSeconds
+                    closestU = float(lineList[uIndex])
+                    closestV = float(lineList[vIndex])
+                except ValueError as VE:
+                    cfg.error("Skipping None in VIL centroid\n"+str(VE)+" DT "+str(lineList[DTIndex])+" tilt "+str(tilt))
+                    continue
+
 
         if closestLocTDSeconds <= (cfg.maxAppendTimeR*60):
             
@@ -522,39 +365,27 @@ def plotETCentroid(cfg, case, plt, ax, tString, closestString):
         #Now we're going to read through the preliminary analysis and get centroid lat/lons
         fileName = str(case.ID)+'_prelim.csv'
         fullPath = os.path.join(case.saveDir, fileName)
-        
-        with open(fullPath, 'r') as analysisFi:
-            first = True
-            DTIndex = None
-            latIndex = None
-            lonIndex = None
-            closestLocIndex = []
-            closestLocTDSeconds = 99999999
-            closestLat = None
-            closestLon = None
-            
-           
-            for line in analysisFi:
-                lineList = line.rstrip('\n').split(',')
-                if first:
-                    DTIndex = lineList.index('DateTime(ET)')
-                    latIndex = lineList.index('Latitude(Degrees)(ET)')
-                    lonIndex = lineList.index('Longitude(Degrees)(ET)')
-                    first = False
-                
-                else:
-                    if lineList[DTIndex] != '-99900' and lineList[DTIndex] != '-99904':
-                        currentTDSeconds = getStringDT(cfg, tString, lineList[DTIndex])[0]
-                        if currentTDSeconds < closestLocTDSeconds:
-                            try:
-                                closestLat = float(lineList[latIndex])
-                                closestLon = float(lineList[lonIndex])
-                                closestLocTDSeconds = currentTDSeconds
-                            except ValueError:
-                                cfg.error("Skipping None in ET centroid\n"+str(VE)+" DT "+str(lineList[DTIndex])+" tilt "+str(tilt))
-                                continue
-                    else:
-                        continue
+        tEpoch = timeindex.toEpoch(tString)
+        
+        overlays = getOverlayIndex(case)
+        DTIndex = overlays.index('DateTime(ET)')
+        latIndex = overlays.index('Latitude(Degrees)(ET)')
+        lonIndex = overlays.index('Longitude(Degrees)(ET)')
+        closestLocTDSeconds = 99999999
+        closestLat = None
+        closestLon = None
+
+        for lineEpoch, lineList in overlays.getRows(DTIndex):
+            currentTDSeconds = abs(lineEpoch - tEpoch)
+            if currentTDSeconds < closestLocTDSeconds:
+                try:
+                    closestLat = float(lineList[latIndex])
+                    closestLon = float(lineList[lonIndex])
+                    closestLocTDSeconds = currentTDSeconds
+                except ValueError:
+                    cfg.error("Skipping None in ET centroid\n"+str(VE)+" DT "+str(lineList[DTIndex])+" tilt "+str(tilt))
+                    continue
+
 
         if closestLocTDSeconds <= (60*cfg.maxAppendTimeR):
             ax.scatter(closestLon, closestLat, s=80, c=['#FF1C51'], marker='X', edgecolor=[1, 1, 1], linewidth=1)
@@ -570,23 +401,12 @@ def plotCluster(cfg, case, plt, ax, tString):
     
     if (case.hasDir['cluster']):
  
-        clu_shed_files = os.listdir(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/')
-
-        nearestTime = 9999999999
-        closestIndex = 9999999999
-        counter = 0
-        closestString = ''
-
-        for fi3 in  clu_shed_files:
-            cluShedDString = fi3[0:15]
-            currentDT, greater, equal = getStringDT(cfg, tString, cluShedDString)
-            if (currentDT < nearestTime):
-                nearestTime = currentDT
-                closestIndex = counter
-                closestString = cluShedDString
-            counter = counter + 1
-        
-        if (nearestTime <= 60):
+        clu_shed_files, fileIndex = getOverlayIndex(case).getShedFiles(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/')
+
+        closestIndex = fileIndex.nearest(tString, tolerance=60)
+        
+        if closestIndex is not None:
+            closestString = clu_shed_files[closestIndex][0:15]
             clu_shed_nc_data = Dataset(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/'+clu_shed_files[closestIndex])
             clu_shed = clu_shed_nc_data.variables[case.productVars['cluster']]
             [vlats, vlons, vlat_spacing, vlon_spacing, vlat_size, vlon_size] = getSpatialAttributes(cfg, clu_shed_nc_data)
@@ -607,32 +427,16 @@ def plotETCluster(cfg, case, plt, ax, tString):
 
     #Plot the echo top clusters if available
     if (case.hasDir['ETCluster']):
-        clu_shed_files = os.listdir(case.productDirs['ETCluster']+'/'+case.productVars['ETCluster']+'/scale_0/')
+        clu_shed_files, fileIndex = getOverlayIndex(case).getShedFiles(case.productDirs['ETCluster']+'/'+case.productVars['ETCluster']+'/scale_0/')
 
-        cfg.log('ET '+str(clu_shed_files))
+        cfg.debug('ET '+str(clu_shed_files))
          
-        nearestTime = 9999999999
-        closestIndex = 9999999999
-        counter = 0
-        closestString = ''
-
-        isEqual = False
-        isGreater = False
-        
-        for fi3 in  clu_shed_files:
-            cluShedDString = fi3[0:15]
-            currentDT, greater, equal = getStringDT(cfg, tString, cluShedDString)
-            if (currentDT < nearestTime):
-                nearestTime = currentDT
-                closestIndex = counter
-                closestString = cluShedDString
-                isEqual = equal
-                isGreater = greater
-            counter = counter + 1
+        closestIndex = fileIndex.nearest(tString, tolerance=60*cfg.maxAppendTimeR)
             
         cfg.log('ET '+str(closestIndex))
          
-        if nearestTime <= (60*cfg.maxAppendTimeR):
+        if closestIndex is not None:
+            closestString = clu_shed_files[closestIndex][0:15]
             clu_shed_nc_data = Dataset(case.productDirs['ETCluster']+'/'+case.productVars['ETCluster']+'/scale_0/'+clu_shed_files[closestIndex])
             clu_shed = clu_shed_nc_data.variables[case.productVars['ETCluster']]
             [vlats, vlons, vlat_spacing, vlon_spacing, vlat_size, vlon_size] = getSpatialAttributes(cfg, clu_shed_nc_data)
@@ -651,26 +455,15 @@ def plotShearClusters(cfg, case, plt, ax, tString, tilt, ax2=None):
     closestString = ''
      
     if (case.hasDir['maxShearCluster']):
-        clu_shed_files = os.listdir(case.productDirs['maxShearCluster']+'/'+tilt+'/'+case.productVars['maxShearCluster']+'/scale_0/')
+        clu_shed_files, fileIndex = getOverlayIndex(case).getShedFiles(case.productDirs['maxShearCluster']+'/'+tilt+'/'+case.productVars['maxShearCluster']+'/scale_0/')
 
+        closestIndex = fileIndex.nearest(tString)
         
-        nearestTime = 9999999999
-        closestIndex = 9999999999
-        counter = 0
-       
-
-        for fi3 in  clu_shed_files:
-            cluShedDString = fi3[0:15]
-            currentDT, greater, equal = getStringDT(cfg, tString, cluShedDString)
-            if (currentDT < nearestTime):
-                nearestTime = currentDT
-                closestIndex = counter
-                closestString = cluShedDString
-            counter = counter + 1
-        
-        cfg.log(case.productDirs['maxShearCluster']+'/'+tilt+'/'+case.productVars['maxShearCluster']+'/scale_0/'+clu_shed_files[closestIndex])
+        if closestIndex is not None:
+            closestString = clu_shed_files[closestIndex][0:15]
+            cfg.log(case.productDirs['maxShearCluster']+'/'+tilt+'/'+case.productVars['maxShearCluster']+'/scale_0/'+clu_shed_files[closestIndex])
         
-        if nearestTime <= (60*cfg.maxAppendTimeV):
+        if closestIndex is not None and abs(fileIndex.getEpoch(closestIndex) - timeindex.toEpoch(tString)) <= (60*cfg.maxAppendTimeV):
             clu_shed_nc_data = Dataset(case.productDirs['maxShearCluster']+'/'+tilt+'/'+case.productVars['maxShearCluster']+'/scale_0/'+clu_shed_files[closestIndex])
             clu_shed = clu_shed_nc_data.variables[case.productVars['maxShearCluster']]
             [vlats, vlons, vlat_spacing, vlon_spacing, vlat_size, vlon_size] = getSpatialAttributes(cfg, clu_shed_nc_data)
@@ -681,22 +474,14 @@ def plotShearClusters(cfg, case, plt, ax, tString, tilt, ax2=None):
             clu_shed_nc_data.close()
                 
     if (case.hasDir['minShearCluster']):            
-        clu_shed_files = os.listdir(case.productDirs['minShearCluster']+'/'+tilt+'/'+case.productVars['minShearCluster']+'/scale_0/')
-
-        nearestTime = 9999999999
-        closestIndex = 9999999999
-        counter = 0
-
-        for fi3 in  clu_shed_files:
-            cluShedDString = fi3[0:15]
-            currentDT, greater, equal = getStringDT(cfg, tString, cluShedDString)
-            if (currentDT < nearestTime):
-                nearestTime = currentDT
-                closestIndex = counter
-                closestString = cluShedDString
-            counter = counter + 1
-            
-        if nearestTime <= (60*cfg.maxAppendTimeV):
+        clu_shed_files, fileIndex = getOverlayIndex(case).getShedFiles(case.productDirs['minShearCluster']+'/'+tilt+'/'+case.productVars['minShearCluster']+'/scale_0/')
+
+        closestIndex = fileIndex.nearest(tString)
+        
+        if closestIndex is not None:
+            closestString = clu_shed_files[closestIndex][0:15]
+            
+        if closestIndex is not None and abs(fileIndex.getEpoch(closestIndex) - timeindex.toEpoch(tString)) <= (60*cfg.maxAppendTimeV):
             clu_shed_nc_data = Dataset(case.productDirs['minShearCluster']+'/'+tilt+'/'+case.productVars['minShearCluster']+'/scale_0/'+clu_shed_files[closestIndex])
             clu_shed = clu_shed_nc_data.variables[case.productVars['minShearCluster']]
             [vlats, vlons, vlat_spacing, vlon_spacing, vlat_size, vlon_size] = getSpatialAttributes(cfg, clu_shed_nc_data)
@@ -809,6 +594,12 @@ def createClusterShedPlot(cfg, case):
         for fi in files:
             currentFile = case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/'+fi
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+altString+'_cluster_shed.png'
+            pdfPath = None
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating Cluster Shed Plot for '+currentFile)
             nc_data = Dataset(currentFile, 'r')
             cluster_shed = nc_data.variables[case.productVars['cluster']]
@@ -833,9 +624,8 @@ def createClusterShedPlot(cfg, case):
             cbar = fig.colorbar(pcm, cax=cbar_ax)
             nc_data.close()
             
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+altString+'_cluster_shed.png'
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
             
             plt.close()
         
@@ -875,6 +665,12 @@ def createMotionPlot(cfg, case):
             currentSFile = os.path.join(southDir, fi)
             currentEFile = os.path.join(eastDir, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+altString+'_motion.png'
+            pdfPath = None
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentSFile, currentEFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating Motion Plots From '+str(southDir)+' '+str(eastDir))
             s_nc_data = Dataset(currentSFile, 'r')
             e_nc_data = Dataset(currentEFile, 'r')
@@ -908,9 +704,8 @@ def createMotionPlot(cfg, case):
             s_nc_data.close()
             e_nc_data.close()
             
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+altString+'_motion.png'
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
 
             plt.close()
         
@@ -944,6 +739,12 @@ def createETPlot(cfg, case):
         for fi in files:
             currentFile = os.path.join(ETDIR, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+altString+'_et.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+altString+'_et.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating ET Plot for '+currentFile)
             nc_data = Dataset(currentFile, 'r')
             ET = nc_data.variables[case.productVars['et']]
@@ -977,7 +778,7 @@ def createETPlot(cfg, case):
             pcm = ax.pcolormesh(xticks, yticks, ET, cmap='cividis', vmin=0, vmax=15, alpha=1, linewidth=0, rasterized=True)
             pcm.set_edgecolor('face')
             
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='white')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='white')
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
            
@@ -998,11 +799,8 @@ def createETPlot(cfg, case):
             
             setExtent(ax, dataWestLon, dataEastLon, dataSouthLat, dataNorthLat, proj)
             
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+altString+'_et.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+altString+'_et.pdf'
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
             
             plt.close()
         
@@ -1040,6 +838,12 @@ def createVILPlot(cfg, case, tilt, count):
         for fi in files:
             currentFile = os.path.join(case.dataDir, case.productVars['vil'], altString, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_vil.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_vil.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating VIL Plot for '+currentFile)
             nc_data = Dataset(currentFile, 'r')
             VIL = nc_data.variables[case.productVars['vil']]
@@ -1075,7 +879,7 @@ def createVILPlot(cfg, case, tilt, count):
            
             plt.title(cfg.storm+' '+case.ID+' '+tString+' VIL '+str(titleTilt)+r'$^\circ$ Shear', loc='center', fontsize=20)
 
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='white')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='white')
 
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
@@ -1100,12 +904,9 @@ def createVILPlot(cfg, case, tilt, count):
             
             setExtent(ax, dataWestLon, dataEastLon, dataSouthLat, dataNorthLat, proj)
 
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_vil.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_vil.pdf'
             
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
 
             plt.close()
         
@@ -1141,6 +942,12 @@ def createCCPlotTilt(cfg, case, tilt, index):
         for fi in files:
             currentFile = os.path.join(currentDir, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_cc_tilt.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_cc_tilt.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating cc Plot for '+currentFile)
             nc_data = Dataset(currentFile, 'r')
             cc = nc_data.variables[case.productVars['cc']]
@@ -1171,7 +978,7 @@ def createCCPlotTilt(cfg, case, tilt, index):
             pcm = ax.pcolormesh(xticks, yticks, cc, cmap='jet', vmin=0.6, vmax=1, alpha=1, linewidth=0, rasterized=True)
             pcm.set_edgecolor('face')
           
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='grey')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='grey')
             
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
@@ -1193,12 +1000,9 @@ def createCCPlotTilt(cfg, case, tilt, index):
 
             setExtent(ax, dataWestLon, dataEastLon, dataSouthLat, dataNorthLat, proj)
             
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_cc_tilt.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_cc_tilt.pdf'
             
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
 
             plt.close()
         
@@ -1232,6 +1036,12 @@ def createTDSPlotTilt(cfg, case, tilt, index):
         for fi in files:
             currentFile = os.path.join(currentDir, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_tds.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_tds.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating tds Plot for '+currentFile)
             nc_data = Dataset(currentFile, 'r')
             tds = nc_data.variables[case.productVars['tds']]
@@ -1262,7 +1072,7 @@ def createTDSPlotTilt(cfg, case, tilt, index):
             ax = plt.axes(projection=proj)
             pcm = ax.pcolormesh(xticks, yticks, tds, cmap='gnuplot2', vmin=0.4, vmax=1, alpha=1, linewidth=0, rasterized=True)
 
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='white')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='white')
             
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
@@ -1286,12 +1096,9 @@ def createTDSPlotTilt(cfg, case, tilt, index):
             setExtent(ax, dataWestLon, dataEastLon, dataSouthLat, dataNorthLat, proj)
             
             
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_tds.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+str(tilt)+'_tds.pdf'
             
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
 
             plt.close()
         
@@ -1335,6 +1142,12 @@ def createVelocityPlotTilt(cfg, case, tilt, index):
             
             currentFile = os.path.join(currentDir, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_velocity_tilt.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_velocity_tilt.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating Velocity Plot for '+currentFile)
             nc_data = Dataset(currentFile)
             velocity = nc_data.variables[case.productVars['velocity']]
@@ -1364,14 +1177,14 @@ def createVelocityPlotTilt(cfg, case, tilt, index):
             dataSouthLat = lat - ((lat_size-1)*(lat_spacing))
             
             
-            colorMap = cm.TtrappyColormap()
+            colorMap = getColormaps()
             #cmap = colorMap.cmaps["velocity"]
             cmap = plt.get_cmap('pyart_balance')
             ax = plt.axes(projection=proj)
             pcm = ax.pcolormesh(xticks, yticks, velocity, cmap=cmap, vmin=-50, vmax=50, alpha=1, linewidth=0, rasterized=True)
             pcm.set_edgecolor('face')
 
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='grey')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='grey')
             
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
@@ -1391,12 +1204,9 @@ def createVelocityPlotTilt(cfg, case, tilt, index):
             
             setExtent(ax, dataWestLon, dataEastLon, dataSouthLat, dataNorthLat, proj)
             
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_velocity_tilt.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_velocity_tilt.pdf'
             
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
             
             plt.close()
         
@@ -1439,6 +1249,12 @@ def createShearPlotTilt(cfg, case, tilt, index):
 
             currentFile = os.path.join(currentDir, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_shear_tilt.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_shear_tilt.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating Shear Plot for '+currentFile)
             nc_data = Dataset(currentFile)
             shear = nc_data.variables[case.productVars['shear']]
@@ -1486,7 +1302,7 @@ def createShearPlotTilt(cfg, case, tilt, index):
             pcm.set_edgecolor('face')
             #pcm = None
             
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='grey')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='grey')
 
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
@@ -1525,12 +1341,9 @@ def createShearPlotTilt(cfg, case, tilt, index):
             setExtent(ax, dataWestLon, dataEastLon, dataSouthLat, dataNorthLat, proj)
             
             
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_shear_tilt.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_shear_tilt.pdf'
             
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
             
             plt.close()
             
@@ -1573,6 +1386,12 @@ def createZdrPlotTilt(cfg, case, tilt, index):
 
             currentFile = os.path.join(currentDir, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_zdr_tilt.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_zdr_tilt.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating Zdr Plot for '+currentFile)
             nc_data = Dataset(currentFile)
             shear = nc_data.variables[case.productVars['Zdr']]
@@ -1606,7 +1425,7 @@ def createZdrPlotTilt(cfg, case, tilt, index):
             
             dataType = 'Zdr'
             
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='grey')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='grey')
 
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
 
@@ -1623,12 +1442,9 @@ def createZdrPlotTilt(cfg, case, tilt, index):
             cbar.solids.set_edgecolor('face')
             nc_data.close()
                 
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_zdr_tilt.png'
-            pdfPath =  case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_zdr_tilt.pdf'
             
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
             
             plt.close()
         
@@ -1672,6 +1488,12 @@ def createRefPlotTilt(cfg, case, tilt, index):
 
             currentFile = os.path.join(currentDir, fi)
             tString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_ref_tilt.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_ref_tilt.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, tString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating Ref Plot for '+currentFile)
             nc_data = Dataset(currentFile)
             ref = nc_data.variables[case.productVars['ref0']]
@@ -1707,7 +1529,7 @@ def createRefPlotTilt(cfg, case, tilt, index):
             dataType = 'ZQC'
             
 
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='grey')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='grey')
 
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
@@ -1731,12 +1553,9 @@ def createRefPlotTilt(cfg, case, tilt, index):
             
             setExtent(ax, dataWestLon, dataEastLon, dataSouthLat, dataNorthLat, proj)
                 
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_ref_tilt.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(tString)+'_'+tilt+'_ref_tilt.pdf'
             
             cfg.log("Saving "+savePath)
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
             
             plt.close()
         
@@ -1774,6 +1593,12 @@ def createRefPlot(cfg, case, alt):
         for fi in files:
             currentFile = os.path.join(case.dataDir, case.productVars['ref'], alt, fi)
             refTString = fi[0:15]
+            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(refTString)+'_'+alt+'_ref.png'
+            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(refTString)+'_'+alt+'_ref.pdf'
+            signature = checkFigure(cfg, case, savePath, pdfPath, refTString, [currentFile])
+            if signature is None:
+                continue
+            
             cfg.log('Creating Ref Plot for '+currentFile)
             nc_data = Dataset(currentFile, 'r')
             ref = nc_data.variables[case.productVars['ref']]
@@ -1803,12 +1628,12 @@ def createRefPlot(cfg, case, alt):
             dataSouthLat = cent_lat - ((lat_size-1)*(lat_spacing))
             
             ax = plt.axes(projection=proj)
-            colorMap = cm.TtrappyColormap()
+            colorMap = getColormaps()
             #cmap = colorMap.cmaps["reflectivity"]
             cmap = plt.get_cmap('pyart_HomeyerRainbow')
             pcm = ax.pcolormesh(xticks, yticks, ref, cmap=cmap, vmin=0, vmax=70, alpha=1, linewidth=0, rasterized=True) 
             
-            ax.add_feature(USCOUNTIES.with_scale('20m'), facecolor='none', edgecolor='grey')
+            ax.add_feature(basemap.getCountyLayer(xticks, yticks), facecolor='none', edgecolor='grey')
 
             drawFeaturesWithAxis(cfg, case, plt, ax, ax2, xticks, yticks, xticks2, yticks2, proj)
             
@@ -1817,31 +1642,20 @@ def createRefPlot(cfg, case, alt):
             
 
             if (case.hasDir['cluster']):
-                clu_shed_files = os.listdir(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/')
-
-                nearestTime = 9999999999
-                closestIndex = 9999999999
-                counter = 0
-                closestString = ''
-
-                for fi3 in  clu_shed_files:
-                    cluShedDString = fi3[0:15]
-                    currentDT, greater, equal = getStringDT(cfg, refTString, cluShedDString)
-                    if (currentDT < nearestTime and (greater or equal)):
-                        nearestTime = currentDT
-                        closestIndex = counter
-                        closestString = cluShedDString
-                    counter = counter + 1
-
-
-                clu_shed_nc_data = Dataset(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/'+clu_shed_files[closestIndex])
-                clu_shed = clu_shed_nc_data.variables[case.productVars['cluster']]
-                [vlats, vlons, vlat_spacing, vlon_spacing, vlat_size, vlon_size] = getSpatialAttributes(cfg, clu_shed_nc_data)
-                xvticks = createAxisTicks(cfg, vlons, vlon_size, vlon_spacing)
-                yvticks = createAxisTicks(cfg, vlats, vlat_size, vlat_spacing)
-                XV, YV = np.meshgrid(xvticks, yvticks)
-                plt.contour(XV, YV, clu_shed[:], 0, linewidths=3)
-                clu_shed_nc_data.close()
+                clu_shed_files, fileIndex = getOverlayIndex(case).getShedFiles(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/')
+
+                #Closest cluster at or after the reflectivity time
+                closestIndex = fileIndex.atOrAfter(refTString)
+
+                if closestIndex is not None:
+                    clu_shed_nc_data = Dataset(case.productDirs['cluster']+'/'+case.productVars['cluster']+'/scale_0/'+clu_shed_files[closestIndex])
+                    clu_shed = clu_shed_nc_data.variables[case.productVars['cluster']]
+                    [vlats, vlons, vlat_spacing, vlon_spacing, vlat_size, vlon_size] = getSpatialAttributes(cfg, clu_shed_nc_data)
+                    xvticks = createAxisTicks(cfg, vlons, vlon_size, vlon_spacing)
+                    yvticks = createAxisTicks(cfg, vlats, vlat_size, vlat_spacing)
+                    XV, YV = np.meshgrid(xvticks, yvticks)
+                    plt.contour(XV, YV, clu_shed[:], 0, linewidths=3)
+                    clu_shed_nc_data.close()
                 
                 
                 
@@ -1859,11 +1673,8 @@ def createRefPlot(cfg, case, alt):
             
             nc_data.close()
 
-            savePath = case.saveDir+'/figs/'+cfg.figurePrefix+str(refTString)+'_'+alt+'_ref.png'
-            pdfPath = case.saveDir+'/pdf/'+cfg.figurePrefix+str(refTString)+'_'+alt+'_ref.pdf'
    
-            plt.savefig(savePath, format='png')
-            plt.savefig(pdfPath, format='pdf')
+            saveFigure(cfg, plt, savePath, pdfPath, signature)
             cfg.log("Saving "+savePath)    
             plt.close()
         
@@ -1874,6 +1685,138 @@ def createRefPlot(cfg, case, alt):
         raise
         
         
+#Pool of plotting processes kept for every case this process plots (see getPlotPool)
+plotPool = None
+plotPoolSize = None
+
+#Colormaps loaded once per process (see getColormaps)
+colormaps = None
+
+#prelim.csv path -> OverlayIndex of the case being plotted (see getOverlayIndex)
+overlayIndexes = {}
+
+#Manifest file -> FigureManifest of the case being plotted (see getFigureManifest)
+figureManifests = {}
+
+#savePath -> manifest entry for the figures saved by the plot running in this process (see saveFigure)
+savedFigures = {}
+
+def getColormaps():
+    """ The TtrappyColormap for this process. Loaded the first time it's needed instead of for every frame """
+    
+    global colormaps
+    if colormaps is None:
+        colormaps = cm.TtrappyColormap()
+        
+    return colormaps
+    
+def initPlotWorker():
+    """ Set up a plotting process once so the frames it draws don't each pay for it """
+    
+    #Add this to disable attempts to connect to X Server
+    mpl.use('AGG')
+    getColormaps()
+    
+    return
+    
+def getOverlayIndex(case):
+    """ The OverlayIndex createPlots built for the case, or a new one (with only prelim.csv) if it isn't plotting through createPlots """
+    
+    fullPath = os.path.join(case.saveDir, str(case.ID)+'_prelim.csv')
+    if fullPath not in overlayIndexes:
+        overlayIndexes[fullPath] = ovl.OverlayIndex(fullPath)
+        
+    return overlayIndexes[fullPath]
+    
+def getFigureManifest(cfg, case):
+    """ The FigureManifest createPlots loaded for the case, or a new one if it isn't plotting through createPlots """
+    
+    fileName = os.path.join(case.saveDir, str(case.ID)+'_figures.json')
+    if fileName not in figureManifests:
+        figureManifests[fileName] = fman.FigureManifest(cfg, case)
+        
+    return figureManifests[fileName]
+    
+def checkFigure(cfg, case, savePath, pdfPath, tString, inputFiles):
+    """ Signature of a frame to hand to saveFigure, or None if the figure already saved for it is up to date and it can be skipped """
+    
+    manifest = getFigureManifest(cfg, case)
+    signature = manifest.getSignature(getOverlayIndex(case), tString, inputFiles)
+    if manifest.isCurrent(savePath, pdfPath, signature):
+        cfg.debug("Skipping "+savePath+" (up to date)")
+        return None
+        
+    return signature
+    
+def saveFigure(cfg, plt, savePath, pdfPath, signature):
+    """ Save the figure (and the PDF if there is one and PDFs are being made) and note it for the manifest """
+    
+    plt.savefig(savePath, format='png')
+    
+    pdf = bool(pdfPath) and cfg.makePDFs
+    if pdf:
+        plt.savefig(pdfPath, format='pdf')
+        
+    savedFigures[savePath] = {'signature':signature, 'pdf':pdf}
+    
+    return
+    
+def runPlotJob(job):
+    """ Run one plot in a pool process. Returns the name of the plot, the traceback if it failed (None if it didn't),
+        and the figures it saved for the manifest
+    """
+    
+    target, args, overlayIndex, manifest = job
+    name = target.__name__+str(args[2:])
+    
+    #Only keep the case being plotted
+    if overlayIndex.fullPath not in overlayIndexes:
+        overlayIndexes.clear()
+    overlayIndexes[overlayIndex.fullPath] = overlayIndex
+    
+    if manifest.fileName not in figureManifests:
+        figureManifests.clear()
+    figureManifests[manifest.fileName] = manifest
+    
+    savedFigures.clear()
+    try:
+        target(*args)
+    except Exception:
+        return name, traceback.format_exc(), dict(savedFigures)
+        
+    return name, None, dict(savedFigures)
+    
+def getPlotPool(cfg):
+    """ The pool the plots are made on. It's started the first time it's needed with cfg.maxProcesses processes (or one per core)
+        and kept for the rest of the cases so each one doesn't start new processes and set up matplotlib again.
+    """
+    
+    global plotPool, plotPoolSize
+    
+    processes = cfg.maxProcesses or os.cpu_count() or 1
+    if plotPool is not None and plotPoolSize != processes:
+        closePlotPool()
+        
+    if plotPool is None:
+        cfg.log("Starting "+str(processes)+" plotting processes")
+        plotPool = mp.Pool(processes, initializer=initPlotWorker)
+        plotPoolSize = processes
+        
+    return plotPool
+    
+def closePlotPool():
+    """ Stop the plotting processes (if they were started) """
+    
+    global plotPool, plotPoolSize
+    
+    if plotPool is not None:
+        plotPool.close()
+        plotPool.join()
+        plotPool = None
+        plotPoolSize = None
+        
+    return
+    
 def createPlots(cfg, case):
 
     
@@ -1966,68 +1909,36 @@ def createPlots(cfg, case):
         count += 1
             
     
-    try:
-        #Try to limit the number of processes to 16
-        
-        procs = []
-        results= []
-        
-        maxProcesses = 14
-        a = 0
-        while a < len(targets):
-            if len(procs) < maxProcesses:
-                p = mp.Process(target=targets[a], args=args[a])
-                p.start()
-                procs.append(p)
-                
-                
-                print('Starting', targets[a], 'with args', args[a])
-                
-                a += 1
-            
-            if len(procs) >= maxProcesses:
-                while (len(procs) >= maxProcesses):
-                    
-                    procs2 = procs
-                    #Go through each process and see if it is alive
-                    for p in procs:
-                        if not p.is_alive():
-                        
-                            #If the process is dead, join it and remove it from procs2
-                            p.join()
-                            #We remove the process from a copy of the process list to avoid modifying something we
-                            #are iterating over.
-                            procs2.remove(p)
-                
-                    procs = procs2
-                    time.sleep(3)
-                    
-            if a == (len(targets) - 1):
+    if not targets:
+        cfg.log("Nothing to plot")
+        return
+        
+    #Read prelim.csv and index the shed directories once for every frame of the case
+    overlayIndex = ovl.OverlayIndex(os.path.join(case.saveDir, str(case.ID)+'_prelim.csv'), ovl.getShedDirectories(cfg, case))
+    
+    #Figures already saved from the same inputs are skipped
+    manifest = fman.FigureManifest(cfg, case)
+    
+    pool = getPlotPool(cfg)
+    
+    #Hand every plot to the pool and log each one as it finishes. A plot that fails is logged and the rest keep going
+    failed = 0
+    saved = 0
+    for name, error, figures in pool.imap_unordered(runPlotJob, [(target, arg, overlayIndex, manifest) for target, arg in zip(targets, args)]):
+        manifest.update(figures)
+        saved += len(figures)
+        if error is None:
+            cfg.log("Finished "+name)
+        else:
+            cfg.error("Plot "+name+" failed\n"+error)
+            failed += 1
             
-                while (len(procs) > 0):
-                
-                    for p in procs:
-                        if not p.is_alive():
-                        
-                            p.join()
-                            
-                            procs2.remove(p)
-                            
-                    procs = procs2
-                    time.sleep(3)
-                    
-                    
-            time.sleep(1)
-    except Exception as E:
-        cfg.log("Exception in plotting "+str(E))
-        for p in procs:
-            p.terminate()
-            p.join()
-        raise
+    manifest.save()
+    cfg.log("Saved "+str(saved)+" figures for case "+str(case.ID)+". The rest were up to date.")
+    
+    if failed:
+        cfg.error(str(failed)+" of "+str(len(targets))+" plots failed for case "+str(case.ID))
     
-    for p in procs:
-        p.join()
-
     cfg.log("End of plotting")
     
     return
@@ -0,0 +1,158 @@
+#Header metadata (VCP, time, elevation) of the netCDF volumes WDSSII writes for a case
+#Each file is opened once and only its global attributes are read. What's read is kept in the case's tmpDir (volumes.json) by
+#directory and file with the file's size and mtime, so later stages and re-runs look it up instead of opening the files again.
+
+import os
+import json
+import tempfile
+from datetime import datetime as dt
+from multiprocessing import Pool
+import netCDF4 as nc
+from ttrappy import timeindex
+
+VERSION = 1 #Change when what's read from a file changes so old indexes aren't used
+INDEXFILE = 'volumes.json'
+ATTRIBUTES = {'vcp':'vcp-value', 'time':'Time', 'elevation':'Elevation'} #Key -> global attribute
+
+
+def getVolumeTime(fileName):
+    """ Datetime of a volume from its name (YYYYMMDD-HHMMSS.netcdf). ValueError if it isn't one """
+    return dt.strptime(fileName, '%Y%m%d-%H%M%S.netcdf')
+
+
+def readHeader(fileName):
+    """ The ATTRIBUTES of a netCDF file as floats (None for any it doesn't have). Only the header is read """
+
+    header = {}
+    with nc.Dataset(fileName, 'r') as dataset:
+        attributes = dataset.ncattrs()
+        for key, attribute in ATTRIBUTES.items():
+            try:
+                header[key] = float(dataset.getncattr(attribute)) if attribute in attributes else None
+            except (TypeError, ValueError):
+                header[key] = None
+
+    return header
+
+
+def readHeaders(directory, files):
+    """ [size, mtime, header] for each of (fileName, size, mtime) in files in directory. Run in the pool """
+
+    entries = {}
+    for fileName, size, mtime in files:
+        try:
+            entries[fileName] = [size, mtime, readHeader(os.path.join(directory, fileName))]
+        except OSError:
+            continue #Unreadable. It's tried again next time
+
+    return directory, entries
+
+
+class VolumeIndex():
+
+    """ Header metadata of the volumes in a case's directories, loaded from and saved to the case's tmpDir.
+
+        update() reads the headers of the files that aren't in the index (or changed) for several directories at once with one
+        process per directory (netCDF isn't safe to read from threads), and getVolumes() returns a directory's volumes in the order of
+        the times in their names. Call save() to keep what was read.
+    """
+
+    def __init__(self, cfg, case):
+
+        self.cfg = cfg
+        self.fileName = os.path.join(case.tmpDir, INDEXFILE)
+        self.directories = {} #Directory -> {file: [size, mtime, header]}
+        self.changed = False
+
+        if os.path.exists(self.fileName):
+            try:
+                with open(self.fileName, 'r') as fi:
+                    index = json.load(fi)
+                if index.get('version') == VERSION:
+                    self.directories = index['directories']
+            except (OSError, ValueError, KeyError) as E:
+                cfg.error("Unable to read volume index "+self.fileName+": "+str(E))
+                self.directories = {}
+
+        return
+
+    def getChanged(self, directory):
+        """ (fileName, size, mtime) of the volumes in directory that aren't in the index or changed since they were read """
+
+        known = self.directories.get(directory, {})
+        changed = []
+        for entry in os.scandir(directory):
+            try:
+                getVolumeTime(entry.name)
+            except ValueError:
+                continue
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name not in known or known[entry.name][0:2] != [stat.st_size, stat.st_mtime_ns]:
+                changed.append((entry.name, stat.st_size, stat.st_mtime_ns))
+
+        return changed
+
+    def update(self, directories):
+        """ Read the headers the index doesn't have for every directory """
+
+        toRead = []
+        for directory in directories:
+            #Drop files that were removed
+            if directory in self.directories:
+                present = set(os.listdir(directory))
+                removed = [fileName for fileName in self.directories[directory] if fileName not in present]
+                for fileName in removed:
+                    del self.directories[directory][fileName]
+                    self.changed = True
+            changed = self.getChanged(directory)
+            if changed:
+                toRead.append((directory, changed))
+
+        if not toRead:
+            return
+
+        self.cfg.log("Reading the headers of "+str(sum(len(files) for _, files in toRead))+" volumes in "+str(len(toRead))+" directories")
+        if len(toRead) > 1:
+            with Pool(min(len(toRead), os.cpu_count() or 1)) as pool:
+                results = pool.starmap(readHeaders, toRead)
+        else:
+            results = [readHeaders(*toRead[0])]
+
+        for directory, entries in results:
+            self.directories.setdefault(directory, {}).update(entries)
+        self.changed = True
+
+        return
+
+    def getVolumes(self, directory):
+        """ (fileName, header) of every volume in directory in the index, in the order of the times in their names """
+
+        volumes = self.directories.get(directory, {})
+        fileNames = list(volumes.keys())
+        order = timeindex.TimeIndex([getVolumeTime(fileName) for fileName in fileNames]).getSortedIndices()
+
+        return [(fileNames[i], volumes[fileNames[i]][2]) for i in order]
+
+    def save(self):
+        """ Write the index if anything was read """
+
+        if not self.changed:
+            return
+
+        os.makedirs(os.path.dirname(self.fileName), exist_ok=True)
+        fd, tempName = tempfile.mkstemp(dir=os.path.dirname(self.fileName), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fi:
+                json.dump({'version':VERSION, 'directories':self.directories}, fi)
+            os.replace(tempName, self.fileName)
+        except OSError as E:
+            self.cfg.error("Unable to write volume index "+self.fileName+": "+str(E))
+            if os.path.exists(tempName):
+                os.remove(tempName)
+            return
+
+        self.changed = False
+
+        return